@@ -12,16 +12,48 @@
 	#include <netdb.h>
 	#include <netinet/tcp.h>
 	#include <arpa/inet.h>
+	#include <sys/mman.h>
+	#include <sys/stat.h>
+	#include <fcntl.h>
 #endif
 
 int32_t socketfd;
 
+// shared memory for the message payload (shm channel), the layout is
+// a control block (magic number, attached flag, capacity) followed by
+// the data
+#define HEADER_FLAGS 0
+#define SHARED_MEMORY_FLAG (1 << 24)
+#define SHARED_MEMORY_MAGIC 0x414d5553
+#define SHARED_MEMORY_CONTROL_SIZE 64
+#define MAXIMUM_HEADER_SIZE 64
+
+char *shared_memory = NULL;
+int64_t shared_memory_capacity = 0;
+int64_t shared_memory_offset = 0;
+bool receiving_from_shared_memory = false;
+bool sending_to_shared_memory = false;
+int32_t pending_header[MAXIMUM_HEADER_SIZE];
+int32_t pending_header_length = 0;
+
 //private funtions
 
 void forsockets_send(void *buffer, int32_t length, int32_t file_descriptor) {
 	int32_t total_written = 0;
 	int32_t written;
 
+	if (sending_to_shared_memory) {
+		if (shared_memory_offset + length <= shared_memory_capacity) {
+			memcpy(shared_memory + shared_memory_offset, buffer, length);
+			shared_memory_offset += length;
+			return;
+		}
+		// message does not fit, send the header and the data so far over the socket
+		sending_to_shared_memory = false;
+		forsockets_send((void *) pending_header, pending_header_length * sizeof(int32_t), file_descriptor);
+		forsockets_send((void *) shared_memory, shared_memory_offset, file_descriptor);
+	}
+
 	while (total_written < length) {
 		
 #ifdef WIN32
@@ -47,6 +79,12 @@ void forsockets_receive(void *buffer, int32_t length, int32_t file_descriptor) {
 	int32_t total_read = 0;
 	int32_t bytes_read;
 
+	if (receiving_from_shared_memory) {
+		memcpy(buffer, shared_memory + shared_memory_offset, length);
+		shared_memory_offset += length;
+		return;
+	}
+
 	while (total_read < length) {
 #ifdef WIN32
 		bytes_read = recv(file_descriptor, ((char *) buffer) + total_read,
@@ -69,8 +107,86 @@ void forsockets_receive(void *buffer, int32_t length, int32_t file_descriptor) {
 
 }
 
+void forsockets_attach_shared_memory() {
+#ifndef WIN32
+	char *name = getenv("AMUSE_SHARED_MEMORY_NAME");
+	struct stat status;
+	void *address;
+	int32_t *control;
+	int fd;
+
+	if (name == NULL) {
+		return;
+	}
+
+	fd = shm_open(name, O_RDWR, 0);
+	// do not pass the shared memory on to processes started by this code
+	unsetenv("AMUSE_SHARED_MEMORY_NAME");
+	if (fd < 0) {
+		perror("could not open shared memory, sending messages over the socket");
+		return;
+	}
+	if (fstat(fd, &status) < 0 || status.st_size <= SHARED_MEMORY_CONTROL_SIZE) {
+		close(fd);
+		return;
+	}
+	address = mmap(NULL, status.st_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+	close(fd);
+	if (address == MAP_FAILED) {
+		perror("could not map shared memory, sending messages over the socket");
+		return;
+	}
+
+	control = (int32_t *) address;
+	if (control[0] != SHARED_MEMORY_MAGIC) {
+		munmap(address, status.st_size);
+		return;
+	}
+	shared_memory_capacity = *((int64_t *) (control + 2));
+	if (shared_memory_capacity > status.st_size - SHARED_MEMORY_CONTROL_SIZE) {
+		shared_memory_capacity = status.st_size - SHARED_MEMORY_CONTROL_SIZE;
+	}
+	shared_memory = ((char *) address) + SHARED_MEMORY_CONTROL_SIZE;
+
+	// tell the other side that the payload can be send through the shared memory
+	control[1] = 1;
+#endif
+}
+
 //public functions
 
+void forsockets_receive_header(int32_t *header, int32_t length) {
+	receiving_from_shared_memory = false;
+	forsockets_receive((void *) header, length * sizeof(int32_t), socketfd);
+	if (header[HEADER_FLAGS] & SHARED_MEMORY_FLAG) {
+		header[HEADER_FLAGS] &= ~SHARED_MEMORY_FLAG;
+		receiving_from_shared_memory = true;
+		shared_memory_offset = 0;
+	}
+}
+
+void forsockets_send_header(int32_t *header, int32_t length) {
+	if (shared_memory != NULL && receiving_from_shared_memory && length <= MAXIMUM_HEADER_SIZE) {
+		// the reply is send the same way as the request, the header
+		// is send last, after the data is copied to the shared memory
+		memcpy(pending_header, header, length * sizeof(int32_t));
+		pending_header_length = length;
+		receiving_from_shared_memory = false;
+		sending_to_shared_memory = true;
+		shared_memory_offset = 0;
+	} else {
+		forsockets_send((void *) header, length * sizeof(int32_t), socketfd);
+	}
+}
+
+void forsockets_flush() {
+	if (sending_to_shared_memory) {
+		sending_to_shared_memory = false;
+		pending_header[HEADER_FLAGS] |= SHARED_MEMORY_FLAG;
+		forsockets_send((void *) pending_header, pending_header_length * sizeof(int32_t), socketfd);
+	}
+}
+
 void forsockets_receive_integers(int32_t *integers, int32_t length) {
 	forsockets_receive((void *) integers, length * sizeof(int32_t), socketfd);
 }
@@ -170,6 +286,9 @@ void forsockets_init(char *host, int32_t port) {
 	memcpy((char *) &serv_addr.sin_addr.s_addr, (char *) server->h_addr, 
 			server->h_length);
 	serv_addr.sin_port = htons(port);
+
+	forsockets_attach_shared_memory();
+
 	if (connect(socketfd, (struct sockaddr *) &serv_addr, sizeof(serv_addr))
 			< 0) {
 	    fprintf(stderr, "cannot connect socket to host %s, port %d\n", host, port);
@@ -2,6 +2,10 @@
 void forsockets_init(char *host, int32_t port);
 void forsockets_close();
 
+void forsockets_receive_header(int32_t *header, int32_t length);
+void forsockets_send_header(int32_t *header, int32_t length);
+void forsockets_flush();
+
 void forsockets_receive_integers(int32_t *integers, int32_t length);
 void forsockets_receive_longs(int64_t *longs, int32_t length);
 void forsockets_receive_floats(float *floats, int32_t length);
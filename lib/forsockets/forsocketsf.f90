@@ -119,6 +119,31 @@ module FortranSocketsInterface
             integer (c_int32_t), value :: length
         end subroutine send_string
 
+        subroutine receive_header &
+            (header, length) &
+            bind(c, name='forsockets_receive_header')
+            use iso_c_binding
+            implicit none
+            type (c_ptr), value :: header
+            integer (c_int32_t), value :: length
+        end subroutine receive_header
+
+        subroutine send_header &
+            (header, length) &
+            bind(c, name='forsockets_send_header')
+            use iso_c_binding
+            implicit none
+            type (c_ptr), value :: header
+            integer (c_int32_t), value :: length
+        end subroutine send_header
+
+        subroutine flush_sockets &
+            () &
+            bind(c, name='forsockets_flush')
+            use iso_c_binding
+            implicit none
+        end subroutine flush_sockets
+
         subroutine forsockets_init &
             (host, port) &
             bind(c, name='forsockets_init')
@@ -86,9 +86,12 @@
 
 import threading
 
+import numpy
+
 from amuse.units import quantities
 from amuse.units import units, constants, generic_unit_system, nbody_system
 from amuse import datamodel
+from amuse.ext import octree
 from amuse.support.exceptions import AmuseException, CoreException
 
 
@@ -212,10 +215,27 @@ class CalculateFieldForParticles:
     """
     Calculates an field for a set of particles, the set
     of particles can be from another code.
+
+    The field is calculated with all units stripped once, either by
+    blocked direct summation (method="direct", the default) or with a
+    Barnes-Hut octree (method="tree"). For the tree, the accuracy is set
+    with the opening_angle (0 gives the exact, direct result) and
+    leaf_size sets the maximum number of particles in a leaf node.
+    For direct summation, block_size sets the number of points to
+    calculate the field for at once (0 to determine it from the
+    number of particles).
     """
 
     def __init__(
-        self, particles=None, gravity_constant=None, softening_mode="shared", G=None
+        self,
+        particles=None,
+        gravity_constant=None,
+        softening_mode="shared",
+        G=None,
+        method="direct",
+        opening_angle=0.5,
+        leaf_size=16,
+        block_size=0,
     ):
         if particles is None:
             self.particles = datamodel.Particles()
@@ -255,6 +275,16 @@ class CalculateFieldForParticles:
             self._softening_lengths_squared = self._softening_lengths_squared_shared
         self.smoothing_length_squared = quantities.zero
 
+        if method not in ("direct", "tree"):
+            raise AmuseException(
+                "Unknown method '{0}' to calculate the field, "
+                "use 'direct' or 'tree'".format(method)
+            )
+        self.method = method
+        self.opening_angle = opening_angle
+        self.leaf_size = leaf_size
+        self.block_size = block_size
+
     def _softening_lengths_squared_individual(self):
         return self.particles.radius**2
 
@@ -273,46 +303,72 @@ class CalculateFieldForParticles:
         """
         """
 
-    def get_potential_at_point(self, radius, x, y, z):
-        positions = self.particles.position
-        result = quantities.AdaptingVectorQuantity()
-
-        for i in range(len(x)):
-            dx = x[i] - positions.x
-            dy = y[i] - positions.y
-            dz = z[i] - positions.z
-            dr_squared = (dx * dx) + (dy * dy) + (dz * dz)
-            dr = (dr_squared + self._softening_lengths_squared()).sqrt()
-            energy_of_this_particle = (self.particles.mass / dr).sum()
-            result.append(-self.gravity_constant * energy_of_this_particle)
-        return result
+    def _field_at_point(
+        self, radius, x, y, z, calculate_potential, calculate_acceleration
+    ):
+        mass = self.particles.mass
+        source_x = self.particles.x
+        length_unit = source_x.unit
+        mass_unit = mass.unit
+
+        positions = numpy.column_stack(
+            (
+                source_x.value_in(length_unit),
+                self.particles.y.value_in(length_unit),
+                self.particles.z.value_in(length_unit),
+            )
+        )
+        points = numpy.column_stack(
+            [
+                quantities.as_vector_quantity(coordinate).value_in(length_unit)
+                for coordinate in (x, y, z)
+            ]
+        )
+        masses = mass.value_in(mass_unit)
+        eps2 = quantities.value_in(self._softening_lengths_squared(), length_unit**2)
+        if calculate_acceleration:
+            point_eps2 = (
+                quantities.as_vector_quantity(radius).value_in(length_unit) ** 2
+            )
+        else:
+            point_eps2 = 0.0
+
+        if self.method == "tree":
+            tree = octree.Octree(positions, masses, eps2, leaf_size=self.leaf_size)
+            potential, acceleration = tree.field(
+                points,
+                self.opening_angle,
+                point_eps2,
+                calculate_potential=calculate_potential,
+                calculate_acceleration=calculate_acceleration,
+            )
+        else:
+            potential, acceleration = octree.direct_field(
+                points,
+                positions,
+                masses,
+                eps2,
+                point_eps2,
+                block_size=self.block_size,
+                calculate_potential=calculate_potential,
+                calculate_acceleration=calculate_acceleration,
+            )
 
-    def get_gravity_at_point(self, radius, x, y, z):
-        positions = self.particles.position
-        m1 = self.particles.mass
-        result_ax = quantities.AdaptingVectorQuantity()
-        result_ay = quantities.AdaptingVectorQuantity()
-        result_az = quantities.AdaptingVectorQuantity()
-        for i in range(len(x)):
-            dx = x[i] - positions.x
-            dy = y[i] - positions.y
-            dz = z[i] - positions.z
-            dr_squared = (
-                (dx * dx)
-                + (dy * dy)
-                + (dz * dz)
-                + self._softening_lengths_squared()
-                + radius[i] ** 2
+        if calculate_potential:
+            potential = self.gravity_constant * (potential | mass_unit / length_unit)
+        if calculate_acceleration:
+            acceleration = self.gravity_constant * (
+                acceleration | mass_unit / length_unit**2
             )
+        return potential, acceleration
 
-            ax = -self.gravity_constant * (m1 * dx / dr_squared**1.5).sum()
-            ay = -self.gravity_constant * (m1 * dy / dr_squared**1.5).sum()
-            az = -self.gravity_constant * (m1 * dz / dr_squared**1.5).sum()
+    def get_potential_at_point(self, radius, x, y, z):
+        potential, _ = self._field_at_point(radius, x, y, z, True, False)
+        return potential
 
-            result_ax.append(ax)
-            result_ay.append(ay)
-            result_az.append(az)
-        return result_ax, result_ay, result_az
+    def get_gravity_at_point(self, radius, x, y, z):
+        _, acceleration = self._field_at_point(radius, x, y, z, False, True)
+        return acceleration[:, 0], acceleration[:, 1], acceleration[:, 2]
 
 
 class GravityCodeInField:
@@ -1070,26 +1070,200 @@ class SamplePointWithInterpolation(object):
         return (values * self.weighing_factors).sum()
 
 
+class GridSampler(object):
+    """
+    Samples a regular grid at many points at once. The cell indices and
+    weights of all points are calculated with numpy and every attribute
+    is read from the grid with one request for all cells involved.
+    Points outside the grid (or, for interpolation, outside the cell
+    centers on the border of the grid) are left out, ``selection``
+    contains the indices of the points that are sampled.
+
+    :argument grid: the regular grid to sample
+    :argument points: vector quantity of the positions of the points
+    :argument method: "nearest" for the value of the cell containing the
+        point, "linear" (or "interpolation") for a (tri)linear interpolation
+        between the centers of the surrounding cells
+    """
+
+    def __init__(self, grid, points, method="linear"):
+        self.grid = grid
+        self.method = method
+        points = quantities.as_vector_quantity(points)
+        number_of_dimensions = points.shape[-1]
+        minimum_index = numpy.asarray(grid.get_minimum_index())[:number_of_dimensions]
+        maximum_index = numpy.asarray(grid.get_maximum_index())[:number_of_dimensions]
+        cellsize = grid.cellsize()
+
+        if method in ["nearest"]:
+            index = numpy.floor(
+                (points - grid.get_minimum_position()) / cellsize
+            ).astype(numpy.int32)
+            isvalid = numpy.logical_and(
+                numpy.all(index >= minimum_index, axis=1),
+                numpy.all(index <= maximum_index, axis=1),
+            )
+            self.selection = numpy.flatnonzero(isvalid)
+            self.points = points[self.selection]
+            self.index = index[self.selection]
+            self.corner_indices = self.index[:, numpy.newaxis, :]
+            self.weights = None
+        elif method in ["interpolation", "linear"]:
+            origin = grid[tuple(minimum_index)].position
+            index_for_000_cell = numpy.floor((points - origin) / cellsize).astype(
+                numpy.int32
+            )
+            isvalid = numpy.logical_and(
+                numpy.all(index_for_000_cell >= minimum_index, axis=1),
+                numpy.all(index_for_000_cell + 1 <= maximum_index, axis=1),
+            )
+            self.selection = numpy.flatnonzero(isvalid)
+            self.points = points[self.selection]
+            self.index = numpy.floor(
+                (self.points - grid.get_minimum_position()) / cellsize
+            ).astype(numpy.int32)
+            index_for_000_cell = index_for_000_cell[self.selection]
+            translations = self._corner_translations(number_of_dimensions)
+            self.corner_indices = (
+                index_for_000_cell[:, numpy.newaxis, :] + translations
+            )
+            self.weights = self._weighing_factors(
+                index_for_000_cell, translations, number_of_dimensions
+            )
+        else:
+            raise Exception("unknown sample method")
+
+    def _corner_translations(self, number_of_dimensions):
+        if number_of_dimensions == 3:
+            # same order as SamplePointWithInterpolation
+            return numpy.asarray(
+                [
+                    [0, 0, 0],
+                    [1, 0, 0],
+                    [0, 1, 0],
+                    [0, 0, 1],
+                    [1, 0, 1],
+                    [0, 1, 1],
+                    [1, 1, 0],
+                    [1, 1, 1],
+                ]
+            )
+        return numpy.indices((2,) * number_of_dimensions).reshape(
+            number_of_dimensions, -1
+        ).T
+
+    def _weighing_factors(self, index_for_000_cell, translations, number_of_dimensions):
+        position0 = self._positions_at(index_for_000_cell)
+        position1 = self._positions_at(index_for_000_cell + 1)
+        unit = position0.unit
+        point = self.points.value_in(unit)
+        x0 = position0.value_in(unit)
+        x1 = position1.value_in(unit)
+        fraction0 = (point - x0) / (x1 - x0)
+        fraction1 = (x1 - point) / (x1 - x0)
+        result = numpy.ones((len(point), len(translations)))
+        for i in range(number_of_dimensions):
+            result *= numpy.where(
+                translations[:, i] == 1,
+                fraction0[:, i : i + 1],
+                fraction1[:, i : i + 1],
+            )
+        return result
+
+    def _positions_at(self, index):
+        return self.get_values_at(index, "position")
+
+    def get_values_at(self, index, name_of_the_attribute):
+        """
+        Returns the values of the attribute in the cells with the given
+        indices (array with the index of one cell in the last dimension).
+        Each cell is read once.
+        """
+        shape = index.shape[:-1]
+        flat_index = numpy.ravel_multi_index(
+            tuple(index.reshape(-1, index.shape[-1]).T), self.grid.shape[: index.shape[-1]]
+        )
+        unique_cells, inverse = numpy.unique(flat_index, return_inverse=True)
+        cells = numpy.unravel_index(unique_cells, self.grid.shape[: index.shape[-1]])
+        if name_of_the_attribute in self.grid._derived_attributes:
+            values = getattr(self.grid, name_of_the_attribute)[cells]
+        else:
+            values = self.grid._convert_to_entities_or_quantities(
+                self.grid.get_values_in_store(cells, [name_of_the_attribute])[0]
+            )
+        values = values[inverse.reshape(-1)]
+        return values.reshape(shape + values.shape[1:])
+
+    def get_values_of_attribute(self, name_of_the_attribute):
+        if len(self.points) == 0:
+            return quantities.AdaptingVectorQuantity()
+        values = self.get_values_at(self.corner_indices, name_of_the_attribute)
+        if self.weights is None:
+            return values[:, 0]
+        weights = self.weights.reshape(self.weights.shape + (1,) * (len(values.shape) - 2))
+        return (values * weights).sum(axis=1)
+
+    @late
+    def position(self):
+        if self.weights is None:
+            return self._positions_at(self.index)
+        return self.points
+
+    def __len__(self):
+        return len(self.selection)
+
+
+def _sample_method_for_factory(samples_factory):
+    if samples_factory is SamplePointWithInterpolation:
+        return "linear"
+    elif samples_factory is SamplePointOnCellCenter:
+        return "nearest"
+    else:
+        return None
+
+
 class SamplePointsOnGrid(object):
     def __init__(
         self, grid, points=None, samples_factory=SamplePointWithInterpolation, **kwargs
     ):
         self.grid = grid
+        self.samples_factory = samples_factory
         points = self.grid._get_array_of_positions_from_arguments(pos=points, **kwargs)
-        self.samples = [samples_factory(grid, x) for x in points]
-        self.samples = [x for x in self.samples if x.isvalid]
+        method = _sample_method_for_factory(samples_factory)
+        if method is None:
+            self.sampler = None
+            self.samples = [samples_factory(grid, x) for x in points]
+            self.samples = [x for x in self.samples if x.isvalid]
+        else:
+            self.sampler = GridSampler(grid, points, method)
+
+    @late
+    def samples(self):
+        return [self.samples_factory(self.grid, x) for x in self.sampler.points]
 
     @late
     def indices(self):
+        if self.sampler is not None:
+            for x in self.sampler.index:
+                yield x
+            return
         for x in self.samples:
             yield x.index
 
     @late
     def positions(self):
+        if self.sampler is not None:
+            for x in self.sampler.position:
+                yield x
+            return
         for x in self.samples:
             yield x.position
 
     def __getattr__(self, name_of_the_attribute):
+        if self.sampler is not None:
+            if name_of_the_attribute == "position":
+                return self.sampler.position
+            return self.sampler.get_values_of_attribute(name_of_the_attribute)
         result = quantities.AdaptingVectorQuantity()
         for x in self.samples:
             result.append(getattr(x, name_of_the_attribute))
@@ -1103,6 +1277,8 @@ class SamplePointsOnGrid(object):
         return self.samples[index]
 
     def __len__(self):
+        if self.sampler is not None:
+            return len(self.sampler)
         return len(self.samples)
 
 
@@ -1117,6 +1293,7 @@ class SamplePointsOnMultipleGrids(object):
         self.grids = grids
         self.points = points
         self.samples_factory = samples_factory
+        self.method = _sample_method_for_factory(samples_factory)
         if index_factory is None:
             self.index = None
         else:
@@ -1133,33 +1310,89 @@ class SamplePointsOnMultipleGrids(object):
         else:
             return self.index.grid_for_point(point)
 
-    def filterout_duplicate_indices(self):
-        previous_grid = None
-        previous_index = None
-        filteredout = []
-        for x in self.samples:
-            if x.grid is previous_grid and numpy.all(x.index == previous_index):
-                pass
-            else:
-                previous_grid = x.grid
-                previous_index = x.index
-                filteredout.append(x)
-        self.samples = filteredout
+    def _grid_indices_for_points(self, points):
+        if self.index is None:
+            result = -numpy.ones(len(points), dtype=int)
+            for i, grid in enumerate(self.grids):
+                is_inside = numpy.logical_and(
+                    numpy.all(points >= grid.get_minimum_position(), axis=1),
+                    numpy.all(points < grid.get_maximum_position(), axis=1),
+                )
+                result[numpy.logical_and(is_inside, result < 0)] = i
+            return result
+        else:
+            return self.index.grid_indices_for_points(points)
 
-    def get_samples(self):
+    @late
+    def samplers(self):
+        # one sampler per grid, for the points in that grid, and the
+        # indices of the points sampled by each of these
+        points = quantities.as_vector_quantity(self.points)
+        grid_indices = self._grid_indices_for_points(points)
         result = []
-        for x in self.points:
-            grid = self._grid_for_point(x)
-            if grid is None:
+        for i, grid in enumerate(self.grids):
+            selection = numpy.flatnonzero(grid_indices == i)
+            if len(selection) == 0:
                 continue
-            sample = self.samples_factory(grid, x)
-            if not sample.isvalid:
-                continue
-            result.append(sample)
+            sampler = GridSampler(grid, points[selection], self.method)
+            if len(sampler) > 0:
+                result.append((selection[sampler.selection], sampler))
         return result
 
     @late
-    def samples(self):
+    def order_of_samples(self):
+        # the samples are in the order of the points
+        if len(self.samplers) == 0:
+            return numpy.zeros(0, dtype=int)
+        point_indices = numpy.concatenate([x[0] for x in self.samplers])
+        return numpy.argsort(point_indices, kind="stable")
+
+    def _concatenate_samples(self, values):
+        if len(values) == 0:
+            return quantities.AdaptingVectorQuantity()
+        if quantities.is_quantity(values[0]):
+            unit = values[0].unit
+            values = new_quantity(
+                numpy.concatenate([x.value_in(unit) for x in values]), unit
+            )
+        else:
+            values = numpy.concatenate(values)
+        return values[self.order_of_samples]
+
+    def filterout_duplicate_indices(self):
+        if self.method is None:
+            previous_grid = None
+            previous_index = None
+            filteredout = []
+            for x in self.samples:
+                if x.grid is previous_grid and numpy.all(x.index == previous_index):
+                    pass
+                else:
+                    previous_grid = x.grid
+                    previous_index = x.index
+                    filteredout.append(x)
+            self.samples = filteredout
+            return
+
+        if len(self.order_of_samples) == 0:
+            return
+        grid_numbers = numpy.concatenate(
+            [numpy.full(len(x[1]), i) for i, x in enumerate(self.samplers)]
+        )[self.order_of_samples]
+        indices = numpy.concatenate([x[1].index for x in self.samplers])[
+            self.order_of_samples
+        ]
+        is_duplicate = numpy.logical_and(
+            grid_numbers[1:] == grid_numbers[:-1],
+            numpy.all(indices[1:] == indices[:-1], axis=1),
+        )
+        self.order_of_samples = self.order_of_samples[
+            numpy.concatenate(([True], ~is_duplicate))
+        ]
+        if "samples" in self.__dict__:
+            del self.samples
+
+    def get_samples(self):
         result = []
         for x in self.points:
             grid = self._grid_for_point(x)
@@ -1171,18 +1404,51 @@ class SamplePointsOnMultipleGrids(object):
             result.append(sample)
         return result
 
+    @late
+    def samples(self):
+        if self.method is not None:
+            grids = [
+                sampler.grid
+                for sampler in [x[1] for x in self.samplers]
+                for i in range(len(sampler))
+            ]
+            points = self._concatenate_samples([x[1].points for x in self.samplers])
+            return [
+                self.samples_factory(grids[i], point)
+                for i, point in zip(self.order_of_samples, points)
+            ]
+        return self.get_samples()
+
     @late
     def indices(self):
+        if self.method is not None:
+            for x in self._concatenate_samples([x[1].index for x in self.samplers]):
+                yield x
+            return
         for x in self.samples:
             yield x.index
 
     @late
     def positions(self):
+        if self.method is not None:
+            for x in self._concatenate_samples(
+                [x[1].position for x in self.samplers]
+            ):
+                yield x
+            return
         for x in self.samples:
             yield x.position
 
     def __getattr__(self, name_of_the_attribute):
-        self.get_samples()
+        if self.method is not None:
+            if name_of_the_attribute == "position":
+                return self._concatenate_samples([x[1].position for x in self.samplers])
+            return self._concatenate_samples(
+                [
+                    x[1].get_values_of_attribute(name_of_the_attribute)
+                    for x in self.samplers
+                ]
+            )
         result = quantities.AdaptingVectorQuantity()
         for x in self.samples:
             result.append(getattr(x, name_of_the_attribute))
@@ -1196,6 +1462,8 @@ class SamplePointsOnMultipleGrids(object):
         return self.samples[index]
 
     def __len__(self):
+        if self.method is not None:
+            return len(self.order_of_samples)
         return len(self.samples)
 
 
@@ -1247,11 +1515,13 @@ class NonOverlappingGridsIndexer(object):
         index_of_grid = self.grids_on_index[tuple(index)]
         return self.grids[index_of_grid]
 
-    def grids_for_points(self, points):
+    def grid_indices_for_points(self, points):
         index = (points - self.minimum_position) / self.smallest_boxsize
         index = numpy.floor(index).astype(numpy.int32)
-        index_of_grid = self.grids_on_index[tuple(index)]
-        return self.grids[index_of_grid]
+        return self.grids_on_index[tuple(index.T)]
+
+    def grids_for_points(self, points):
+        return [self.grids[x] for x in self.grid_indices_for_points(points)]
 
 
 # convenience function to convert input arguments to positions (or vector of "points")
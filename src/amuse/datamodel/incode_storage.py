@@ -104,6 +104,7 @@ from amuse.datamodel import Grid
 from amuse.datamodel import AttributeStorage
 
 from amuse.rfi.async_request import ASyncRequestSequence, PoolDependentASyncRequest
+from amuse.rfi.async_request import FakeASyncRequest
 
 try:
     from types import EllipsisType
@@ -227,6 +228,11 @@ class ParticleGetAttributesMethod(ParticleMappingMethod):
         return self.convert_return_value(return_value, storage, attributes_to_return)
 
     def get_attribute_values_async(self, storage, attributes_to_return, *indices):
+        if not self.is_async_supported:
+            return FakeASyncRequest(
+                self.get_attribute_values(storage, attributes_to_return, *indices)
+            )
+
         self.check_arguments(storage, indices, attributes_to_return)
 
         def result_handler(inner):
@@ -282,6 +288,11 @@ class ParticleGetGriddedAttributesMethod(ParticleGetAttributesMethod):
             mapping_from_name_to_value[key] = value.reshape(gridshape)
         return mapping_from_name_to_value
 
+    def get_attribute_values_async(self, storage, attributes_to_return, *indices):
+        return FakeASyncRequest(
+            self.get_attribute_values(storage, attributes_to_return, *indices)
+        )
+
 
 class ParticleSetAttributesMethod(ParticleMappingMethod):
     """
@@ -377,6 +388,10 @@ class ParticleSetAttributesMethod(ParticleMappingMethod):
         )
         keyword_args.update(keyword_args2)
         list_arguments.extend(list_args)
+        if not self.is_async_supported:
+            raise exceptions.AsyncNotSupportedException(
+                "asynchronous call is not supported for this method"
+            )
         async_request = self.method.asynchronous(*list_arguments, **keyword_args)
         return async_request
 
@@ -512,6 +527,10 @@ class ParticleSetGriddedAttributesMethod(ParticleSetAttributesMethod):
         for key, value in keyword_args.items():
             keyword_args[key] = value.reshape(-1)
 
+        if not self.is_async_supported:
+            raise exceptions.AsyncNotSupportedException(
+                "asynchronous call is not supported for this method"
+            )
         async_request = self.method.asynchronous(
             *one_dimensional_arrays_of_args, **keyword_args
         )
@@ -583,18 +602,10 @@ class ParticleQueryMethod(object):
         indices = self.method(*args, **kwargs)
         subset_results = []
         for subset in particles._private.particle_sets:
-            keys = []
-            for index in indices:
-                if (
-                    index
-                    in subset._private.attribute_storage.mapping_from_index_in_the_code_to_particle_key
-                ):
-                    keys.append(
-                        subset._private.attribute_storage.mapping_from_index_in_the_code_to_particle_key[
-                            index
-                        ]
-                    )
-            subset_results.append(subset._subset(keys))
+            keys, is_found = subset._private.attribute_storage.mapping_from_index_in_the_code_to_particle_key.lookup(
+                indices
+            )
+            subset_results.append(subset._subset(keys[is_found]))
         return ParticlesSuperset(subset_results)
 
 
@@ -619,9 +630,7 @@ class ParticleSpecificSelectMethod(object):
         self.public_name = public_name
 
     def apply_on_all(self, particles):
-        all_indices = list(
-            particles._private.attribute_storage.mapping_from_index_in_the_code_to_particle_key.keys()
-        )
+        all_indices = list(particles._private.attribute_storage.code_indices)
 
         lists_of_indices = self.method(list(all_indices))
 
@@ -668,9 +677,7 @@ class ParticleMethod(AbstractCodeMethodWrapper):
 
     def apply_on_all(self, particles, *list_arguments, **keyword_arguments):
         storage = particles._private.attribute_storage
-        all_indices = list(
-            storage.mapping_from_index_in_the_code_to_particle_key.keys()
-        )
+        all_indices = list(storage.code_indices)
         return self.method(all_indices, *list_arguments, **keyword_arguments)
 
     def apply_on_one(self, set, particle, *list_arguments, **keyword_arguments):
@@ -802,6 +809,11 @@ class ParticleGetIndexMethod(object):
     def get_attribute_values(self, storage, attributes_to_return, *indices):
         return {self.ATTRIBUTE_NAME: indices[0]}
 
+    def get_attribute_values_async(self, storage, attributes_to_return, *indices):
+        return FakeASyncRequest(
+            self.get_attribute_values(storage, attributes_to_return, *indices)
+        )
+
 
 class AbstractInCodeAttributeStorage(base.AttributeStorage):
     """
@@ -890,6 +902,34 @@ class AbstractInCodeAttributeStorage(base.AttributeStorage):
 
         return result
 
+    def get_attribute_values_of_getters(self, getters, attributes, *indices):
+        """
+        Calls the getters in one batch of calls to the code (if the
+        code batches its getters), returns the mapping from the attribute
+        names to the values
+        """
+        mapping_from_attribute_to_result = {}
+
+        if len(getters) > 1 and hasattr(self.code_interface, "batch"):
+            batch = self.code_interface.batch()
+        else:
+            batch = None
+
+        if batch is not None and batch.is_used_for_getters:
+            with batch:
+                requests = [
+                    getter.get_attribute_values_async(self, attributes, *indices)
+                    for getter in getters
+                ]
+            for request in requests:
+                mapping_from_attribute_to_result.update(request.result())
+        else:
+            for getter in getters:
+                result = getter.get_attribute_values(self, attributes, *indices)
+                mapping_from_attribute_to_result.update(result)
+
+        return mapping_from_attribute_to_result
+
     def get_defined_attribute_names(self):
         return sorted(self.attributes)
 
@@ -897,6 +937,134 @@ class AbstractInCodeAttributeStorage(base.AttributeStorage):
         return sorted(self.writable_attributes)
 
 
+class SortedArrayMapping(object):
+    """
+    Mapping of unique integers (keys) to integers (values), stored
+    as an array of sorted keys and an array of the values of these keys.
+    All operations work on arrays of keys, lookups use a binary search
+    (numpy.searchsorted), insertions and deletions copy the arrays once.
+    """
+
+    def __init__(self, key_dtype="uint64", value_dtype="int64"):
+        self.keys = numpy.zeros(0, dtype=key_dtype)
+        self.values = numpy.zeros(0, dtype=value_dtype)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _positions_of(self, keys):
+        keys = numpy.asarray(keys, dtype=self.keys.dtype)
+        if len(self.keys) == 0:
+            return keys, numpy.zeros(keys.shape, dtype=int), numpy.zeros(keys.shape, dtype=bool)
+        positions = numpy.searchsorted(self.keys, keys)
+        positions = numpy.minimum(positions, len(self.keys) - 1)
+        return keys, positions, self.keys[positions] == keys
+
+    def lookup(self, keys):
+        """
+        Returns the values of the keys and a mask, True for
+        the keys in the mapping (the values of the other keys are invalid).
+        """
+        keys, positions, is_found = self._positions_of(keys)
+        if len(self.keys) == 0:
+            return numpy.zeros(keys.shape, dtype=self.values.dtype), is_found
+        return self.values[positions], is_found
+
+    def contains(self, keys):
+        return self._positions_of(keys)[2]
+
+    def insert(self, keys, values):
+        """
+        Adds the keys, the keys must not be in the mapping already.
+        """
+        keys = numpy.asarray(keys, dtype=self.keys.dtype).reshape(-1)
+        values = numpy.asarray(values, dtype=self.values.dtype).reshape(-1)
+        order = numpy.argsort(keys, kind="stable")
+        keys = keys[order]
+        positions = numpy.searchsorted(self.keys, keys)
+        self.keys = numpy.insert(self.keys, positions, keys)
+        self.values = numpy.insert(self.values, positions, values[order])
+
+    def delete(self, keys):
+        """
+        Removes the keys, returns a mask, True for the keys that
+        were in the mapping.
+        """
+        keys, positions, is_found = self._positions_of(keys)
+        is_found = is_found.reshape(-1)
+        if numpy.any(is_found):
+            positions = positions.reshape(-1)[is_found]
+            self.keys = numpy.delete(self.keys, positions)
+            self.values = numpy.delete(self.values, positions)
+        return is_found
+
+
+class AttributeValuesCache(object):
+    """
+    Read-through cache of the values of the attributes of all particles
+    in an in-code storage. Values read for all particles are kept
+    until the code changes (the state version of the code interface
+    is increased, see InCodeComponentImplementation) or the cache is
+    cleared by the storage.
+    """
+
+    def __init__(self, code_interface):
+        self.code_interface = code_interface
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def clear(self):
+        self.values = {}
+        self.indices = None
+        self.positions = None
+        self.state_version = self.get_state_version()
+
+    def get_state_version(self):
+        return getattr(self.code_interface, "_state_version", None)
+
+    def _validate(self):
+        if self.state_version != self.get_state_version():
+            self.clear()
+
+    def get_values(self, indices_in_the_code, attributes):
+        """
+        Returns copies of the cached values of the attributes, or None
+        if not all values are cached.
+        """
+        self._validate()
+        if self.indices is None or not all(x in self.values for x in attributes):
+            self.misses += 1
+            return None
+
+        if indices_in_the_code is self.indices:
+            self.hits += 1
+            return [self.values[x].copy() for x in attributes]
+
+        positions, is_found = self.positions.lookup(indices_in_the_code)
+        if not numpy.all(is_found):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [self.values[x][positions] for x in attributes]
+
+    def set_values(self, indices_in_the_code, attributes, values):
+        """
+        Stores copies of the values of the attributes of all particles
+        """
+        self._validate()
+        if not indices_in_the_code is self.indices:
+            self.values = {}
+            self.indices = indices_in_the_code
+            self.positions = SortedArrayMapping("int64", "int64")
+            self.positions.insert(
+                indices_in_the_code, numpy.arange(len(indices_in_the_code))
+            )
+        for attribute, value in zip(attributes, values):
+            if hasattr(value, "copy"):
+                self.values[attribute] = value.copy()
+
+
 class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
     """
     Manages sets of particles stored in codes.
@@ -924,8 +1092,8 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
 
         AbstractInCodeAttributeStorage.__init__(self, code_interface, setters, getters)
 
-        self.mapping_from_particle_key_to_index_in_the_code = {}
-        self.mapping_from_index_in_the_code_to_particle_key = {}
+        self.mapping_from_particle_key_to_index_in_the_code = SortedArrayMapping("uint64", "int64")
+        self.mapping_from_index_in_the_code_to_particle_key = SortedArrayMapping("int64", "uint64")
         self.particle_keys = numpy.zeros(0)
         self.code_indices = numpy.zeros(0)
 
@@ -935,6 +1103,23 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
 
         self.getters.append(ParticleGetIndexMethod())
 
+        self.cache = None
+
+    def enable_cache(self):
+        """
+        Keep the values of attributes read for all particles, until
+        the code or the particles are changed.
+        """
+        if self.cache is None:
+            self.cache = AttributeValuesCache(self.code_interface)
+
+    def disable_cache(self):
+        self.cache = None
+
+    def invalidate_cache(self):
+        if self.cache is not None:
+            self.cache.clear()
+
     def __len__(self):
         return len(self.mapping_from_particle_key_to_index_in_the_code)
 
@@ -942,82 +1127,67 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
         return False
 
     def add_particles_to_store(self, keys, attributes=[], values=[]):
+        keys_array = numpy.asarray(keys)
+        is_stored = self.mapping_from_particle_key_to_index_in_the_code.contains(keys_array)
+        if numpy.any(is_stored):
+            raise Exception(
+                "particle with same key added twice: {0}".format(keys_array[is_stored][0])
+            )
+        unique_keys, counts = numpy.unique(keys_array, return_counts=True)
+        if numpy.any(counts > 1):
+            raise Exception(
+                "particle with same key added twice: {0}".format(unique_keys[counts > 1][0])
+            )
+
+        self.invalidate_cache()
         indices = self.new_particle_method.add_entities(attributes, values)
 
         if len(self.particle_keys) > 0:
             previous_length = len(self.particle_keys)
             self.particle_keys = numpy.concatenate(
-                (self.particle_keys, numpy.array(list(keys)))
+                (self.particle_keys, keys_array)
             )
             self.code_indices = numpy.concatenate(
                 (self.code_indices, numpy.array(indices))
             )
             result = self.code_indices[previous_length:]
         else:
-            self.particle_keys = numpy.array(keys)
+            self.particle_keys = numpy.array(keys_array)
             self.code_indices = numpy.array(indices)
             result = self.code_indices
 
-        index = 0
-        for key in keys:
-            if key in self.mapping_from_particle_key_to_index_in_the_code:
-                raise Exception("particle with same key added twice: {0}".format(key))
-            self.mapping_from_particle_key_to_index_in_the_code[key] = indices[index]
-            self.mapping_from_index_in_the_code_to_particle_key[indices[index]] = key
-            index = index + 1
+        self.mapping_from_particle_key_to_index_in_the_code.insert(keys_array, indices)
+        self.mapping_from_index_in_the_code_to_particle_key.insert(indices, keys_array)
 
         return result
 
     def get_indices_of(self, keys):
-        indices_in_the_code = []
         if keys is None:
             keys = self.particle_keys
 
-        notfoundkeys = []
-        foundkeys = []
-        for particle_key in keys:
-            try:
-                indices_in_the_code.append(
-                    self.mapping_from_particle_key_to_index_in_the_code[particle_key]
-                )
-                foundkeys.append(particle_key)
-            except KeyError:
-                notfoundkeys.append(particle_key)
+        keys = numpy.asarray(keys)
+        indices_in_the_code, is_found = self.mapping_from_particle_key_to_index_in_the_code.lookup(keys)
 
-        if not len(notfoundkeys) == 0:
+        if not numpy.all(is_found):
             raise exceptions.KeysNotInStorageException(
-                numpy.asarray(foundkeys),
-                numpy.asarray(indices_in_the_code),
-                numpy.asarray(notfoundkeys),
+                keys[is_found],
+                indices_in_the_code[is_found],
+                keys[~is_found],
             )
 
-        return numpy.asarray(indices_in_the_code)
+        return indices_in_the_code
 
     def get_key_indices_of(self, keys):
-        result = []
         if keys is None:
             keys = self.particle_keys
 
-        keys_set = set(keys)
-        for index in range(len(self.particle_keys)):
-            key = self.particle_keys[index]
-            if key in keys_set:
-                result.append(index)
-
-        return result
+        return numpy.flatnonzero(numpy.isin(self.particle_keys, numpy.asarray(keys)))
 
     def get_positions_of_indices(self, indices):
-        result = []
         if indices is None:
             indices = self.code_indices
 
-        indices_set = set(indices)
-        for index in range(len(self.code_indices)):
-            index_in_code = self.code_indices[index]
-            if index_in_code in indices_set:
-                result.append(index)
-
-        return result
+        return numpy.flatnonzero(numpy.isin(self.code_indices, numpy.asarray(indices)))
 
     def get_value_of(self, index, attribute):
         return self.get_value_in_store(index, attribute)
@@ -1029,15 +1199,21 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
         if len(indices_in_the_code) == 0:
             return [[] for attribute in attributes]
 
-        mapping_from_attribute_to_result = {}
+        if self.cache is not None:
+            results = self.cache.get_values(indices_in_the_code, attributes)
+            if results is not None:
+                return results
 
-        for getter in self.select_getters_for(attributes):
-            result = getter.get_attribute_values(self, attributes, indices_in_the_code)
-            mapping_from_attribute_to_result.update(result)
+        mapping_from_attribute_to_result = self.get_attribute_values_of_getters(
+            self.select_getters_for(attributes), attributes, indices_in_the_code
+        )
 
         results = []
         for attribute in attributes:
             results.append(mapping_from_attribute_to_result[attribute])
+
+        if self.cache is not None and indices_in_the_code is self.code_indices:
+            self.cache.set_values(indices_in_the_code, attributes, results)
         return results
 
     def get_values_in_store_async(self, indices_in_the_code, attributes):
@@ -1047,6 +1223,11 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
         if len(indices_in_the_code) == 0:
             return [[] for attribute in attributes]
 
+        if self.cache is not None:
+            results = self.cache.get_values(indices_in_the_code, attributes)
+            if results is not None:
+                return FakeASyncRequest(results)
+
         mapping_from_attribute_to_result = {}
 
         getters = self.select_getters_for(attributes)
@@ -1101,6 +1282,7 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
         if len(indices_in_the_code) == 0:
             return
 
+        self.invalidate_cache()
         for setter in self.select_setters_for(attributes):
             setter.set_attribute_values(self, attributes, values, indices_in_the_code)
 
@@ -1110,6 +1292,7 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
 
         if len(indices_in_the_code) == 0:
             return
+        self.invalidate_cache()
         setters = self.select_setters_for(attributes)
         if len(setters) > 1:
 
@@ -1135,14 +1318,14 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
     def remove_particles_from_store(self, indices_in_the_code):
         if indices_in_the_code is None:
             return
+        self.invalidate_cache()
         self.delete_particle_method(indices_in_the_code)
 
-        mapping_key = self.mapping_from_particle_key_to_index_in_the_code
-        mapping_index = self.mapping_from_index_in_the_code_to_particle_key
-        for i in indices_in_the_code:
-            key = mapping_index[i]
-            del mapping_index[i]
-            del mapping_key[key]
+        keys, is_found = self.mapping_from_index_in_the_code_to_particle_key.lookup(indices_in_the_code)
+        if not numpy.all(is_found):
+            raise KeyError(numpy.asarray(indices_in_the_code)[~is_found][0])
+        self.mapping_from_index_in_the_code_to_particle_key.delete(indices_in_the_code)
+        self.mapping_from_particle_key_to_index_in_the_code.delete(keys)
 
         indices_to_delete = self.get_positions_of_indices(indices_in_the_code)
 
@@ -1156,41 +1339,38 @@ class InCodeAttributeStorage(AbstractInCodeAttributeStorage):
         return self.code_indices
 
     def has_key_in_store(self, key):
-        return key in self.mapping_from_particle_key_to_index_in_the_code
+        return bool(self.mapping_from_particle_key_to_index_in_the_code.contains(key))
 
     def _get_keys_for_indices_in_the_code(self, indices):
-        result = []
-        for i in indices:
-            result.append(self.mapping_from_index_in_the_code_to_particle_key.get(i, 0))
-        return result
+        keys, is_found = self.mapping_from_index_in_the_code_to_particle_key.lookup(indices)
+        return numpy.where(is_found, keys, 0)
 
     def _remove_indices(self, indices):
-        keys = []
-        for i in indices:
-            if i in self.mapping_from_index_in_the_code_to_particle_key:
-                key = self.mapping_from_index_in_the_code_to_particle_key[i]
-                del self.mapping_from_index_in_the_code_to_particle_key[i]
-                del self.mapping_from_particle_key_to_index_in_the_code[key]
-                keys.append(key)
+        self.invalidate_cache()
+        indices = numpy.asarray(indices)
+        keys, is_found = self.mapping_from_index_in_the_code_to_particle_key.lookup(indices)
+        keys = keys[is_found]
+        self.mapping_from_index_in_the_code_to_particle_key.delete(indices[is_found])
+        self.mapping_from_particle_key_to_index_in_the_code.delete(keys)
 
         indices_to_delete = self.get_key_indices_of(keys)
         self.particle_keys = numpy.delete(self.particle_keys, indices_to_delete)
         self.code_indices = numpy.delete(self.code_indices, indices_to_delete)
 
     def _add_indices(self, indices):
-        keys = []
-        for i in indices:
-            if i in self.mapping_from_index_in_the_code_to_particle_key:
-                raise exceptions.AmuseException(
-                    "adding an index '{0}' that is already managed, bookkeeping is broken".format(
-                        i
-                    )
+        self.invalidate_cache()
+        indices = numpy.asarray(indices)
+        is_managed = self.mapping_from_index_in_the_code_to_particle_key.contains(indices)
+        if numpy.any(is_managed):
+            raise exceptions.AmuseException(
+                "adding an index '{0}' that is already managed, bookkeeping is broken".format(
+                    indices[is_managed][0]
                 )
-            newkey = next(base.UniqueKeyGenerator)
-            self.mapping_from_index_in_the_code_to_particle_key[i] = newkey
-            self.mapping_from_particle_key_to_index_in_the_code[newkey] = i
+            )
+        keys = numpy.asarray(base.UniqueKeyGenerator.next_set_of_keys(len(indices)), dtype="uint64")
+        self.mapping_from_index_in_the_code_to_particle_key.insert(indices, keys)
+        self.mapping_from_particle_key_to_index_in_the_code.insert(keys, indices)
 
-            keys.append(newkey)
         if len(self.particle_keys) > 0:
             self.particle_keys = numpy.concatenate(
                 (
@@ -1282,13 +1462,12 @@ class InCodeGridAttributeStorage(AbstractInCodeAttributeStorage):
 
     def get_values_in_store(self, indices, attributes):
         array_of_indices = self._to_arrays_of_indices(indices)
-        mapping_from_attribute_to_result = {}
         one_dimensional_array_of_indices = [x.reshape(-1) for x in array_of_indices]
-        for getter in self.select_getters_for(attributes):
-            result = getter.get_attribute_values(
-                self, attributes, *one_dimensional_array_of_indices
-            )
-            mapping_from_attribute_to_result.update(result)
+        mapping_from_attribute_to_result = self.get_attribute_values_of_getters(
+            self.select_getters_for(attributes),
+            attributes,
+            *one_dimensional_array_of_indices,
+        )
 
         results = []
         for attribute in attributes:
@@ -19,6 +19,7 @@ except BaseException as ex:
     _SIMPLE_HASH_PRESENT_ = False
 
 _PREFER_SORTED_KEYS_ = True
+_PREFER_INCREMENTAL_INDEX_ = False
 
 
 class InMemoryAttributeStorage(AttributeStorage):
@@ -108,6 +109,22 @@ class InMemoryAttributeStorage(AttributeStorage):
         )
         self.reindex()
 
+    def add_attribute_to_store_by_reference(self, attribute, values):
+        """
+        Stores the values of an attribute for all particles without
+        copying them, the store keeps a reference to the given array
+        (for example to keep the values in a memory mapped file)
+        """
+        if len(values) != len(self.particle_keys):
+            raise exceptions.AmuseException(
+                "you need to provide the same number of values as particles, found {0} values and {1} particles".format(
+                    len(values), len(self.particle_keys)
+                )
+            )
+        self.mapping_from_attribute_to_quantities[attribute] = (
+            InMemoryAttribute.new_attribute_by_reference(attribute, values)
+        )
+
     def get_values_in_store(self, indices, attributes):
         results = []
         for attribute in attributes:
@@ -506,8 +523,295 @@ class InMemoryAttributeStorageUseSimpleHash(InMemoryAttributeStorage):
             self._hash.reindex(self.particle_keys)
 
 
+class DictionaryHash(object):
+    """
+    Key to index mapping with the same interface as SimpleHash,
+    used when the SimpleHash library is not available.
+    """
+
+    def __init__(self):
+        self._map = {}
+
+    def lookup(self, inkeys):
+        mapping = self._map
+        result = []
+        notfoundkeys = []
+        foundkeys = []
+        for key in inkeys:
+            try:
+                result.append(mapping[key])
+                foundkeys.append(key)
+            except KeyError:
+                notfoundkeys.append(key)
+
+        if not len(notfoundkeys) == 0:
+            raise exceptions.KeysNotInStorageException(
+                numpy.asarray(foundkeys),
+                numpy.asarray(result),
+                numpy.asarray(notfoundkeys),
+            )
+        return numpy.asarray(result, dtype="uintp")
+
+    def insert(self, keys, values=None):
+        if values is None:
+            values = range(len(keys))
+        self._map.update(zip(keys, values))
+
+    def update(self, keys, values):
+        self.insert(keys, values)
+
+    def delete(self, keys):
+        for key in keys:
+            del self._map[key]
+
+    def reindex(self, keys, values=None):
+        self._map = {}
+        self.insert(keys, values)
+
+    def key_present(self, key):
+        return key in self._map
+
+
+class InMemoryAttributeStorageUseIncrementalIndex(InMemoryAttributeStorage):
+    """
+    In memory storage optimized for adding or removing a few particles
+    at a time.
+
+    Every particle occupies a slot in the attribute arrays, the index of
+    a particle is the number of its slot. The attribute arrays are
+    allocated with spare capacity (doubled when full), so adding k
+    particles only copies k values per attribute. Removed particles
+    leave a tombstone in their slot, the slots are compacted when more
+    than half of them are tombstones. The mapping from keys to slots is
+    updated for the added or removed keys only. Added slots are appended
+    to the arrays of live slots and keys. Removing particles copies these
+    arrays without the removed slots (O(N), the particles keep their
+    order), the slots and tombstones are not scanned.
+    """
+
+    MINIMUM_CAPACITY = 16
+
+    def __init__(self):
+        InMemoryAttributeStorage.__init__(self)
+        self._hash = SimpleHash() if _SIMPLE_HASH_PRESENT_ else DictionaryHash()
+        self._capacity = 0
+        self._number_of_slots = 0
+        self._number_of_tombstones = 0
+        self._slot_keys = numpy.zeros(0, dtype="uint64")
+        self._is_alive = numpy.zeros(0, dtype=bool)
+        self._set_live_slots(
+            numpy.zeros(0, dtype="int64"), numpy.zeros(0, dtype="uint64")
+        )
+
+    def add_particles_to_store(self, keys, attributes=[], quantities=[]):
+        if len(quantities) != len(attributes):
+            raise exceptions.AmuseException(
+                "you need to provide the same number of quantities as attributes, found {0} attributes and {1} list of values".format(
+                    len(attributes), len(quantities)
+                )
+            )
+        if len(quantities) > 0 and len(keys) != len(quantities[0]):
+            raise exceptions.AmuseException(
+                "you need to provide the same number of values as particles, found {0} values and {1} particles".format(
+                    len(quantities[0]), len(keys)
+                )
+            )
+
+        keys = numpy.array(keys, dtype="uint64").reshape(-1)
+        self.__version__ = self.__version__ + 1
+
+        start = self._number_of_slots
+        end = start + len(keys)
+        self._ensure_capacity(end)
+        slots = numpy.arange(start, end)
+
+        for attribute, values_to_set in zip(attributes, quantities):
+            if attribute in self.mapping_from_attribute_to_quantities:
+                storage = self.mapping_from_attribute_to_quantities[attribute]
+            else:
+                storage = self._new_attribute(attribute, len(keys), values_to_set)
+            try:
+                storage.set_values(slice(start, end), values_to_set)
+            except Exception as ex:
+                raise AttributeError(
+                    "exception in setting attribute '{0}', error was '{1}'".format(
+                        attribute, ex
+                    )
+                )
+
+        self._slot_keys[start:end] = keys
+        self._is_alive[start:end] = True
+        self._number_of_slots = end
+        self._hash.insert(keys, slots)
+        self._add_live_slots(slots, keys)
+        return slots
+
+    def _new_attribute(self, attribute, length, values_to_set):
+        storage = InMemoryAttribute.new_attribute(attribute, length, values_to_set)
+        storage.increase_to_length(self._capacity)
+        self.mapping_from_attribute_to_quantities[attribute] = storage
+        return storage
+
+    def _ensure_capacity(self, length):
+        if length <= self._capacity:
+            return
+        capacity = max(2 * self._capacity, length, self.MINIMUM_CAPACITY)
+        for attribute_values in self.mapping_from_attribute_to_quantities.values():
+            attribute_values.increase_to_length(capacity)
+        self._slot_keys = numpy.concatenate(
+            (self._slot_keys, numpy.zeros(capacity - self._capacity, dtype="uint64"))
+        )
+        self._is_alive = numpy.concatenate(
+            (self._is_alive, numpy.zeros(capacity - self._capacity, dtype=bool))
+        )
+        self._capacity = capacity
+
+    def _set_live_slots(self, slots, keys):
+        self._live_slots = slots
+        self._live_keys = keys
+        self._number_of_live_slots = len(slots)
+        self.index_array = slots
+        self.particle_keys = keys
+
+    def _reset_live_slots(self):
+        live_slots = numpy.flatnonzero(self._is_alive[: self._number_of_slots])
+        self._set_live_slots(live_slots, self._slot_keys[live_slots])
+
+    def _add_live_slots(self, slots, keys):
+        # the live slots and keys are kept in arrays with spare capacity,
+        # index_array and particle_keys are views on the used part, the
+        # values in these views are never changed
+        start = self._number_of_live_slots
+        end = start + len(slots)
+        if end > len(self._live_slots):
+            capacity = max(2 * len(self._live_slots), end, self.MINIMUM_CAPACITY)
+            live_slots = numpy.empty(capacity, dtype="int64")
+            live_slots[:start] = self._live_slots[:start]
+            live_keys = numpy.empty(capacity, dtype="uint64")
+            live_keys[:start] = self._live_keys[:start]
+            self._live_slots = live_slots
+            self._live_keys = live_keys
+        self._live_slots[start:end] = slots
+        self._live_keys[start:end] = keys
+        self._number_of_live_slots = end
+        self.index_array = self._live_slots[:end]
+        self.particle_keys = self._live_keys[:end]
+
+    def _remove_live_slots(self, slots):
+        # slots are sorted, as are the live slots, the remaining
+        # live slots and keys are copied (numpy.delete)
+        positions = numpy.searchsorted(self.index_array, slots)
+        self._set_live_slots(
+            numpy.delete(self.index_array, positions),
+            numpy.delete(self.particle_keys, positions),
+        )
+
+    def _indices_or_live_slots(self, indices):
+        if indices is not None and indices is not Ellipsis:
+            return indices
+        if self._number_of_tombstones == 0:
+            return slice(0, self._number_of_slots)
+        return self.index_array
+
+    def remove_particles_from_store(self, indices):
+        indices = numpy.unique(numpy.asarray(indices, dtype="int64"))
+        if len(indices) > 0 and not numpy.all(self._is_alive[indices]):
+            raise exceptions.AmuseException(
+                "tried to remove particles that are not in the storage"
+            )
+        self._hash.delete(self._slot_keys[indices])
+        self._is_alive[indices] = False
+        self._number_of_tombstones += len(indices)
+
+        if self._number_of_tombstones > max(
+            len(self.index_array) - len(indices), self.MINIMUM_CAPACITY
+        ):
+            self._compact()
+            self._reset_live_slots()
+        else:
+            self._remove_live_slots(indices)
+
+        self.__version__ = self.__version__ + 1
+
+    def _compact(self):
+        live_slots = numpy.flatnonzero(self._is_alive[: self._number_of_slots])
+        for attribute_values in self.mapping_from_attribute_to_quantities.values():
+            attribute_values.keep_indices(live_slots)
+        self._slot_keys = self._slot_keys[live_slots]
+        self._is_alive = numpy.ones(len(live_slots), dtype=bool)
+        self._capacity = self._number_of_slots = len(live_slots)
+        self._number_of_tombstones = 0
+        self._hash.reindex(self._slot_keys)
+
+    def get_values_in_store(self, indices, attributes):
+        return InMemoryAttributeStorage.get_values_in_store(
+            self, self._indices_or_live_slots(indices), attributes
+        )
+
+    def set_values_in_store(self, indices, attributes, list_of_values_to_set):
+        indices = self._indices_or_live_slots(indices)
+        for attribute, values_to_set in zip(attributes, list_of_values_to_set):
+            if not attribute in self.mapping_from_attribute_to_quantities:
+                self._new_attribute(attribute, len(self), values_to_set)
+        InMemoryAttributeStorage.set_values_in_store(
+            self, indices, attributes, list_of_values_to_set
+        )
+
+    def _get_values_for_indices(self, indices, attributes):
+        return InMemoryAttributeStorage._get_values_for_indices(
+            self, self._indices_or_live_slots(indices), attributes
+        )
+
+    def has_key_in_store(self, key):
+        return self._hash.key_present(key)
+
+    def get_indices_of(self, keys):
+        if keys is None:
+            return self.index_array
+
+        if len(self.particle_keys) == 0:
+            return ()
+
+        return self._hash.lookup(keys)
+
+    def reindex(self):
+        self._hash.reindex(
+            self._slot_keys[self.index_array], self.index_array
+        )
+
+    def copy(self):
+        copy = type(self)()
+        copy._capacity = self._capacity
+        copy._number_of_slots = self._number_of_slots
+        copy._number_of_tombstones = self._number_of_tombstones
+        copy._slot_keys = self._slot_keys.copy()
+        copy._is_alive = self._is_alive.copy()
+        copy._reset_live_slots()
+        copy.reindex()
+        for (
+            attribute,
+            attribute_values,
+        ) in self.mapping_from_attribute_to_quantities.items():
+            copy.mapping_from_attribute_to_quantities[
+                attribute
+            ] = attribute_values.copy()
+        return copy
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_hash")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+        self._hash = SimpleHash() if _SIMPLE_HASH_PRESENT_ else DictionaryHash()
+        self.reindex()
+
+
 def get_in_memory_attribute_storage_factory():
-    if _SIMPLE_HASH_PRESENT_:
+    if _PREFER_INCREMENTAL_INDEX_:
+        return InMemoryAttributeStorageUseIncrementalIndex
+    elif _SIMPLE_HASH_PRESENT_:
         return InMemoryAttributeStorageUseSimpleHash
     elif _PREFER_SORTED_KEYS_:
         return InMemoryAttributeStorageUseSortedKeys
@@ -570,12 +874,25 @@ class InMemoryAttribute(object):
             else:
                 return InMemoryUnitlessAttribute(name, shape, dtype)
 
+    @classmethod
+    def new_attribute_by_reference(cls, name, values_to_set):
+        if is_quantity(values_to_set):
+            result = InMemoryVectorQuantityAttribute(name, 0, values_to_set.unit)
+            result.quantity = values_to_set
+        else:
+            result = InMemoryUnitlessAttribute(name, 0, values_to_set.dtype)
+            result.values = values_to_set
+        return result
+
     def get_value(self, index):
         pass
 
     def remove_indices(self, indices):
         pass
 
+    def keep_indices(self, indices):
+        pass
+
 
 class InMemoryVectorQuantityAttribute(InMemoryAttribute):
     def __init__(self, name, shape, unit):
@@ -634,6 +951,9 @@ class InMemoryVectorQuantityAttribute(InMemoryAttribute):
     def remove_indices(self, indices):
         self.quantity._number = numpy.delete(self.quantity.number, indices)
 
+    def keep_indices(self, indices):
+        self.quantity._number = self.quantity.number[indices]
+
     def has_units(self):
         return True
 
@@ -681,6 +1001,9 @@ class InMemoryUnitlessAttribute(InMemoryAttribute):
     def remove_indices(self, indices):
         self.values = numpy.delete(self.values, indices)
 
+    def keep_indices(self, indices):
+        self.values = self.values[indices]
+
     def has_units(self):
         return False
 
@@ -751,5 +1074,8 @@ class InMemoryLinkedAttribute(InMemoryAttribute):
     def remove_indices(self, indices):
         self.values = numpy.delete(self.values, indices)
 
+    def keep_indices(self, indices):
+        self.values = LinkedArray(self.values[indices])
+
     def has_units(self):
         return False
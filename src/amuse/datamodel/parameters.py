@@ -7,6 +7,7 @@ from amuse.units import quantities
 from amuse.units.core import IncompatibleUnitsException
 from amuse.units.quantities import is_quantity
 from amuse.support import exceptions
+from amuse.rfi.async_request import FakeASyncRequest
 
 from amuse.support.core import OrderedDictionary
 
@@ -162,9 +163,25 @@ class Parameters(object):
                 )
 
     def copy(self):
+        instance = self._instance()
+        if hasattr(instance, "batch"):
+            batch = instance.batch()
+        else:
+            batch = None
+
         mapping_from_name_to_value = {}
-        for name in self.names():
-            mapping_from_name_to_value[name] = getattr(self, name)
+        if batch is not None and batch.is_used_for_getters:
+            instance.before_get_parameter()
+            with batch:
+                requests = [
+                    (name, self.get_parameter(name).get_value_async())
+                    for name in self.names()
+                ]
+            for name, request in requests:
+                mapping_from_name_to_value[name] = request.result()
+        else:
+            for name in self.names():
+                mapping_from_name_to_value[name] = getattr(self, name)
 
         return ParametersMemento(mapping_from_name_to_value)
 
@@ -412,6 +429,9 @@ class AbstractParameterDefinition(object):
     def get_value(self, parameter, object):
         raise exceptions.AmuseException("not implemented")
 
+    def get_value_async(self, parameter, object):
+        return FakeASyncRequest(self.get_value(parameter, object))
+
     def set_value(self, parameter, object, quantity):
         raise exceptions.AmuseException("not implemented")
 
@@ -567,6 +587,18 @@ class ModuleMethodParameterDefinition(ParameterDefinition):
         else:
             return getattr(object, self.get_method)()
 
+    def get_value_async(self, parameter, object):
+        if self.get_method is None or (
+            self.must_set_before_get and not parameter.is_set
+        ):
+            return ParameterDefinition.get_value_async(self, parameter, object)
+
+        method = getattr(object, self.get_method)
+        if getattr(method, "is_async_supported", False):
+            return method.asynchronous()
+        else:
+            return FakeASyncRequest(method())
+
     def set_value(self, parameter, object, quantity):
         # if self.unit.is_non_numeric() or len(self.unit.base) == 0:
         #    if not isinstance(quantity, quantities.Quantity):
@@ -599,6 +631,13 @@ class ModuleBooleanParameterDefinition(ModuleMethodParameterDefinition):
             else False
         )
 
+    def get_value_async(self, parameter, object):
+        request = ModuleMethodParameterDefinition.get_value_async(
+            self, parameter, object
+        )
+        request.add_result_handler(lambda function: True if function() else False)
+        return request
+
     def set_value(self, parameter, object, bool):
         return ModuleMethodParameterDefinition.set_value(
             self, parameter, object, 1 if bool else 0
@@ -646,6 +685,9 @@ class Parameter(object):
     def get_value(self):
         return self.definition.get_value(self, self.parameter_set._instance())
 
+    def get_value_async(self):
+        return self.definition.get_value_async(self, self.parameter_set._instance())
+
     def set_value(self, quantity):
         return self.definition.set_value(self, self.parameter_set._instance(), quantity)
 
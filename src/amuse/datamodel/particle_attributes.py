@@ -11,10 +11,12 @@ from amuse.units.quantities import zero
 from amuse.units.quantities import VectorQuantity
 
 from amuse.support import exceptions
+from amuse.ext import octree
+from amuse.ext.kdtree import KDTree
 from amuse.ext.basicgraph import (
     Graph,
+    ConnectedComponentLabels,
     MinimumSpanningTreeFromEdges,
-    MinimumSpanningTree,
 )
 
 from amuse.datamodel import rotation
@@ -235,12 +237,20 @@ def kinetic_energy(particles):
     return 0.5 * m_v_squared.sum()
 
 
-def potential_energy(particles, smoothing_length_squared=zero, G=None):
+def potential_energy(
+    particles, smoothing_length_squared=zero, G=None, block_size=0, opening_angle=0
+):
     """
     Returns the total potential energy of the particles in the particles set.
 
     :argument smoothing_length_squared: gravitational softening, added to every distance**2.
     :argument G: gravitational constant, automatically detected for SI and Nbody units.
+    :argument block_size: number of particles to process at once, 0 to
+        limit the number of pairwise distances held in memory to 100m floats.
+    :argument opening_angle: if larger than 0, the potential energy is
+        approximated with a Barnes-Hut octree using this opening angle
+        (tolerance), useful for very large sets. With 0 (the default) all
+        pairs are summed exactly.
 
     >>> from amuse.datamodel import Particles
     >>> particles = Particles(2)
@@ -259,26 +269,26 @@ def potential_energy(particles, smoothing_length_squared=zero, G=None):
 
     mass = particles.mass
     x_vector = particles.x
-    y_vector = particles.y
-    z_vector = particles.z
-
-    sum_of_energies = zero
-
-    for i in range(len(particles) - 1):
-        x = x_vector[i]
-        y = y_vector[i]
-        z = z_vector[i]
-        dx = x - x_vector[i + 1 :]
-        dy = y - y_vector[i + 1 :]
-        dz = z - z_vector[i + 1 :]
-        dr_squared = (dx * dx) + (dy * dy) + (dz * dz)
-        dr = (dr_squared + smoothing_length_squared).sqrt()
-        m_m = mass[i] * mass[i + 1 :]
+    length_unit = x_vector.unit
+    positions = numpy.column_stack(
+        (
+            x_vector.value_in(length_unit),
+            particles.y.value_in(length_unit),
+            particles.z.value_in(length_unit),
+        )
+    )
+    masses = mass.value_in(mass.unit)
+    eps2 = quantities.value_in(smoothing_length_squared, length_unit**2)
 
-        energy_of_this_particle = (m_m / dr).sum()
-        sum_of_energies -= energy_of_this_particle
+    if opening_angle > 0:
+        tree = octree.Octree(positions, masses, eps2)
+        sum_of_energies = tree.potential_energy(opening_angle)
+    else:
+        sum_of_energies = octree.direct_potential_energy(
+            positions, masses, eps2, block_size
+        )
 
-    return G * sum_of_energies
+    return G * (sum_of_energies | mass.unit**2 / length_unit)
 
 
 def thermal_energy(particles):
@@ -439,24 +449,19 @@ def virial_radius(particles):
             "Cannot calculate virial radius for a particles set with fewer than "
             "2 particles."
         )
-    partial_sum = zero
-
     mass = particles.mass
     x_vector = particles.x
-    y_vector = particles.y
-    z_vector = particles.z
-
-    for i in range(len(particles) - 1):
-        x = x_vector[i]
-        y = y_vector[i]
-        z = z_vector[i]
-        dx = x - x_vector[i + 1 :]
-        dy = y - y_vector[i + 1 :]
-        dz = z - z_vector[i + 1 :]
-        dr_squared = (dx * dx) + (dy * dy) + (dz * dz)
-        dr = (dr_squared).sqrt()
-        m_m = mass[i] * mass[i + 1 :]
-        partial_sum += (m_m / dr).sum()
+    length_unit = x_vector.unit
+    positions = numpy.column_stack(
+        (
+            x_vector.value_in(length_unit),
+            particles.y.value_in(length_unit),
+            particles.z.value_in(length_unit),
+        )
+    )
+    partial_sum = -octree.direct_potential_energy(
+        positions, mass.value_in(mass.unit)
+    ) | (mass.unit**2 / length_unit)
     return (mass.sum() ** 2) / (2 * partial_sum)
 
 
@@ -522,34 +527,40 @@ def get_binaries(particles, hardness=10, G=constants.G):
     average_Ek = total_Ek / particles.mass.sum()
     max_mass = particles.mass.amax()
     limitE = hardness * average_Ek
+    if n < 2:
+        return []
 
-    a = numpy.argsort(particles.x.number)
+    # a pair with a separation larger than 2 * G * max_mass / limitE
+    # can never be bound more than limitE
+    position = particles.position
+    index = _spatial_index(particles, position)
+    pairs = index.query_pairs((2 * G * max_mass / limitE).value_in(position.unit))
+    if len(pairs) == 0:
+        return []
+
+    # report the pairs in order of x, the first particle of a binary is
+    # the one with the smallest x
+    rank = numpy.empty(n, dtype=int)
+    rank[numpy.argsort(particles.x.number)] = numpy.arange(n)
+    is_ordered = rank[pairs[:, 0]] < rank[pairs[:, 1]]
+    first = numpy.where(is_ordered, pairs[:, 0], pairs[:, 1])
+    second = numpy.where(is_ordered, pairs[:, 1], pairs[:, 0])
+    order = numpy.lexsort((rank[second], rank[first]))
+    first = first[order]
+    second = second[order]
 
-    binaries = []
+    mass = particles.mass
+    velocity = particles.velocity
+    r = (position[second] - position[first]).lengths()
+    v2 = ((velocity[second] - velocity[first]) ** 2).sum(axis=1)
+    eb = G * (mass[first] + mass[second]) / r - 0.5 * v2
+    is_binary = eb > limitE
 
-    for i in range(n - 1):
-        j = i + 1
-        while (
-            j < n
-            and (particles.x[a[j]] - particles.x[a[i]]) < 2 * G * max_mass / limitE
-        ):
-            r2 = (
-                (particles.x[a[j]] - particles.x[a[i]]) ** 2
-                + (particles.y[a[j]] - particles.y[a[i]]) ** 2
-                + (particles.z[a[j]] - particles.z[a[i]]) ** 2
-            )
-            v2 = (
-                (particles.vx[a[j]] - particles.vx[a[i]]) ** 2
-                + (particles.vy[a[j]] - particles.vy[a[i]]) ** 2
-                + (particles.vz[a[j]] - particles.vz[a[i]]) ** 2
-            )
-            r = r2**0.5
-            eb = G * (particles.mass[a[i]] + particles.mass[a[j]]) / r - 0.5 * v2
-            if eb > limitE:
-                binary = particles[[a[i], a[j]]].copy()
-                binary.hardness = eb / average_Ek
-                binaries.append(binary)
-            j += 1
+    binaries = []
+    for i, j, energy in zip(first[is_binary], second[is_binary], eb[is_binary]):
+        binary = particles[[i, j]].copy()
+        binary.hardness = energy / average_Ek
+        binaries.append(binary)
 
     return binaries
 
@@ -923,14 +934,52 @@ def distances_squared(particles, other_particles):
     return (dxdydz**2).sum(-1)
 
 
+def spatial_index(particles, leaf_size=16):
+    """
+    Returns a k-d tree (:class:`amuse.ext.kdtree.KDTree`) of the positions
+    of the particles, the positions in the tree are numbers in the unit of
+    particles.position. The tree is cached on the set and only rebuilt when
+    particles are added or removed, or when the positions have changed.
+
+    :argument leaf_size: maximum number of particles in a leaf of the tree
+
+    >>> from amuse.datamodel import Particles
+    >>> particles = Particles(3)
+    >>> particles.position = [[1.0, 0, 0], [3.0, 0, 0], [4.0, 0, 0]] | units.m
+    >>> distances_squared, indices = particles.spatial_index().query([[2.9, 0, 0]])
+    >>> print(indices)
+    [[1]]
+    """
+    return _spatial_index(particles, particles.position, leaf_size)
+
+
+def _spatial_index(particles, position, leaf_size=16):
+    points = position.value_in(position.unit)
+    if hasattr(particles, "_get_version"):
+        version = particles._get_version()
+    else:
+        version = None
+    key = (version, position.unit, leaf_size)
+    cached_results = particles._private.cached_results.results
+    if "spatial_index" in cached_results:
+        cached_key, index = cached_results["spatial_index"]
+        if cached_key == key and numpy.array_equal(index.positions, points):
+            return index
+    index = KDTree(points, leaf_size)
+    cached_results["spatial_index"] = (key, index)
+    return index
+
+
 def nearest_neighbour(particles, neighbours=None, max_array_length=10000000):
     """
     Returns the nearest neighbour of each particle in this set. If the 'neighbours'
     particle set is supplied, the search is performed on the neighbours set, for
     each particle in the orignal set. Otherwise the nearest neighbour in the same
-    set is searched.
+    set is searched. The search uses the spatial index of the (neighbours) set.
 
     :argument neighbours: the particle set in which to search for the nearest neighbour (optional)
+    :argument max_array_length: not used anymore, the search does not build
+        distance matrices
 
     >>> from amuse.datamodel import Particles
     >>> particles = Particles(3)
@@ -947,38 +996,19 @@ def nearest_neighbour(particles, neighbours=None, max_array_length=10000000):
     quantity<[0.0, 2.5, 2.5] m>
     """
     if neighbours is None:
-        other_particles = particles
-    else:
-        other_particles = neighbours
-
-    if len(particles) * len(other_particles) * 3 > max_array_length:
-        neighbour_indices = []
-        particles_per_batch = max(1, max_array_length // (3 * len(other_particles)))
-        number_of_batches = (len(particles) - 1) // particles_per_batch + 1
-        indices_in_each_batch = [
-            numpy.arange(particles_per_batch) + i * particles_per_batch
-            for i in range(number_of_batches - 1)
-        ]
-        indices_in_each_batch.append(
-            numpy.arange(indices_in_each_batch[-1][-1] + 1, len(particles))
+        position = particles.position
+        index = _spatial_index(particles, position)
+        distances_squared, neighbour_indices = index.query(
+            index.positions, 1, point_indices=numpy.arange(len(particles))
         )
-        for indices in indices_in_each_batch:
-            distances_squared = particles[indices].distances_squared(other_particles)
-            if neighbours is None:
-                diagonal_indices = (numpy.arange(len(indices)), indices)
-                distances_squared.number[
-                    diagonal_indices
-                ] = numpy.inf  # can't be your own neighbour
-            neighbour_indices.append(distances_squared.argmin(axis=1))
-        return other_particles[numpy.concatenate(neighbour_indices)]
-
-    distances_squared = particles.distances_squared(other_particles)
-    if neighbours is None:
-        diagonal_indices = numpy.diag_indices(len(particles))
-        distances_squared.number[
-            diagonal_indices
-        ] = numpy.inf  # can't be your own neighbour
-    return other_particles[distances_squared.argmin(axis=1)]
+        return particles[neighbour_indices[:, 0]]
+
+    position = neighbours.position
+    index = _spatial_index(neighbours, position)
+    distances_squared, neighbour_indices = index.query(
+        particles.position.value_in(position.unit), 1
+    )
+    return neighbours[neighbour_indices[:, 0]]
 
 
 def velocity_diff_squared(particles, field_particles):
@@ -1013,16 +1043,22 @@ def Qparameter(parts, distfunc=None):
     for a projection of the particle set.
 
     :argument distfunc:  distfunc is the distance function which can be used to select
-    the projection plane.
+    the projection plane. By default the x-y plane is used, and the minimum spanning
+    tree is calculated with the k-d tree of the projected positions.
 
     """
-    if distfunc is None:
-
-        def distfunc(p, q):
-            return (((p.x - q.x) ** 2 + (p.y - q.y) ** 2) ** 0.5).value_in(p.x.unit)
-
     N = len(parts)
 
+    if distfunc is None:
+        unit = parts.x.unit
+        points = numpy.column_stack((parts.x.value_in(unit), parts.y.value_in(unit)))
+        mst_lengths, first, second = KDTree(points).minimum_spanning_tree()
+        ml = _mean_separation(points)
+        mlmst = mst_lengths.sum() / len(mst_lengths)
+        # normalize
+        mlmst = mlmst / (N * numpy.pi) ** 0.5 * (N - 1)
+        return mlmst / ml
+
     graph = Graph()
 
     for p in parts:
@@ -1056,9 +1092,7 @@ def connected_components(parts, threshold=None, distfunc=None, verbose=False):
         threshold = 1.0 | parts.x.unit
 
     if distfunc is None:
-
-        def distfunc(p, q):
-            return ((p.x - q.x) ** 2 + (p.y - q.y) ** 2 + (p.z - q.z) ** 2) ** 0.5
+        return _connected_components_of_positions(parts, threshold, verbose)
 
     if verbose:
         print("making CC")
@@ -1089,18 +1123,57 @@ def connected_components(parts, threshold=None, distfunc=None, verbose=False):
     return cc
 
 
+def _connected_components_of_positions(parts, threshold, verbose=False):
+    # Euclidean distance: radius query on the spatial index, the components
+    # are returned in the order of the original algorithm (the component of
+    # the last particle first)
+    if verbose:
+        print("making CC")
+    if len(parts) == 0:
+        return []
+    position = parts.position
+    index = _spatial_index(parts, position)
+    pairs = index.query_pairs(threshold.value_in(position.unit))
+    labels = ConnectedComponentLabels(len(parts), pairs[:, 0], pairs[:, 1])
+    members = numpy.argsort(labels, kind="stable")
+    boundaries = numpy.flatnonzero(numpy.diff(labels[members])) + 1
+    components = numpy.split(members, boundaries)
+    components.sort(key=lambda x: x[-1], reverse=True)
+    cc = [parts[x] for x in components]
+    if verbose:
+        print("done")
+    if verbose:
+        print("number of CC:", len(cc))
+    return cc
+
+
+def _mean_separation(points, block_size=0):
+    # mean distance of all pairs of points, the pairs are processed in
+    # blocks of rows of the upper triangle
+    n = len(points)
+    block_size = octree.block_size_for(n, block_size)
+    result = 0.0
+    for offset in range(0, n - 1, block_size):
+        end = min(offset + block_size, n - 1)
+        dr = points[offset:end, numpy.newaxis, :] - points[numpy.newaxis, offset + 1 :, :]
+        distances = numpy.sqrt((dr * dr).sum(axis=2))
+        is_upper = (
+            numpy.arange(n - offset - 1)[numpy.newaxis, :]
+            >= numpy.arange(end - offset)[:, numpy.newaxis]
+        )
+        result += distances[is_upper].sum()
+    return result / (n * (n - 1) // 2)
+
+
 def minimum_spanning_tree_length(particles):
     """
-    Calculates the length of the minimum spanning tree (MST) of a set of particles
-    using David Eppstein's Python implemention of Kruskal's algorithm.
+    Calculates the length of the minimum spanning tree (MST) of a set of particles,
+    with Boruvka's algorithm on the spatial index of the set.
     """
-    graph = Graph()
-    for particle in particles:
-        others = particles - particle
-        distances = (particle.position - others.position).lengths()
-        for other, distance in zip(others, distances):
-            graph.add_edge(particle, other, distance)
-    return sum([edge[0] for edge in MinimumSpanningTree(graph)], zero)
+    position = particles.position
+    index = _spatial_index(particles, position)
+    mst_lengths, first, second = index.minimum_spanning_tree()
+    return mst_lengths.sum() | position.unit
 
 
 MassSegregationRatioResults = namedtuple(
@@ -1199,42 +1272,21 @@ def correlation_dimension(particles, max_array_length=10000000):
     """
     Computes the correlation dimension, a measure of the fractal dimension of a
     set of points. The measure is based on counting the number of pairs with a
-    mutual distance less than 'eps', for varying values of 'eps'.
-    """
-    size = (particles.position.max(axis=0) - particles.position.min(axis=0)).max()
-    eps2_range = (size / 2 ** numpy.arange(2.0, 6.0, 0.1)) ** 2
-
-    if 3 * len(particles) ** 2 > max_array_length:
-        counts_per_batch = []
-        particles_per_batch = max(1, max_array_length // (3 * len(particles)))
-        number_of_batches = (len(particles) - 1) // particles_per_batch + 1
-        indices_in_each_batch = [
-            numpy.arange(particles_per_batch) + i * particles_per_batch
-            for i in range(number_of_batches - 1)
-        ]
-        indices_in_each_batch.append(
-            numpy.arange(indices_in_each_batch[-1][-1] + 1, len(particles))
-        )
-        for indices in indices_in_each_batch:
-            distances_squared = particles[indices].distances_squared(particles)
-            diagonal_indices = (numpy.arange(len(indices)), indices)
-            distances_squared.number[
-                diagonal_indices
-            ] = numpy.inf  # can't be your own neighbour
-
-            counts_per_batch.append(
-                [(distances_squared < eps2).sum() for eps2 in eps2_range]
-            )
-        number_of_close_pairs = numpy.array(counts_per_batch).sum(axis=0)
-    else:
-        distances_squared = particles.distances_squared(particles)
-        diagonal_indices = numpy.diag_indices(len(particles))
-        distances_squared.number[
-            diagonal_indices
-        ] = numpy.inf  # can't be your own neighbour
-        number_of_close_pairs = numpy.array(
-            [(distances_squared < eps2).sum() for eps2 in eps2_range]
-        )
+    mutual distance less than 'eps', for varying values of 'eps'. The pairs are
+    counted with the spatial index of the set.
+
+    :argument max_array_length: not used anymore, the pairs are counted
+        without building distance matrices
+    """
+    position = particles.position
+    size = (position.max(axis=0) - position.min(axis=0)).max()
+    eps_range = size / 2 ** numpy.arange(2.0, 6.0, 0.1)
+    eps2_range = eps_range**2
+
+    index = _spatial_index(particles, position)
+    number_of_close_pairs = numpy.array(
+        [index.count_pairs(eps) for eps in eps_range.value_in(position.unit)]
+    )
 
     upper_index = numpy.searchsorted(-number_of_close_pairs, 0)  # Prevent log(0)
     x = 0.5 * numpy.log10(eps2_range.number[:upper_index])
@@ -1341,6 +1393,7 @@ AbstractParticleSet.add_global_function_attribute(
 AbstractParticleSet.add_global_function_attribute("rotate", rotation.rotate)
 AbstractParticleSet.add_global_function_attribute("add_spin", rotation.add_spin)
 
+AbstractParticleSet.add_global_function_attribute("spatial_index", spatial_index)
 AbstractParticleSet.add_global_function_attribute("binaries", get_binaries)
 AbstractParticleSet.add_global_function_attribute("get_binaries", get_binaries)
 
@@ -15,6 +15,7 @@ from amuse.units.quantities import is_quantity
 from amuse.units.quantities import as_vector_quantity
 from amuse.units.quantities import zero
 from amuse.units.quantities import AdaptingVectorQuantity
+from amuse.rfi.async_request import AsyncRequestsPool, FakeASyncRequest
 
 import random
 import numpy
@@ -1455,9 +1456,12 @@ class Particles(AbstractParticleSet):
         return tmp
 
     def get_values_in_store_async(self, indices, attributes):
-        return self._private.attribute_storage.get_values_in_store_async(
-            indices, attributes
-        )
+        storage = self._private.attribute_storage
+        if not hasattr(storage, "get_values_in_store_async"):
+            raise exceptions.AsyncNotSupportedException(
+                "asynchronous access is not supported by the storage of the set"
+            )
+        return storage.get_values_in_store_async(indices, attributes)
 
     def get_indices_of_keys(self, keys):
         return self._private.attribute_storage.get_indices_of(keys)
@@ -1466,9 +1470,12 @@ class Particles(AbstractParticleSet):
         self._private.attribute_storage.set_values_in_store(indices, attributes, values)
 
     def set_values_in_store_async(self, indices, attributes, values):
-        return self._private.attribute_storage.set_values_in_store_async(
-            indices, attributes, values
-        )
+        storage = self._private.attribute_storage
+        if not hasattr(storage, "set_values_in_store_async"):
+            raise exceptions.AsyncNotSupportedException(
+                "asynchronous access is not supported by the storage of the set"
+            )
+        return storage.set_values_in_store_async(indices, attributes, values)
 
     def get_attribute_names_defined_in_store(self):
         return self._private.attribute_storage.get_defined_attribute_names()
@@ -1828,19 +1835,79 @@ class ParticlesSuperset(AbstractParticleSet):
 
             set.remove_particles_from_store(indices_in_subset)
 
+    def _new_request_for_set(self, set, name_of_method, indices, attributes, *values):
+        """
+        Starts an asynchronous get or set of the attributes in the
+        set, returns None if the set cannot do this (the attributes
+        must then be accessed synchronously). Some sets handle the
+        request synchronously and return None, a finished request is
+        returned for these.
+        """
+        if not hasattr(set, name_of_method):
+            return None
+        missing_attributes = (
+            frozenset(attributes)
+            - frozenset(set.get_attribute_names_defined_in_store())
+            - frozenset(["index_in_code"])
+        )
+        if missing_attributes:
+            return None
+        try:
+            request = getattr(set, name_of_method)(indices, attributes, *values)
+        except exceptions.AsyncNotSupportedException:
+            return None
+        if request is None:
+            request = FakeASyncRequest()
+        return request
+
+    def _get_values_in_store_of_sets(
+        self, split_indices_in_subset, split_indices_in_input, attributes
+    ):
+        sets_and_indices = [
+            x
+            for x in zip(
+                self._private.particle_sets,
+                split_indices_in_subset,
+                split_indices_in_input,
+            )
+            if len(x[1]) > 0
+        ]
+        indices_and_values = [None] * len(sets_and_indices)
+
+        def handle_result(request, index, indices_in_input):
+            indices_and_values[index] = (indices_in_input, request.result())
+
+        # the requests to all sets are sent first, so codes on
+        # different workers handle them concurrently, the pool is also
+        # waited on when a synchronous get fails
+        pool = AsyncRequestsPool()
+        try:
+            for index, (set, indices_in_subset, indices_in_input) in enumerate(
+                sets_and_indices
+            ):
+                request = None
+                if len(sets_and_indices) > 1:
+                    request = self._new_request_for_set(
+                        set, "get_values_in_store_async", indices_in_subset, attributes
+                    )
+                if request is None:
+                    values_for_set = set.get_values_in_store(indices_in_subset, attributes)
+                    indices_and_values[index] = (indices_in_input, values_for_set)
+                else:
+                    pool.add_request(request, handle_result, (index, indices_in_input))
+        finally:
+            pool.waitall()
+
+        return indices_and_values
+
     def get_values_in_store(self, indices, attributes):
         split_indices_in_subset, split_indices_in_input = self._split_indices_over_sets(
             indices
         )
 
-        indices_and_values = []
-
-        for indices_in_subset, indices_in_input, set in zip(
-            split_indices_in_subset, split_indices_in_input, self._private.particle_sets
-        ):
-            if len(indices_in_subset) > 0:
-                values_for_set = set.get_values_in_store(indices_in_subset, attributes)
-                indices_and_values.append((indices_in_input, values_for_set))
+        indices_and_values = self._get_values_in_store_of_sets(
+            split_indices_in_subset, split_indices_in_input, attributes
+        )
 
         if indices is None or isinstance(indices, EllipsisType):
             resultlength = len(self)
@@ -1892,31 +1959,51 @@ class ParticlesSuperset(AbstractParticleSet):
                 len_indices += len(split_indices_in_subset)
         else:
             len_indices = len(indices)
-        for indices_in_subset, indices_in_input, set in zip(
-            split_indices_in_subset, split_indices_in_input, self._private.particle_sets
-        ):
-            quantities = [None] * len(attributes)
-            for valueindex, quantity in enumerate(values):
-                if is_quantity(quantity):
-                    if quantity.is_scalar():
-                        numbers = [quantity.number] * len(indices_in_input)
-                    elif quantity.is_vector() and len(quantity) < len_indices:
-                        numbers = numpy.take(
-                            [quantity.number] * len_indices, indices_in_input
-                        )
+
+        # the requests to all sets are sent first, so codes on
+        # different workers handle them concurrently, the pool is also
+        # waited on when a synchronous set fails
+        pool = AsyncRequestsPool()
+        number_of_sets = len([x for x in split_indices_in_subset if len(x) > 0])
+        try:
+            for indices_in_subset, indices_in_input, set in zip(
+                split_indices_in_subset, split_indices_in_input, self._private.particle_sets
+            ):
+                if len(indices_in_subset) == 0:
+                    continue
+                quantities = [None] * len(attributes)
+                for valueindex, quantity in enumerate(values):
+                    if is_quantity(quantity):
+                        if quantity.is_scalar():
+                            numbers = [quantity.number] * len(indices_in_input)
+                        elif quantity.is_vector() and len(quantity) < len_indices:
+                            numbers = numpy.take(
+                                [quantity.number] * len_indices, indices_in_input
+                            )
+                        else:
+                            numbers = numpy.take(quantity.number, indices_in_input)
+                        quantities[valueindex] = quantity.unit.new_quantity(numbers)
                     else:
-                        numbers = numpy.take(quantity.number, indices_in_input)
-                    quantities[valueindex] = quantity.unit.new_quantity(numbers)
+                        if not hasattr(quantity, "ndim"):
+                            numbers = numpy.asarray([quantity] * len(indices_in_input))
+                        elif len(quantity) < len_indices:
+                            numbers = numpy.take([quantity] * len_indices, indices_in_input)
+                        else:
+                            numbers = numpy.take(quantity, indices_in_input)
+                        quantities[valueindex] = numbers
+
+                request = None
+                if number_of_sets > 1:
+                    request = self._new_request_for_set(
+                        set, "set_values_in_store_async", indices_in_subset, attributes,
+                        quantities
+                    )
+                if request is None:
+                    set.set_values_in_store(indices_in_subset, attributes, quantities)
                 else:
-                    if not hasattr(quantity, "ndim"):
-                        numbers = numpy.asarray([quantity] * len(indices_in_input))
-                    elif len(quantity) < len_indices:
-                        numbers = numpy.take([quantity] * len_indices, indices_in_input)
-                    else:
-                        numbers = numpy.take(quantity, indices_in_input)
-                    quantities[valueindex] = numbers
-
-            set.set_values_in_store(indices_in_subset, attributes, quantities)
+                    pool.add_request(request)
+        finally:
+            pool.waitall()
 
     def get_attribute_names_defined_in_store(self):
         self._ensure_updated_set_properties()
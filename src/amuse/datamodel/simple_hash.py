@@ -94,6 +94,33 @@ class SimpleHash(object):
                 raise MemoryError("allocation of SimpleHash")
         self.insert(keys, values)
 
+    def update(self, keys, values):
+        N = len(keys)
+        if N == 0:
+            return
+        keys = numpy.ascontiguousarray(keys, dtype="uintp")
+        values = numpy.ascontiguousarray(values, dtype="uintp")
+        assert len(keys) == len(values)
+
+        ckeys = keys.ctypes.data_as(c_size_t_pointer)
+        cvalues = values.ctypes.data_as(c_size_t_pointer)
+        with self.lock:
+            err = self._lib.hash_updates(self._map_ref, N, ckeys, cvalues)
+        if err != 0:
+            raise Exception("simple hash update error")
+
+    def delete(self, keys):
+        N = len(keys)
+        if N == 0:
+            return
+        keys = numpy.ascontiguousarray(keys, dtype="uintp")
+
+        ckeys = keys.ctypes.data_as(c_size_t_pointer)
+        with self.lock:
+            err = self._lib.hash_deletes(self._map_ref, N, ckeys)
+        if err != 0:
+            raise Exception("simple hash delete error")
+
     def key_present(self, key):
         with self.lock:
             return (
@@ -18,6 +18,9 @@ UnionFind and MinimumSpanningTree taken from PADS:
 
 """
 
+import numpy
+
+
 class UnionFind(object):
     """Union-find data structure.
 
@@ -168,6 +171,32 @@ def ConnectedComponentsFromEdges(edges):
       u.union(e[1],e[2])
     return u.sets()
 
+def ConnectedComponentLabels(number_of_nodes, first, second):
+    """
+    Return the connected component of every node of a graph with nodes
+    0 ... number_of_nodes - 1 and the edges (first[i], second[i]), given
+    as numpy arrays. A component is labeled with its lowest node, the
+    labels are returned as a numpy array.
+    """
+    # Union-find on arrays: every pass hooks the root of the larger label
+    # of each edge on the smaller one, and then compresses all paths.
+    labels = numpy.arange(number_of_nodes)
+    first = numpy.asarray(first, dtype=labels.dtype)
+    second = numpy.asarray(second, dtype=labels.dtype)
+    while True:
+        first_labels = labels[first]
+        second_labels = labels[second]
+        if numpy.array_equal(first_labels, second_labels):
+            return labels
+        smallest = numpy.minimum(first_labels, second_labels)
+        numpy.minimum.at(labels, first_labels, smallest)
+        numpy.minimum.at(labels, second_labels, smallest)
+        while True:
+            compressed = labels[labels]
+            if numpy.array_equal(compressed, labels):
+                break
+            labels = compressed
+
 
 if __name__=="__main__":
   graph = Graph()
@@ -17,6 +17,10 @@ wait for all to finish, loop over all:
   jobserver.waitall()
   for job in jobserver.finished_jobs:
     print job.result
+
+submit job and get a future (concurrent.futures.Future):
+  future=jobserver.submit(somework, arg1, arg2, keyword=value)
+  result=future.result()
     
 it is essential that the function which are to be executed remotely are pickleable, i.e. they must not be 
 derived from the main module. Easy way to achieve this is to import them from a seperate file.    
@@ -36,6 +40,7 @@ from collections import deque
 import threading
 from time import sleep
 import warnings
+from concurrent.futures import Future
 
 import base64
 
@@ -44,6 +49,17 @@ def dump_and_encode(x):
 def decode_and_load(x):
   return pickle.loads(base64.b64decode(x.encode()))
 
+def dump_to_blob(x):
+  """
+  pickles x (protocol 5) to a blob, a tuple of the pickle data and the
+  out-of-band buffers (numpy arrays are not copied into the pickle data)
+  """
+  buffers=[]
+  data=pickle.dumps(x, protocol=5, buffer_callback=buffers.append)
+  return (data,)+tuple(b.raw() for b in buffers)
+def load_from_blob(x):
+  return pickle.loads(x[0], buffers=x[1:])
+
 class RemoteCodeException(Exception):
     def __init__(self,ex=None):
         self.ex=ex
@@ -55,41 +71,43 @@ class RemoteCodeImplementation(object):
      self.scope={}
      self.scope['dump_and_encode']=dump_and_encode
      self.scope['decode_and_load']=decode_and_load
+     self.scope['dump_to_blob']=dump_to_blob
+     self.scope['load_from_blob']=load_from_blob
 
    def _exec(self,arg):
      try:
        exec(arg, self.scope)
-       return dump_and_encode(None)
+       return dump_to_blob(None)
      except Exception as ex:
-       return dump_and_encode(RemoteCodeException(ex))
+       return dump_to_blob(RemoteCodeException(ex))
    def _eval(self,arg,argout):
      try:
        self.scope.update(dict(arg=arg))
        exec("argout="+arg, self.scope)
-       argout.value=eval("dump_and_encode(argout)",self.scope)
-       return dump_and_encode(None)
+       argout.value=eval("dump_to_blob(argout)",self.scope)
+       return dump_to_blob(None)
      except Exception as ex:
-       argout.value=dump_and_encode("")
-       return dump_and_encode(RemoteCodeException(ex))
+       argout.value=dump_to_blob("")
+       return dump_to_blob(RemoteCodeException(ex))
    def _assign(self,lhs,argin):
      try:
        self.scope.update(dict(argin=argin))
-       exec(lhs+"=decode_and_load(argin)", self.scope)
-       return dump_and_encode(None)
+       exec(lhs+"=load_from_blob(argin)", self.scope)
+       return dump_to_blob(None)
      except Exception as ex:
-       return dump_and_encode(RemoteCodeException(ex))
+       return dump_to_blob(RemoteCodeException(ex))
    def _func(self,func,argin,kwargin,argout):
      try:
        self.scope.update(dict(func=func,argin=argin,kwargin=kwargin))
-       exec("func=decode_and_load(func)", self.scope)
-       exec("arg=decode_and_load(argin)", self.scope)
-       exec("kwarg=decode_and_load(kwargin)", self.scope)
+       exec("func=load_from_blob(func)", self.scope)
+       exec("arg=load_from_blob(argin)", self.scope)
+       exec("kwarg=load_from_blob(kwargin)", self.scope)
        exec("result=func(*arg,**kwarg)", self.scope)
-       argout.value=eval("dump_and_encode(result)",self.scope)
-       return dump_and_encode(None)
+       argout.value=eval("dump_to_blob(result)",self.scope)
+       return dump_to_blob(None)
      except Exception as ex:
-       argout.value=dump_and_encode(None)
-       return dump_and_encode(RemoteCodeException(ex))
+       argout.value=dump_to_blob(None)
+       return dump_to_blob(RemoteCodeException(ex))
 
 class RemoteCodeInterface(PythonCodeInterface):    
     def __init__(self, **options):
@@ -98,78 +116,78 @@ class RemoteCodeInterface(PythonCodeInterface):
     @legacy_function
     def _func():
         function = LegacyFunctionSpecification()
-        function.addParameter('func', dtype='string', direction=function.IN)
-        function.addParameter('argin', dtype='string', direction=function.IN)
-        function.addParameter('kwargin', dtype='string', direction=function.IN)
-        function.addParameter('argout', dtype='string', direction=function.OUT)
-        function.result_type = 'string'
+        function.addParameter('func', dtype='bytes', direction=function.IN)
+        function.addParameter('argin', dtype='bytes', direction=function.IN)
+        function.addParameter('kwargin', dtype='bytes', direction=function.IN)
+        function.addParameter('argout', dtype='bytes', direction=function.OUT)
+        function.result_type = 'bytes'
         return function
 
     @legacy_function
     def _exec():
         function = LegacyFunctionSpecification()
         function.addParameter('arg', dtype='string', direction=function.IN)
-        function.result_type = 'string'
+        function.result_type = 'bytes'
         return function
 
     @legacy_function
     def _eval():
         function = LegacyFunctionSpecification()
         function.addParameter('arg', dtype='string', direction=function.IN)
-        function.addParameter('argout', dtype='string', direction=function.OUT)
-        function.result_type = 'string'
+        function.addParameter('argout', dtype='bytes', direction=function.OUT)
+        function.result_type = 'bytes'
         return function
 
     @legacy_function
     def _assign():
         function = LegacyFunctionSpecification()
         function.addParameter('lhs', dtype='string', direction=function.IN)
-        function.addParameter('argin', dtype='string', direction=function.IN)
-        function.result_type = 'string'
+        function.addParameter('argin', dtype='bytes', direction=function.IN)
+        function.result_type = 'bytes'
         return function
 
     def execute(self,express):
-        err=decode_and_load( self._exec(express) )
+        err=load_from_blob( self._exec(express) )
         if err:
           raise err
 
     def assign(self,lhs,arg):
-        err=decode_and_load( self._assign(lhs, dump_and_encode(arg)) )
+        err=load_from_blob( self._assign(lhs, dump_to_blob(arg)) )
         if err:
           raise err
 
     def evaluate(self,express):
         result,err=self._eval(express)
-        err=decode_and_load( err)
+        err=load_from_blob( err)
         if err :
           raise err
-        return decode_and_load(result) 
+        return load_from_blob(result) 
 
     def func(self,f,*args,**kwargs):
-        result,err=self._func( dump_and_encode(f),
-                               dump_and_encode(args),
-                               dump_and_encode(kwargs) )
-        err=decode_and_load( err)
+        result,err=self._func( dump_to_blob(f),
+                               dump_to_blob(args),
+                               dump_to_blob(kwargs) )
+        err=load_from_blob( err)
         if err :
           raise err
-        return decode_and_load(result)
+        return load_from_blob(result)
 
     def async_func(self,f,*args,**kwargs):
-        request=self._func.asynchronous(dump_and_encode(f),
-                                 dump_and_encode(args),
-                                 dump_and_encode(kwargs) )
+        request=self._func.asynchronous(dump_to_blob(f),
+                                 dump_to_blob(args),
+                                 dump_to_blob(kwargs) )
         def f(x):
           result,err=x()
-          err=decode_and_load( err)
+          err=load_from_blob( err)
           if err :
             raise err
-          return decode_and_load(result)
+          return load_from_blob(result)
         request.add_result_handler( f )
         return request
 
 
 class Job(object):
-    def __init__(self, f, args, kwargs,retries=0):
+    def __init__(self, f, args, kwargs,retries=0,future=None):
       self.f=f
       self.args=args
       self.kwargs=kwargs
@@ -177,6 +195,23 @@ class Job(object):
       self.request=None
       self.err=None
       self.retries=retries
+      self.future=future
+
+class JobFuture(Future):
+    """
+    Future of a job submitted with JobServer.submit. The results of
+    the jobs are handled while waiting on the jobserver, so result()
+    and exception() wait on the jobserver until the job is done.
+    """
+    def __init__(self, job_server):
+      Future.__init__(self)
+      self.job_server=job_server
+    def result(self, timeout=None):
+      self.job_server._wait_for(self)
+      return Future.result(self, timeout)
+    def exception(self, timeout=None):
+      self.job_server._wait_for(self)
+      return Future.exception(self, timeout)
 
 class JobServer(object):
     def __init__(self,hosts=[],channel_type="mpi",preamble=None, retry_jobs=True, 
@@ -283,6 +318,28 @@ class JobServer(object):
           self._add_job(self.job_list.popleft(), self.idle_codes.pop())        
       return job
 
+    def submit(self,f,*args,**kwargs):
+      """
+      submits a job and returns a concurrent.futures.Future of its
+      result, the job is not added to the finished_jobs
+      """
+      future=JobFuture(self)
+      future.set_running_or_notify_cancel()
+      job=Job(f,args,kwargs,future=future)
+      self.job_list.append(job)
+      if self.idle_codes: 
+          self._add_job(self.job_list.popleft(), self.idle_codes.pop())        
+      return future
+
+    def _wait_for(self, future):
+      while not future.done() and (len(self.pool)>0 or self.job_list):
+        if len(self.pool)==0:
+          if self.number_starting_codes==0:
+            raise Exception("JobServer: no codes available")
+          sleep(0.1)
+        else:
+          self.pool.wait()
+
     def wait(self):
       if self._finished_jobs:
         self.last_finished_job=self._finished_jobs.popleft()
@@ -298,6 +355,10 @@ class JobServer(object):
           if self.number_starting_codes==0:
             raise Exception("JobServer: no codes available")
         self.pool.wait()
+        while not self._finished_jobs and len(self.pool)>0:
+          self.pool.wait()
+        if not self._finished_jobs:
+          return False
         self.last_finished_job=self._finished_jobs.popleft()
         return True
 
@@ -309,7 +370,8 @@ class JobServer(object):
                 raise Exception("JobServer: no codes available")
         while len(self.pool)>0 or self.job_list:        
             self.pool.wait()
-            self.last_finished_job=self._finished_jobs[-1]
+            if self._finished_jobs:
+                self.last_finished_job=self._finished_jobs[-1]
     
     @property
     def finished_jobs(self):
@@ -323,12 +385,14 @@ class JobServer(object):
       except Exception as ex:
         job.result=None
         job.err=ex
+      is_retried=False
       if job.err and not isinstance(job.err,RemoteCodeException):
         del code
         self.number_available_codes-=1
         if self.retry_jobs and job.retries<self.max_retries:
-          retry=Job(job.f,job.args,job.kwargs,job.retries+1)
+          retry=Job(job.f,job.args,job.kwargs,job.retries+1,job.future)
           self.job_list.append(retry)
+          is_retried=True
       else:
         self.idle_codes.append(code)
       if self.job_list and self.idle_codes:
@@ -336,7 +400,13 @@ class JobServer(object):
         if not self.job_list:
           if self.verbose:
             print("JobServer: last job dispatched")
-      self._finished_jobs.append(job)
+      if job.future is None:
+        self._finished_jobs.append(job)
+      elif not is_retried:
+        if job.err:
+          job.future.set_exception(job.err)
+        else:
+          job.future.set_result(job.result)
     
     def _add_job(self,job,code):
       job.request=code.async_func(job.f,*job.args,**job.kwargs)
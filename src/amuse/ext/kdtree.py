@@ -0,0 +1,336 @@
+"""
+Unit-less k-d tree for neighbour searches.
+
+All functions and classes in this module work on plain numpy arrays,
+units are expected to be stripped by the caller (once, at entry) and
+re-attached to the result.
+
+The tree (KDTree) supports three kinds of queries, each of which is
+processed for all query points at once, walking the tree with groups of
+query points:
+
+- the k nearest neighbours of points (query),
+- all pairs of sources closer than a given distance (query_pairs),
+- the number of pairs of sources closer than a given distance
+  (count_pairs).
+
+The Euclidean minimum spanning tree of the sources is calculated with
+Boruvka's algorithm (minimum_spanning_tree), every round finds the
+nearest source outside its own component for all sources with one query.
+
+For well distributed points these scale as O(N log N), instead of the
+O(N^2) of a complete distance matrix.
+"""
+
+import numpy
+
+from amuse.ext.basicgraph import ConnectedComponentLabels
+
+
+class KDTree:
+    """
+    k-d tree over a set of (unit-less) points. Every node is split at the
+    median of its widest dimension, and stores the bounding box of the
+    points it contains. Points are stored in tree order, so the points of
+    a node are a contiguous range in ``order``.
+
+    :argument positions: (m, d) array of positions
+    :argument leaf_size: maximum number of points in a leaf node
+    """
+
+    def __init__(self, positions, leaf_size=16):
+        positions = numpy.asarray(positions, dtype="float64")
+        if positions.ndim == 1:
+            positions = positions.reshape(-1, 1)
+        self.positions = positions
+        self.leaf_size = max(int(leaf_size), 1)
+        self._build()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _build(self):
+        n, dimensions = self.positions.shape
+        self.order = numpy.arange(n)
+        lowers = []
+        uppers = []
+        ranges = []
+        children = []
+        split_dimensions = []
+        split_values = []
+
+        stack = [(0, n, -1, 0)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(ranges)
+            indices = self.order[start:end]
+            points = self.positions[indices]
+            if end > start:
+                lower = points.min(axis=0)
+                upper = points.max(axis=0)
+            else:
+                lower = upper = numpy.zeros(dimensions)
+            lowers.append(lower)
+            uppers.append(upper)
+            ranges.append((start, end))
+            children.append([-1, -1])
+            split_dimensions.append(0)
+            split_values.append(0.0)
+            if parent >= 0:
+                children[parent][side] = node
+
+            extent = upper - lower
+            if end - start <= self.leaf_size or extent.max() == 0:
+                continue
+
+            dimension = int(extent.argmax())
+            middle = (end - start) // 2
+            partition = numpy.argpartition(points[:, dimension], middle)
+            self.order[start:end] = indices[partition]
+            split_dimensions[node] = dimension
+            split_values[node] = points[partition[middle], dimension]
+            stack.append((start + middle, end, node, 1))
+            stack.append((start, start + middle, node, 0))
+
+        self.lowers = numpy.asarray(lowers).reshape(-1, dimensions)
+        self.uppers = numpy.asarray(uppers).reshape(-1, dimensions)
+        self.ranges = numpy.asarray(ranges, dtype="int64").reshape(-1, 2)
+        self.children = numpy.asarray(children, dtype="int64").reshape(-1, 2)
+        self.split_dimensions = numpy.asarray(split_dimensions, dtype="int64")
+        self.split_values = numpy.asarray(split_values, dtype="float64")
+
+    def _minimum_distance_squared(self, node, points):
+        delta = numpy.maximum(self.lowers[node] - points, 0) + numpy.maximum(
+            points - self.uppers[node], 0
+        )
+        return (delta * delta).sum(axis=1)
+
+    def _maximum_distance_squared(self, node, points):
+        delta = numpy.maximum(
+            numpy.abs(points - self.lowers[node]), numpy.abs(points - self.uppers[node])
+        )
+        return (delta * delta).sum(axis=1)
+
+    def _sources(self, node):
+        start, end = self.ranges[node]
+        return self.order[start:end]
+
+    def _push_children(self, stack, node, points, targets):
+        # the child on the side of the point is visited first, this
+        # tightens the search radius of the k nearest neighbour query early
+        left, right = self.children[node]
+        is_left = (
+            points[targets, self.split_dimensions[node]] < self.split_values[node]
+        )
+        near_left = targets[is_left]
+        near_right = targets[~is_left]
+        stack.append((right, near_left))
+        stack.append((left, near_right))
+        stack.append((right, near_right))
+        stack.append((left, near_left))
+
+    def _uniform_labels(self, labels):
+        # label of every node, or -1 if the sources of the node have different labels
+        ordered_labels = numpy.append(labels[self.order], 0)
+        boundaries = self.ranges.reshape(-1)
+        lowest = numpy.minimum.reduceat(ordered_labels, boundaries)[::2]
+        highest = numpy.maximum.reduceat(ordered_labels, boundaries)[::2]
+        return numpy.where(lowest == highest, lowest, -1)
+
+    def query(self, points, k=1, point_indices=None, point_labels=None, labels=None):
+        """
+        Finds the k nearest neighbours of every point. Neighbours at the
+        same distance are ordered by index.
+
+        If point_indices is given, the points are sources of this tree
+        (point i is source point_indices[i]) and a point is not its own
+        neighbour.
+
+        If point_labels and labels (non negative integers, one for every
+        point and one for every source) are given, only sources with a
+        label different from the label of the point are neighbours.
+
+        :returns: tuple of distances squared (n, k) and indices (n, k) of
+            the neighbours, sorted on distance. If there are fewer than k
+            candidates the remaining distances are inf and indices -1.
+        """
+        points = numpy.asarray(points, dtype="float64").reshape(
+            -1, self.positions.shape[1]
+        )
+        n = len(points)
+        best_distances = numpy.full((n, k), numpy.inf)
+        best_indices = numpy.full((n, k), -1, dtype="int64")
+        if n == 0 or len(self) == 0:
+            return best_distances, best_indices
+        exclude_self = point_indices is not None
+        if exclude_self:
+            point_indices = numpy.asarray(point_indices)
+        exclude_labels = labels is not None
+        if exclude_labels:
+            labels = numpy.asarray(labels)
+            point_labels = numpy.asarray(point_labels)
+            node_labels = self._uniform_labels(labels)
+
+        stack = [(0, numpy.arange(n))]
+        while stack:
+            node, targets = stack.pop()
+            if len(targets) == 0:
+                continue
+            minimum_distance = self._minimum_distance_squared(node, points[targets])
+            is_candidate = minimum_distance <= best_distances[targets, -1]
+            if exclude_labels:
+                is_candidate &= point_labels[targets] != node_labels[node]
+            targets = targets[is_candidate]
+            if len(targets) == 0:
+                continue
+
+            if self.children[node, 0] >= 0:
+                self._push_children(stack, node, points, targets)
+                continue
+
+            sources = self._sources(node)
+            dr = points[targets, numpy.newaxis, :] - self.positions[sources]
+            distances = (dr * dr).sum(axis=2)
+            if exclude_self:
+                distances[point_indices[targets, numpy.newaxis] == sources] = numpy.inf
+            if exclude_labels:
+                distances[
+                    point_labels[targets, numpy.newaxis] == labels[sources]
+                ] = numpy.inf
+            all_distances = numpy.concatenate((best_distances[targets], distances), axis=1)
+            all_indices = numpy.concatenate(
+                (
+                    best_indices[targets],
+                    numpy.broadcast_to(sources, distances.shape),
+                ),
+                axis=1,
+            )
+            all_indices = numpy.where(numpy.isinf(all_distances), -1, all_indices)
+            selection = numpy.lexsort(
+                (numpy.where(all_indices < 0, len(self), all_indices), all_distances),
+                axis=1,
+            )[:, :k]
+            best_distances[targets] = numpy.take_along_axis(all_distances, selection, 1)
+            best_indices[targets] = numpy.take_along_axis(all_indices, selection, 1)
+        return best_distances, best_indices
+
+    def query_pairs(self, radius):
+        """
+        Finds all pairs of sources at a distance smaller than radius.
+
+        :returns: (p, 2) array of the indices (i, j) of the pairs, with i < j
+        """
+        radius_squared = radius * radius
+        points = self.positions
+        result = []
+        stack = [(0, numpy.arange(len(self)))]
+        while stack and len(self) > 0:
+            node, targets = stack.pop()
+            if len(targets) == 0:
+                continue
+            minimum_distance = self._minimum_distance_squared(node, points[targets])
+            targets = targets[minimum_distance < radius_squared]
+            if len(targets) == 0:
+                continue
+
+            if self.children[node, 0] >= 0:
+                for child in self.children[node]:
+                    stack.append((child, targets))
+                continue
+
+            sources = self._sources(node)
+            dr = points[targets, numpy.newaxis, :] - points[sources]
+            distances = (dr * dr).sum(axis=2)
+            is_pair = (distances < radius_squared) & (
+                targets[:, numpy.newaxis] < sources
+            )
+            i, j = numpy.nonzero(is_pair)
+            result.append(numpy.column_stack((targets[i], sources[j])))
+        if not result:
+            return numpy.zeros((0, 2), dtype="int64")
+        return numpy.concatenate(result)
+
+    def count_pairs(self, radius):
+        """
+        Counts the number of ordered pairs (i, j), i != j, of sources at a
+        distance smaller than radius (every pair is counted twice).
+        """
+        radius_squared = radius * radius
+        if len(self) == 0 or not radius_squared > 0:
+            return 0
+        points = self.positions
+        result = 0
+        stack = [(0, numpy.arange(len(self)))]
+        while stack:
+            node, targets = stack.pop()
+            if len(targets) == 0:
+                continue
+            target_points = points[targets]
+            minimum_distance = self._minimum_distance_squared(node, target_points)
+            is_near = minimum_distance < radius_squared
+            targets = targets[is_near]
+            if len(targets) == 0:
+                continue
+            maximum_distance = self._maximum_distance_squared(node, target_points[is_near])
+            is_inside = maximum_distance < radius_squared
+            start, end = self.ranges[node]
+            result += int(is_inside.sum()) * int(end - start)
+            targets = targets[~is_inside]
+            if len(targets) == 0:
+                continue
+
+            if self.children[node, 0] >= 0:
+                for child in self.children[node]:
+                    stack.append((child, targets))
+                continue
+
+            sources = self._sources(node)
+            dr = points[targets, numpy.newaxis, :] - points[sources]
+            distances = (dr * dr).sum(axis=2)
+            result += int((distances < radius_squared).sum())
+        # every source is at distance 0 of itself
+        return result - len(self)
+
+    def minimum_spanning_tree(self):
+        """
+        Calculates the Euclidean minimum spanning tree of the sources.
+
+        :returns: tuple of the distances (n - 1,) and the indices (n - 1,)
+            and (n - 1,) of the two sources of every edge, sorted on distance
+        """
+        n = len(self)
+        first = numpy.zeros(0, dtype="int64")
+        second = numpy.zeros(0, dtype="int64")
+        distances = numpy.zeros(0)
+        labels = numpy.arange(n)
+        while len(first) < n - 1:
+            # Boruvka: the shortest edge leaving each component is in the tree,
+            # edges of equal length are ordered on (smallest, largest) index
+            # so that no cycles are formed
+            distances_squared, neighbours = self.query(
+                self.positions, 1, point_labels=labels, labels=labels
+            )
+            distances_squared = distances_squared[:, 0]
+            neighbours = neighbours[:, 0]
+            sources = numpy.arange(n)
+            smallest = numpy.minimum(sources, neighbours)
+            largest = numpy.maximum(sources, neighbours)
+            order = numpy.lexsort((largest, smallest, distances_squared, labels))
+            is_first_of_component = numpy.concatenate(
+                ([True], labels[order][1:] != labels[order][:-1])
+            )
+            selection = order[is_first_of_component]
+            selection = selection[neighbours[selection] >= 0]
+            if len(selection) == 0:
+                raise ValueError("the points cannot be connected, positions must be finite")
+            edges = numpy.unique(
+                numpy.column_stack((smallest[selection], largest[selection])), axis=0
+            )
+            first = numpy.concatenate((first, edges[:, 0]))
+            second = numpy.concatenate((second, edges[:, 1]))
+            labels = ConnectedComponentLabels(n, first, second)
+
+        dr = self.positions[first] - self.positions[second]
+        distances = numpy.sqrt((dr * dr).sum(axis=1))
+        order = numpy.argsort(distances, kind="stable")
+        return distances[order], first[order], second[order]
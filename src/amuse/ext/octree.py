@@ -0,0 +1,389 @@
+"""
+Unit-less gravitational field kernels.
+
+All functions and classes in this module work on plain numpy arrays,
+units are expected to be stripped by the caller (once, at entry) and
+re-attached to the result. The gravitational constant is not included,
+the potential returned is -sum(m / r) and the acceleration is
+-sum(m * dr / r**3), with dr the vector pointing from the source to
+the target point.
+
+Two engines are provided:
+
+- blocked direct summation (direct_field), exact, O(N_target x N_source),
+  with the work split in blocks of target points to bound memory use.
+- a Barnes-Hut octree (Octree), approximate, O(N_target log N_source),
+  the accuracy is set with the opening angle.
+
+The total potential energy of a set of sources, -sum_{i<j}(m_i m_j / r_ij),
+is calculated exactly with direct_potential_energy or approximately with
+Octree.potential_energy.
+"""
+
+import numpy
+
+DEFAULT_MAXIMUM_NUMBER_OF_ELEMENTS = 100000 * 100  # 100m floats
+
+
+def block_size_for(number_of_sources, block_size=0):
+    """
+    Returns the number of target points to process at once, so that
+    a block of pairwise distances does not exceed
+    DEFAULT_MAXIMUM_NUMBER_OF_ELEMENTS floats (if block_size is 0).
+    """
+    if block_size > 0:
+        return block_size
+    return max(DEFAULT_MAXIMUM_NUMBER_OF_ELEMENTS // max(number_of_sources, 1), 1)
+
+
+def _as_per_element(value, length):
+    return numpy.broadcast_to(numpy.asarray(value, dtype="float64"), (length,))
+
+
+def direct_field(
+    points,
+    positions,
+    masses,
+    eps2=0.0,
+    point_eps2=0.0,
+    block_size=0,
+    calculate_potential=True,
+    calculate_acceleration=True,
+    point_indices=None,
+    source_indices=None,
+):
+    """
+    Calculates the potential and acceleration at the points, by direct
+    summation over all sources.
+
+    :argument points: (n, 3) array of target positions
+    :argument positions: (m, 3) array of source positions
+    :argument masses: (m,) array of source masses
+    :argument eps2: softening length squared, shared or per source
+    :argument point_eps2: extra softening length squared, shared or per point
+    :argument block_size: number of points per block, 0 to determine
+        from the number of sources
+    :argument point_indices: (n,) array of source indices of the points,
+        pairs of a point and a source with the same index are skipped
+        (used to exclude self interaction), requires source_indices
+    :argument source_indices: (m,) array of indices of the sources
+
+    :returns: tuple of potential (n,) and acceleration (n, 3), either can
+        be None if not requested
+    """
+    points = numpy.asarray(points, dtype="float64").reshape(-1, 3)
+    positions = numpy.asarray(positions, dtype="float64").reshape(-1, 3)
+    masses = numpy.asarray(masses, dtype="float64")
+    n = len(points)
+    eps2 = _as_per_element(eps2, len(positions))
+    point_eps2 = _as_per_element(point_eps2, n)
+    block_size = block_size_for(len(positions), block_size)
+
+    potential = numpy.zeros(n) if calculate_potential else None
+    acceleration = numpy.zeros((n, 3)) if calculate_acceleration else None
+
+    for offset in range(0, n, block_size):
+        block = slice(offset, offset + block_size)
+        dr = points[block, numpy.newaxis, :] - positions[numpy.newaxis, :, :]
+        dr_squared = (dr * dr).sum(axis=2)
+        dr_squared += eps2
+        dr_squared += point_eps2[block, numpy.newaxis]
+        if point_indices is not None:
+            is_same = point_indices[block, numpy.newaxis] == source_indices
+            dr_squared[is_same] = numpy.inf
+        inverse_dr = 1.0 / numpy.sqrt(dr_squared)
+        m_inverse_dr = masses * inverse_dr
+        if calculate_potential:
+            potential[block] = -m_inverse_dr.sum(axis=1)
+        if calculate_acceleration:
+            m_inverse_dr3 = m_inverse_dr * inverse_dr * inverse_dr
+            acceleration[block] = -numpy.einsum("ij,ijk->ik", m_inverse_dr3, dr)
+    return potential, acceleration
+
+
+def direct_potential_energy(positions, masses, eps2=0.0, block_size=0):
+    """
+    Calculates the total potential energy, -sum_{i<j}(m_i m_j / r_ij), by
+    direct summation over all pairs. Every pair is visited once, the
+    pairs are processed in blocks of rows of the upper triangle.
+
+    :argument positions: (m, 3) array of source positions
+    :argument masses: (m,) array of source masses
+    :argument eps2: softening length squared, added to every distance**2
+    :argument block_size: number of sources per block, 0 to determine
+        from the number of sources
+    """
+    positions = numpy.asarray(positions, dtype="float64").reshape(-1, 3)
+    masses = numpy.asarray(masses, dtype="float64")
+    n = len(positions)
+    block_size = block_size_for(n, block_size)
+
+    result = 0.0
+    for offset in range(0, n - 1, block_size):
+        end = min(offset + block_size, n - 1)
+        dr = (
+            positions[offset:end, numpy.newaxis, :]
+            - positions[numpy.newaxis, offset + 1 :, :]
+        )
+        dr_squared = (dr * dr).sum(axis=2)
+        dr_squared += eps2
+        # column j holds particle offset + 1 + j, only keep the pairs (i, k) with k > i
+        is_lower = (
+            numpy.arange(n - offset - 1)[numpy.newaxis, :]
+            < numpy.arange(end - offset)[:, numpy.newaxis]
+        )
+        dr_squared[is_lower] = numpy.inf
+        m_inverse_dr = masses[offset + 1 :] / numpy.sqrt(dr_squared)
+        result -= (masses[offset:end] * m_inverse_dr.sum(axis=1)).sum()
+    return result
+
+
+class Octree:
+    """
+    Barnes-Hut octree over a set of (unit-less) sources, every node stores
+    the total mass, center of mass and mass weighted softening of the
+    sources it contains. Sources are stored in tree order, so the sources
+    of a node are a contiguous range in ``order``.
+
+    :argument positions: (m, 3) array of source positions
+    :argument masses: (m,) array of source masses
+    :argument eps2: softening length squared, shared or per source
+    :argument leaf_size: maximum number of sources in a leaf node
+    """
+
+    MAXIMUM_DEPTH = 64
+
+    def __init__(self, positions, masses, eps2=0.0, leaf_size=16):
+        self.positions = numpy.asarray(positions, dtype="float64").reshape(-1, 3)
+        self.masses = numpy.asarray(masses, dtype="float64")
+        self.eps2 = numpy.array(_as_per_element(eps2, len(self.positions)))
+        self.leaf_size = max(int(leaf_size), 1)
+        self._build()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _build(self):
+        n = len(self.positions)
+        self.order = numpy.arange(n)
+        centers = []
+        half_widths = []
+        ranges = []
+        children = []
+
+        if n == 0:
+            lower = upper = numpy.zeros(3)
+        else:
+            lower = self.positions.min(axis=0)
+            upper = self.positions.max(axis=0)
+        center = 0.5 * (lower + upper)
+        half_width = 0.5 * (upper - lower).max()
+        half_width = half_width * (1 + 1e-10) + 1e-300
+
+        stack = [(center, half_width, 0, n, 0, -1)]
+        while stack:
+            center, half_width, start, end, depth, parent = stack.pop()
+            node = len(centers)
+            centers.append(center)
+            half_widths.append(half_width)
+            ranges.append((start, end))
+            children.append([])
+            if parent >= 0:
+                children[parent].append(node)
+
+            if end - start <= self.leaf_size or depth >= self.MAXIMUM_DEPTH:
+                continue
+
+            indices = self.order[start:end]
+            delta = self.positions[indices] >= center
+            octants = delta[:, 0] * 1 + delta[:, 1] * 2 + delta[:, 2] * 4
+            sorted_indices = numpy.argsort(octants, kind="stable")
+            self.order[start:end] = indices[sorted_indices]
+            counts = numpy.bincount(octants, minlength=8)
+            offsets = start + numpy.concatenate(([0], numpy.cumsum(counts)))
+            child_half_width = 0.5 * half_width
+            for octant in range(8):
+                if counts[octant] == 0:
+                    continue
+                offset = numpy.array(
+                    [(octant >> 0) & 1, (octant >> 1) & 1, (octant >> 2) & 1]
+                )
+                child_center = center + (2 * offset - 1) * child_half_width
+                stack.append(
+                    (
+                        child_center,
+                        child_half_width,
+                        offsets[octant],
+                        offsets[octant + 1],
+                        depth + 1,
+                        node,
+                    )
+                )
+
+        self.centers = numpy.asarray(centers)
+        self.half_widths = numpy.asarray(half_widths)
+        self.ranges = numpy.asarray(ranges, dtype="int64").reshape(-1, 2)
+        self.children = children
+        self._calculate_moments()
+
+    def _calculate_moments(self):
+        ordered_masses = self.masses[self.order]
+        ordered_positions = self.positions[self.order]
+        ordered_eps2 = self.eps2[self.order]
+        cumulative_mass = numpy.concatenate(([0.0], numpy.cumsum(ordered_masses)))
+        cumulative_moment = numpy.concatenate(
+            (
+                numpy.zeros((1, 3)),
+                numpy.cumsum(ordered_masses[:, numpy.newaxis] * ordered_positions, axis=0),
+            )
+        )
+        cumulative_position = numpy.concatenate(
+            (numpy.zeros((1, 3)), numpy.cumsum(ordered_positions, axis=0))
+        )
+        cumulative_eps2 = numpy.concatenate(
+            ([0.0], numpy.cumsum(ordered_masses * ordered_eps2))
+        )
+        cumulative_plain_eps2 = numpy.concatenate(([0.0], numpy.cumsum(ordered_eps2)))
+
+        start = self.ranges[:, 0]
+        end = self.ranges[:, 1]
+        count = numpy.maximum(end - start, 1)
+        self.node_masses = cumulative_mass[end] - cumulative_mass[start]
+        has_mass = self.node_masses != 0
+        safe_masses = numpy.where(has_mass, self.node_masses, 1.0)
+        self.centers_of_mass = numpy.where(
+            has_mass[:, numpy.newaxis],
+            (cumulative_moment[end] - cumulative_moment[start])
+            / safe_masses[:, numpy.newaxis],
+            (cumulative_position[end] - cumulative_position[start])
+            / count[:, numpy.newaxis],
+        )
+        self.node_eps2 = numpy.where(
+            has_mass,
+            (cumulative_eps2[end] - cumulative_eps2[start]) / safe_masses,
+            (cumulative_plain_eps2[end] - cumulative_plain_eps2[start]) / count,
+        )
+        offset_of_center_of_mass = numpy.sqrt(
+            ((self.centers_of_mass - self.centers) ** 2).sum(axis=1)
+        )
+        self._node_sizes = 2 * self.half_widths
+        self._offsets_of_center_of_mass = offset_of_center_of_mass
+
+    def field(
+        self,
+        points,
+        opening_angle=0.5,
+        point_eps2=0.0,
+        calculate_potential=True,
+        calculate_acceleration=True,
+        point_indices=None,
+    ):
+        """
+        Calculates the potential and acceleration at the points. A node is
+        accepted as a single point mass (at its center of mass) if the
+        distance to the point is larger than
+        size / opening_angle + |center_of_mass - center|,
+        otherwise the node is opened. Sources in leaf nodes that are not
+        accepted are summed directly.
+
+        If point_indices is given, the points are sources of this tree
+        (point i is source point_indices[i]) and the interaction of a point
+        with itself is excluded.
+
+        :returns: tuple of potential (n,) and acceleration (n, 3), either can
+            be None if not requested
+        """
+        points = numpy.asarray(points, dtype="float64").reshape(-1, 3)
+        n = len(points)
+        point_eps2 = numpy.array(_as_per_element(point_eps2, n))
+        potential = numpy.zeros(n) if calculate_potential else None
+        acceleration = numpy.zeros((n, 3)) if calculate_acceleration else None
+        if n == 0 or len(self) == 0:
+            return potential, acceleration
+        exclude_self = point_indices is not None
+        if exclude_self:
+            point_indices = numpy.asarray(point_indices)
+
+        if opening_angle > 0:
+            critical_distances = (
+                self._node_sizes / opening_angle + self._offsets_of_center_of_mass
+            )
+        else:
+            critical_distances = numpy.full(len(self.centers), numpy.inf)
+
+        stack = [(0, numpy.arange(n))]
+        while stack:
+            node, targets = stack.pop()
+            dr = points[targets] - self.centers_of_mass[node]
+            dr_squared = (dr * dr).sum(axis=1)
+            is_leaf = len(self.children[node]) == 0
+            if is_leaf:
+                accepted = numpy.zeros(len(targets), dtype=bool)
+            else:
+                accepted = dr_squared > critical_distances[node] ** 2
+                if exclude_self:
+                    # a node containing the point is always opened, so the
+                    # point itself is never part of an accepted node
+                    accepted &= ~self._contains(node, points[targets])
+
+            if accepted.any():
+                selection = targets[accepted]
+                r_squared = (
+                    dr_squared[accepted] + self.node_eps2[node] + point_eps2[selection]
+                )
+                inverse_dr = 1.0 / numpy.sqrt(r_squared)
+                m_inverse_dr = self.node_masses[node] * inverse_dr
+                if calculate_potential:
+                    potential[selection] -= m_inverse_dr
+                if calculate_acceleration:
+                    acceleration[selection] -= (
+                        m_inverse_dr * inverse_dr * inverse_dr
+                    )[:, numpy.newaxis] * dr[accepted]
+
+            remaining = targets[~accepted]
+            if len(remaining) == 0:
+                continue
+            if is_leaf:
+                start, end = self.ranges[node]
+                sources = self.order[start:end]
+                leaf_potential, leaf_acceleration = direct_field(
+                    points[remaining],
+                    self.positions[sources],
+                    self.masses[sources],
+                    self.eps2[sources],
+                    point_eps2[remaining],
+                    calculate_potential=calculate_potential,
+                    calculate_acceleration=calculate_acceleration,
+                    point_indices=(
+                        point_indices[remaining] if exclude_self else None
+                    ),
+                    source_indices=sources,
+                )
+                if calculate_potential:
+                    potential[remaining] += leaf_potential
+                if calculate_acceleration:
+                    acceleration[remaining] += leaf_acceleration
+            else:
+                for child in self.children[node]:
+                    stack.append((child, remaining))
+        return potential, acceleration
+
+    def _contains(self, node, points):
+        return (
+            numpy.abs(points - self.centers[node]) <= self.half_widths[node]
+        ).all(axis=1)
+
+    def potential_energy(self, opening_angle=0.5):
+        """
+        Calculates the (approximate) total potential energy of the sources,
+        as half the sum of the mass times the potential at every source,
+        excluding the self interaction. With an opening angle of 0 the result
+        is exact.
+        """
+        potential, _ = self.field(
+            self.positions,
+            opening_angle,
+            calculate_acceleration=False,
+            point_indices=numpy.arange(len(self)),
+        )
+        return 0.5 * (self.masses * potential).sum()
@@ -28,6 +28,7 @@ class MakeKingModel:
         beta=0.0,
         verbose=False,
         center_model=True,
+        random=None,
         **kwargs
     ):
         self.kwargs = kwargs
@@ -40,6 +41,10 @@ class MakeKingModel:
         self.W0 = W0
         self.beta_w0 = beta * W0
         self.scale_fac = math.exp(self.beta_w0)
+        if random is None:
+            self.random = numpy.random
+        else:
+            self.random = random
 
         self.YMAX = 4.0  # Note: make sure YMAX is a float.
         self.NG = 1000
@@ -344,7 +349,7 @@ class MakeKingModel:
         # // and return the scaled potential at that location.
 
         #  //  Choose radius randomly from the mass distribution.
-        rno = numpy.random.uniform()
+        rno = self.random.uniform()
         i = int(self.NINDX * rno)
         found_index = False
         for i1 in range(
@@ -360,8 +365,8 @@ class MakeKingModel:
         potential = self.psi[i1 - 1] + rfac * (self.psi[i1] - self.psi[i1 - 1])
 
         #  //  Angular position random.
-        theta = numpy.arccos(numpy.random.uniform(-1.0, 1.0))
-        phi = numpy.random.uniform(0.0, 2.0 * math.pi)
+        theta = numpy.arccos(self.random.uniform(-1.0, 1.0))
+        phi = self.random.uniform(0.0, 2.0 * math.pi)
         return self.coordinates_from_spherical(radius, theta, phi), potential
 
     def setvel(self, potential):
@@ -393,7 +398,9 @@ class MakeKingModel:
                 iu = self.NG
             rl = 0
             ru = pfac * self.g_integral[iu] - self.v33[iu]
-            rno = numpy.random.uniform(0.0, ru)
+            # ru can be negative for beta > 0, uniform(0.0, ru) is
+            # not allowed by numpy.random.Generator
+            rno = ru * self.random.uniform()
             while iu - il > 1:
                 im = (il + iu) // 2
                 rm = pfac * self.g_integral[im] - self.v33[im]
@@ -409,10 +416,80 @@ class MakeKingModel:
             # 	//      escape speed, sqrt(-2*p).
             v = (self.YMAX / self.NG) * math.sqrt(2.0) * (il + (rno - rl) / (ru - rl))
         #    //  Direction is random.
-        theta = numpy.arccos(numpy.random.uniform(-1.0, 1.0))
-        phi = numpy.random.uniform(0.0, 2.0 * math.pi)
+        theta = numpy.arccos(self.random.uniform(-1.0, 1.0))
+        phi = self.random.uniform(0.0, 2.0 * math.pi)
         return self.coordinates_from_spherical(v, theta, phi)
 
+    def sample_positions(self, rno, theta_deviates, phi_deviates):
+        # // Vectorized version of setpos, for arrays of uniform deviates in
+        # // [0, 1). Returns the positions and the scaled potentials.
+        zm = numpy.asarray(self.zm)
+        rr = numpy.asarray(self.rr)
+        psi = numpy.asarray(self.psi)
+        #  //  Choose radius by inverse interpolation of the mass distribution.
+        i1 = numpy.searchsorted(zm, rno, side="right")
+        if numpy.any(i1 >= len(zm)):
+            raise exceptions.AmuseException("makeking: error in getpos")
+        rfac = (rno - zm[i1 - 1]) / (zm[i1] - zm[i1 - 1])
+        radius = rr[i1 - 1] + rfac * (rr[i1] - rr[i1 - 1])
+        potential = psi[i1 - 1] + rfac * (psi[i1] - psi[i1 - 1])
+        theta = numpy.arccos(-1.0 + 2.0 * theta_deviates)
+        phi = 2.0 * math.pi * phi_deviates
+        return self.coordinates_from_spherical(radius, theta, phi), potential
+
+    def sample_speeds(self, potential, deviates):
+        # // Vectorized version of the speed selection in setvel, for an
+        # // array of bound potentials (< -beta*W0) and uniform deviates.
+        # // Performs the same bisection as setvel for all particles at once.
+        g_integral = numpy.asarray(self.g_integral)
+        v33 = numpy.asarray(self.v33)
+        pfac = numpy.exp(-potential)
+        il = numpy.zeros(len(potential), dtype=int)
+        iu = numpy.minimum(
+            ((self.NG / self.YMAX) * numpy.sqrt(-potential)).astype(int), self.NG
+        )
+        rno = (pfac * g_integral[iu] - v33[iu]) * deviates
+        active = iu - il > 1
+        while active.any():
+            im = (il + iu) // 2
+            rm = pfac * g_integral[im] - v33[im]
+            above = rm > rno
+            iu = numpy.where(active & above, im, iu)
+            il = numpy.where(active & ~above, im, il)
+            active = iu - il > 1
+        rl = pfac * g_integral[il] - v33[il]
+        ru = pfac * g_integral[iu] - v33[iu]
+        return (self.YMAX / self.NG) * math.sqrt(2.0) * (il + (rno - rl) / (ru - rl))
+
+    def sample_phase_space(self):
+        # // Assign positions and velocities to all particles at once.
+        # // The uniform deviates are drawn in one block and consumed in the
+        # // same order as the per-particle setpos/setvel calls would (6 per
+        # // particle, 5 for an unbound particle that gets no speed), so a
+        # // seeded model is the same as one generated particle by particle.
+        n = self.number_of_particles
+        deviates = self.random.uniform(size=6 * n)
+        full_stride = 6 * numpy.arange(n)
+        start = full_stride
+        while True:
+            rno = deviates[start]
+            position, potential = self.sample_positions(
+                rno, deviates[start + 1], deviates[start + 2]
+            )
+            unbound = potential >= -self.beta_w0
+            skipped = numpy.cumsum(unbound) - unbound
+            if numpy.array_equal(full_stride - skipped, start):
+                break
+            start = full_stride - skipped
+        bound = ~unbound
+        speed = numpy.zeros(n)
+        speed[bound] = self.sample_speeds(potential[bound], deviates[start[bound] + 3])
+        offset = start + 3 + bound
+        theta = numpy.arccos(-1.0 + 2.0 * deviates[offset])
+        phi = 2.0 * math.pi * deviates[offset + 1]
+        velocity = self.coordinates_from_spherical(speed, theta, phi)
+        return numpy.transpose(position), numpy.transpose(velocity)
+
     def makeking(self):
         # // Create a King model, and optionally initialize an N-body system
         # // with total mass = n, core radius = 1.
@@ -498,23 +575,17 @@ class MakeKingModel:
         masses = numpy.zeros(self.number_of_particles) + (
             1.0 / self.number_of_particles
         )
-        positions = []
-        velocities = []
         #    // Convenient to have the "unscaled" system
         #    // be as close to standard units as possible, so rescale position
         #    // and velocity with 'xfac' and 'vfac' to force
         #    // the virial radius to 1.  (Steve, 9/04)
         xfac = 1.0 / rvirial
         vfac = 1.0 / math.sqrt(xfac)
-        for i in range(self.number_of_particles):
-            (position, potential) = self.setpos()
-            velocity = self.setvel(potential)
-            # 	// Unit of length = rc.
-            # 	// Unit of velocity = sig.
-            position[:] = [xfac * comp for comp in position]
-            velocity[:] = [vfac * comp * sig for comp in velocity]
-            positions.append(position)
-            velocities.append(velocity)
+        positions, velocities = self.sample_phase_space()
+        # 	// Unit of length = rc.
+        # 	// Unit of velocity = sig.
+        positions = xfac * positions
+        velocities = vfac * velocities * sig
         #    // System is in virial equilibrium in a consistent set of units
         #    // with G, core radius, and total mass = 1.
 
@@ -558,6 +629,8 @@ def new_king_model(number_of_particles, W0, *list_arguments, **keyword_arguments
         rescaled King models; models with b < 0 approach isothermal spheres as
         b --> -infinity.
     :argument verbose: Be verbose (output is suppressed by default) [False]
+    :argument random: random number generator with a ``uniform`` method, such as
+        a seeded ``numpy.random.Generator`` [numpy.random]
     """
     uc = MakeKingModel(number_of_particles, W0, *list_arguments, **keyword_arguments)
     return uc.result
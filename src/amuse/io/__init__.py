@@ -11,6 +11,7 @@ from amuse.io.nemotsf import NemoFileFormatProcessor
 from amuse.io.nemobin import NemoBinaryFileFormatProcessor
 from amuse.io.starlab import StarlabFileFormatProcessor
 from amuse.io.store import HDF5FileFormatProcessor
+from amuse.io.store import read_history
 from amuse.io.gadget import GadgetFileFormatProcessor
 from amuse.io.vtk import VtkStructuredGrid
 from amuse.io.vtk import VtkUnstructuredGrid
@@ -27,4 +28,11 @@ GadgetFileFormatProcessor.register()
 VtkStructuredGrid.register()
 VtkUnstructuredGrid.register()
 
-__all__ = ["read_set_from_file", "write_set_to_file", "get_options_for_format"]
+__all__ = [
+    "read_set_from_file",
+    "iter_set_from_file",
+    "write_set_to_file",
+    "get_options_for_format",
+    "read_history",
+    "AsyncSnapshotWriter",
+]
@@ -2,6 +2,8 @@ import textwrap
 import struct
 import numpy
 import os.path
+import queue
+import threading
 
 from amuse.support.core import late
 from amuse.support import exceptions
@@ -100,6 +102,168 @@ def read_set_from_file(filename, format="amuse", **format_specific_keyword_argum
     return processor.load()
 
 
+def iter_set_from_file(
+    filename,
+    format="amuse",
+    chunk_size=100000,
+    attributes=None,
+    read_ahead=True,
+    **format_specific_keyword_arguments
+):
+    """
+    Read a set from the given file in the given format, in parts.
+    Returns an iterator over new sets of at most chunk_size particles,
+    formats that support it ('amuse', 'hdf5', 'txt', 'csv', 'amuse-txt',
+    'gadget' and 'dyn') read only one part of the file at a time, so
+    files larger than the available memory can be processed ('gadget'
+    reads one file of a snapshot at a time, set use_memory_map to
+    read only the parts of the file that are used).
+
+    :argument filename: name of the file to read the data from
+    :argument format: name of a registered format or
+        a :class:`FileFormatProcessor` subclass (must be a
+        class and not an instance)
+    :argument chunk_size: maximum number of particles in a set
+    :argument attributes: names of the attributes to read, by default
+        all attributes
+    :argument read_ahead: if True, the next set is read on a background
+        thread while the current set is processed
+
+    All other keywords are set as attributes on the fileformat processor. To
+    determine the supported options for a processor call
+    :func:`get_options_for_format`
+
+    Call close() on the returned iterator if not all sets are read, this
+    closes the file.
+
+    Example usage::
+
+        total_mass = zero
+        for particles in iter_set_from_file("run.h5", chunk_size=10**6, attributes=["mass"]):
+            total_mass += particles.mass.sum()
+    """
+    if "stream" not in format_specific_keyword_arguments and not os.path.exists(
+        filename
+    ):
+        raise IoException("Error: file '{0}' does not exist.".format(filename))
+    if not chunk_size > 0:
+        raise IoException("chunk_size must be larger than 0, is {0}".format(chunk_size))
+
+    processor_factory = _get_processor_factory(format)
+
+    processor = processor_factory(filename, format=format)
+    processor.set_options(format_specific_keyword_arguments)
+    if not attributes is None:
+        attributes = list(attributes)
+    chunks = processor.iter_load(int(chunk_size), attributes)
+    if read_ahead:
+        return _ReadAheadIterator(chunks)
+    else:
+        return chunks
+
+
+def _names_of_attributes_in_store(set, attributes):
+    # vector attributes (position, velocity, ...) are stored per component
+    result = []
+    for name in attributes:
+        if name in set._derived_attributes and hasattr(
+            set._derived_attributes[name], "attribute_names"
+        ):
+            result.extend(set._derived_attributes[name].attribute_names)
+        else:
+            result.append(name)
+    return result
+
+
+def _chunks_of_set(set, chunk_size, attributes=None):
+    if attributes is None:
+        filter_attributes = lambda particle_set, x: True
+    else:
+        attributes = _names_of_attributes_in_store(set, attributes)
+        filter_attributes = lambda particle_set, x: x in attributes
+    for start in range(0, len(set), chunk_size):
+        yield set[start : start + chunk_size].copy(filter_attributes=filter_attributes)
+
+
+class _ReadAheadIterator(object):
+    """
+    Iterates over the items of a generator, the next item is
+    produced on a background thread while the current item is used.
+    The generator is closed when the iterator is exhausted, closed,
+    used as a context manager or garbage collected.
+    """
+
+    def __init__(self, generator):
+        self.items = queue.Queue(1)
+        self.is_closed = threading.Event()
+        # the thread must not refer to self, otherwise an abandoned
+        # iterator is never collected and its generator never closed
+        self.thread = threading.Thread(
+            target=_produce_items,
+            args=(generator, self.items, self.is_closed)
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.is_closed.is_set():
+            raise StopIteration
+        kind, value = self.items.get()
+        if kind == "item":
+            return value
+        self.close()
+        if kind == "exception":
+            raise value
+        raise StopIteration
+
+    def close(self):
+        """
+        Stop producing items and close the generator.
+        """
+        self.is_closed.set()
+        while self.thread.is_alive():
+            try:
+                self.items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        if hasattr(self, "thread"):
+            self.close()
+
+
+def _put_item(items, is_closed, item):
+    while not is_closed.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _produce_items(generator, items, is_closed):
+    try:
+        for item in generator:
+            if not _put_item(items, is_closed, ("item", item)):
+                return
+        _put_item(items, is_closed, ("end", None))
+    except BaseException as ex:
+        _put_item(items, is_closed, ("exception", ex))
+    finally:
+        generator.close()
+
+
 class ReportTable(object):
     """
     Report quantities and values to a file.
@@ -180,6 +344,133 @@ class ReportTable(object):
         self.processor.close_stream()
 
 
+class AsyncSnapshotWriter(object):
+    """
+    Write sets to files on a background thread, so that writing
+    a (large) snapshot overlaps with the next steps of a simulation.
+
+    :argument filename: name of the file to write the data to
+    :argument format: name of a registered format or
+        a :class:`FileFormatProcessor` subclass (must be a
+        class and not an instance)
+    :argument maximum_number_of_pending_writes: maximum number of
+        snapshots waiting to be written, :meth:`write` blocks until
+        a snapshot is written when this number is reached
+
+    All other keywords are used as options of every write, see
+    :func:`write_set_to_file`.
+
+    The set is copied into memory by :meth:`write` (on the calling
+    thread), so the set can be changed as soon as :meth:`write` returns.
+    An exception raised while writing is raised again by the next call
+    to :meth:`write`, :meth:`flush` or :meth:`close`, the snapshots
+    that are pending at that moment are not written.
+
+    Example usage::
+
+        with AsyncSnapshotWriter("run.h5", "amuse", append_to_file=True) as writer:
+            for time in times:
+                code.evolve_model(time)
+                channel.copy()
+                writer.write(particles, timestamp=time)
+
+    """
+
+    def __init__(
+        self,
+        filename,
+        format="amuse",
+        maximum_number_of_pending_writes=2,
+        **format_specific_keyword_arguments,
+    ):
+        self.filename = filename
+        self.format = format
+        self.options = format_specific_keyword_arguments
+        self.pending_writes = queue.Queue(maximum_number_of_pending_writes)
+        self.exception = None
+        self.is_closed = False
+        self.thread = threading.Thread(target=self._write_pending_snapshots)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write(self, set, filename=None, **format_specific_keyword_arguments):
+        """
+        Copy the set and add it to the snapshots to write.
+
+        :argument set: set, grid, or list or dictionary of sets and grids
+            (see the names option of the amuse format)
+        :argument filename: name of the file to write this snapshot to,
+            by default the filename of the writer
+
+        All other keywords are used as options of this write, in addition
+        to the options given to the writer.
+        """
+        if self.is_closed:
+            raise IoException("cannot write a snapshot, the writer is closed")
+        self._raise_exception_of_writer()
+        options = dict(self.options)
+        options.update(format_specific_keyword_arguments)
+        self.pending_writes.put(
+            (self._copy_of_set(set), filename or self.filename, options)
+        )
+
+    def flush(self):
+        """
+        Wait until all pending snapshots are written.
+        """
+        self.pending_writes.join()
+        self._raise_exception_of_writer()
+
+    def close(self):
+        """
+        Write all pending snapshots and stop the background thread.
+        """
+        if not self.is_closed:
+            self.is_closed = True
+            self.pending_writes.put(None)
+            self.thread.join()
+        self._raise_exception_of_writer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # do not hide the exception raised in the with block
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def _copy_of_set(self, set):
+        if isinstance(set, (list, tuple)):
+            return [self._copy_of_set(x) for x in set]
+        if hasattr(set, "keys") and not hasattr(set, "as_set"):
+            return dict((name, self._copy_of_set(x)) for name, x in set.items())
+        return set.copy()
+
+    def _raise_exception_of_writer(self):
+        if self.exception is not None:
+            exception, self.exception = self.exception, None
+            raise exception
+
+    def _write_pending_snapshots(self):
+        while True:
+            pending_write = self.pending_writes.get()
+            try:
+                if pending_write is None:
+                    return
+                if self.exception is None:
+                    set, filename, options = pending_write
+                    write_set_to_file(set, filename, self.format, **options)
+            except BaseException as ex:
+                self.exception = ex
+            finally:
+                self.pending_writes.task_done()
+
+
 def get_options_for_format(
     format="amuse",
 ):
@@ -304,6 +595,17 @@ class FileFormatProcessor(object):
         """
         raise CannotLoadException(self.format)
 
+    def iter_load(self, chunk_size, attributes=None):
+        """
+        Loads the set from the file and yields it in
+        new sets of at most chunk_size particles, with only the given
+        attributes (all attributes if None). This implementation loads
+        the complete set first, processors that can read a part of a
+        file override it.
+        """
+        for chunk in _chunks_of_set(self.load(), chunk_size, attributes):
+            yield chunk
+
     def store_string(self):
         raise CannotSaveException(self.format)
 
@@ -388,6 +690,37 @@ class BinaryFileFormatProcessor(FileFormatProcessor):
         """Return a particle set, read from the binary file"""
         raise CannotLoadException(self.format)
 
+    @format_option
+    def use_memory_map(self):
+        """
+        If True, the file is mapped in memory (numpy.memmap) instead of
+        read. The arrays loaded from the file are views on the mapped file,
+        parts of the file are only read from disk when their values
+        are used. Changes to these arrays are not written to the file.
+        """
+        return False
+
+    def memory_map_of(self, file):
+        """
+        Returns the file mapped in memory as an array of bytes, or None
+        if use_memory_map is not set or the file cannot be mapped.
+        The file is mapped once, on the first call.
+        """
+        if not self.use_memory_map:
+            return None
+        if not getattr(self, "_mapped_file", None) is file:
+            # numpy.memmap moves the file to its end, the file is
+            # also read normally so the position is restored
+            try:
+                position = file.tell()
+                memory_map = numpy.memmap(file, dtype="uint8", mode="c")
+                file.seek(position)
+            except (AttributeError, ValueError, OSError):
+                memory_map = None
+            self._mapped_file = file
+            self._memory_map = memory_map
+        return self._memory_map
+
 
 class FortranFileFormatProcessor(BinaryFileFormatProcessor):
     """
@@ -464,25 +797,50 @@ class FortranFileFormatProcessor(BinaryFileFormatProcessor):
             )
         return result
 
+    def read_fortran_block_array(self, file, dtype):
+        """Returns the values in the next block of the file as an array
+        of the given type. If the file is mapped in memory (see
+        use_memory_map) the array is a view on the mapped file, the block
+        itself is skipped.
+        """
+        memory_map = self.memory_map_of(file)
+        if memory_map is None:
+            bytes = self.read_fortran_block(file)
+            return numpy.frombuffer(bytes, dtype=dtype)
+
+        format = self.endianness + "I"
+        bytes = file.read(4)
+        if not bytes:
+            return None
+        length_of_block = struct.unpack(format, bytes)[0]
+        offset = file.tell()
+        file.seek(length_of_block, os.SEEK_CUR)
+        bytes = file.read(4)
+        if len(bytes) < 4:
+            raise IoException("Block is truncated, the file ends before the end of the block")
+        length_of_block_after = struct.unpack(format, bytes)[0]
+        if length_of_block_after != length_of_block:
+            raise IoException(
+                "Block is mangled sizes don't match before: {0}, after: {1}".format(
+                    length_of_block, length_of_block_after
+                )
+            )
+        return memory_map[offset : offset + length_of_block].view(dtype)
+
     def read_fortran_block_floats(self, file):
-        bytes = self.read_fortran_block(file)
-        return numpy.frombuffer(bytes, dtype=self.float_type)
+        return self.read_fortran_block_array(file, self.float_type)
 
     def read_fortran_block_doubles(self, file):
-        bytes = self.read_fortran_block(file)
-        return numpy.frombuffer(bytes, dtype=self.double_type)
+        return self.read_fortran_block_array(file, self.double_type)
 
     def read_fortran_block_uints(self, file):
-        bytes = self.read_fortran_block(file)
-        return numpy.frombuffer(bytes, dtype=self.uint_type)
+        return self.read_fortran_block_array(file, self.uint_type)
 
     def read_fortran_block_ulongs(self, file):
-        bytes = self.read_fortran_block(file)
-        return numpy.frombuffer(bytes, dtype=self.ulong_type)
+        return self.read_fortran_block_array(file, self.ulong_type)
 
     def read_fortran_block_ints(self, file):
-        bytes = self.read_fortran_block(file)
-        return numpy.frombuffer(bytes, dtype=self.int_type)
+        return self.read_fortran_block_array(file, self.int_type)
 
     def read_fortran_block_float_vectors(self, file, size=3):
         result = self.read_fortran_block_floats(file)
@@ -141,18 +141,28 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
     
     
     
-    @late
+    @base.format_option
+    def load_all_files_of_snapshot(self):
+        """If the header of the file gives more than one file
+        for the snapshot (NumFiles > 1) and the name of the file
+        ends with '.0', also load the particles in the other files of
+        the snapshot (with names ending in '.1', '.2', ...)
+        (default: False)"""
+        return False
+    
+    @property
     def total_number_of_particles(self):
         return sum(self.header_struct.Npart)
         
-    @late
+    @property
     def total_number_of_particles_with_variable_masses(self):
         result = 0
         for x, n in zip(self.header_struct.Massarr, self.header_struct.Npart):
             if x == 0.0:
                 result += n
         return result
-    @late
+    
+    @property
     def number_of_gas_particles(self):
         return self.header_struct.Npart[self.GAS]
         
@@ -177,11 +187,11 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
         self.positions = self.read_fortran_block_float_vectors(file)
         self.velocities = self.read_fortran_block_float_vectors(file)
         
-        id_bytes = self.read_fortran_block(file)
+        id_bytes = self.read_fortran_block_array(file, numpy.uint8)
         if len(id_bytes) == 4*self.total_number_of_particles:
-            self.ids = numpy.frombuffer(id_bytes, dtype=self.uint_type)
+            self.ids = id_bytes.view(self.uint_type)
         else:
-            self.ids = numpy.frombuffer(id_bytes, dtype=self.ulong_type)
+            self.ids = id_bytes.view(self.ulong_type)
         
         
         if self.total_number_of_particles_with_variable_masses > 0:
@@ -232,6 +242,24 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
             self.dt = None
     
 
+    def set_values_of_set(self, set, attribute, values):
+        """
+        Sets the values of the attribute for all particles in the set.
+        If the file is mapped in memory the values are not copied, the
+        set keeps the views on the mapped file.
+        """
+        storage = set._private.attribute_storage
+        if self.use_memory_map and hasattr(storage, 'add_attribute_to_store_by_reference'):
+            if attribute in set._derived_attributes:
+                # vector attributes are stored per component, as strided views
+                names = set._derived_attributes[attribute].attribute_names
+                for i, name in enumerate(names):
+                    storage.add_attribute_to_store_by_reference(name, values[..., i])
+            else:
+                storage.add_attribute_to_store_by_reference(attribute, values)
+        else:
+            setattr(set, attribute, values)
+    
     def new_sets_from_arrays(self):
         offset = 0
         ids_per_set = []
@@ -245,7 +273,7 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
             sets = [datamodel.Particles(len(x)) for x in ids_per_set]
             for set, x in zip(sets, ids_per_set):
                 if len(set) > 0:
-                    set.id = x
+                    self.set_values_of_set(set, 'id', x)
                 
         offset = 0
         for x in sets:
@@ -253,16 +281,16 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
             if length == 0:
                 continue
                 
-            x.position = nbody_system.length.new_quantity(self.positions[offset:offset+length])
-            x.velocity = nbody_system.speed.new_quantity(self.velocities[offset:offset+length])
+            self.set_values_of_set(x, 'position', nbody_system.length.new_quantity(self.positions[offset:offset+length]))
+            self.set_values_of_set(x, 'velocity', nbody_system.speed.new_quantity(self.velocities[offset:offset+length]))
             if self.convert_gadget_w_to_velocity:
                 x.velocity *= numpy.sqrt(1.0 + self.header_struct.Redshift)
             if not self.pot is None:
-                x.potential_energy = nbody_system.energy.new_quantity(self.pot[offset:offset+length])
+                self.set_values_of_set(x, 'potential_energy', nbody_system.energy.new_quantity(self.pot[offset:offset+length]))
             if not self.acc is None:
-                x.acceleration = nbody_system.acceleration.new_quantity(self.acc[offset:offset+length])
+                self.set_values_of_set(x, 'acceleration', nbody_system.acceleration.new_quantity(self.acc[offset:offset+length]))
             if not self.dt is None:
-                x.timestep = nbody_system.time.new_quantity(self.dt[offset:offset+length])
+                self.set_values_of_set(x, 'timestep', nbody_system.time.new_quantity(self.dt[offset:offset+length]))
             offset += length
         
         offset = 0
@@ -271,7 +299,7 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
             if length == 0:
                 continue
             if mass == 0.0:
-                x.mass = nbody_system.mass.new_quantity(self.masses[offset:offset+length])
+                self.set_values_of_set(x, 'mass', nbody_system.mass.new_quantity(self.masses[offset:offset+length]))
                 offset += length
             else:
                 x.mass = nbody_system.mass.new_quantity(mass)
@@ -279,17 +307,49 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
         if self.number_of_gas_particles > 0:
             gas_set = sets[self.GAS]
             unit = (nbody_system.length / nbody_system.time) ** 2
-            gas_set.u = unit.new_quantity(self.u)
+            self.set_values_of_set(gas_set, 'u', unit.new_quantity(self.u))
             unit = nbody_system.mass / nbody_system.length ** 3
             if not self.density is None:
-                gas_set.rho = unit.new_quantity(self.density)
+                self.set_values_of_set(gas_set, 'rho', unit.new_quantity(self.density))
             if not self.hsml is None:
-                gas_set.h_smooth = nbody_system.length.new_quantity(self.hsml)
+                self.set_values_of_set(gas_set, 'h_smooth', nbody_system.length.new_quantity(self.hsml))
             
         return sets
-        
-            
-        
+    
+    def filenames_of_other_files_of_snapshot(self):
+        if not self.load_all_files_of_snapshot or self.filename is None:
+            return []
+        if self.header_struct.NumFiles <= 1 or not self.filename.endswith('.0'):
+            return []
+        prefix = self.filename[:-1]
+        return [prefix + str(i) for i in range(1, self.header_struct.NumFiles)]
+        
+    def iter_load(self, chunk_size, attributes=None):
+        with open(self.filename, 'rb') as file:
+            self.load_header(file)
+            self.load_body(file)
+            other_filenames = self.filenames_of_other_files_of_snapshot()
+            for chunk in self.iter_sets_from_arrays(chunk_size, attributes):
+                yield chunk
+        for filename in other_filenames:
+            with open(filename, 'rb') as file:
+                self.load_header(file)
+                self.load_body(file)
+                for chunk in self.iter_sets_from_arrays(chunk_size, attributes):
+                    yield chunk
+    
+    def iter_sets_from_arrays(self, chunk_size, attributes):
+        """
+        Yields the particles loaded from one file in sets of at most
+        chunk_size particles, the name of the particle type of a set
+        (gas, halo, ...) is stored in its particle_type collection attribute
+        """
+        attribute_names = ["gas","halo","disk","bulge","stars","bndry"]
+        for name, particles in zip(attribute_names, self.new_sets_from_arrays()):
+            for chunk in base._chunks_of_set(particles, chunk_size, attributes):
+                chunk.collection_attributes.particle_type = name
+                yield chunk
+    
     def load_file(self, file):
         self.load_header(file)
         self.load_body(file)
@@ -297,6 +357,19 @@ class GadgetFileFormatProcessor(base.FortranFileFormatProcessor):
         attribute_names = ["gas","halo","disk","bulge","stars","bndry"]
         values = self.new_sets_from_arrays()
         
+        header_struct = self.header_struct
+        other_filenames = self.filenames_of_other_files_of_snapshot()
+        for filename in other_filenames:
+            with open(filename, 'rb') as other_file:
+                self.load_header(other_file)
+                self.load_body(other_file)
+                for x, y in zip(values, self.new_sets_from_arrays()):
+                    if len(y) > 0:
+                        x.add_particles(y)
+        if len(other_filenames) > 0:
+            header_struct = header_struct._replace(Npart=tuple(len(x) for x in values))
+            self.header_struct = header_struct
+        
         if self.return_header:
             attribute_names += [name for name, times, formatchar in self.header_struct_format]
             values += list(self.header_struct)
@@ -225,8 +225,9 @@ class YrotsItem(NemoItem):
 
 class NemoBinaryFile(object):
 
-    def __init__(self, file):
+    def __init__(self, file, memory_map=None):
         self.file = file
+        self.memory_map = memory_map
 
     SingMagic = ((0o11 << 8) + 0o222)
     PlurMagic = ((0o13 << 8) + 0o222)
@@ -267,8 +268,16 @@ class NemoBinaryFile(object):
         return self.read_array('b').tobytes().decode('latin_1')
 
     def read_fixed_array(self, datatype, count):
-        bytes = self.file.read(int(datatype.itemsize * count))
-        return numpy.frombuffer(bytes, dtype=datatype,)
+        nbytes = int(datatype.itemsize * count)
+        if self.memory_map is None:
+            bytes = self.file.read(nbytes)
+            return numpy.frombuffer(bytes, dtype=datatype,)
+
+        offset = self.file.tell()
+        if offset + nbytes > len(self.memory_map):
+            raise base.IoException("Item is truncated, the file ends before the end of the item")
+        self.file.seek(nbytes, 1)
+        return self.memory_map[offset:offset + nbytes].view(datatype)
 
     def get_item_header(self):
 
@@ -361,7 +370,7 @@ class NemoBinaryFileFormatProcessor(base.BinaryFileFormatProcessor):
     provided_formats = ['nemobin']
 
     def load_file(self, file):
-        nemofile = NemoBinaryFile(file)
+        nemofile = NemoBinaryFile(file, self.memory_map_of(file))
         structure = nemofile.read()
         result = None
         for snapshot in structure['SnapShot']:
@@ -387,6 +387,59 @@ class StarlabFileFormatProcessor(base.FullTextFileFormatProcessor):
             else:
                 return result[0]
         
+    def iter_load(self, chunk_size, attributes=None):
+        if not self.return_children:
+            for chunk in base.FullTextFileFormatProcessor.iter_load(self, chunk_size, attributes):
+                yield chunk
+            return
+        
+        with open(self.filename, "r") as f:
+            for string in self.iter_strings_of_children(f, chunk_size):
+                result = self.load_string(string)
+                if self.return_converter:
+                    result = result[0]
+                for chunk in base._chunks_of_set(result, chunk_size, attributes):
+                    yield chunk
+    
+    def iter_strings_of_children(self, lines, number_of_children):
+        """
+        Yields starlab strings of the root node with at most
+        number_of_children of its children. The sections of the root
+        node (Log, Dynamics, Star, Hydro) are repeated in every string,
+        so every string is scaled in the same way.
+        """
+        header = []
+        children = []
+        count = 0
+        depth = 0
+        in_child = False
+        for line in lines:
+            line = line.rstrip()
+            if line.startswith("("):
+                depth += 1
+                if depth == 2 and line.lstrip("(").strip() == "Particle":
+                    if count >= number_of_children:
+                        yield '\n'.join(header + children + [")Particle"])
+                        children = []
+                        count = 0
+                    in_child = True
+                    count += 1
+            elif line.startswith(")") and depth == 1:
+                break
+            
+            if in_child:
+                children.append(line)
+            elif depth >= 1:
+                header.append(line)
+            
+            if line.startswith(")"):
+                if depth == 2:
+                    in_child = False
+                depth -= 1
+        
+        if count > 0:
+            yield '\n'.join(header + children + [")Particle"])
+        
     def store_string(self):
         if not self.nbody_to_si_converter is None:
             particles = datamodel.ParticlesWithUnitsConverted(
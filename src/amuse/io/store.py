@@ -15,9 +15,64 @@ from amuse.datamodel import AttributeStorage
 
 from amuse.io import store_v1
 from amuse.io import store_v2
+from amuse.io import store_v3
 
 StoreHDF = store_v1.StoreHDF
 
+def read_history(filename, attributes, keys=None, name=None):
+    """
+    Reads the history of attributes of a set from a file written
+    with storage version '3.0', with one read per attribute.
+
+    :argument filename: name of the file
+    :argument attributes: list of names of the attributes to read,
+        the names of collection attributes (for example 'timestamp')
+        and the name 'key' can also be given
+    :argument keys: keys of the particles to return the history of,
+        by default all particles ever stored in the file, in the order
+        they were first stored
+    :argument name: name the set was stored under (names option of
+        write_set_to_file), by default the unnamed set
+
+    Returns a list with a (number of snapshots, number of particles)
+    array or quantity for every attribute, (number of snapshots,) for
+    collection attributes and (number of snapshots,) + shape for the
+    attributes of grids. Values of particles that are not in the set at
+    a snapshot are NaN (0 for integer attributes and for 'key').
+
+    .. code-block:: python
+
+        for i in range(100):
+            ...
+            write_set_to_file(particles, "run.h5", "amuse", version="3.0",
+                append_to_file=True, timestamp=time)
+        timestamp, x = read_history("run.h5", ["timestamp", "x"])
+    """
+    if not os.path.exists(filename):
+        raise base.IoException("Error: file '{0}' does not exist.".format(filename))
+    processor = store_v3.StoreHDF(filename, open_for_writing=False, append_to_file=False)
+    try:
+        if not processor.is_correct_version():
+            raise base.IoException("Error: file '{0}' was not written in storage version 3.0".format(filename))
+        return processor.read_history(attributes, keys, name)
+    finally:
+        processor.close()
+
+
+def version_of_file(filename):
+    """
+    Returns the storage version of the file, as stored in the info
+    group ('2.0' or '3.0'), '1.0' for files without an info group
+    """
+    with store_v2.h5py.File(filename, "r") as hdf5file:
+        if not store_v2.StoreHDF.INFO_GROUP_NAME in hdf5file:
+            return '1.0' if len(hdf5file) > 0 else '2.0'
+        version = hdf5file[store_v2.StoreHDF.INFO_GROUP_NAME].attrs.get("version", "2.0")
+        if not isinstance(version, str):
+            version = version.decode("ascii")
+        return version
+
+
 class _FileContext(object):
     
     def __init__(self, processor, result):
@@ -41,42 +96,75 @@ class HDF5FileFormatProcessor(base.FileFormatProcessor):
         base.FileFormatProcessor.__init__(self, filename, set, format)
     
     def load(self):
-        processor, result = self.load_base()
+        processor, result = self.load_base(self.close_file, self.copy_history)
         if self.return_context:
             return _FileContext(processor, result)
         else:
             return result
             
-    def load_base(self):
-        processor = store_v2.StoreHDF(
-            self.filename,
-            open_for_writing=False,
-            append_to_file=self.append_to_file or self.allow_writing,
-            copy_history=self.copy_history,
-            overwrite_file=self.overwrite_file,
-            compression=False,
-            compression_opts=None,
-        )
-        if not processor.is_correct_version():
-            processor.close()
+    def load_base(self, close_file, copy_history):
+        version = version_of_file(self.filename)
+        if version == '3.0':
+            processor = store_v3.StoreHDF(
+                self.filename,
+                open_for_writing=False,
+                append_to_file=self.append_to_file or self.allow_writing,
+                copy_history=copy_history,
+                overwrite_file=self.overwrite_file,
+            )
+        elif version == '1.0':
             processor = store_v1.StoreHDF(
                     self.filename, 
                     open_for_writing = False, 
                     append_to_file = self.append_to_file or self.allow_writing, 
-                    copy_history = self.copy_history,
+                    copy_history = copy_history,
                     overwrite_file = self.overwrite_file )
+        else:
+            processor = store_v2.StoreHDF(
+                self.filename,
+                open_for_writing=False,
+                append_to_file=self.append_to_file or self.allow_writing,
+                copy_history=copy_history,
+                overwrite_file=self.overwrite_file,
+                compression=False,
+                compression_opts=None,
+                chunk_cache_size=self.chunk_cache_size,
+            )
+        return self.load_from_processor(processor, close_file, copy_history)
+
+    def iter_load(self, chunk_size, attributes=None):
+        # the file is kept open while the parts are read and closed
+        # afterwards, the history is not read (the options are only
+        # in the dictionary of the processor when they were given)
+        if self.__dict__.get("copy_history", False):
+            raise base.IoException("copy_history is not supported when reading a file in parts")
+        if not self.__dict__.get("close_file", True):
+            raise base.IoException("close_file=False is not supported when reading a file in parts, the file is closed after the last part")
+        processor, result = self.load_base(False, False)
+        try:
+            if len(self.names) > 0:
+                if len(result) != 1:
+                    raise base.IoException("only one set can be read in parts, {0} names given".format(len(result)))
+                result = result[0]
+            elif isinstance(result, dict):
+                raise base.IoException("the file contains {0} named sets, select the set to read with the names option".format(len(result)))
+            for chunk in base._chunks_of_set(result, chunk_size, attributes):
+                yield chunk
+        finally:
+            processor.close()
 
+    def load_from_processor(self, processor, close_file, copy_history):
         if len(self.names) > 0:
             result = processor.load_sets(self.names)
-            if self.close_file:
-                if not self.copy_history:
+            if close_file:
+                if not copy_history:
                     for part in result:
                         part._private.previous = None
                 processor.close()
         else:
             result = processor.load()
-            if self.close_file:
-                if not self.copy_history:
+            if close_file:
+                if not copy_history:
                     result = result.copy()
                     result._private.previous = None
                 processor.close()
@@ -95,6 +183,19 @@ class HDF5FileFormatProcessor(base.FileFormatProcessor):
             
             if not processor.is_correct_version():
                 raise Exception("You are trying to append to a file that was not written in version 1.0 format")
+        elif self.version == '3.0':
+            processor = store_v3.StoreHDF(
+                self.filename,
+                append_to_file=self.append_to_file,
+                open_for_writing=True,
+                overwrite_file=self.overwrite_file,
+                compression=self.compression,
+                compression_opts=self.compression_opts
+            )
+
+            if not processor.is_correct_version():
+                processor.close()
+                raise Exception("You are trying to append to a file that was not written in version 3.0 format")
         else:
             processor = store_v2.StoreHDF(
                 self.filename,
@@ -107,6 +208,9 @@ class HDF5FileFormatProcessor(base.FileFormatProcessor):
         
             if not processor.is_correct_version():
                 raise Exception("You are trying to append to a file that was written in version 1.0 format")
+            if processor.INFO_GROUP_NAME in processor.hdf5file and processor.info_group().attrs.get("version") == "3.0":
+                processor.close()
+                raise Exception("You are trying to append to a file that was written in version 3.0 format")
         try:
             if len(self.names) > 0:
                 return processor.store_sets(self.set, self.names, self.extra_attributes)
@@ -146,7 +250,11 @@ class HDF5FileFormatProcessor(base.FileFormatProcessor):
     @base.format_option
     def version(self):
         """AMUSE storage version to use, needs to be >= '2.0' if you want
-        to store links between particles and grids (default: '2.0')"""
+        to store links between particles and grids. Version '3.0' stores
+        the sets as time series, every write with append_to_file=True adds
+        a snapshot to the datasets of the set, use it for files that are
+        appended to many times and read the history of attributes with
+        :func:`read_history` (default: '2.0')"""
         return '2.0'
 
     @base.format_option
@@ -186,3 +294,11 @@ class HDF5FileFormatProcessor(base.FileFormatProcessor):
     def compression_opts(self):
         "Compression level to use if using compression (0-9, defaults to None)"
         return None
+
+    @base.format_option
+    def chunk_cache_size(self):
+        """Number of bytes of the datasets to keep in memory when
+        reading parts of a file that is not closed after reading
+        (close_file=False), the most recently read parts are kept
+        (defaults to 16 MiB, 0 disables the cache)"""
+        return 16 * 1024 * 1024
@@ -9,6 +9,8 @@ import numpy
 import pickle
 import os.path
 import sys
+import numbers
+import collections
 
 from amuse.units import si
 from amuse.units import units
@@ -38,10 +40,181 @@ def pickle_to_string(value):
         
 def unpickle_from_string(value):
     return pickle.loads(value, encoding='bytes')
-    
+
+
+class HDF5ChunkCache(object):
+    """
+    Least recently used cache of blocks of rows of the datasets
+    in an open HDF5 file. A block is a chunk of the dataset for chunked
+    (compressed) datasets and about block_size bytes of rows for contiguous
+    datasets and for chunks that do not fit in the cache. Blocks are read
+    with one hyperslab read for every run of consecutive blocks that are
+    not in the cache.
+
+    :argument maximum_size: maximum number of bytes kept in the cache
+    :argument block_size: number of bytes in a block of a contiguous dataset
+    """
+
+    def __init__(self, maximum_size=16 * 1024 * 1024, block_size=64 * 1024):
+        self.maximum_size = maximum_size
+        self.block_size = block_size
+        self.blocks = collections.OrderedDict()
+        self.size = 0
+
+    def rows_per_block(self, dataset):
+        row_size = max(dataset.dtype.itemsize * int(numpy.prod(dataset.shape[1:])), 1)
+        if dataset.chunks is not None:
+            rows_per_chunk = max(int(dataset.chunks[0]), 1)
+            # chunks larger than the cache are split in blocks, these
+            # would never be kept otherwise
+            if rows_per_chunk * row_size <= self.maximum_size:
+                return rows_per_chunk
+        return max(self.block_size // row_size, 1)
+
+    def get(self, dataset, block):
+        key = (dataset.name, block)
+        if key in self.blocks:
+            self.blocks.move_to_end(key)
+            return self.blocks[key]
+        return None
+
+    def put(self, dataset, block, values):
+        if values.nbytes > self.maximum_size:
+            return
+        key = (dataset.name, block)
+        if key in self.blocks:
+            self.size -= self.blocks.pop(key).nbytes
+        # copy, a view would keep the complete hyperslab read in memory
+        values = values.copy()
+        self.blocks[key] = values
+        self.size += values.nbytes
+        while self.size > self.maximum_size:
+            _, removed = self.blocks.popitem(last=False)
+            self.size -= removed.nbytes
+
+    def invalidate(self, dataset):
+        name = dataset.name
+        for key in [x for x in self.blocks if x[0] == name]:
+            self.size -= self.blocks.pop(key).nbytes
+
+    def clear(self):
+        self.blocks.clear()
+        self.size = 0
+
+
+def read_rows(dataset, rows, cache=None):
+    """
+    Reads the rows (sorted, unique and non negative indices) of the
+    dataset. Only the blocks of rows containing the requested rows are
+    read, consecutive blocks are read with one hyperslab read.
+    """
+    if cache is None:
+        cache = HDF5ChunkCache(0)
+    if len(rows) == 0:
+        return numpy.empty((0,) + dataset.shape[1:], dtype=dataset.dtype)
+    rows_per_block = cache.rows_per_block(dataset)
+    blocks = numpy.unique(rows // rows_per_block)
+    values_of_blocks = [cache.get(dataset, block) for block in blocks]
+    is_missing = numpy.asarray([x is None for x in values_of_blocks])
+    missing = numpy.flatnonzero(is_missing)
+    if len(missing) > 0:
+        breaks = numpy.flatnonzero(numpy.diff(blocks[missing]) > 1) + 1
+        for run in numpy.split(missing, breaks):
+            first_block = blocks[run[0]]
+            start = first_block * rows_per_block
+            end = min((blocks[run[-1]] + 1) * rows_per_block, len(dataset))
+            values = dataset[start:end]
+            for position in run:
+                offset = (blocks[position] - first_block) * rows_per_block
+                block_values = values[offset:offset + rows_per_block]
+                values_of_blocks[position] = block_values
+                cache.put(dataset, blocks[position], block_values)
+
+    values = numpy.concatenate(values_of_blocks)
+    # all blocks, except the last block of the dataset, have rows_per_block rows
+    positions = numpy.searchsorted(blocks, rows // rows_per_block)
+    return values[positions * rows_per_block + rows % rows_per_block]
+
+
+def read_selection(dataset, indices, cache=None):
+    """
+    Returns dataset[:][indices], but reads only the selected part of the
+    dataset. Slices are read as a hyperslab, (fancy) integer indices
+    are read as the blocks of rows they touch (see read_rows) and tuples
+    of indices (grids) are read as the hyperslab of their bounding box.
+    """
+    if indices is None or indices is Ellipsis:
+        return dataset[:]
+    if isinstance(indices, slice):
+        start, stop, step = indices.indices(len(dataset))
+        if step > 0:
+            if stop <= start:
+                return numpy.empty((0,) + dataset.shape[1:], dtype=dataset.dtype)
+            return dataset[start:stop:step]
+        indices = numpy.arange(start, stop, step)
+    elif isinstance(indices, tuple):
+        return read_bounding_box(dataset, indices)
+
+    indices = numpy.asarray(indices)
+    if indices.size == 0 and indices.dtype.kind == 'f':
+        # an empty list of indices
+        indices = indices.astype(int)
+    if indices.dtype == bool:
+        if indices.ndim != 1 or len(dataset.shape) == 0:
+            return dataset[:][indices]
+        indices = numpy.flatnonzero(indices)
+    if indices.dtype.kind not in 'iu' or len(dataset.shape) == 0:
+        return dataset[:][indices]
+
+    length = len(dataset)
+    rows = numpy.where(indices < 0, indices + length, indices)
+    if numpy.any((rows < 0) | (rows >= length)):
+        raise IndexError("index out of range for dataset of length {0}".format(length))
+    if rows.ndim == 0:
+        return dataset[int(rows)]
+    unique_rows, inverse = numpy.unique(rows.reshape(-1), return_inverse=True)
+    values = read_rows(dataset, unique_rows, cache)
+    return values[inverse.reshape(rows.shape)]
+
+
+def read_bounding_box(dataset, indices):
+    """
+    Returns dataset[:][indices] for a tuple of indices, by reading the
+    bounding box of the selection and indexing it in memory.
+    """
+    shape = dataset.shape
+    if len(indices) > len(shape):
+        return dataset[:][indices]
+    box = []
+    local = []
+    for index, length in zip(indices, shape):
+        if isinstance(index, slice):
+            selected = range(*index.indices(length))
+            if len(selected) == 0:
+                return dataset[:][indices]
+            lower = min(selected[0], selected[-1])
+            upper = max(selected[0], selected[-1]) + 1
+            box.append(slice(lower, upper))
+            stop = selected[-1] - lower + (1 if selected.step > 0 else -1)
+            local.append(slice(selected[0] - lower, stop if stop >= 0 else None, selected.step))
+        elif isinstance(index, numbers.Integral):
+            index = int(index) + length if index < 0 else int(index)
+            box.append(slice(index, index + 1))
+            local.append(0)
+        else:
+            index = numpy.asarray(index)
+            if index.dtype.kind not in 'iu' or index.size == 0:
+                return dataset[:][indices]
+            index = numpy.where(index < 0, index + length, index)
+            lower = int(index.min())
+            box.append(slice(lower, int(index.max()) + 1))
+            local.append(index - lower)
+    return dataset[tuple(box)][tuple(local)]
+
 class HDF5Attribute(object):
     compression = False
     compression_opts = None
+    cache = None
     
     def __init__(self, name):
         self.name = name
@@ -127,6 +300,12 @@ class HDF5Attribute(object):
 
     @classmethod
     def load_attribute(cls, name, dataset, loader):
+        result = cls._load_attribute(name, dataset, loader)
+        result.cache = getattr(loader, "chunk_cache", None)
+        return result
+
+    @classmethod
+    def _load_attribute(cls, name, dataset, loader):
         units_string = dataset.attrs["units"] if isinstance(dataset.attrs["units"], str) else dataset.attrs["units"].decode("ascii") 
         if units_string == "none":
             return HDF5UnitlessAttribute(name, dataset)
@@ -164,6 +343,10 @@ class HDF5Attribute(object):
     def remove_indices(self, indices):
         pass
 
+    def invalidate_cache(self):
+        if self.cache is not None:
+            self.cache.invalidate(self.dataset)
+
 class HDF5VectorQuantityAttribute(HDF5Attribute):
     compression = False
     compression_opts = None
@@ -175,15 +358,10 @@ class HDF5VectorQuantityAttribute(HDF5Attribute):
         self.unit = unit
         
     def get_values(self, indices):
-        if indices is None:
-            return self.unit.new_quantity(self.dataset[:])
-        elif len(self.get_shape()) > 1:
-            return self.unit.new_quantity(self.dataset[:][indices])
-        else:
-            return self.unit.new_quantity(self.dataset[:][indices])
-            
+        return self.unit.new_quantity(read_selection(self.dataset, indices, self.cache))
     
     def set_values(self, indices, values):
+        self.invalidate_cache()
         try:
             self.dataset[indices] = values.value_in(self.unit)
         except AttributeError:
@@ -203,6 +381,7 @@ class HDF5VectorQuantityAttribute(HDF5Attribute):
            return
         newshape = list(self.dataset.shape)
         newshape[0] = newlength
+        self.invalidate_cache()
         
         values = numpy.empty(shape=self.dataset.shape, dtype=self.dataset.dtype)
         values[:] = self.dataset[:]
@@ -232,6 +411,7 @@ class HDF5VectorQuantityAttribute(HDF5Attribute):
 
     def remove_indices(self, indices):
         oldlength = len(self.dataset)
+        self.invalidate_cache()
         
         values = numpy.empty(shape=self.dataset.shape, dtype=self.dataset.dtype)
         values[:] = self.dataset[:]
@@ -263,15 +443,10 @@ class HDF5UnitlessAttribute(HDF5Attribute):
         self.dataset = dataset
         
     def get_values(self, indices):
-        if indices is None:
-            return self.dataset[:]
-        elif len(self.get_shape()) > 1:
-            return self.dataset[:][indices]
-        else:
-            return self.dataset[:][indices]
-        
+        return read_selection(self.dataset, indices, self.cache)
     
     def set_values(self, indices, values):
+        self.invalidate_cache()
         self.dataset[indices] = values
     
     def get_shape(self):
@@ -284,6 +459,7 @@ class HDF5UnitlessAttribute(HDF5Attribute):
            return
         newshape = list(self.dataset.shape)
         newshape[0] = newlength
+        self.invalidate_cache()
         
         values = numpy.empty(shape=self.dataset.shape, dtype=self.dataset.dtype)
         values[:] = self.dataset[:]
@@ -313,6 +489,7 @@ class HDF5UnitlessAttribute(HDF5Attribute):
 
     def remove_indices(self, indices):
         oldlength = len(self.dataset)
+        self.invalidate_cache()
         
         values = numpy.empty(shape=self.dataset.shape, dtype=self.dataset.dtype)
         values[:] = self.dataset[:]
@@ -351,12 +528,12 @@ class HDF5LinkedAttribute(HDF5Attribute):
     def get_values(self, indices):
         if indices is None: 
             indices=slice(None)
-        kinds = self.kind_dataset[:][indices]
-        references = self.ref_dataset[:][indices]
-        keys = self.keys_dataset[:][indices]
+        kinds = read_selection(self.kind_dataset, indices)
+        references = read_selection(self.ref_dataset, indices)
+        keys = read_selection(self.keys_dataset, indices)
         shape = kinds.shape
         if self.indices_dataset:
-            grid_indices = self.indices_dataset[:][indices]
+            grid_indices = read_selection(self.indices_dataset, indices)
         else:
             grid_indices = numpy.zeros(shape)
         result = LinkedArray(numpy.empty(shape, dtype = object))
@@ -520,6 +697,7 @@ class HDF5AttributeStorage(AttributeStorage):
         self.particle_keys = keys
         self.loader = loader
         self.mapping_from_particle_to_index = self.new_index()
+        self.attributes = {}
         
     def can_extend_attributes(self):
         return True
@@ -551,17 +729,22 @@ class HDF5AttributeStorage(AttributeStorage):
     def get_defined_attribute_names(self):
         return list(self.attributesgroup.keys())
         
+    def get_attribute(self, name):
+        if not name in self.attributes:
+            self.attributes[name] = HDF5Attribute.load_attribute(
+                name,
+                self.attributesgroup[name],
+                self.loader
+            )
+        return self.attributes[name]
+        
     def get_defined_settable_attribute_names(self):
         return self.get_defined_attribute_names()
     
     def get_values_in_store(self, indices, attributes):
         results = []
         for attribute in attributes:
-            dataset = HDF5Attribute.load_attribute(
-                attribute,
-                self.attributesgroup[attribute],
-                self.loader
-            )
+            dataset = self.get_attribute(attribute)
             selected_values = dataset.get_values(indices)
             results.append(selected_values)
         
@@ -577,11 +760,7 @@ class HDF5AttributeStorage(AttributeStorage):
             
         for attribute, quantity in zip(attributes, quantities):
             if attribute in self.attributesgroup:
-                dataset = HDF5Attribute.load_attribute(
-                    attribute,
-                    self.attributesgroup[attribute],
-                    self.loader
-                )
+                dataset = self.get_attribute(attribute)
             else:
                 dataset = HDF5Attribute.new_attribute(
                     attribute,
@@ -589,6 +768,8 @@ class HDF5AttributeStorage(AttributeStorage):
                     quantity,
                     self.attributesgroup
                 )
+                dataset.cache = getattr(self.loader, "chunk_cache", None)
+                self.attributes[attribute] = dataset
                 
             bools = numpy.zeros(dataset.get_shape(), dtype='bool')
             bools[indices] = True
@@ -604,6 +785,7 @@ class HDF5GridAttributeStorage(AttributeStorage):
         self.attributesgroup = self.hdfgroup["attributes"]
         self.shape = shape
         self.loader = loader
+        self.attributes = {}
         
     def storage_shape(self):
         return self.shape
@@ -625,15 +807,20 @@ class HDF5GridAttributeStorage(AttributeStorage):
     def get_defined_attribute_names(self):
         return list(self.attributesgroup.keys())
         
+    def get_attribute(self, name):
+        if not name in self.attributes:
+            self.attributes[name] = HDF5Attribute.load_attribute(
+                name,
+                self.attributesgroup[name],
+                self.loader
+            )
+        return self.attributes[name]
+        
     def get_values_in_store(self, indices, attributes):
             
         results = []
         for attribute in attributes:
-            dataset = HDF5Attribute.load_attribute(
-                attribute,
-                self.attributesgroup[attribute],
-                self.loader
-            )
+            dataset = self.get_attribute(attribute)
             selected_values = dataset.get_values(indices)
             results.append(selected_values)
         
@@ -648,11 +835,7 @@ class HDF5GridAttributeStorage(AttributeStorage):
     def set_values_in_store(self, indices, attributes, quantities):
         for attribute, quantity in zip(attributes, quantities):
             if attribute in self.attributesgroup:
-                dataset = HDF5Attribute.load_attribute(
-                    attribute,
-                    self.attributesgroup[attribute],
-                    self.loader
-                )
+                dataset = self.get_attribute(attribute)
             else:
                 dataset = HDF5Attribute.new_attribute(
                     attribute,
@@ -660,6 +843,8 @@ class HDF5GridAttributeStorage(AttributeStorage):
                     quantity,
                     self.attributesgroup
                 )
+                dataset.cache = getattr(self.loader, "chunk_cache", None)
+                self.attributes[attribute] = dataset
                 
             bools = numpy.zeros(dataset.get_shape(), dtype='bool')
             bools[indices] = True
@@ -718,9 +903,11 @@ class StoreHDF(object):
         overwrite_file=False,
         compression=False,
         compression_opts=None,
+        chunk_cache_size=16 * 1024 * 1024,
     ):
         self.compression = compression
         self.compression_opts = compression_opts
+        self.chunk_cache = HDF5ChunkCache(chunk_cache_size)
         if h5py is None:
             raise exceptions.AmuseException(
                 "h5py module not available, cannot use hdf5 files")
@@ -1247,6 +1434,7 @@ class StoreHDF(object):
             return self.hdf5file.require_group(name)
         
     def close(self):
+        self.chunk_cache.clear()
         if not self.hdf5file is None:
             self.hdf5file.flush()
             self.hdf5file.close()
@@ -1259,15 +1447,11 @@ class HDF5UnicodeAttribute(HDF5UnitlessAttribute):
         HDF5UnitlessAttribute.__init__(self, name, dataset)
         
     def get_values(self, indices):
-        if indices is None:
-            encoded = self.dataset[:]
-        elif len(self.get_shape()) > 1:
-            encoded = self.dataset[:][indices]
-        else:
-            encoded = self.dataset[:][indices]
+        encoded = read_selection(self.dataset, indices, self.cache)
         return numpy.char.decode(encoded, 'UTF-32BE')
 
     def set_values(self, indices, values):
+        self.invalidate_cache()
         self.dataset[indices] = numpy.char.encode(values, 'UTF-32LE')
     
     def get_value(self, index):
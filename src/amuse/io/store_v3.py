@@ -0,0 +1,540 @@
+"""
+AMUSE hdf5 storage version 3.0, a time series layout for sets that are
+appended to a file many times (``append_to_file=True``).
+
+Every set (the default set or a named set) is stored in one group, every
+write of the set adds one snapshot (a row along the time axis) to the
+datasets in this group. The datasets are chunked and extendible, so
+appending a snapshot does not create new hdf5 objects:
+
+- ``keys``, the key of every particle ever stored, a particle gets a
+  column the first time it is stored;
+- ``members``, ``member_ranges`` and ``membership``, the columns of the
+  particles in every snapshot, the columns are only stored again when the
+  particles in the set change;
+- ``attributes/<name>``, (snapshots, columns) array of the values of
+  an attribute, values of particles that are not in a snapshot are NaN
+  (or 0 for integer attributes);
+- ``collection_attributes/<name>``, (snapshots,) array of the values of
+  the collection attributes (and extra attributes) of the set.
+
+Grids are stored in the same way, without the keys and membership and
+with (snapshots,) + shape datasets for the attributes.
+
+The history of attributes can be read in one read per attribute with
+:func:`amuse.io.read_history`.
+"""
+
+try:
+    import h5py
+except ImportError as ex:
+    import warnings
+    warnings.warn("could not load h5py, hdf5 files not supported", ImportWarning)
+    h5py = None
+
+import numpy
+import os.path
+
+from amuse.units import core
+from amuse.units.quantities import is_quantity
+from amuse.support import exceptions
+
+from amuse.datamodel import LinkedArray
+from amuse.datamodel import AbstractSet
+
+from amuse.io.store_v2 import pickle_to_string
+from amuse.io.store_v2 import unpickle_from_string
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def unit_to_string(unit):
+    return unit.to_simple_form().reference_string()
+
+
+def string_to_unit(string):
+    if not isinstance(string, str):
+        string = string.decode("ascii")
+    if string == "none":
+        return None
+    return eval(string, core.__dict__)
+
+
+class TimeSeriesGroup(object):
+    """
+    Reads and appends the snapshots of one set stored in a
+    group of the file.
+
+    :argument group: hdf5 group of the set
+    :argument chunk_size: number of values in a chunk of a dataset
+    """
+
+    def __init__(self, group, compression=False, compression_opts=None, chunk_size=32768):
+        self.group = group
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.chunk_size = chunk_size
+
+    @property
+    def number_of_snapshots(self):
+        if "number_of_snapshots" in self.group.attrs:
+            return int(self.group.attrs["number_of_snapshots"])
+        return 0
+
+    @property
+    def container_type(self):
+        value = self.group.attrs["type"]
+        return value if isinstance(value, str) else value.decode("ascii")
+
+    @property
+    def number_of_columns(self):
+        if self.container_type == "grid":
+            return 0
+        return len(self.group["keys"])
+
+    def new_dataset(self, group, name, shape, dtype, maxshape):
+        dtype = numpy.dtype(dtype)
+        if dtype.kind == "f":
+            fillvalue = numpy.nan
+        elif dtype.kind == "O":
+            fillvalue = None
+        else:
+            fillvalue = 0
+        chunks = [max(x, 1) for x in shape]
+        if len(shape) > 1 and maxshape[1] is None:
+            # the number of particle columns can grow, start with the
+            # number of columns rounded up to a power of two, so that
+            # the chunks of small sets are small
+            values_per_column = int(numpy.prod(chunks[2:]))
+            columns = 1 << int(numpy.ceil(numpy.log2(chunks[1])))
+            chunks[1] = max(min(columns, self.chunk_size // values_per_column), 1)
+        chunks[0] = max(self.chunk_size // int(numpy.prod(chunks[1:])), 1)
+        return group.create_dataset(
+            name,
+            shape=shape,
+            dtype=dtype,
+            maxshape=maxshape,
+            chunks=tuple(chunks),
+            fillvalue=fillvalue,
+            compression=self.compression,
+            compression_opts=self.compression_opts,
+        )
+
+    def new_index_dataset(self, name, shape, dtype):
+        maxshape = (None,) + tuple(shape[1:])
+        return self.new_dataset(self.group, name, shape, dtype, maxshape)
+
+    def append_to_dataset(self, dataset, values):
+        if len(values) == 0:
+            return
+        length = len(dataset)
+        dataset.resize(length + len(values), axis=0)
+        dataset[length:] = values
+
+    def initialize(self, container):
+        if hasattr(container, "shape"):
+            self.group.attrs["type"] = "grid".encode("ascii")
+            self.group.attrs["class_of_the_container"] = pickle_to_string(container._factory_for_new_collection())
+            self.group.create_dataset("shape", data=numpy.asarray(container.shape))
+        else:
+            self.group.attrs["type"] = "particles".encode("ascii")
+            self.group.attrs["class_of_the_particles"] = pickle_to_string(container._factory_for_new_collection())
+            self.new_index_dataset("keys", (0,), "uint64")
+            self.new_index_dataset("members", (0,), "int64")
+            self.new_index_dataset("member_ranges", (0, 2), "int64")
+            self.new_index_dataset("membership", (0,), "int64")
+        self.group.create_group("attributes")
+        self.group.create_group("collection_attributes")
+        self.group.attrs["number_of_snapshots"] = 0
+
+    def append(self, container, extra_attributes={}):
+        if not "type" in self.group.attrs:
+            self.initialize(container)
+        is_grid = hasattr(container, "shape")
+        if is_grid != (self.container_type == "grid"):
+            raise exceptions.AmuseException(
+                "cannot append a {0} to a time series of a {1}".format(
+                    "grid" if is_grid else "particle set",
+                    self.container_type
+                )
+            )
+        snapshot = self.number_of_snapshots
+        if is_grid:
+            if tuple(container.shape) != tuple(self.group["shape"][:]):
+                raise exceptions.AmuseException("cannot append a grid of a different shape to a time series")
+            columns = None
+        else:
+            columns = self.append_membership(container.get_all_keys_in_store())
+
+        names = container.get_attribute_names_defined_in_store()
+        values = container.get_values_in_store(Ellipsis, names)
+        attributes_group = self.group["attributes"]
+        for name, value in zip(names, values):
+            self.append_attribute(attributes_group, name, value, snapshot, columns)
+        for name in attributes_group.keys():
+            if not name in names:
+                self.resize_attribute(attributes_group[name], snapshot + 1)
+
+        collection_attributes = dict(container.collection_attributes.__getstate__())
+        collection_attributes.update(extra_attributes)
+        collection_attributes_group = self.group["collection_attributes"]
+        for name, value in collection_attributes.items():
+            if value is None:
+                continue
+            self.append_attribute(collection_attributes_group, name, value, snapshot, None)
+        for name in collection_attributes_group.keys():
+            if not name in collection_attributes or collection_attributes[name] is None:
+                self.resize_attribute(collection_attributes_group[name], snapshot + 1)
+
+        self.group.attrs["number_of_snapshots"] = snapshot + 1
+
+    def append_membership(self, keys):
+        keys = numpy.asarray(keys, dtype="uint64")
+        keys_dataset = self.group["keys"]
+        all_keys = keys_dataset[:]
+        sorted_indices = numpy.argsort(all_keys, kind="stable")
+        positions = numpy.searchsorted(all_keys[sorted_indices], keys)
+        positions = numpy.minimum(positions, max(len(all_keys) - 1, 0))
+        if len(all_keys) > 0:
+            is_stored = all_keys[sorted_indices[positions]] == keys
+            columns = numpy.where(is_stored, sorted_indices[positions], -1)
+        else:
+            is_stored = numpy.zeros(len(keys), dtype=bool)
+            columns = numpy.full(len(keys), -1, dtype="int64")
+
+        new_keys = keys[~is_stored]
+        if len(new_keys) > 0:
+            if len(numpy.unique(new_keys)) != len(new_keys):
+                raise exceptions.AmuseException("cannot store a set with duplicate keys")
+            columns[~is_stored] = len(all_keys) + numpy.arange(len(new_keys))
+            self.append_to_dataset(keys_dataset, new_keys)
+
+        member_ranges = self.group["member_ranges"]
+        version = len(member_ranges) - 1
+        if version >= 0:
+            start, end = member_ranges[version]
+            if end - start != len(columns) or numpy.any(self.group["members"][start:end] != columns):
+                version = -1
+        if version < 0:
+            members = self.group["members"]
+            start = len(members)
+            self.append_to_dataset(members, columns)
+            self.append_to_dataset(member_ranges, [[start, start + len(columns)]])
+            version = len(member_ranges) - 1
+        self.append_to_dataset(self.group["membership"], [version])
+        return columns
+
+    def resize_attribute(self, dataset, number_of_snapshots):
+        shape = list(dataset.shape)
+        shape[0] = number_of_snapshots
+        if dataset.attrs.get("per_particle", False):
+            shape[1] = self.number_of_columns
+        if tuple(shape) != dataset.shape:
+            dataset.resize(shape)
+
+    def append_attribute(self, group, name, value, snapshot, columns):
+        if isinstance(value, LinkedArray) or hasattr(value, "as_set") or hasattr(value, "get_containing_set"):
+            raise exceptions.AmuseException(
+                "cannot store attribute '{0}', links to particles or grids "
+                "are not supported in storage version 3.0".format(name)
+            )
+        if is_quantity(value):
+            unit = value.unit
+            value = value.value_in(unit)
+        else:
+            unit = None
+            value = numpy.asanyarray(value)
+            if value.dtype.kind in "USO":
+                value = numpy.asarray(value, dtype=object)
+        value = numpy.asarray(value)
+
+        per_particle = columns is not None
+        if per_particle:
+            row_shape = (self.number_of_columns,) + value.shape[1:]
+        else:
+            row_shape = value.shape
+
+        if name in group:
+            dataset = group[name]
+            stored_unit = string_to_unit(dataset.attrs["units"])
+            if (stored_unit is None) != (unit is None):
+                raise exceptions.AmuseException(
+                    "cannot store attribute '{0}', the values of the attribute in "
+                    "the file are {1}quantities".format(name, "not " if stored_unit is None else "")
+                )
+            if unit is not None:
+                value = (unit.new_quantity(value)).value_in(stored_unit)
+            if tuple(dataset.shape[2 if per_particle else 1:]) != tuple(row_shape[1 if per_particle else 0:]):
+                raise exceptions.AmuseException(
+                    "cannot store attribute '{0}', the shape of the values differs "
+                    "from the shape of the values in the file".format(name)
+                )
+            self.resize_attribute(dataset, snapshot + 1)
+        else:
+            if value.dtype.kind == "O":
+                dtype = h5py.string_dtype()
+            else:
+                dtype = value.dtype
+            maxshape = (None,) + ((None,) if per_particle else ()) + row_shape[1 if per_particle else 0:]
+            dataset = self.new_dataset(group, name, (snapshot + 1,) + row_shape, dtype, maxshape)
+            dataset.attrs["units"] = (unit_to_string(unit) if unit is not None else "none").encode("ascii")
+            dataset.attrs["first_snapshot"] = snapshot
+            dataset.attrs["per_particle"] = per_particle
+
+        if per_particle:
+            # the row of a new snapshot is written completely, columns of
+            # particles that are not in the set get the fill value
+            fillvalue = "" if dataset.dtype.kind == "O" else dataset.fillvalue
+            row = numpy.full(row_shape, fillvalue, dtype=dataset.dtype)
+            row[columns] = value
+            dataset[snapshot] = row
+        else:
+            dataset[snapshot] = value
+
+    def columns_of_snapshot(self, snapshot):
+        version = self.group["membership"][snapshot]
+        start, end = self.group["member_ranges"][version]
+        return self.group["members"][start:end]
+
+    def columns_of_keys(self, keys):
+        all_keys = self.group["keys"][:]
+        if keys is None:
+            return all_keys, numpy.arange(len(all_keys))
+        keys = numpy.asarray(keys, dtype="uint64")
+        sorted_indices = numpy.argsort(all_keys, kind="stable")
+        positions = numpy.searchsorted(all_keys[sorted_indices], keys)
+        positions = numpy.minimum(positions, max(len(all_keys) - 1, 0))
+        if len(all_keys) == 0 or numpy.any(all_keys[sorted_indices[positions]] != keys):
+            raise exceptions.AmuseException("not all keys are stored in the time series")
+        return keys, sorted_indices[positions]
+
+    def read_value(self, dataset, selection):
+        unit = string_to_unit(dataset.attrs["units"])
+        value = dataset[selection]
+        if dataset.dtype.kind == "O":
+            value = numpy.array(
+                [x.decode("utf-8") if isinstance(x, bytes) else x for x in numpy.ravel(value)],
+                dtype=str
+            ).reshape(numpy.shape(value))
+            if value.ndim == 0:
+                value = value[()]
+        if unit is None:
+            return value
+        return unit.new_quantity(value)
+
+    def load_snapshot(self, snapshot):
+        attributes_group = self.group["attributes"]
+        names = [x for x in attributes_group.keys() if attributes_group[x].attrs["first_snapshot"] <= snapshot]
+        if self.container_type == "grid":
+            class_of_the_container = unpickle_from_string(self.group.attrs["class_of_the_container"])
+            container = class_of_the_container(*self.group["shape"][:])
+            values = [self.read_value(attributes_group[x], snapshot) for x in names]
+            container.set_values_in_store(Ellipsis, names, values)
+        else:
+            class_of_the_container = unpickle_from_string(self.group.attrs["class_of_the_particles"])
+            container = class_of_the_container(is_working_copy=False)
+            columns = self.columns_of_snapshot(snapshot)
+            keys = self.group["keys"][:][columns]
+            values = [self.read_value(attributes_group[x], snapshot)[columns] for x in names]
+            if len(keys) > 0:
+                container.add_particles_to_store(keys, names, values)
+
+        collection_attributes_group = self.group["collection_attributes"]
+        for name in collection_attributes_group.keys():
+            dataset = collection_attributes_group[name]
+            if dataset.attrs["first_snapshot"] > snapshot:
+                continue
+            setattr(container.collection_attributes, name, self.read_value(dataset, snapshot))
+        return container
+
+    def read_history(self, attributes, keys=None):
+        if self.container_type == "grid":
+            if keys is not None:
+                raise exceptions.AmuseException("keys can only be given for the history of a particle set")
+            columns = None
+        else:
+            keys, columns = self.columns_of_keys(keys)
+            unique_columns, inverse = numpy.unique(columns, return_inverse=True)
+
+        result = []
+        for name in attributes:
+            if name in self.group["collection_attributes"]:
+                result.append(self.read_value(self.group["collection_attributes"][name], slice(None)))
+            elif name == "key" and columns is not None:
+                result.append(self.history_of_keys(keys, columns))
+            elif name in self.group["attributes"]:
+                dataset = self.group["attributes"][name]
+                if columns is None:
+                    result.append(self.read_value(dataset, slice(None)))
+                elif len(unique_columns) == 0:
+                    result.append(self.read_value(dataset, (slice(None), slice(0, 0))))
+                elif 2 * len(unique_columns) > dataset.shape[1]:
+                    result.append(self.read_value(dataset, slice(None))[:, columns])
+                else:
+                    values = self.read_value(dataset, (slice(None), unique_columns))
+                    result.append(values[:, inverse])
+            else:
+                raise exceptions.AmuseException("attribute '{0}' is not stored in the time series".format(name))
+        return result
+
+    def history_of_keys(self, keys, columns):
+        membership = self.group["membership"][:]
+        member_ranges = self.group["member_ranges"][:]
+        members = self.group["members"][:]
+        is_member = numpy.zeros((len(membership), len(columns)), dtype=bool)
+        for version, (start, end) in enumerate(member_ranges):
+            is_member[membership == version] = numpy.isin(columns, members[start:end])
+        return numpy.where(is_member, keys, numpy.uint64(0))
+
+
+class StoreHDF(object):
+    INFO_GROUP_NAME = 'AMUSE_INF'
+    DATA_GROUP_NAME = 'data'
+
+    def __init__(
+        self,
+        filename,
+        append_to_file=True,
+        open_for_writing=True,
+        copy_history=False,
+        overwrite_file=False,
+        compression=False,
+        compression_opts=None,
+    ):
+        self.compression = compression
+        self.compression_opts = compression_opts
+        if h5py is None:
+            raise exceptions.AmuseException(
+                "h5py module not available, cannot use hdf5 files")
+
+        logger.info(
+            f"opening {filename} with options {append_to_file} "
+            f"{open_for_writing} {copy_history} {overwrite_file}"
+        )
+
+        if not append_to_file and open_for_writing:
+            if os.path.exists(filename):
+                if overwrite_file:
+                    os.remove(filename)
+                else:
+                    raise FileExistsError("Opening file for write with overwrite_file is False but file {0} exists".format(filename))
+
+        if append_to_file:
+            if os.access(filename, os.F_OK) and not os.access(filename, os.W_OK):
+                raise Exception("Opening file for append but file {0} is not writeable".format(filename))
+            self.hdf5file = h5py.File(filename, 'a', libver='latest')
+        elif open_for_writing:
+            self.hdf5file = h5py.File(filename, 'w', libver='latest')
+        else:
+            self.hdf5file = h5py.File(filename, 'r', libver='latest')
+
+        self.copy_history = copy_history
+
+    def is_correct_version(self):
+        if len(self.hdf5file) == 0:
+            return True
+        if not self.INFO_GROUP_NAME in self.hdf5file:
+            return False
+        version = self.hdf5file[self.INFO_GROUP_NAME].attrs.get("version", "")
+        if not isinstance(version, str):
+            version = version.decode("ascii")
+        return version == self.get_version()
+
+    def get_version(self):
+        return "3.0"
+
+    def time_series(self, group):
+        return TimeSeriesGroup(group, self.compression, self.compression_opts)
+
+    def store_sets(self, sets, names, extra_attributes={}):
+        # a single set is iterable, but its rows are not the sets to store
+        if isinstance(sets, AbstractSet):
+            raise exceptions.AmuseException(
+                "the sets to store with names must be given as a list, not as a {0}".format(type(sets).__name__)
+            )
+        info_group = self.info_group()
+        info_group.attrs["version"] = self.get_version()
+
+        for x, name in zip(sets, names):
+            self.time_series(self.named_group(name)).append(x, extra_attributes)
+        self.hdf5file.flush()
+
+    def store(self, container, extra_attributes={}):
+        if hasattr(container, 'keys') and not hasattr(container, 'as_set'):
+            self.store_sets(
+                list(container.values()),
+                list(container.keys()),
+                extra_attributes
+            )
+            return
+
+        info_group = self.info_group()
+        info_group.attrs["version"] = self.get_version()
+        self.time_series(self.data_group()).append(container, extra_attributes)
+        self.hdf5file.flush()
+
+    def load(self):
+        if not self.data_group(False) is None and len(self.data_group(False)) > 0:
+            return self.load_container(self.data_group())
+        else:
+            result = {}
+            for x in self.hdf5file.keys():
+                if x == self.INFO_GROUP_NAME:
+                    continue
+                result[x] = self.load_container(self.named_group(x))
+            return result
+
+    def load_sets(self, names):
+        return [self.load_container(self.named_group(x)) for x in names]
+
+    def load_container(self, group):
+        series = self.time_series(group)
+        number_of_snapshots = series.number_of_snapshots
+        if self.copy_history:
+            snapshots = range(number_of_snapshots)
+        else:
+            snapshots = [number_of_snapshots - 1]
+
+        previous = None
+        for snapshot in snapshots:
+            container = series.load_snapshot(snapshot)
+            container._private.previous = previous
+            previous = container
+
+        if self.copy_history:
+            copy_of_last = previous.copy()
+            copy_of_last._private.previous = previous
+            return copy_of_last
+        else:
+            return previous
+
+    def read_history(self, attributes, keys=None, name=None):
+        if name is None:
+            group = self.data_group(False)
+        else:
+            group = self.named_group(name, False)
+        if group is None or not "type" in group.attrs:
+            raise exceptions.AmuseException("no time series stored under name '{0}'".format(name))
+        return self.time_series(group).read_history(attributes, keys)
+
+    def info_group(self, ensure=True):
+        return self.named_group(self.INFO_GROUP_NAME, ensure)
+
+    def data_group(self, ensure=True):
+        return self.named_group(self.DATA_GROUP_NAME, ensure)
+
+    def named_group(self, name, ensure=True):
+        if self.hdf5file.mode == 'r' or not ensure:
+            if not name in self.hdf5file:
+                return None
+            else:
+                return self.hdf5file[name]
+        else:
+            return self.hdf5file.require_group(name)
+
+    def close(self):
+        if not self.hdf5file is None:
+            self.hdf5file.flush()
+            self.hdf5file.close()
+            self.hdf5file = None
@@ -80,6 +80,21 @@ class TableFormattedText(base.FileFormatProcessor):
         self.read_footer()
         return self.set
 
+    def iter_load(self, chunk_size, attributes=None):
+        if self.stream is None:
+            self.stream = open(self.filename, "r")
+            close_function = self.stream.close
+        else:
+            close_function = lambda: None
+
+        try:
+            self.cursor = LineBasedFileCursor(self.stream)
+            self.read_header()
+            for chunk in self.iter_sets_of_rows(chunk_size, attributes):
+                yield chunk
+        finally:
+            close_function()
+
     def store(self):
         self.open_stream()
         try:
@@ -244,24 +259,80 @@ class TableFormattedText(base.FileFormatProcessor):
                 self.attribute_dtypes = self._get_attribute_dtypes()
 
     def read_rows(self):
-        values = [[] for x in range(len(self.attribute_names))]
+        self.set = None
+        for tmp_set in self.iter_sets_of_rows(self.maximum_number_of_lines_buffered):
+            if self.set is None:
+                self.set = tmp_set
+            else:
+                self.set.add_particles(tmp_set)
+        if self.set is None:
+            self.set = self.new_set(0)
 
-        number_of_particles = 0
-        keys = []
+        self.cursor.forward()
 
-        self.set = None
+    def iter_sets_of_rows(self, number_of_lines, attributes=None):
+        """
+        Yields a new set for every block of (at most) number_of_lines
+        rows, up to the footer
+        """
         string_converters = list(map(self._new_converter_from_string_to_dtype, self.attribute_dtypes))
         units_with_dtype = list(map(core.unit_with_specific_dtype, self.attribute_types, self.attribute_dtypes))
 
+        lines = []
         while not self.cursor.is_at_end() and not self.cursor.line().startswith(self.footer_prefix_string):
-            columns = self.split_into_columns(self.cursor.line())
+            lines.append(self.cursor.line())
+            self.cursor.forward()
+            if len(lines) >= number_of_lines:
+                result = self.new_set_from_rows(lines, string_converters, units_with_dtype, attributes)
+                if not result is None:
+                    yield result
+                lines = []
+
+        if len(lines) > 0:
+            result = self.new_set_from_rows(lines, string_converters, units_with_dtype, attributes)
+            if not result is None:
+                yield result
+
+    def new_set_from_rows(self, lines, string_converters, units_with_dtype, attributes=None):
+        result = self.convert_rows_with_numpy(lines)
+        if result is None:
+            result = self.convert_rows(lines, string_converters)
+        number_of_particles, keys, values = result
+        if number_of_particles == 0:
+            return None
+
+        result = self.new_set(number_of_particles, keys=keys)
+        if not attributes is None:
+            attributes = base._names_of_attributes_in_store(result, attributes)
+        attribute_names = []
+        quantities = []
+        for name, value, unit, dtype in zip(self.attribute_names, values, units_with_dtype, self.attribute_dtypes):
+            if not attributes is None and not name in attributes:
+                continue
+            attribute_names.append(name)
+            if not unit is None:
+                quantities.append(unit.new_quantity(value))
+            elif not dtype is None:
+                quantities.append(numpy.asarray(value, dtype=dtype))
+            else:
+                quantities.append(value)
+        result.set_values_in_store(result.get_all_indices_in_store(), attribute_names, quantities)
+        return result
+
+    def convert_rows(self, lines, string_converters):
+        values = [[] for x in range(len(self.attribute_names))]
+        number_of_particles = 0
+        keys = []
+
+        for line in lines:
+            columns = self.split_into_columns(line)
             if len(columns)>0:
 
                 if self.key_in_column >= 0:
 
                     if len(columns) != len(self.attribute_names) + 1:
                         raise base.IoException(
-                            "Number of values on line '{0}' is {1}, expected {2}".format(self.cursor.line(), len(columns), len(self.attribute_names)))
+                            "Number of values on line '{0}' is {1}, expected {2}".format(line, len(columns), len(self.attribute_names)))
 
                     key = self.convert_string_to_long(columns[self.key_in_column])
                     keys.append(key)
@@ -269,50 +340,71 @@ class TableFormattedText(base.FileFormatProcessor):
 
                 if len(columns) != len(self.attribute_names):
                     raise base.IoException(
-                        "Number of values on line '{0}' is {1}, expected {2}".format(self.cursor.line(), len(columns), len(self.attribute_names)))
+                        "Number of values on line '{0}' is {1}, expected {2}".format(line, len(columns), len(self.attribute_names)))
 
                 for value_string, list_of_values, conv in zip(columns, values, string_converters):
                     list_of_values.append(conv(value_string))
 
                 number_of_particles += 1
-            self.cursor.forward()
-            if number_of_particles >= self.maximum_number_of_lines_buffered:
-                quantities = list(map(
-                    lambda value, unit, dtype: unit.new_quantity(value) if not unit is None else (numpy.asarray(value, dtype=dtype) if not dtype is None else value),
-                    values,
-                    units_with_dtype,
-                    self.attribute_dtypes
-                ))
-                if self.set is None:
-                    self.set = self.new_set(number_of_particles, keys=keys)
-                    self.set.set_values_in_store(self.set.get_all_indices_in_store(), self.attribute_names, quantities)
-                else:
-                    tmp_set = self.new_set(number_of_particles, keys=keys)
-                    tmp_set.set_values_in_store(tmp_set.get_all_indices_in_store(), self.attribute_names, quantities)
-                    self.set.add_particles(tmp_set)
-
-                number_of_particles = 0
-                keys = []
-                values = [[] for x in range(len(self.attribute_names))]
-
-        if number_of_particles > 0:
-            quantities = list(map(
-                lambda value, unit, dtype: unit.new_quantity(value) if not unit is None else (numpy.asarray(value, dtype=dtype) if not dtype is None else value),
-                values,
-                units_with_dtype,
-                self.attribute_dtypes
-            ))
-            if self.set is None:
-                self.set = self.new_set(number_of_particles, keys=keys)
-                self.set.set_values_in_store(self.set.get_all_indices_in_store(), self.attribute_names, quantities)
-            else:
-                tmp_set = self.new_set(number_of_particles, keys=keys)
-                tmp_set.set_values_in_store(tmp_set.get_all_indices_in_store(), self.attribute_names, quantities)
-                self.set.add_particles(tmp_set)
-        elif self.set is None:
-            self.set = self.new_set(0)
+        return number_of_particles, keys, values
 
-        self.cursor.forward()
+    def _numpy_dtype_for_column(self, dtype):
+        if dtype is None:
+            return 'float64'
+        kind = numpy.dtype(dtype).kind
+        if kind == 'f':
+            return 'float64'
+        elif kind == 'i':
+            return 'int64'
+        elif kind == 'u':
+            return 'uint64'
+        else:
+            return None
+
+    def convert_rows_with_numpy(self, lines):
+        """
+        Converts all lines at once with numpy, possible if all columns
+        are numbers and the lines have no irregularities (empty lines,
+        wrong number of columns). Returns None if the lines cannot be
+        converted this way.
+        """
+        if not self.can_convert_rows_with_numpy or not all(lines):
+            return None
+
+        dtypes = list(map(self._numpy_dtype_for_column, self.attribute_dtypes))
+        if self.key_in_column >= 0:
+            dtypes.insert(self.key_in_column, 'uint64')
+        if len(dtypes) == 0 or None in dtypes:
+            return None
+
+        try:
+            table = numpy.loadtxt(
+                lines,
+                dtype=[('col{0}'.format(i), x) for i, x in enumerate(dtypes)],
+                delimiter=None if self.column_separator == ' ' else self.column_separator,
+                comments=None,
+                ndmin=1
+            )
+        except ValueError:
+            return None
+        if len(table) != len(lines):
+            return None
+
+        columns = [table['col{0}'.format(i)] for i in range(len(dtypes))]
+        if self.key_in_column >= 0:
+            keys = columns.pop(self.key_in_column)
+        else:
+            keys = []
+        return len(table), keys, columns
+
+    @late
+    def can_convert_rows_with_numpy(self):
+        cls = type(self)
+        return (
+            cls.split_into_columns is TableFormattedText.split_into_columns and
+            cls.convert_string_to_number is TableFormattedText.convert_string_to_number and
+            cls.convert_string_to_long is TableFormattedText.convert_string_to_long
+        )
 
     def read_footer(self):
         while not self.cursor.is_at_end() and self.cursor.line().startswith(self.footer_prefix_string):
@@ -341,31 +433,85 @@ class TableFormattedText(base.FileFormatProcessor):
 
         while offset < max_row:
 
-            numbers = map(lambda quantity, unit: quantity[offset:offset+block_size] if unit is None else 
-                          quantity[offset:offset+block_size].value_in(unit), quantities, units)
-
-            columns = []
-
-            for x in numbers:
-                columns.append(list(map(self.convert_number_to_string, x)))
-
-            rows = []
-            for i in range(len(columns[0])):
-                row = [x[i] for x in columns]
-
-                if self.key_in_column >= 0:
-                    row.insert(self.key_in_column, self.convert_long_to_string(self.keys[i+offset]))
-
-                rows.append(row)
-
-            lines = [self.column_separator.join(x) for x in rows]
+            numbers = list(map(lambda quantity, unit: quantity[offset:offset+block_size] if unit is None else
+                          quantity[offset:offset+block_size].value_in(unit), quantities, units))
 
-            for x in lines:
-                self.stream.write(x)
-                self.stream.write('\n')
+            if self.can_convert_columns_with_format_string(numbers):
+                self.stream.write(self.convert_columns_with_format_string(numbers, offset))
+            else:
+                for x in self.convert_columns(numbers, offset):
+                    self.stream.write(x)
+                    self.stream.write('\n')
 
             offset += block_size
 
+    def convert_columns(self, numbers, offset):
+        columns = []
+
+        for x in numbers:
+            columns.append(list(map(self.convert_number_to_string, x)))
+
+        rows = []
+        for i in range(len(columns[0])):
+            row = [x[i] for x in columns]
+
+            if self.key_in_column >= 0:
+                row.insert(self.key_in_column, self.convert_long_to_string(self.keys[i+offset]))
+
+            rows.append(row)
+
+        return [self.column_separator.join(x) for x in rows]
+
+    def can_convert_columns_with_format_string(self, numbers):
+        cls = type(self)
+        if not (
+            cls.convert_number_to_string is TableFormattedText.convert_number_to_string and
+            cls.convert_long_to_string is TableFormattedText.convert_long_to_string
+        ):
+            return False
+        # python floats (from tolist) are formatted like float64
+        # numbers, not like the numbers of other float types
+        for x in numbers:
+            if not isinstance(x, numpy.ndarray) or is_quantity(x) or x.ndim != 1:
+                return False
+            if not (x.dtype.kind in 'biuSU' or x.dtype == numpy.float64):
+                return False
+        return len(numbers) > 0
+
+    def format_of_column(self, column):
+        if column.dtype.kind in 'SU':
+            return '%s'
+        elif self.is_precise:
+            return '%.18e'
+        elif column.dtype.kind == 'f':
+            # repr of a python float has all the digits needed to
+            # read back the same float64 number
+            return '%r'
+        else:
+            return '%s'
+
+    def convert_columns_with_format_string(self, numbers, offset):
+        """
+        Converts the columns to text with one format operation for
+        all rows, with one format per column (see format_of_column).
+        Floats are written with all their digits, unlike
+        convert_number_to_string.
+        """
+        columns = [numpy.asarray(x) for x in numbers]
+        formats = [self.format_of_column(x) for x in columns]
+        number_of_rows = len(columns[0])
+        if self.key_in_column >= 0:
+            formats.insert(self.key_in_column, '%s')
+            columns.insert(self.key_in_column, numpy.asarray(self.keys[offset:offset + number_of_rows]))
+
+        number_of_columns = len(columns)
+        values = [None] * (number_of_columns * number_of_rows)
+        for i, x in enumerate(columns):
+            values[i::number_of_columns] = x.tolist()
+        separator = self.column_separator.replace('%', '%%')
+        line_format = separator.join(formats) + '\n'
+        return (line_format * number_of_rows) % tuple(values)
+
     def write_row(self, row):
         units = self.attribute_types
         row = map(lambda quantity, unit: quantity if unit is None else quantity.value_in(unit), row, units)
@@ -647,12 +793,6 @@ class AmuseText(TableFormattedText):
         """
         return True
 
-    def convert_number_to_string(self, number):
-        if self.is_precise:
-            return '{:.18e}'.format(number)
-        else:
-            return str(number)
-
     @base.format_option
     def use_fractions(self):
         """
@@ -0,0 +1 @@
+from amuse.rfi.profiler import profile
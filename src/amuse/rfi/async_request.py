@@ -1,5 +1,6 @@
 import select
 import operator
+import functools
 
 from . import channel
 
@@ -413,6 +414,80 @@ class ASyncSocketRequest(AbstractASyncRequest):
             return False
         return True
 
+class ASyncPipelinedSocketRequest(ASyncSocketRequest):
+    """
+    Request for the reply on a message that was send before the
+    replies on the earlier messages were received. The worker
+    handles the messages in order, so the replies of the earlier
+    (pipelined) requests are received first.
+    """
+    
+    def __init__(self, message, socket, previous = None):
+        ASyncSocketRequest.__init__(self, message, socket)
+        self.previous = previous
+        self._exception = None
+
+    def _unfinished_previous_requests(self):
+        result = []
+        current = self.previous
+        while current is not None and not current.is_finished:
+            result.append(current)
+            current = current.previous
+        return list(reversed(result))
+        
+    def wait(self):
+        if self.is_finished:
+            return
+        
+        for x in self._unfinished_previous_requests():
+            try:
+                x.wait()
+            except Exception:
+                # reported when the result of x is requested
+                pass
+        self.previous = None
+        
+        # the reply is the next message on the socket, so no need to
+        # poll the socket first
+        self._is_finished = True
+        self._set_result()
+
+    def is_result_available(self):
+        if self.is_finished:
+            return self._is_result_set
+        
+        if self.previous is not None and not self.previous.is_finished:
+            return False
+            
+        return ASyncSocketRequest.is_result_available(self)
+        
+    def _set_result(self):
+        if self._called_set_result:
+            return
+        self._called_set_result=True
+        
+        try:
+            self.message.receive(self.socket)
+            
+            current = self.get_message
+            for x, args in self.result_handlers:
+                current = functools.partial(x, current, *args)
+            
+            self._result = current()
+            
+            self._is_result_set = True
+        except Exception as ex:
+            self._exception = ex
+            raise
+    
+    def result(self):
+        self.wait()
+        
+        if self._exception is not None:
+            raise self._exception
+        
+        return ASyncSocketRequest.result(self)
+        
 class FakeASyncRequest(AbstractASyncRequest):
         
     def __init__(self, result=None):
@@ -42,6 +42,27 @@ from amuse.config import parse_configmk_lines
 from amuse.rfi import slurm
 
 from . import async_request
+from . import profiler
+
+# set in the fourth flag of the header when the message has blobs,
+# the first bit of this flag is used for the shared memory of the
+# socket channel
+HAS_BLOBS_FLAG = 2
+
+def as_blob(value):
+    """
+    Returns the value of a 'bytes' parameter as a blob, a tuple of
+    buffers (bytes-like objects). A tuple is a blob, any other value
+    is send as a blob of one buffer.
+    """
+    if value is None:
+        return ()
+    if isinstance(value, tuple):
+        return value
+    return (value,)
+
+def size_of_blob(blob):
+    return sum(memoryview(x).nbytes for x in blob)
 
 class AbstractMessage(object):
     
@@ -70,6 +91,7 @@ class AbstractMessage(object):
         self.doubles = []
         self.strings = []
         self.booleans = []
+        self.blobs = []
 
         self.pack_data(dtype_to_arguments)
         
@@ -101,6 +123,7 @@ class AbstractMessage(object):
             ('float64', 'doubles'),
             ('bool', 'booleans'),
             ('string', 'strings'),
+            ('bytes', 'blobs'),
         )
     
     def receive(self, comm):
@@ -118,7 +141,9 @@ class MPIMessage(AbstractMessage):
         
     def receive(self, comm):
         header = self.receive_header(comm)
+        profiler.mark("compute")
         self.receive_content(comm, header)
+        profiler.mark("receive")
         
     def receive_header(self, comm):
         header = numpy.zeros(11, dtype='i')
@@ -133,6 +158,7 @@ class MPIMessage(AbstractMessage):
         self.big_endian = flags[0]
         self.error = flags[1]
         self.is_continued = flags[2]
+        has_blobs = header.view(dtype='b')[3] & HAS_BLOBS_FLAG
 
         self.call_id = header[1]
         self.function_id = header[2]
@@ -155,6 +181,11 @@ class MPIMessage(AbstractMessage):
         
         self.encoded_units = self.receive_doubles(comm, number_of_units)
         
+        if has_blobs:
+            self.blobs = self.receive_blobs(comm)
+        else:
+            self.blobs = []
+        
 
     def nonblocking_receive(self, comm):
         header = numpy.zeros(11, dtype='i')
@@ -229,6 +260,23 @@ class MPIMessage(AbstractMessage):
         else:
             return []
         
+    def receive_blobs(self, comm):
+        number_of_blobs = self.receive_ints(comm, 1)[0]
+        number_of_buffers = self.receive_ints(comm, number_of_blobs)
+        sizes = self.receive_longs(comm, sum(number_of_buffers))
+        
+        blobs = []
+        begin = 0
+        for count in number_of_buffers:
+            blob = []
+            for size in sizes[begin:begin + count]:
+                data = bytearray(size)
+                if size > 0:
+                    self.mpi_receive(comm, [data, MPI.BYTE])
+                blob.append(data)
+            blobs.append(tuple(blob))
+            begin += count
+        return blobs
     
     def send(self, comm):
         header = numpy.array([
@@ -250,8 +298,11 @@ class MPIMessage(AbstractMessage):
         flags[0] = self.big_endian
         flags[1] = self.error
         flags[2] = len(self.encoded_units) > 0
+        if len(self.blobs) > 0:
+            header.view(dtype='b')[3] = HAS_BLOBS_FLAG
         self.send_header(comm, header)
         self.send_content(comm)
+        profiler.mark("send")
     
     def send_header(self, comm, header):
         self.mpi_send(comm, [header, MPI.INT])
@@ -264,6 +315,8 @@ class MPIMessage(AbstractMessage):
         self.send_booleans(comm, self.booleans)
         self.send_strings(comm, self.strings)
         self.send_doubles(comm, self.encoded_units)
+        if len(self.blobs) > 0:
+            self.send_blobs(comm, self.blobs)
         
 
     def send_ints(self, comm, array):
@@ -305,6 +358,16 @@ class MPIMessage(AbstractMessage):
         if len(array) > 0:
             sendbuffer = numpy.array(array, dtype='b')
             self.mpi_send(comm, [sendbuffer, MPI.C_BOOL or MPI.BYTE])
+    
+    def send_blobs(self, comm, blobs):
+        # the buffers are send as they are, without copies
+        self.send_ints(comm, [len(blobs)])
+        self.send_ints(comm, [len(x) for x in blobs])
+        buffers = [memoryview(x).cast("B") for blob in blobs for x in blob]
+        self.send_longs(comm, [len(x) for x in buffers])
+        for x in buffers:
+            if len(x) > 0:
+                self.mpi_send(comm, [x, MPI.BYTE])
 
     def set_error(self, message):
         self.strings = [message]
@@ -382,6 +445,17 @@ class ClientSideMPIMessage(MPIMessage):
 MAPPING = {}
 
 def pack_array(array, length, dtype):
+    if dtype == 'bytes':
+        # a value is a blob (tuple) or a list with a blob per call
+        result = []
+        for x in array:
+            if isinstance(x, list):
+                result.extend(as_blob(y) for y in x)
+            elif length > 1:
+                raise exceptions.AmuseException("a 'bytes' value cannot be repeated for a call of length {0}".format(length))
+            else:
+                result.append(as_blob(x))
+        return result
     if dtype == 'string':
         if length == 1 and len(array) > 0 and isinstance(array[0], str):
             return array
@@ -744,10 +818,14 @@ Please do a 'make clean; make' in the root directory.
     def is_polling_supported(self):
         return False
         
+    def is_pipelining_supported(self):
+        return False
     
     def determine_length_from_data(self, dtype_to_arguments):
         def get_length(type_and_values):
             argument_type, argument_values = type_and_values
+            if argument_type == 'bytes':
+                return 1
             if argument_values:
                 result = 1
                 for argument_value in argument_values:
@@ -770,6 +848,7 @@ Please do a 'make clean; make' in the root directory.
         
         if call_count<=1:
             raise Exception("split message called with call_count<=1")
+        profiler.mark_split_message()
                 
         dtype_to_result = {}
         
@@ -1482,37 +1561,239 @@ m.run_mpi_channel('{2}')"""
         return True
 
 
-class SocketMessage(AbstractMessage):
-      
-    def _receive_all(self, nbytes, thesocket):
+class ReceiveBufferPool(object):
+    """
+    Pool of reusable receive buffers.
+    
+    A buffer is owned by the one that acquired it until it is given
+    back with release, the pool only keeps the released (free)
+    buffers. A buffer must not be used after it is released. The
+    pool keeps at most maximum_number_of_buffers free buffers, it is
+    not thread safe.
+    """
+    
+    MINIMUM_BUFFER_SIZE = 4096
+    
+    def __init__(self, maximum_number_of_buffers=16):
+        self.maximum_number_of_buffers = maximum_number_of_buffers
+        self.free_buffers = []
+        
+    def acquire(self, nbytes):
+        """
+        Returns a free buffer (an array of bytes) of at least nbytes
+        bytes, a new buffer is allocated if no free buffer is large
+        enough
+        """
+        for index, buffer in enumerate(self.free_buffers):
+            if len(buffer) >= nbytes:
+                return self.free_buffers.pop(index)
+        return numpy.empty(max(nbytes, self.MINIMUM_BUFFER_SIZE), dtype='uint8')
+    
+    def release(self, buffer):
+        if len(self.free_buffers) < self.maximum_number_of_buffers:
+            self.free_buffers.append(buffer)
+    
+    def clear(self):
+        self.free_buffers = []
+        
 
-        # logger.debug("receiving %d bytes", nbytes)
+class SharedMemoryBuffer(object):
+    """
+    POSIX shared memory segment to pass the data of the messages between
+    the python side and a worker on the same host (shm channel), the
+    socket is then only used for the headers.
+    
+    The segment starts with a control block (magic number, a flag set by
+    the worker when it has attached to the segment and the capacity),
+    followed by the data. Calls strictly alternate between the two sides,
+    so both directions use the same data area. The data is written before
+    the header is send, the header signals the other side that the data
+    is available.
+    """
+    
+    ENVIRONMENT_VARIABLE = "AMUSE_SHARED_MEMORY_NAME"
+    MAGIC = 0x414d5553
+    CONTROL_SIZE = 64
+    CONTROL_FORMAT = "iiq"
+    
+    def __init__(self, name=None, size=0):
+        from multiprocessing import shared_memory
         
-        result = []
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size + self.CONTROL_SIZE)
+            struct.pack_into(self.CONTROL_FORMAT, self.memory.buf, 0, self.MAGIC, 0, size)
+            self.is_owner = True
+        else:
+            self.memory = self._attach(shared_memory, name.lstrip("/"))
+            self.is_owner = False
+        
+        magic, _, capacity = struct.unpack_from(self.CONTROL_FORMAT, self.memory.buf, 0)
+        if magic != self.MAGIC:
+            self.memory.close()
+            raise exceptions.CodeException("shared memory {0} is not a message buffer".format(name))
+        self.capacity = min(capacity, self.memory.size - self.CONTROL_SIZE)
+        self.offset = self.CONTROL_SIZE
+    
+    @classmethod
+    def attach_from_environment(cls):
+        """
+        Attaches to the shared memory set up by the python side of the
+        channel (used in workers), returns None if no shared memory is
+        available. 
+        """
+        name = os.environ.pop(cls.ENVIRONMENT_VARIABLE, None)
+        if name is None:
+            return None
+        try:
+            result = cls(name=name)
+        except Exception as ex:
+            logger.warning("could not attach to shared memory %s, sending messages over the socket: %s", name, ex)
+            return None
+        result.mark_attached()
+        return result
+        
+    def _attach(self, shared_memory, name):
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13, the segment is owned by the other side,
+            # so make sure the resource tracker does not remove it
+            from multiprocessing import resource_tracker
+            result = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(result._name, "shared_memory")
+            return result
+        
+    @property
+    def name(self):
+        """name of the segment, as used in shm_open"""
+        return "/" + self.memory.name
+    
+    def is_attached(self):
+        return struct.unpack_from("i", self.memory.buf, 4)[0] == 1
+    
+    def mark_attached(self):
+        struct.pack_into("i", self.memory.buf, 4, 1)
         
-        while nbytes > 0:
-            chunk = min(nbytes, 10240)
-            data_bytes = thesocket.recv(chunk)
+    def write(self, views):
+        """
+        Copies the views into the data area, returns False (and copies
+        nothing) if the data does not fit.
+        """
+        if sum(len(x) for x in views) > self.capacity:
+            return False
+        offset = self.CONTROL_SIZE
+        for x in views:
+            self.memory.buf[offset:offset + len(x)] = x
+            offset += len(x)
+        return True
+        
+    def start_reading(self):
+        self.offset = self.CONTROL_SIZE
+    
+    def read_into(self, view):
+        nbytes = len(view)
+        if self.offset + nbytes > self.CONTROL_SIZE + self.capacity:
+            raise exceptions.CodeException("message data does not fit in the shared memory")
+        view[:] = self.memory.buf[self.offset:self.offset + nbytes]
+        self.offset += nbytes
+        
+    def close(self):
+        if self.memory is None:
+            return
+        self.memory.close()
+        if self.is_owner:
+            self.memory.unlink()
+        self.memory = None
+        
+
+class SocketMessage(AbstractMessage):
+    """
+    Message send over a socket. The flags and header are send as one
+    block of 44 bytes, followed by the (native endian) data of every
+    type. The data is send with a single sendmsg call over views of the
+    arrays and received directly into numpy arrays. If a buffer pool
+    is given the arrays are views on buffers acquired from the pool,
+    the owner of the message must call release_buffers when the
+    arrays are no longer used.
+    
+    If a shared memory buffer is given, the data is passed through the
+    shared memory whenever it fits (signalled with the fourth flag).
+    """
+    
+    MAXIMUM_NUMBER_OF_BUFFERS_PER_SEND = 64
+    
+    def __init__(self, *arguments, **keyword_arguments):
+        self.buffer_pool = keyword_arguments.pop("buffer_pool", None)
+        self.shared_memory = keyword_arguments.pop("shared_memory", None)
+        self._acquired_buffers = []
+        self._data_in_shared_memory = False
+        AbstractMessage.__init__(self, *arguments, **keyword_arguments)
+    
+    def __getstate__(self):
+        # the buffers are local to this process
+        result = self.__dict__.copy()
+        result["buffer_pool"] = None
+        result["shared_memory"] = None
+        result["_acquired_buffers"] = []
+        return result
+        
+    def _new_array(self, count, dtype):
+        if self.buffer_pool is None:
+            return numpy.empty(count, dtype=dtype)
+        dtype = numpy.dtype(dtype)
+        nbytes = count * dtype.itemsize
+        buffer = self.buffer_pool.acquire(nbytes)
+        self._acquired_buffers.append(buffer)
+        return buffer[:nbytes].view(dtype)
+    
+    def release_buffers(self):
+        """
+        Gives the buffers of the received arrays back to the pool,
+        the arrays must not be used after this call
+        """
+        for x in self._acquired_buffers:
+            self.buffer_pool.release(x)
+        self._acquired_buffers = []
             
-            if len(data_bytes) == 0:
+    def _receive_into(self, array, thesocket):
+        if self._data_in_shared_memory:
+            self.shared_memory.read_into(memoryview(array).cast("B"))
+        else:
+            self._receive_from_socket(array, thesocket)
+            
+    def _receive_from_socket(self, array, thesocket):
+        view = memoryview(array).cast("B")
+        nbytes = len(view)
+        received = 0
+        while received < nbytes:
+            count = thesocket.recv_into(view[received:])
+            if count == 0:
                 raise exceptions.CodeException("lost connection to code")
-            
-            result.append(data_bytes)
-            nbytes -= len(data_bytes)
-            # logger.debug("got %d bytes, result length = %d", len(data_bytes), len(result))
+            received += count
         
-        if len(result) > 0:
-            return type(result[0])().join(result)
+    def _receive_all(self, nbytes, thesocket):
+        result = bytearray(nbytes)
+        self._receive_into(result, thesocket)
+        return bytes(result)
+    
+    def _receive_array(self, thesocket, count, dtype):
+        if count > 0:
+            result = self._new_array(count, dtype)
+            self._receive_into(result, thesocket)
+            return result
         else:
-            return b""
+            return []
             
     def receive(self, socket):
         
         # logger.debug("receiving message")
         
-        header_bytes = self._receive_all(44, socket)
+        header = numpy.empty(11, dtype="i")
+        self._data_in_shared_memory = False
+        self._receive_from_socket(header, socket)
+        profiler.mark("compute")
         
-        flags = numpy.frombuffer(header_bytes, dtype="b", count=4, offset=0)
+        flags = header.view(dtype="b")[:4]
         
         if flags[0] != self.big_endian:
             raise exceptions.CodeException("endianness in message does not match native endianness")
@@ -1522,7 +1803,12 @@ class SocketMessage(AbstractMessage):
         else:
             self.error = False
         
-        header = numpy.copy(numpy.frombuffer(header_bytes, dtype="i", offset=0))
+        has_blobs = flags[3] & HAS_BLOBS_FLAG
+        if flags[3] & 1:
+            if self.shared_memory is None:
+                raise exceptions.CodeException("message data was send through shared memory, but no shared memory is attached")
+            self._data_in_shared_memory = True
+            self.shared_memory.start_reading()
         
         # logger.debug("receiving message with flags %s and header %s", flags, header)
 
@@ -1551,77 +1837,34 @@ class SocketMessage(AbstractMessage):
         self.booleans = self.receive_booleans(socket, number_of_booleans)
         self.strings = self.receive_strings(socket, number_of_strings)
         self.encoded_units = self.receive_doubles(socket, number_of_units)
+        if has_blobs:
+            self.blobs = self.receive_blobs(socket)
+        else:
+            self.blobs = []
+        profiler.mark("receive")
         
         # logger.debug("message received")
         
 
     def receive_ints(self, socket, count):
-        if count > 0:
-            nbytes = count * 4  # size of int
-            
-            data_bytes = self._receive_all(nbytes, socket)
-            
-            result = numpy.copy(numpy.frombuffer(data_bytes, dtype='int32'))
-            
-            return result
-        else:
-            return []        
+        return self._receive_array(socket, count, 'int32')
             
     def receive_longs(self, socket, count):
-        if count > 0:
-            nbytes = count * 8  # size of long
-            
-            data_bytes = self._receive_all(nbytes, socket)
-            
-            result = numpy.copy(numpy.frombuffer(data_bytes, dtype='int64'))
-            
-            return result
-        else:
-            return []
- 
+        return self._receive_array(socket, count, 'int64')
         
     def receive_floats(self, socket, count):
-        if count > 0:
-            nbytes = count * 4  # size of float
-            
-            data_bytes = self._receive_all(nbytes, socket)
-            
-            result = numpy.copy(numpy.frombuffer(data_bytes, dtype='f4'))
-            
-            return result
-        else:
-            return []
-    
+        return self._receive_array(socket, count, 'f4')
           
     def receive_doubles(self, socket, count):
-        if count > 0:
-            nbytes = count * 8  # size of double
-            
-            data_bytes = self._receive_all(nbytes, socket)
-            
-            result = numpy.copy(numpy.frombuffer(data_bytes, dtype='f8'))
-            
-            return result
-        else:
-            return []
-        
+        return self._receive_array(socket, count, 'f8')
 
     def receive_booleans(self, socket, count):
-        if count > 0:
-            nbytes = count * 1  # size of boolean/byte
-            
-            data_bytes = self._receive_all(nbytes, socket)
-            
-            result = numpy.copy(numpy.frombuffer(data_bytes, dtype='b'))
-            
-            return result
-        else:
-            return []
-    
+        return self._receive_array(socket, count, 'b')
             
     def receive_strings(self, socket, count):
         if count > 0:
-            lengths = self.receive_ints(socket, count)
+            lengths = numpy.empty(count, dtype='int32')
+            self._receive_into(lengths, socket)
             
             total = lengths.sum() + len(lengths)
                         
@@ -1636,16 +1879,49 @@ class SocketMessage(AbstractMessage):
             return numpy.array(strings)
         else:
             return []
+    
+    def receive_blobs(self, socket):
+        # every buffer is received in its own bytearray (not in the
+        # buffer pool), objects unpickled from the blob can keep
+        # references to the buffers
+        number_of_blobs = int(self._receive_array(socket, 1, 'int32')[0])
+        number_of_buffers = [int(x) for x in self._receive_array(socket, number_of_blobs, 'int32')]
+        sizes = [int(x) for x in self._receive_array(socket, sum(number_of_buffers), 'int64')]
+        
+        blobs = []
+        begin = 0
+        for count in number_of_buffers:
+            blob = []
+            for size in sizes[begin:begin + count]:
+                data = bytearray(size)
+                self._receive_into(data, socket)
+                blob.append(data)
+            blobs.append(tuple(blob))
+            begin += count
+        return blobs
             
     def nonblocking_receive(self, socket):
         return async_request.ASyncSocketRequest(self, socket)
     
+    def pipelined_receive(self, socket, previous_request):
+        return async_request.ASyncPipelinedSocketRequest(self, socket, previous_request)
+    
+    def shared_memory_for_reply(self):
+        """
+        The reply is send the same way as this message, the shared
+        memory holds only one message so it cannot be used when the
+        sender did not wait for the reply on its previous message
+        """
+        if self._data_in_shared_memory:
+            return self.shared_memory
+        else:
+            return None
+    
     
     def send(self, socket):
         
-        flags = numpy.array([self.big_endian, self.error, len(self.encoded_units) > 0, False], dtype="b")
-
         header = numpy.array([
+            0,
             self.call_id,
             self.function_id,
             self.call_count,
@@ -1657,39 +1933,68 @@ class SocketMessage(AbstractMessage):
             len(self.strings),
             len(self.encoded_units),
         ], dtype='i')
+        header.view(dtype="b")[:4] = [self.big_endian, self.error, len(self.encoded_units) > 0, HAS_BLOBS_FLAG if len(self.blobs) > 0 else 0]
         
         # logger.debug("sending message with flags %s and header %s", flags, header)
         
-        socket.sendall(flags.tobytes())
-
-        socket.sendall(header.tobytes())
-
-        self.send_ints(socket, self.ints)
-        self.send_longs(socket, self.longs)
-        self.send_floats(socket, self.floats)
-        self.send_doubles(socket, self.doubles)
-        self.send_booleans(socket, self.booleans)
-        self.send_strings(socket, self.strings)
-        self.send_doubles(socket, self.encoded_units)
+        buffers = []
+        buffers.extend(self.ints_buffers(self.ints))
+        buffers.extend(self.longs_buffers(self.longs))
+        buffers.extend(self.floats_buffers(self.floats))
+        buffers.extend(self.doubles_buffers(self.doubles))
+        buffers.extend(self.booleans_buffers(self.booleans))
+        buffers.extend(self.strings_buffers(self.strings))
+        buffers.extend(self.doubles_buffers(self.encoded_units))
+        buffers.extend(self.blobs_buffers(self.blobs))
+        
+        if self.shared_memory is not None and self.shared_memory.write(self._as_views(buffers)):
+            header.view(dtype="b")[3] |= 1
+            self._send_buffers(socket, [header])
+        else:
+            self._send_buffers(socket, [header] + buffers)
+        profiler.mark("send")
         
         # logger.debug("message send")
-
-    def send_doubles(self, socket, array):
+    
+    def _as_views(self, buffers):
+        views = [memoryview(x).cast("B") for x in buffers]
+        return [x for x in views if len(x) > 0]
+        
+    def _send_buffers(self, socket, buffers):
+        views = self._as_views(buffers)
+        
+        if not hasattr(socket, "sendmsg"):
+            for x in views:
+                socket.sendall(x)
+            return
+        
+        first = 0
+        while first < len(views):
+            nbytes = socket.sendmsg(views[first:first + self.MAXIMUM_NUMBER_OF_BUFFERS_PER_SEND])
+            while nbytes > 0:
+                if nbytes >= len(views[first]):
+                    nbytes -= len(views[first])
+                    first += 1
+                else:
+                    views[first] = views[first][nbytes:]
+                    nbytes = 0
+    
+    def _array_buffers(self, array, dtype):
         if len(array) > 0:
-            data_buffer = numpy.array(array, dtype='f8')
-            socket.sendall(data_buffer.tobytes())
+            return [numpy.ascontiguousarray(array, dtype=dtype)]
+        else:
+            return []
+    
+    def doubles_buffers(self, array):
+        return self._array_buffers(array, 'f8')
             
-    def send_ints(self, socket, array):
-        if len(array) > 0:
-            data_buffer = numpy.array(array, dtype='int32')
-            socket.sendall(data_buffer.tobytes())
+    def ints_buffers(self, array):
+        return self._array_buffers(array, 'int32')
             
-    def send_floats(self, socket, array):
-        if len(array) > 0:
-            data_buffer = numpy.array(array, dtype='f4')
-            socket.sendall(data_buffer.tobytes())
+    def floats_buffers(self, array):
+        return self._array_buffers(array, 'f4')
             
-    def send_strings(self, socket, array):
+    def strings_buffers(self, array):
         if len(array) > 0:
             
             lengths = numpy.array( [len(s) for s in array] ,dtype='int32')
@@ -1698,18 +2003,45 @@ class SocketMessage(AbstractMessage):
             if len(chars) != lengths.sum()+len(lengths):
                 raise Exception("send_strings size mismatch {0} vs {1}".format( len(chars) , lengths.sum()+len(lengths) ))
 
-            self.send_ints(socket, lengths)
-            socket.sendall(chars)
+            return [lengths, chars]
+        else:
+            return []
+        
+    def booleans_buffers(self, array):
+        return self._array_buffers(array, 'b')
+    
+    def blobs_buffers(self, blobs):
+        # the buffers of the blobs are send as they are, without copies
+        if len(blobs) > 0:
+            buffers = [memoryview(x).cast("B") for blob in blobs for x in blob]
+            return [
+                numpy.array([len(blobs)], dtype='int32'),
+                numpy.array([len(x) for x in blobs], dtype='int32'),
+                numpy.array([len(x) for x in buffers], dtype='int64'),
+            ] + buffers
+        else:
+            return []
+
+    def longs_buffers(self, array):
+        return self._array_buffers(array, 'int64')
+
+    def send_doubles(self, socket, array):
+        self._send_buffers(socket, self.doubles_buffers(array))
+            
+    def send_ints(self, socket, array):
+        self._send_buffers(socket, self.ints_buffers(array))
+            
+    def send_floats(self, socket, array):
+        self._send_buffers(socket, self.floats_buffers(array))
+            
+    def send_strings(self, socket, array):
+        self._send_buffers(socket, self.strings_buffers(array))
         
     def send_booleans(self, socket, array):
-        if len(array) > 0:
-            data_buffer = numpy.array(array, dtype='b')
-            socket.sendall(data_buffer.tobytes())
+        self._send_buffers(socket, self.booleans_buffers(array))
 
     def send_longs(self, socket, array):
-        if len(array) > 0:
-            data_buffer = numpy.array(array, dtype='int64')
-            socket.sendall(data_buffer.tobytes())
+        self._send_buffers(socket, self.longs_buffers(array))
 
 
 class SocketChannel(AbstractMessageChannel):
@@ -1748,6 +2080,8 @@ class SocketChannel(AbstractMessageChannel):
         self._is_inuse = False
         self._communicated_splitted_message = False
         self.socket = None
+        self._shared_memory = None
+        self._last_pipelined_request = None
     
         self.remote_env=remote_env
 
@@ -1956,7 +2290,7 @@ class SocketChannel(AbstractMessageChannel):
         else:
           logger.debug("starting process with command `%s`, arguments `%s` and environment '%s'", command, arguments, os.environ)
           # ~ print(arguments)
-          self.process = Popen(arguments, executable=command, stdin=PIPE, stdout=None, stderr=None, close_fds=self.close_fds)
+          self.process = Popen(arguments, executable=command, stdin=PIPE, stdout=None, stderr=None, close_fds=self.close_fds, env=self.worker_environment())
 
         logger.debug("waiting for connection from worker")
         self.socket, address = self.accept_worker_connection(server_socket, self.process)
@@ -1972,6 +2306,18 @@ class SocketChannel(AbstractMessageChannel):
         # logger.info("worker %s initialized", self.name_of_the_worker)
         
 
+    def worker_environment(self):
+        """
+        Environment of the worker process, None to inherit the
+        environment of this process
+        """
+        if SharedMemoryBuffer.ENVIRONMENT_VARIABLE in os.environ:
+            # do not pass on the shared memory of a worker running this code
+            result = dict(os.environ)
+            del result[SharedMemoryBuffer.ENVIRONMENT_VARIABLE]
+            return result
+        return None
+        
     @option(type="boolean", sections=("sockets_channel",))
     def close_fds(self):
         """close open file descriptors when spawning child process"""
@@ -2061,7 +2407,7 @@ class SocketChannel(AbstractMessageChannel):
         if call_count > self.max_message_length:
             self.split_message(call_id, function_id, call_count, dtype_to_arguments, encoded_units)
         else:
-            message = SocketMessage(call_id, function_id, call_count, dtype_to_arguments, encoded_units = encoded_units)
+            message = SocketMessage(call_id, function_id, call_count, dtype_to_arguments, encoded_units = encoded_units, shared_memory = self._shared_memory)
             message.send(self.socket)
 
             self._is_inuse = True
@@ -2076,7 +2422,7 @@ class SocketChannel(AbstractMessageChannel):
             del self._merged_results_splitted_message
             return x
         
-        message = SocketMessage()
+        message = SocketMessage(shared_memory=self._shared_memory)
         
         message.receive(self.socket)
 
@@ -2100,36 +2446,71 @@ class SocketChannel(AbstractMessageChannel):
             return message.to_result(handle_as_array)
 
     def nonblocking_recv_message(self, call_id, function_id, handle_as_array, has_units=False):
-        request = SocketMessage().nonblocking_receive(self.socket)
+        request = SocketMessage(shared_memory=self._shared_memory).nonblocking_receive(self.socket)
     
         def handle_result(function):
             self._is_inuse = False
-    
-            message = function()
+            return self._result_of_asynchronous_reply(function(), call_id, function_id, handle_as_array, has_units)
 
-            if message.error:
-                error_message=message.strings[0] if len(message.strings)>0 else "no error message"
-                if message.call_id != call_id or message.function_id != function_id:
-                    self.stop() 
-                    error_message+=" - code probably died, sorry."
-                raise exceptions.CodeException("Error in (asynchronous) communication with worker: " + error_message)
-        
-            if message.call_id != call_id:
-                self.stop()
-                raise exceptions.CodeException('Received reply for call id {0} but expected {1}'.format(message.call_id, call_id))
+        request.add_result_handler(handle_result)
     
-            if message.function_id != function_id:
-                self.stop()
-                raise exceptions.CodeException('Received reply for function id {0} but expected {1}'.format(message.function_id, function_id))
-                
-            if has_units:
-                return message.to_result(handle_as_array), message.encoded_units
-            else:
-                return message.to_result(handle_as_array)
+        return request
+    
+    def is_pipelining_supported(self):
+        return True
+    
+    def pipeline_message(self, call_id, function_id, handle_as_array, dtype_to_arguments={}, encoded_units = (), has_units=False):
+        """
+        Sends a message without waiting for the replies on the earlier
+        pipelined messages and returns the request for its reply. The
+        data is always send over the socket (the shared memory can
+        only hold one message), messages that must be split are not
+        supported.
+        """
+        if self.is_inuse():
+            raise exceptions.CodeException("You've tried to pipeline a message to a code that is already handling a (not pipelined) message, this is not correct")
+        if self.socket is None:
+            raise exceptions.CodeException("You've tried to send a message to a code that is not running")
+        
+        call_count = self.determine_length_from_data(dtype_to_arguments)
+        if call_count > self.max_message_length:
+            raise exceptions.CodeException("Message of length {0} is too long to be pipelined".format(call_count))
+        
+        message = SocketMessage(call_id, function_id, call_count, dtype_to_arguments, encoded_units = encoded_units)
+        message.send(self.socket)
+        
+        request = SocketMessage().pipelined_receive(self.socket, self._last_pipelined_request)
+        self._last_pipelined_request = request
+        
+        def handle_result(function):
+            if self._last_pipelined_request is request:
+                self._last_pipelined_request = None
+            return self._result_of_asynchronous_reply(function(), call_id, function_id, handle_as_array, has_units)
 
         request.add_result_handler(handle_result)
     
         return request
+    
+    def _result_of_asynchronous_reply(self, message, call_id, function_id, handle_as_array, has_units):
+        if message.error:
+            error_message=message.strings[0] if len(message.strings)>0 else "no error message"
+            if message.call_id != call_id or message.function_id != function_id:
+                self.stop() 
+                error_message+=" - code probably died, sorry."
+            raise exceptions.CodeException("Error in (asynchronous) communication with worker: " + error_message)
+    
+        if message.call_id != call_id:
+            self.stop()
+            raise exceptions.CodeException('Received reply for call id {0} but expected {1}'.format(message.call_id, call_id))
+
+        if message.function_id != function_id:
+            self.stop()
+            raise exceptions.CodeException('Received reply for function id {0} but expected {1}'.format(message.function_id, function_id))
+            
+        if has_units:
+            return message.to_result(handle_as_array), message.encoded_units
+        else:
+            return message.to_result(handle_as_array)
 
     @option(type="int", sections=("channel",))
     def max_message_length(self):
@@ -2161,6 +2542,59 @@ class SocketChannel(AbstractMessageChannel):
         os.makedirs(directory)
 
 
+class SharedMemoryChannel(SocketChannel):
+    """
+    Channel to a worker on the same host, the worker is started and
+    connected as in the SocketChannel, but the data of the messages
+    is passed through a POSIX shared memory segment and the socket is
+    only used for the headers. Messages that do not fit in the segment
+    (see shared_memory_size) are send over the socket, as are all
+    messages for workers without shared memory support.
+    """
+    
+    @option(type="int", sections=("channel",))
+    def shared_memory_size(self):
+        """size in bytes of the shared memory used for the data of the messages"""
+        return 64 * 1024 * 1024
+    
+    def worker_environment(self):
+        if self._shared_memory is None:
+            return SocketChannel.worker_environment(self)
+        result = dict(os.environ)
+        result[SharedMemoryBuffer.ENVIRONMENT_VARIABLE] = self._shared_memory.name
+        return result
+        
+    def start(self):
+        if self.remote:
+            logger.warning("shared memory is not available for workers on another host, using sockets")
+            SocketChannel.start(self)
+            return
+        
+        self._shared_memory = SharedMemoryBuffer(size=self.shared_memory_size)
+        try:
+            SocketChannel.start(self)
+        except:
+            self._close_shared_memory()
+            raise
+        
+        # the worker attaches to the shared memory before it connects
+        if not self._shared_memory.is_attached():
+            logger.info("worker %s does not support shared memory, using sockets", self.name_of_the_worker)
+            self._close_shared_memory()
+    
+    def stop(self):
+        SocketChannel.stop(self)
+        self._close_shared_memory()
+        
+    def _close_shared_memory(self):
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+            self._shared_memory = None
+    
+    def is_using_shared_memory(self):
+        return self._shared_memory is not None
+            
+
 class OutputHandler(threading.Thread):
     
     def __init__(self, stream, port):
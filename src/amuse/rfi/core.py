@@ -27,8 +27,12 @@ from amuse.rfi.channel import MpiChannel
 from amuse.rfi.channel import MultiprocessingMPIChannel
 from amuse.rfi.channel import DistributedChannel
 from amuse.rfi.channel import SocketChannel
+from amuse.rfi.channel import SharedMemoryChannel
 from amuse.rfi.channel import is_mpd_running
 from amuse.rfi.async_request import DependentASyncRequest
+from amuse.rfi.async_request import FakeASyncRequest
+from amuse.rfi import profiler
+from amuse.rfi import worker_pool
 
 try:
     from amuse import config
@@ -68,6 +72,7 @@ def _typecode_to_datatype(typecode):
         's':'string',
         'b':'bool',
         'l':'int64',
+        'y':'bytes',
     }
     if typecode in mapping:
         return mapping[typecode]
@@ -114,15 +119,19 @@ class CodeFunction(object):
         
         call_id = random.randint(0, 1000)
         
+        record = profiler.begin_call(self.interface, self.specification.name, dtype_to_values)
         try:
             self.interface.channel.send_message(call_id, self.specification.id, dtype_to_arguments = dtype_to_values)
+            profiler.mark("send")
             
             dtype_to_result = self.interface.channel.recv_message(call_id, self.specification.id, handle_as_array)
         except Exception as ex:
+            profiler.end_call(record)
             CODE_LOG.info("Exception when calling function '{0}', of code '{1}', exception was '{2}'".format(self.specification.name, type(self.interface).__name__, ex))
             raise exceptions.CodeException("Exception when calling function '{0}', of code '{1}', exception was '{2}'".format(self.specification.name, type(self.interface).__name__, ex))
         
         result = self.converted_results(dtype_to_result, handle_as_array)
+        profiler.end_call(record, dtype_to_result)
         
         if not self.owner is None:
             CODE_LOG.info("end call '%s.%s'",self.owner.__name__, self.specification.name)
@@ -135,17 +144,27 @@ class CodeFunction(object):
         handle_as_array = self.must_handle_as_array(dtype_to_values)
         
         call_id = random.randint(0, 1000)
-              
-        self.interface.channel.send_message(call_id, self.specification.id, dtype_to_arguments = dtype_to_values)
         
-        request = self.interface.channel.nonblocking_recv_message(call_id, self.specification.id, handle_as_array)
+        record = profiler.begin_asynchronous_call(self.interface, self.specification.name, dtype_to_values)
+        if self.interface.call_batch is not None:
+            request = self.interface.call_batch.pipeline_call(self, call_id, handle_as_array, dtype_to_values)
+        else:
+            self.interface.channel.send_message(call_id, self.specification.id, dtype_to_arguments = dtype_to_values)
+            
+            request = self.interface.channel.nonblocking_recv_message(call_id, self.specification.id, handle_as_array)
+        if record is not None:
+            record.mark("send")
 
         def handle_result(function):
             try:
                 dtype_to_result = function()
             except Exception as ex:
+                profiler.end_asynchronous_call(record)
                 raise exceptions.CodeException("Exception when calling legacy code '{0}', exception was '{1}'".format(self.specification.name, ex))
+            if record is not None:
+                record.mark("compute")
             result=self.converted_results(dtype_to_result, handle_as_array)
+            profiler.end_asynchronous_call(record, dtype_to_result)
             return result
             
         request.add_result_handler(handle_result)
@@ -153,7 +172,7 @@ class CodeFunction(object):
         return request
 
     def asynchronous(self, *arguments_list, **keyword_arguments):
-        if self.interface.async_request is not None:
+        if self.interface.async_request is not None and self.interface.call_batch is None:
             def factory():
               return self._async_request(*arguments_list, **keyword_arguments)
             request=DependentASyncRequest( self.interface.async_request, factory) 
@@ -177,6 +196,8 @@ class CodeFunction(object):
     
     def must_handle_as_array(self, keyword_arguments):
         for argument_type, argument_values in keyword_arguments.items():
+            if argument_type == 'bytes':
+                continue
             if argument_values:
                 count = 0
                 for argument_value in argument_values:
@@ -189,6 +210,25 @@ class CodeFunction(object):
                     return True
         return False
     
+    def estimated_reply_size(self, call_count):
+        """
+        Returns the size in bytes of the reply message for a call of
+        the given length, or None if it cannot be determined
+        beforehand (for string outputs)
+        """
+        datatypes = [x.datatype for x in self.specification.output_parameters]
+        if not self.specification.result_type is None:
+            datatypes.append(self.specification.result_type)
+        
+        result = 11 * 4
+        for datatype in datatypes:
+            if datatype == 'string' or datatype == 'bytes':
+                return None
+            result += call_count * numpy.dtype(datatype).itemsize
+        if self.specification.has_units:
+            result += len(self.specification.output_parameters) * 9 * 8
+        return result
+    
     """
     Get list of result keys
     """
@@ -628,7 +668,7 @@ class LegacyFunctionSpecification(object):
                 
     
     def __str__(self):
-        typecode_to_name = {'int32':'int', 'float64':'double', 'float32':'float', 'string':'string', 'int64':'long', 'bool':'bool' }
+        typecode_to_name = {'int32':'int', 'float64':'double', 'float32':'float', 'string':'string', 'int64':'long', 'bool':'bool', 'bytes':'bytes' }
         p = print_out()
         p + 'function: '
         if self.result_type is None:
@@ -690,6 +730,10 @@ def stop_interfaces(exceptions = []):
     All instantiated interfaces will become unstable
     after this call!
     """
+    # the idle workers of the pool are stopped first, while their
+    # channels are still open, workers of codes that are stopped
+    # after this are not returned to the stopped pool
+    worker_pool.stop_worker_pool()
     for reference in reversed(CodeInterface.instances):
         x = reference()
         if not x is None and x.__class__.__name__ not in exceptions:
@@ -733,6 +777,7 @@ class CodeInterface(OptionalAttributes):
         OptionalAttributes.__init__(self, **options)
         
         self.async_request=None
+        self.call_batch=None
 
         self.instances.append(weakref.ref(self))
         #
@@ -764,16 +809,35 @@ class CodeInterface(OptionalAttributes):
         if interpreter_executable is None and self.use_interpreter:
             interpreter_executable = self.interpreter
 
-        self.channel = self.channel_factory(name_of_the_worker, type(self), interpreter_executable = interpreter_executable, **options)
+        self.channel = None
+        if self.use_worker_pool:
+            key = self._key_of_worker_pool(name_of_the_worker, interpreter_executable, options)
+            self.channel = worker_pool.get_worker_pool().acquire(key)
+            if self.channel is not None:
+                self._check_if_worker_is_up_to_date()
         
-        self._check_if_worker_is_up_to_date()
+        if self.channel is None:
+            self.channel = self.channel_factory(name_of_the_worker, type(self), interpreter_executable = interpreter_executable, **options)
+            
+            self._check_if_worker_is_up_to_date()
 
-        self.channel.redirect_stdout_file = self.redirection_filenames[0]
-        self.channel.redirect_stderr_file = self.redirection_filenames[1]
-        self.channel.polling_interval_in_milliseconds = self.polling_interval_in_milliseconds
-        #~ self.channel.initialize_mpi = self.initialize_mpi
-        
-        self.channel.start()
+            self.channel.redirect_stdout_file = self.redirection_filenames[0]
+            self.channel.redirect_stderr_file = self.redirection_filenames[1]
+            self.channel.polling_interval_in_milliseconds = self.polling_interval_in_milliseconds
+            #~ self.channel.initialize_mpi = self.initialize_mpi
+            
+            self.channel.start()
+        
+        if self.use_worker_pool:
+            self._worker_pool_key = key
+            worker_pool.get_worker_pool().start_workers(
+                key,
+                self._new_worker_of_pool_function(name_of_the_worker, interpreter_executable, options),
+                size = self.worker_pool_size,
+                maximum_size = self.worker_pool_maximum_size,
+                maximum_idle_time = self.worker_pool_maximum_idle_time,
+                can_start_in_background = self.channel.is_multithreading_supported()
+            )
 
         # change to the working directory
         if self.working_directory:
@@ -793,10 +857,157 @@ class CodeInterface(OptionalAttributes):
     def wait(self):
         if self.async_request is not None:
             self.async_request.wait()
+    
+    def batch(self):
+        """
+        Returns a context in which the asynchronous calls to the
+        code are send without waiting for the replies on the earlier
+        calls. The worker handles the calls in order, so a batch of
+        calls costs (about) one round trip instead of one per call.
+        Calls made without ``asynchronous`` wait for the pending
+        replies first. When the channel does not support this, the
+        calls are handled as normal asynchronous calls.
+        
+        .. code-block:: python
+        
+            with code.batch():
+                requests = [code.get_mass.asynchronous(i) for i in range(10)]
+            masses = [x.result() for x in requests]
+        """
+        return CodeCallBatch(self)
+    
+    def call_many(self, calls):
+        """
+        Calls several functions of the code in one batch (see
+        ``batch``) and returns the list of results, in the order
+        of the calls. Every call is a function (or the name of a
+        function), or a tuple of the function, a sequence of
+        arguments and an optional dictionary of keyword arguments.
+        
+        .. code-block:: python
+        
+            mass, position = code.call_many([
+                (code.get_mass, (1,)),
+                ("get_position", (1,)),
+            ])
+        """
+        requests = []
+        with self.batch():
+            for call in calls:
+                if isinstance(call, tuple):
+                    function, arguments_list = call[0], call[1]
+                    keyword_arguments = call[2] if len(call) > 2 else {}
+                else:
+                    function, arguments_list, keyword_arguments = call, (), {}
+                if isinstance(function, str):
+                    function = getattr(self, function)
+                requests.append(function.asynchronous(*arguments_list, **keyword_arguments))
+        return [x.result() for x in requests]
+    
+    @option(type="int", sections=("channel",))
+    def maximum_size_of_pending_replies(self):
+        """
+        Maximum size in bytes of the replies a batch of calls waits
+        on, must fit in the buffers of the socket to the worker as
+        the worker cannot receive the next call while its reply is
+        not read
+        """
+        return 32768
+
+    @option(type="boolean", sections=("channel",))
+    def batch_calls_of_getters(self):
+        """
+        If True, the getters of the attributes of particle sets
+        and grids and of the parameters are called in one batch.
+        Defaults to True for workers on another host only, for
+        a worker on the same host a round trip is too cheap to
+        make up for the extra bookkeeping of a batch
+        """
+        return getattr(self.channel, "remote", False)
 
     @option(type="int", sections=("channel",))
     def polling_interval_in_milliseconds(self):
         return 0
+    
+    @option(type="boolean", sections=("channel",))
+    def use_worker_pool(self):
+        """
+        Take the worker from the pool of started workers and
+        return it to the pool when the code is stopped, see
+        amuse.rfi.worker_pool
+        """
+        return False
+    
+    @option(type="int", sections=("channel",))
+    def worker_pool_size(self):
+        """Number of workers of this kind to keep ready in the pool"""
+        return 2
+    
+    @option(type="int", sections=("channel",))
+    def worker_pool_maximum_size(self):
+        """Maximum number of idle workers of this kind in the pool"""
+        return 8
+    
+    @option(type="float", sections=("channel",))
+    def worker_pool_maximum_idle_time(self):
+        """Idle workers are stopped after this time (in seconds)"""
+        return 300.0
+    
+    def _key_of_worker_pool(self, name_of_the_worker, interpreter_executable, options):
+        # workers are only shared between instances started in the same way
+        return (
+            self.channel_factory,
+            type(self),
+            name_of_the_worker,
+            interpreter_executable,
+            tuple(self.redirection_filenames),
+            self.polling_interval_in_milliseconds,
+            tuple(sorted((name, repr(value)) for name, value in options.items())),
+        )
+    
+    def _new_worker_of_pool_function(self, name_of_the_worker, interpreter_executable, options):
+        # the function is called on the thread of the pool, so it must not
+        # refer to this instance
+        channel_factory = self.channel_factory
+        interface_class = type(self)
+        redirection_filenames = self.redirection_filenames
+        polling_interval_in_milliseconds = self.polling_interval_in_milliseconds
+        options = dict(options)
+        
+        def new_worker():
+            channel = channel_factory(name_of_the_worker, interface_class, interpreter_executable = interpreter_executable, **options)
+            channel.redirect_stdout_file = redirection_filenames[0]
+            channel.redirect_stderr_file = redirection_filenames[1]
+            channel.polling_interval_in_milliseconds = polling_interval_in_milliseconds
+            channel.start()
+            return channel
+        return new_worker
+    
+    def reset_worker_for_pool(self):
+        """
+        Called before the worker is returned to the worker pool,
+        must leave the code as in a newly started worker. Returns
+        False if the worker cannot be reused.
+        
+        The code is initialized and cleaned up, so that codes that
+        are stopped with and without a cleanup_code call end in
+        the same state. Override this for codes that need
+        another reset.
+        """
+        if not (hasattr(self, 'initialize_code') and hasattr(self, 'cleanup_code')):
+            return True
+        return self.initialize_code() == 0 and self.cleanup_code() == 0
+    
+    def _return_worker_to_pool(self):
+        key = getattr(self, '_worker_pool_key', None)
+        if key is None:
+            return False
+        try:
+            is_reset = self.reset_worker_for_pool()
+        except Exception as ex:
+            CODE_LOG.info("could not reset worker of code '{0}', exception was '{1}'".format(type(self).__name__, ex))
+            is_reset = False
+        return is_reset and worker_pool.get_worker_pool().release(key, self.channel)
         
     @classmethod
     def ensure_stop_interface_at_exit(cls):
@@ -843,6 +1054,8 @@ class CodeInterface(OptionalAttributes):
                 if self.reuse_worker:
                     self.store_reusable_channel(self.channel)
                     self.channel = None
+                elif self._return_worker_to_pool():
+                    self.channel = None
                 else:
                     self._stop_worker()
                     self.channel.stop()
@@ -916,7 +1129,7 @@ class CodeInterface(OptionalAttributes):
     def stop(self):
         self._stop()
     
-    @option(choices=['mpi','remote','distributed', 'sockets', 'local'], sections=("channel",))
+    @option(choices=['mpi','remote','distributed', 'sockets', 'shm', 'local'], sections=("channel",))
     def channel_type(self):
         return 'mpi'
     
@@ -971,6 +1184,8 @@ class CodeInterface(OptionalAttributes):
             return DistributedChannel
         elif self.channel_type == 'sockets':
             return SocketChannel
+        elif self.channel_type == 'shm':
+            return SharedMemoryChannel
         elif self.channel_type == 'local':
             return LocalChannel
         else:
@@ -1062,6 +1277,85 @@ class CodeInterface(OptionalAttributes):
         function.internal_provided=True
         return function
 
+class CodeCallBatch(object):
+    """
+    Sends the asynchronous calls to a code without waiting for
+    the replies on the earlier calls, see ``CodeInterface.batch``.
+    
+    The replies are read in order when a result is requested,
+    or when the replies still to be read would not fit in the
+    buffers of the channel anymore.
+    """
+    
+    def __init__(self, interface):
+        self.interface = interface
+        self.is_active = False
+        self.pending_requests = []
+        self.size_of_pending_replies = 0
+    
+    @property
+    def is_supported(self):
+        return self.interface.channel.is_pipelining_supported()
+    
+    @property
+    def is_used_for_getters(self):
+        return self.is_supported and self.interface.batch_calls_of_getters
+        
+    def __enter__(self):
+        if self.interface.call_batch is None and self.is_supported:
+            self.interface.wait()
+            self.interface.call_batch = self
+            self.is_active = True
+        return self
+        
+    def __exit__(self, exception_type, exception_value, traceback):
+        if self.is_active:
+            self.interface.call_batch = None
+            self.is_active = False
+            self.wait()
+    
+    def wait(self):
+        self.make_room_for_reply(self.maximum_size_of_pending_replies + 1)
+    
+    @late
+    def maximum_size_of_pending_replies(self):
+        return self.interface.maximum_size_of_pending_replies
+        
+    def pipeline_call(self, function, call_id, handle_as_array, dtype_to_arguments, encoded_units = (), has_units = False):
+        channel = self.interface.channel
+        function_id = function.specification.id
+        
+        call_count = channel.determine_length_from_data(dtype_to_arguments)
+        if call_count > channel.max_message_length:
+            # message will be split in several messages, cannot be pipelined
+            self.wait()
+            channel.send_message(call_id, function_id, dtype_to_arguments = dtype_to_arguments, encoded_units = encoded_units)
+            return FakeASyncRequest(channel.recv_message(call_id, function_id, handle_as_array, has_units = has_units))
+        
+        size = function.estimated_reply_size(call_count)
+        if size is None:
+            size = self.maximum_size_of_pending_replies
+        self.make_room_for_reply(size)
+        
+        request = channel.pipeline_message(call_id, function_id, handle_as_array, dtype_to_arguments, encoded_units = encoded_units, has_units = has_units)
+        self.pending_requests.append((request, size))
+        self.size_of_pending_replies += size
+        return request
+    
+    def make_room_for_reply(self, size):
+        while len(self.pending_requests) > 0:
+            request, request_size = self.pending_requests[0]
+            if not request.is_finished and self.size_of_pending_replies + size <= self.maximum_size_of_pending_replies:
+                break
+            try:
+                request.wait()
+            except Exception:
+                # reported when the result of the request is requested
+                pass
+            self.pending_requests.pop(0)
+            self.size_of_pending_replies -= request_size
+        
+
 class CodeWithDataDirectories(object):
     
     
@@ -1249,10 +1543,13 @@ class CodeFunctionWithUnits(CodeFunction):
         handle_as_array = self.must_handle_as_array(dtype_to_values)
         
         call_id = random.randint(0, 1000)
-              
-        self.interface.channel.send_message(call_id, self.specification.id, dtype_to_arguments = dtype_to_values, encoded_units = encoded_units)
         
-        request = self.interface.channel.nonblocking_recv_message(call_id, self.specification.id, handle_as_array, has_units = True)
+        if self.interface.call_batch is not None:
+            request = self.interface.call_batch.pipeline_call(self, call_id, handle_as_array, dtype_to_values, encoded_units = encoded_units, has_units = True)
+        else:
+            self.interface.channel.send_message(call_id, self.specification.id, dtype_to_arguments = dtype_to_values, encoded_units = encoded_units)
+            
+            request = self.interface.channel.nonblocking_recv_message(call_id, self.specification.id, handle_as_array, has_units = True)
         
         def handle_result(function):
             try:
@@ -1270,6 +1567,8 @@ class CodeFunctionWithUnits(CodeFunction):
 
     def must_handle_as_array(self, keyword_arguments):
         for argument_type, argument_values in keyword_arguments.items():
+            if argument_type == 'bytes':
+                continue
             if argument_values:
                 count = 0
                 for argument_value in argument_values:
@@ -0,0 +1,301 @@
+"""
+Opt-in profiling of the calls to the functions of codes (workers).
+
+For every call to a legacy function of a code, the profiler records
+the time spent sending the request, waiting for the worker to compute
+the reply (up to the arrival of the header of the reply) and receiving
+the reply, the number of bytes in the arguments and results and if the
+message had to be split (see max_message_length of the channels).
+
+Example usage::
+
+    from amuse import rfi
+
+    with rfi.profile() as profiler:
+        gravity.evolve_model(1 | nbody_system.time)
+        channel.copy()
+    print(profiler.report())
+    table = profiler.as_dict()  # pandas.DataFrame(table) for further analysis
+
+Asynchronous calls are recorded from the moment the request is sent
+until the result is handled, this time is reported as compute time.
+"""
+
+import threading
+import time
+
+import numpy
+
+_active_profilers = []
+_current_call = threading.local()
+
+
+def is_profiling():
+    return len(_active_profilers) > 0
+
+
+def mark(phase):
+    """
+    Adds the time since the last mark to the given phase
+    ('send', 'compute' or 'receive') of the call in progress on
+    this thread, called by the channels and messages.
+    """
+    if not _active_profilers:
+        return
+    record = getattr(_current_call, "record", None)
+    if record is not None:
+        record.mark(phase)
+
+
+def mark_split_message():
+    if not _active_profilers:
+        return
+    record = getattr(_current_call, "record", None)
+    if record is not None:
+        record.is_split = True
+
+
+def size_of_values(dtype_to_values):
+    """
+    Returns the number of bytes of the values of a message, as
+    a dictionary from datatype to lists of values (or arrays)
+    """
+    result = 0
+    for datatype, values in dtype_to_values.items():
+        for x in values:
+            if x is None:
+                continue
+            if datatype == "string":
+                if isinstance(x, str):
+                    result += len(x) + 1
+                else:
+                    result += sum(len(y) + 1 for y in x)
+            elif datatype == "bytes":
+                # a blob, see amuse.rfi.channel.as_blob
+                parts = x if isinstance(x, tuple) else (x,)
+                result += sum(memoryview(y).nbytes for y in parts)
+            else:
+                result += numpy.asarray(x).nbytes
+    return result
+
+
+class CallRecord(object):
+    def __init__(self, worker, function_name):
+        self.worker = worker
+        self.function_name = function_name
+        self.times = {"send": 0.0, "compute": 0.0, "receive": 0.0}
+        self.is_split = False
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.time_of_last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.times[phase] += now - self.time_of_last_mark
+        self.time_of_last_mark = now
+
+
+def begin_call(interface, function_name, dtype_to_values):
+    """
+    Starts recording a (synchronous) call on this thread, returns
+    the record or None if no profiler is active.
+    """
+    if not _active_profilers:
+        return None
+    record = CallRecord(interface, function_name)
+    record.bytes_sent = size_of_values(dtype_to_values)
+    _current_call.record = record
+    return record
+
+
+def end_call(record, dtype_to_result=None):
+    if record is None:
+        return
+    _current_call.record = None
+    record.mark("receive")
+    if dtype_to_result is not None:
+        record.bytes_received = size_of_values(dtype_to_result)
+    for x in list(_active_profilers):
+        x.add_record(record)
+
+
+def begin_asynchronous_call(interface, function_name, dtype_to_values):
+    """
+    Starts recording an asynchronous call, the record is not
+    bound to this thread as other calls can be made before the
+    result is handled.
+    """
+    if not _active_profilers:
+        return None
+    record = CallRecord(interface, function_name)
+    record.bytes_sent = size_of_values(dtype_to_values)
+    return record
+
+
+def end_asynchronous_call(record, dtype_to_result=None):
+    if record is None:
+        return
+    record.mark("receive")
+    if dtype_to_result is not None:
+        record.bytes_received = size_of_values(dtype_to_result)
+    for x in list(_active_profilers):
+        x.add_record(record)
+
+
+class FunctionCallStatistics(object):
+    """
+    Statistics of the calls to one function of one worker
+    """
+
+    def __init__(self, worker, function_name):
+        self.worker = worker
+        self.function_name = function_name
+        self.send_times = []
+        self.compute_times = []
+        self.receive_times = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.number_of_split_messages = 0
+
+    @property
+    def count(self):
+        return len(self.send_times)
+
+    def add_record(self, record):
+        self.send_times.append(record.times["send"])
+        self.compute_times.append(record.times["compute"])
+        self.receive_times.append(record.times["receive"])
+        self.bytes_sent += record.bytes_sent
+        self.bytes_received += record.bytes_received
+        if record.is_split:
+            self.number_of_split_messages += 1
+
+    def as_row(self, percentiles):
+        total_times = (
+            numpy.asarray(self.send_times)
+            + numpy.asarray(self.compute_times)
+            + numpy.asarray(self.receive_times)
+        )
+        result = dict(
+            worker=self.worker,
+            function=self.function_name,
+            count=self.count,
+            total_time=total_times.sum(),
+            send_time=sum(self.send_times),
+            compute_time=sum(self.compute_times),
+            receive_time=sum(self.receive_times),
+        )
+        for x in percentiles:
+            result["p{0:g}_time".format(x)] = numpy.percentile(total_times, x)
+        result["bytes_sent"] = self.bytes_sent
+        result["bytes_received"] = self.bytes_received
+        result["split_messages"] = self.number_of_split_messages
+        return result
+
+
+class CallProfiler(object):
+    """
+    Collects the statistics of the calls to the functions of all
+    workers while it is active (between start and stop, or in
+    a with block).
+
+    :argument percentiles: percentiles of the wall time per call
+        to report
+    """
+
+    def __init__(self, percentiles=(50, 90, 99)):
+        self.percentiles = percentiles
+        self.statistics = {}
+        self.names_of_workers = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        if not self in _active_profilers:
+            _active_profilers.append(self)
+        return self
+
+    def stop(self):
+        if self in _active_profilers:
+            _active_profilers.remove(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def clear(self):
+        with self.lock:
+            self.statistics = {}
+
+    def name_of_worker(self, interface):
+        # one name per instance, numbered per class of the interface
+        key = id(interface)
+        if not key in self.names_of_workers:
+            name = type(interface).__name__
+            number = len(
+                [x for x in self.names_of_workers.values() if x.rsplit("-", 1)[0] == name]
+            )
+            self.names_of_workers[key] = "{0}-{1}".format(name, number)
+        return self.names_of_workers[key]
+
+    def add_record(self, record):
+        with self.lock:
+            worker = self.name_of_worker(record.worker)
+            key = (worker, record.function_name)
+            if not key in self.statistics:
+                self.statistics[key] = FunctionCallStatistics(
+                    worker, record.function_name
+                )
+            self.statistics[key].add_record(record)
+
+    def as_table(self):
+        """
+        Returns a list with a dictionary per worker and function,
+        sorted on total time (largest first)
+        """
+        with self.lock:
+            rows = [x.as_row(self.percentiles) for x in self.statistics.values()]
+        rows.sort(key=lambda x: x["total_time"], reverse=True)
+        return rows
+
+    def as_dict(self):
+        """
+        Returns the table as a dictionary of columns, for example
+        to create a pandas DataFrame
+        """
+        rows = self.as_table()
+        if len(rows) == 0:
+            return {}
+        return dict((name, [x[name] for x in rows]) for name in rows[0].keys())
+
+    def report(self):
+        """
+        Returns the table as a formatted string
+        """
+        rows = self.as_table()
+        columns = ["worker", "function", "count", "total_time", "send_time", "compute_time", "receive_time"]
+        columns += ["p{0:g}_time".format(x) for x in self.percentiles]
+        columns += ["bytes_sent", "bytes_received", "split_messages"]
+        lines = [[str(x) for x in columns]]
+        for row in rows:
+            line = []
+            for name in columns:
+                value = row[name]
+                if isinstance(value, float):
+                    line.append("{0:.6f}".format(value))
+                else:
+                    line.append(str(value))
+            lines.append(line)
+        widths = [max(len(line[i]) for line in lines) for i in range(len(columns))]
+        return "\n".join(
+            " ".join(x.rjust(width) for x, width in zip(line, widths)) for line in lines
+        )
+
+
+def profile(percentiles=(50, 90, 99)):
+    """
+    Returns a new profiler of the calls to codes, use it
+    in a with block or call start and stop.
+    """
+    return CallProfiler(percentiles)
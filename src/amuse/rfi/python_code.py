@@ -12,12 +12,65 @@ import warnings
 
 from amuse.rfi.channel import ClientSideMPIMessage
 from amuse.rfi.channel import SocketMessage
+from amuse.rfi.channel import ReceiveBufferPool
+from amuse.rfi.channel import SharedMemoryBuffer
 
 from amuse.rfi.channel import pack_array
 from amuse.rfi.channel import unpack_array
 from amuse.rfi.core import legacy_function
 from amuse.rfi.core import LegacyFunctionSpecification
 
+def vectorized(function):
+    """
+    Marks a method of a python implementation as safe to call with
+    arrays (like a numpy ufunc). For a function that is not specified
+    with must_handle_array, the worker then calls the method once
+    with the arrays of the arguments of all calls in a message,
+    instead of once per call. The outputs must be set to arrays
+    (or to values that are the same for all calls). The argument
+    arrays are only valid during the call, copy them to keep them.
+    
+    .. code-block:: python
+    
+        class Implementation(object):
+            @vectorized
+            def get_mass(self, index_of_the_particle, mass):
+                mass.value = self.masses[index_of_the_particle]
+                return 0
+    """
+    function.is_vectorized = True
+    return function
+
+class ArgumentLayout(object):
+    """
+    Position of the arguments and outputs of a function in the
+    messages, determined once per specification
+    """
+    
+    def __init__(self, specification, dtype_to_message_attribute):
+        self.inputs = []
+        self.outputs = []
+        for parameter in specification.parameters:
+            name = 'in_' if parameter.name == 'in' else parameter.name
+            attribute = dtype_to_message_attribute[parameter.datatype]
+            if parameter.is_input():
+                self.inputs.append((name, parameter.direction, attribute, parameter.input_index, parameter.index_in_input))
+            else:
+                self.inputs.append((name, parameter.direction, attribute, None, None))
+            if parameter.is_output():
+                self.outputs.append((parameter.name, attribute, parameter.output_index, parameter.index_in_output))
+        
+        if specification.result_type is None:
+            self.result_attribute = None
+        else:
+            self.result_attribute = dtype_to_message_attribute[specification.result_type]
+        
+        self.dtype_to_count = {}
+        for parameter in specification.output_parameters:
+            self.dtype_to_count[parameter.datatype] = self.dtype_to_count.get(parameter.datatype, 0) + 1
+        if not specification.result_type is None:
+            self.dtype_to_count[specification.result_type] = self.dtype_to_count.get(specification.result_type, 0) + 1
+
 class ValueHolder(object):
     
     def __init__(self, value = None):
@@ -38,6 +91,7 @@ class PythonImplementation(object):
         'string' : 'strings', 
         'bool' : 'booleans',
         'int64' : 'longs',
+        'bytes' : 'blobs',
     }
     
     def __init__(self, implementation, interface):
@@ -49,6 +103,7 @@ class PythonImplementation(object):
         self.lastid = -1
         self.activeid = -1
         self.id_to_activate = -1
+        self.argument_layouts = {}
         if not self.implementation is None:
             self.implementation._interface = self
         
@@ -112,15 +167,19 @@ class PythonImplementation(object):
 
 
     def start_socket(self, port, host):
+        # attach before connecting, the other side checks for
+        # shared memory support when the connection is made
+        shared_memory = SharedMemoryBuffer.attach_from_environment()
         client_socket = socket.create_connection((host, port))
+        buffer_pool = ReceiveBufferPool()
         
         self.must_run = True
         while self.must_run:
             
-            message = SocketMessage()
+            message = SocketMessage(buffer_pool=buffer_pool, shared_memory=shared_memory)
             message.receive(client_socket)
                 
-            result_message = SocketMessage(message.call_id, message.function_id, message.call_count)
+            result_message = SocketMessage(message.call_id, message.function_id, message.call_count, shared_memory=message.shared_memory_for_reply())
             
             if message.function_id == 0:
                 self.must_run = False
@@ -140,27 +199,36 @@ class PythonImplementation(object):
                     result_message.set_error("unknown function id " + message.function_id)
             
             result_message.send(client_socket)
+            # the arrays of the message are reused for the next message,
+            # implementations must copy the arrays they keep
+            message.release_buffers()
         
         client_socket.close()
+        if shared_memory is not None:
+            shared_memory.close()
         
     def start_socket_mpi(self, port, host):
         rank=MPI.COMM_WORLD.Get_rank()
 
+        shared_memory = None
+        reply_shared_memory = None
         if rank==0:
+            shared_memory = SharedMemoryBuffer.attach_from_environment()
             client_socket = socket.create_connection((host, port))
         
         self.must_run = True
         while self.must_run:
             
             if rank==0:
-                message = SocketMessage()
+                message = SocketMessage(shared_memory=shared_memory)
                 message.receive(client_socket)
+                reply_shared_memory = message.shared_memory_for_reply()
             else:
                 message=None
             
             message=MPI.COMM_WORLD.bcast(message, root=0)
                 
-            result_message = SocketMessage(message.call_id, message.function_id, message.call_count)
+            result_message = SocketMessage(message.call_id, message.function_id, message.call_count, shared_memory=reply_shared_memory)
             
             if message.function_id == 0:
                 self.must_run = False
@@ -184,6 +252,8 @@ class PythonImplementation(object):
         
         if rank==0:
             client_socket.close()
+            if shared_memory is not None:
+                shared_memory.close()
 
 
     def handle_message(self, input_message, output_message):
@@ -207,6 +277,8 @@ class PythonImplementation(object):
             for x in range(count):
                 if type == 'string':
                     getattr(output_message, attribute).append([""] * output_message.call_count)
+                elif type == 'bytes':
+                    getattr(output_message, attribute).append([None] * output_message.call_count)
                 else:
                     getattr(output_message, attribute).append(numpy.zeros(output_message.call_count, dtype=type))
 
@@ -216,7 +288,7 @@ class PythonImplementation(object):
             setattr(input_message,attribute, unpacked)
         
         units = [False] * len(specification.output_parameters)
-        if specification.must_handle_array:
+        if specification.must_handle_array or getattr(method, "is_vectorized", False):
             keyword_arguments = self.new_keyword_arguments_from_message(input_message, None,  specification, input_units)
             try: 
                 result = method(**keyword_arguments)
@@ -245,80 +317,75 @@ class PythonImplementation(object):
     
 
 
+    def argument_layout(self, specification):
+        if not specification in self.argument_layouts:
+            self.argument_layouts[specification] = ArgumentLayout(specification, self.dtype_to_message_attribute)
+        return self.argument_layouts[specification]
+    
     def new_keyword_arguments_from_message(self, input_message, index, specification, units = []):
+        """
+        Returns the arguments of the call at index, or of all calls
+        (as arrays) if index is None
+        """
+        IN = LegacyFunctionSpecification.IN
+        INOUT = LegacyFunctionSpecification.INOUT
+        OUT = LegacyFunctionSpecification.OUT
+        LENGTH = LegacyFunctionSpecification.LENGTH
+        
         keyword_arguments = OrderedDictionary()
-        for parameter in specification.parameters:
-            attribute = self.dtype_to_message_attribute[parameter.datatype]
+        for name, direction, attribute, input_index, index_in_input in self.argument_layout(specification).inputs:
             argument_value = None
-            if parameter.direction == LegacyFunctionSpecification.IN:
-                if specification.must_handle_array:
-                    argument_value = getattr(input_message, attribute)[parameter.input_index]
+            if direction == IN or direction == INOUT:
+                if index is None:
+                    argument_value = getattr(input_message, attribute)[input_index]
                 else:
-                    argument_value = getattr(input_message, attribute)[parameter.input_index][index]
+                    argument_value = getattr(input_message, attribute)[input_index][index]
                 if specification.has_units:
-                    unit = units[parameter.index_in_input]
+                    unit = units[index_in_input]
                     if not unit is None:
                         argument_value = argument_value | unit
-            elif parameter.direction == LegacyFunctionSpecification.INOUT:
-                if specification.must_handle_array:
-                    argument_value = ValueHolder(getattr(input_message, attribute)[parameter.input_index])
-                else:
-                    argument_value = ValueHolder(getattr(input_message, attribute)[parameter.input_index][index])
-                
-                if specification.has_units:
-                    unit = units[parameter.index_in_input]
-                    if not unit is None:
-                        argument_value.value = argument_value.value | unit
-            elif parameter.direction == LegacyFunctionSpecification.OUT:
+                if direction == INOUT:
+                    argument_value = ValueHolder(argument_value)
+            elif direction == OUT:
                 argument_value = ValueHolder(None)
-            elif parameter.direction == LegacyFunctionSpecification.LENGTH:
+            elif direction == LENGTH:
                 argument_value = input_message.call_count
-            name = 'in_' if parameter.name == 'in' else parameter.name
             keyword_arguments[name] = argument_value
         return keyword_arguments
         
 
     def fill_output_message(self, output_message, index, result, keyword_arguments, specification, units):
+        """
+        Stores the outputs of the call at index, or of all calls
+        if index is None
+        """
         from amuse.units import quantities
         
-        if not specification.result_type is None:
-            attribute = self.dtype_to_message_attribute[specification.result_type]
-            if specification.must_handle_array:
-                getattr(output_message, attribute)[0] = result
+        layout = self.argument_layout(specification)
+        
+        if not layout.result_attribute is None:
+            if index is None:
+                getattr(output_message, layout.result_attribute)[0] = result
             else:
-                getattr(output_message, attribute)[0][index] = result
+                getattr(output_message, layout.result_attribute)[0][index] = result
                 
-        for parameter in specification.parameters:
-            attribute = self.dtype_to_message_attribute[parameter.datatype]
-            if (parameter.direction == LegacyFunctionSpecification.OUT or 
-                parameter.direction == LegacyFunctionSpecification.INOUT):
-                argument_value = keyword_arguments[parameter.name]
-                output = argument_value.value
-                if specification.has_units:
-                    unit = output.unit if quantities.is_quantity(output) else None
-                    if specification.must_handle_array or index == 0:
-                        units[parameter.index_in_output] = unit
-                    else:
-                        unit = units[parameter.index_in_output]
-                    if not unit is None:
-                        output = output.value_in(unit)
-                if specification.must_handle_array:
-                    getattr(output_message, attribute)[parameter.output_index] = output
+        for name, attribute, output_index, index_in_output in layout.outputs:
+            output = keyword_arguments[name].value
+            if specification.has_units:
+                unit = output.unit if quantities.is_quantity(output) else None
+                if index is None or index == 0:
+                    units[index_in_output] = unit
                 else:
-                    getattr(output_message, attribute)[parameter.output_index][index] = output
+                    unit = units[index_in_output]
+                if not unit is None:
+                    output = output.value_in(unit)
+            if index is None:
+                getattr(output_message, attribute)[output_index] = output
+            else:
+                getattr(output_message, attribute)[output_index][index] = output
     
     def get_dtype_to_count(self, specification):
-        dtype_to_count = {}
-        
-        for parameter in specification.output_parameters:
-            count = dtype_to_count.get(parameter.datatype, 0)
-            dtype_to_count[parameter.datatype] = count + 1
-                
-        if not specification.result_type is None:
-            count = dtype_to_count.get(specification.result_type, 0)
-            dtype_to_count[specification.result_type] = count + 1
-        
-        return dtype_to_count
+        return self.argument_layout(specification).dtype_to_count
         
     @late
     def mapping_from_tag_to_legacy_function(self):
@@ -558,6 +625,8 @@ class CythonImplementation(PythonImplementation):
             for x in range(count):
                 if type == 'string':
                     getattr(output_message, attribute).append([""] * output_message.call_count)
+                elif type == 'bytes':
+                    getattr(output_message, attribute).append([None] * output_message.call_count)
                 else:
                     getattr(output_message, attribute).append(numpy.zeros(output_message.call_count, dtype=type))
 
@@ -40,6 +40,9 @@ HEADER_CODE_STRING = """
 	#include <netdb.h>
 	#include <netinet/tcp.h>
   #include <arpa/inet.h>
+  #include <sys/mman.h>
+  #include <sys/stat.h>
+  #include <fcntl.h>
 #endif
 #if _POSIX_VERSION >= 1
 #ifndef _POSIX_C_SOURCE
@@ -72,6 +75,20 @@ static bool mpiIntercom = false;
 
 static int socketfd = 0;
 
+/* shared memory for the message payload (shm channel), the layout is
+   a control block (magic number, attached flag, capacity) followed by
+   the data */
+static int SHARED_MEMORY_FLAG = 1 << 24;
+static int SHARED_MEMORY_MAGIC = 0x414d5553;
+static int SHARED_MEMORY_CONTROL_SIZE = 64;
+
+static char * shared_memory = 0;
+static long long int shared_memory_capacity = 0;
+static long long int shared_memory_offset = 0;
+static bool receiving_from_shared_memory = false;
+static bool sending_to_shared_memory = false;
+static int * pending_header_out = 0;
+
 static int * header_in;
 static int * header_out;
 
@@ -294,6 +311,18 @@ void send_array_sockets(void *buffer, int length, int file_descriptor, int rank)
     if (rank != 0) {
         return;
     }
+    
+    if (sending_to_shared_memory) {
+        if (shared_memory_offset + length <= shared_memory_capacity) {
+            memcpy(shared_memory + shared_memory_offset, buffer, length);
+            shared_memory_offset += length;
+            return;
+        }
+        // message does not fit, send the header and the data so far over the socket
+        sending_to_shared_memory = false;
+        send_array_sockets(pending_header_out, HEADER_SIZE * sizeof(int), file_descriptor, rank);
+        send_array_sockets(shared_memory, shared_memory_offset, file_descriptor, rank);
+    }
     //fprintf(stderr, "number of bytes to write: %d\\n", length);
     while (total_written < length) {
     
@@ -322,6 +351,12 @@ void receive_array_sockets(void *buffer, int length, int file_descriptor, int ra
     if (rank != 0) {
         return;
     }
+    
+    if (receiving_from_shared_memory) {
+        memcpy(buffer, shared_memory + shared_memory_offset, length);
+        shared_memory_offset += length;
+        return;
+    }
 
     while (total_read < length) {
     
@@ -342,6 +377,92 @@ void receive_array_sockets(void *buffer, int length, int file_descriptor, int ra
     }
 }
 
+void attach_shared_memory() {
+#ifndef WIN32
+    char * name = getenv("AMUSE_SHARED_MEMORY_NAME");
+    struct stat status;
+    void * address;
+    int fd;
+    
+    if (name == NULL) {
+        return;
+    }
+    
+    fd = shm_open(name, O_RDWR, 0);
+    // do not pass the shared memory on to processes started by this code
+    unsetenv("AMUSE_SHARED_MEMORY_NAME");
+    if (fd < 0) {
+        perror("could not open shared memory, sending messages over the socket");
+        return;
+    }
+    if (fstat(fd, &status) < 0 || status.st_size <= SHARED_MEMORY_CONTROL_SIZE) {
+        close(fd);
+        return;
+    }
+    address = mmap(NULL, status.st_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (address == MAP_FAILED) {
+        perror("could not map shared memory, sending messages over the socket");
+        return;
+    }
+    
+    int * control = (int *) address;
+    if (control[0] != SHARED_MEMORY_MAGIC) {
+        munmap(address, status.st_size);
+        return;
+    }
+    shared_memory_capacity = *((long long int *) (control + 2));
+    if (shared_memory_capacity > status.st_size - SHARED_MEMORY_CONTROL_SIZE) {
+        shared_memory_capacity = status.st_size - SHARED_MEMORY_CONTROL_SIZE;
+    }
+    shared_memory = ((char *) address) + SHARED_MEMORY_CONTROL_SIZE;
+    pending_header_out = new int[HEADER_SIZE];
+    
+    // tell the other side that the payload can be send through the shared memory
+    control[1] = 1;
+#endif
+}
+
+void receive_header_sockets(int *header, int file_descriptor, int rank) {
+    if (rank != 0) {
+        return;
+    }
+    receiving_from_shared_memory = false;
+    receive_array_sockets(header, HEADER_SIZE * sizeof(int), file_descriptor, rank);
+    if (header[HEADER_FLAGS] & SHARED_MEMORY_FLAG) {
+        header[HEADER_FLAGS] &= ~SHARED_MEMORY_FLAG;
+        receiving_from_shared_memory = true;
+        shared_memory_offset = 0;
+    }
+}
+
+void send_header_sockets(int *header, int file_descriptor, int rank) {
+    if (rank != 0) {
+        return;
+    }
+    if (shared_memory && receiving_from_shared_memory) {
+        // the reply is send the same way as the request, the header
+        // is send last, after the data is copied to the shared memory
+        memcpy(pending_header_out, header, HEADER_SIZE * sizeof(int));
+        receiving_from_shared_memory = false;
+        sending_to_shared_memory = true;
+        shared_memory_offset = 0;
+    } else {
+        send_array_sockets(header, HEADER_SIZE * sizeof(int), file_descriptor, rank);
+    }
+}
+
+void flush_sockets(int file_descriptor, int rank) {
+    if (rank != 0) {
+        return;
+    }
+    if (sending_to_shared_memory) {
+        sending_to_shared_memory = false;
+        pending_header_out[HEADER_FLAGS] |= SHARED_MEMORY_FLAG;
+        send_array_sockets(pending_header_out, HEADER_SIZE * sizeof(int), file_descriptor, rank);
+    }
+}
+
 void new_arrays(int max_call_count) {
   ints_in = new int[ max_call_count * MAX_INTS_IN];
   ints_out = new int[ max_call_count * MAX_INTS_OUT];
@@ -634,6 +755,8 @@ void run_sockets_mpi(int argc, char *argv[], int port, char *host) {
     serv_addr.sin_family = AF_INET;
     memcpy((char *) &serv_addr.sin_addr.s_addr, (char *) server->h_addr, server->h_length);
     serv_addr.sin_port = htons(port);
+    
+    attach_shared_memory();
   
     if (connect(socketfd, (struct sockaddr *) &serv_addr, sizeof(serv_addr)) < 0) {
       fprintf(stderr, "cannot connect socket to host %s, port %d\\n", host, port);
@@ -657,7 +780,7 @@ void run_sockets_mpi(int argc, char *argv[], int port, char *host) {
   
   while(must_run_loop) {
     //fprintf(stderr, "sockets_mpi: receiving header\\n");
-    receive_array_sockets(header_in, HEADER_SIZE * sizeof(int), socketfd, rank);
+    receive_header_sockets(header_in, socketfd, rank);
     MPI_Bcast(header_in, HEADER_SIZE, MPI_INT, 0, MPI_COMM_WORLD);
     
     //fprintf(stderr, "C sockets_mpi worker code: got header %d %d %d %d %d %d %d %d %d %d\\n", header_in[0], header_in[1], header_in[2], header_in[3], header_in[4], header_in[5], header_in[6], header_in[7], header_in[8], header_in[9]);
@@ -737,7 +860,7 @@ void run_sockets_mpi(int argc, char *argv[], int port, char *host) {
     
     if (rank == 0) {
 
-      send_array_sockets(header_out, HEADER_SIZE * sizeof(int), socketfd, 0);
+      send_header_sockets(header_out, socketfd, 0);
           
       if(header_out[HEADER_INTEGER_COUNT] > 0) {
         send_array_sockets(ints_out, header_out[HEADER_INTEGER_COUNT] * sizeof(int), socketfd, 0);
@@ -778,6 +901,8 @@ void run_sockets_mpi(int argc, char *argv[], int port, char *host) {
         send_array_sockets(string_sizes_out, header_out[HEADER_STRING_COUNT] * sizeof(int), socketfd, 0);
         send_array_sockets(characters_out, offset * sizeof(char), socketfd, 0);
       }
+      
+      flush_sockets(socketfd, 0);
         
       //fprintf(stderr, "sockets_mpicall done\\n");
     }
@@ -850,6 +975,8 @@ void run_sockets(int port, char *host) {
   memcpy((char *) &serv_addr.sin_addr.s_addr, (char *) server->h_addr, server->h_length);
   serv_addr.sin_port = htons(port);
   
+  attach_shared_memory();
+  
   if (connect(socketfd, (struct sockaddr *) &serv_addr, sizeof(serv_addr)) < 0) {
     fprintf(stderr, "cannot connect socket to host %s, port %d\\n", host, port);
     fprintf(stderr, "resolved IP address: %s\\n",  inet_ntoa( * (struct in_addr *) server->h_addr));
@@ -870,7 +997,7 @@ void run_sockets(int port, char *host) {
   
   while(must_run_loop) {
     //fprintf(stderr, "sockets: receiving header\\n");
-    receive_array_sockets(header_in, HEADER_SIZE * sizeof(int), socketfd, 0);
+    receive_header_sockets(header_in, socketfd, 0);
     //fprintf(stderr, "C sockets worker code: got header %d %d %d %d %d %d %d %d %d %d\\n", header_in[0], header_in[1], header_in[2], header_in[3], header_in[4], header_in[5], header_in[6], header_in[7], header_in[8], header_in[9]);
     
     int call_count = header_in[HEADER_CALL_COUNT];
@@ -938,7 +1065,7 @@ void run_sockets(int port, char *host) {
     
     //fprintf(stderr, "c worker sockets: call handled\\n");
 
-    send_array_sockets(header_out, HEADER_SIZE * sizeof(int), socketfd, 0);
+    send_header_sockets(header_out, socketfd, 0);
       
     if(header_out[HEADER_INTEGER_COUNT] > 0) {
       send_array_sockets(ints_out, header_out[HEADER_INTEGER_COUNT] * sizeof(int), socketfd, 0);
@@ -980,6 +1107,8 @@ void run_sockets(int port, char *host) {
         send_array_sockets(characters_out, offset * sizeof(char), socketfd, 0);
     }
     
+    flush_sockets(socketfd, 0);
+    
     if (characters_in) { 
         delete[] characters_in;
         characters_in = 0;
@@ -609,7 +609,7 @@ RUN_LOOP_SOCKETS_STRING = """
       must_run_loop = 1
       
       do while (must_run_loop .eq. 1)
-        call receive_integers(c_loc(header_in), HEADER_SIZE)
+        call receive_header(c_loc(header_in), HEADER_SIZE)
         
         !print*, 'fortran sockets: got header ', header_in
         
@@ -723,7 +723,7 @@ RUN_LOOP_SOCKETS_STRING = """
         
         !print*, 'fortran: sending header ', header_out
     
-        call send_integers(c_loc(header_out), HEADER_SIZE)
+        call send_header(c_loc(header_out), HEADER_SIZE)
 
         if (header_out(HEADER_INTEGER_COUNT) .gt. 0) then
           call send_integers(c_loc(integers_out), header_out(HEADER_INTEGER_COUNT))
@@ -773,6 +773,8 @@ RUN_LOOP_SOCKETS_STRING = """
           call send_integers(c_loc(string_sizes_out), header_out(HEADER_STRING_COUNT))
           call send_string(c_loc(c_characters_out), offset-1 )
         end if
+        
+        call flush_sockets()
       end do
     
       DEALLOCATE(integers_in)
@@ -862,7 +864,7 @@ RUN_LOOP_SOCKETS_MPI_STRING = """
       
       do while (must_run_loop .eq. 1)
         if (rank .eq. 0) then
-          call receive_integers(c_loc(header_in), HEADER_SIZE)
+          call receive_header(c_loc(header_in), HEADER_SIZE)
         end if
         call MPI_BCast(header_in, HEADER_SIZE , MPI_INTEGER, 0, MPI_COMM_WORLD, ioerror)
         
@@ -1008,7 +1010,7 @@ RUN_LOOP_SOCKETS_MPI_STRING = """
         
           !print*, 'fortran: sending header ', header_out
     
-          call send_integers(c_loc(header_out), HEADER_SIZE)
+          call send_header(c_loc(header_out), HEADER_SIZE)
 
           if (header_out(HEADER_INTEGER_COUNT) .gt. 0) then
             call send_integers(c_loc(integers_out), header_out(HEADER_INTEGER_COUNT))
@@ -1059,6 +1061,8 @@ RUN_LOOP_SOCKETS_MPI_STRING = """
             call send_integers(c_loc(string_sizes_out), header_out(HEADER_STRING_COUNT))
             call send_string(c_loc(c_characters_out), offset-1 )
          end if
+         
+         call flush_sockets()
         end if
       end do
     
@@ -0,0 +1,269 @@
+"""
+Pool of started workers, shared by the instances of codes that are
+created with the ``use_worker_pool`` option.
+
+Starting a worker (spawning the process, connecting to it and
+checking it) can take seconds, workflows that start and stop many
+short lived codes (parameter sweeps, ensembles) spend most of their
+time waiting for workers. With the pool, the worker of a stopped code
+is reset and kept, and new workers are started in the background so
+that the next instance of the code can start without waiting.
+
+The idle workers are kept per kind of worker (the worker application,
+the interface class, the channel and the options of the channel).
+When a worker is taken from the pool, new workers are started in
+the background until ``worker_pool_size`` workers are ready (only
+when the channel supports starting workers from another thread).
+When a code is stopped, its worker is returned to the pool, unless
+the pool already has ``worker_pool_maximum_size`` workers of that
+kind. Workers that are idle for longer than
+``worker_pool_maximum_idle_time`` seconds are stopped.
+
+Example usage::
+
+    for x in parameters:
+        code = Hermite(use_worker_pool=True, channel_type="sockets")
+        ...
+        code.stop()
+"""
+
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def stop_channel(channel):
+    # low level stop of the worker, as in
+    # CodeInterface.stop_reusable_channels (id == 0, no arguments)
+    call_id = random.randint(0, 1000)
+    channel.send_message(call_id, 0, dtype_to_arguments={})
+    channel.recv_message(call_id, 0, False)
+    channel.stop()
+
+
+class IdleWorkers(object):
+    """
+    The idle workers of one kind, with the function
+    to start a new worker of this kind
+    """
+
+    def __init__(self):
+        self.channels = []
+        self.number_of_starting_workers = 0
+        self.start_channel = None
+        self.size = 0
+        self.maximum_size = 0
+        self.maximum_idle_time = 0.0
+        self.can_start_in_background = False
+        self.must_start_workers = False
+
+    def number_of_workers(self):
+        return len(self.channels) + self.number_of_starting_workers
+
+    def remove_idle_workers(self, now):
+        result = [x for x, t in self.channels if now - t > self.maximum_idle_time]
+        if len(result) > 0:
+            self.channels = [(x, t) for x, t in self.channels if now - t <= self.maximum_idle_time]
+        return result
+
+
+class WorkerPool(object):
+    """
+    Keeps the idle workers of codes and starts new workers
+    in the background, see the module documentation
+    """
+
+    def __init__(self, polling_interval=1.0):
+        self.polling_interval = polling_interval
+        self.workers = {}
+        self.lock = threading.Condition()
+        self.thread = None
+        self.is_stopped = False
+
+    def acquire(self, key):
+        """
+        Returns an idle worker (channel) of the kind or None
+        if no worker is ready
+        """
+        with self.lock:
+            if self.is_stopped:
+                return None
+            channels_to_stop = self._remove_idle_workers(background=False)
+            entry = self.workers.get(key)
+            if entry is None or len(entry.channels) == 0:
+                result = None
+            else:
+                result, _ = entry.channels.pop()
+            if entry is not None:
+                entry.must_start_workers = True
+                self.lock.notify_all()
+        self._stop_channels(channels_to_stop)
+        return result
+
+    def start_workers(
+        self,
+        key,
+        start_channel,
+        size=2,
+        maximum_size=8,
+        maximum_idle_time=300.0,
+        can_start_in_background=True,
+    ):
+        """
+        Starts new workers of the kind in the background until
+        size workers are ready. The start_channel function must
+        return a new started channel.
+        """
+        with self.lock:
+            if self.is_stopped:
+                return
+            if not key in self.workers:
+                self.workers[key] = IdleWorkers()
+            entry = self.workers[key]
+            entry.start_channel = start_channel
+            entry.size = size
+            entry.maximum_size = max(maximum_size, size)
+            entry.maximum_idle_time = maximum_idle_time
+            entry.can_start_in_background = can_start_in_background
+            entry.must_start_workers = True
+            if can_start_in_background and size > 0:
+                self._ensure_thread()
+            self.lock.notify_all()
+
+    def release(self, key, channel):
+        """
+        Returns the worker of a stopped code to the pool, the worker
+        must be reset by the code. Returns False if the pool does not
+        keep the worker, the worker must then be stopped by the code.
+        """
+        with self.lock:
+            if self.is_stopped or not key in self.workers:
+                return False
+            channels_to_stop = self._remove_idle_workers(background=False)
+            entry = self.workers[key]
+            is_kept = entry.number_of_workers() < entry.maximum_size
+            if is_kept:
+                entry.channels.append((channel, time.time()))
+                # the thread stops the idle workers of this kind
+                if entry.can_start_in_background:
+                    self._ensure_thread()
+                self.lock.notify_all()
+        self._stop_channels(channels_to_stop)
+        return is_kept
+
+    def number_of_idle_workers(self, key):
+        with self.lock:
+            entry = self.workers.get(key)
+            return 0 if entry is None else len(entry.channels)
+
+    def stop(self):
+        """
+        Stops all idle workers, workers that are still starting
+        are stopped when ready. Workers can no longer be acquired
+        from or returned to a stopped pool.
+        """
+        with self.lock:
+            self.is_stopped = True
+            channels_to_stop = []
+            for entry in self.workers.values():
+                channels_to_stop.extend(x for x, t in entry.channels)
+                entry.channels = []
+            self.lock.notify_all()
+        self._stop_channels(channels_to_stop)
+
+    def _ensure_thread(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="amuse-worker-pool")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _remove_idle_workers(self, background):
+        now = time.time()
+        result = []
+        for entry in self.workers.values():
+            if entry.can_start_in_background == background:
+                result.extend(entry.remove_idle_workers(now))
+        return result
+
+    def _entry_to_fill(self):
+        for entry in self.workers.values():
+            if not (entry.must_start_workers and entry.can_start_in_background):
+                continue
+            if entry.number_of_workers() < entry.size:
+                return entry
+            entry.must_start_workers = False
+        return None
+
+    def _has_idle_workers(self):
+        return any(len(x.channels) > 0 for x in self.workers.values())
+
+    def _stop_channels(self, channels):
+        for x in channels:
+            try:
+                stop_channel(x)
+            except Exception as ex:
+                logger.warning("could not stop idle worker, exception was '%s'", ex)
+
+    def _run(self):
+        while True:
+            entry = None
+            with self.lock:
+                while True:
+                    if self.is_stopped:
+                        return
+                    channels_to_stop = self._remove_idle_workers(background=True)
+                    entry = self._entry_to_fill()
+                    if entry is not None or len(channels_to_stop) > 0:
+                        break
+                    self.lock.wait(self.polling_interval if self._has_idle_workers() else None)
+                if entry is not None:
+                    entry.number_of_starting_workers += 1
+            self._stop_channels(channels_to_stop)
+            if entry is not None:
+                self._start_worker(entry)
+
+    def _start_worker(self, entry):
+        try:
+            channel = entry.start_channel()
+        except Exception as ex:
+            logger.warning("could not start worker for the pool, exception was '%s'", ex)
+            with self.lock:
+                entry.number_of_starting_workers -= 1
+                entry.must_start_workers = False
+            return
+        with self.lock:
+            entry.number_of_starting_workers -= 1
+            is_kept = not self.is_stopped and entry.number_of_workers() < entry.maximum_size
+            if is_kept:
+                entry.channels.append((channel, time.time()))
+        if not is_kept:
+            self._stop_channels([channel])
+
+
+_worker_pool = None
+_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """
+    Returns the pool used by the codes
+    """
+    global _worker_pool
+    with _lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool()
+        return _worker_pool
+
+
+def stop_worker_pool():
+    """
+    Stops the idle workers of the pool used by the codes, called
+    at exit (see amuse.rfi.core.stop_interfaces)
+    """
+    with _lock:
+        pool = _worker_pool
+    if pool is not None:
+        pool.stop()
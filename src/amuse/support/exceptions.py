@@ -50,6 +50,10 @@ class CodeException(AmuseException):
     
     
 
+class AsyncNotSupportedException(AmuseException):
+    pass
+
+
 class KeysNotInStorageException(AmuseException):
     
     def __init__(self, found_keys, found_indices, missing_keys):
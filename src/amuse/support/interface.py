@@ -240,6 +240,7 @@ class HandleConvertUnits(
 
     def set_converter(self, converter):
         self.converter = converter
+        _invalidate_method_cache(self.handler)
 
     def set_nbody_converter(self, nbody_converter):
         self.set_converter(nbody_converter.as_converter_from_si_to_generic())
@@ -380,6 +381,8 @@ class StateMethodDefinition(CodeMethodWrapperDefinition):
             return
         else:
             self.state_machine._current_state = to_state
+            if isinstance(self.interface, InCodeComponentImplementation):
+                self.interface.invalidate_cached_attributes()
 
     def __str__(self):
         return "<StateMethod {0}>".format(self.function_name)
@@ -426,11 +429,13 @@ class HandleState(HandleCodeInterfaceAttributeAccess):
         else:
             state_method = self._mapping_from_name_to_state_method[function_name]
             state_method.add_transition(from_state, to_state)
+        _invalidate_method_cache(self.interface)
 
     def _remove_state_method(self, from_name, to_name, function_name):
         if function_name in self._mapping_from_name_to_state_method:
             state_method = self._mapping_from_name_to_state_method[function_name]
             state_method.remove_transition(from_name, to_name)
+        _invalidate_method_cache(self.interface)
 
     def add_method(self, state_name, function_name):
         """
@@ -506,6 +511,56 @@ class HandleState(HandleCodeInterfaceAttributeAccess):
         return self._state_machine.get_name_of_current_state()
 
 
+class HandleAttributeCache(
+    HandleCodeInterfaceAttributeAccess, CodeMethodWrapperDefinition
+):
+    """
+    Wraps the methods of a code, a call to one of these methods
+    invalidates the cached attribute values of the particle sets of
+    the code. Only the methods known to be read-only (getters and the
+    methods declared by the code in define_read_only_methods) do not
+    invalidate the cache.
+    """
+
+    prefixes_of_read_only_methods = ("get_", "is_", "has_")
+
+    def __init__(self, interface):
+        self.interface = interface
+        self.is_enabled = interface.cache_particle_attributes
+        self.names_of_read_only_methods = set([])
+
+    def add_read_only_method(self, name):
+        self.names_of_read_only_methods.add(name)
+
+    def is_read_only_method(self, name):
+        return (
+            name in self.names_of_read_only_methods
+            or name.startswith(self.prefixes_of_read_only_methods)
+            or name.startswith("_")
+        )
+
+    def supports(self, name, was_found):
+        return was_found and self.is_enabled and not self.is_read_only_method(name)
+
+    def get_attribute(self, name, attribute):
+        if callable(attribute):
+            return CodeMethodWrapper(attribute, self)
+        else:
+            return attribute
+
+    def precall(self, method):
+        self.interface.invalidate_cached_attributes()
+
+    def postcall(self, method, object):
+        self.interface.invalidate_cached_attributes()
+
+    def setup(self, object):
+        object.define_read_only_methods(self)
+
+    def has_name(self, name):
+        return name == "CACHE"
+
+
 class MethodWithUnits(CodeMethodWrapper):
     def __init__(self, original_method, definition):
         CodeMethodWrapper.__init__(self, original_method, definition)
@@ -852,6 +907,8 @@ class HandleMethodsWithUnits(object):
             self.interface, original_name, units, return_unit, public_name
         )
         self.method_definitions[public_name] = definition
+        self.method_instances.pop(public_name, None)
+        _invalidate_method_cache(self.interface)
 
     def has_name(self, name):
         return name == "METHOD"
@@ -929,6 +986,7 @@ class HandlePropertiesWithUnits(HandleCodeInterfaceAttributeAccess):
                 self, function_name, unit, public_name
             )
         self.property_definitions[public_name] = definition
+        _invalidate_method_cache(self.interface)
 
     def has_name(self, name):
         return name == "PROPERTY"
@@ -1278,7 +1336,7 @@ class ParticleSetDefinition(AbstractParticleSetDefinition):
             None  # getattr(interface, self.name_of_number_of_particles_method)
         )
 
-        return incode_storage.InCodeAttributeStorage(
+        storage = incode_storage.InCodeAttributeStorage(
             interface,
             new_particle_method,
             delete_particle_method,
@@ -1287,6 +1345,9 @@ class ParticleSetDefinition(AbstractParticleSetDefinition):
             getters,
             self.name_of_indexing_attribute,
         )
+        if getattr(interface, "cache_particle_attributes", False):
+            storage.enable_cache()
+        return storage
 
     def new_set_instance(self, handler):
         storage = self.new_storage(handler.interface)
@@ -1536,6 +1597,7 @@ class HandleParticles(HandleCodeInterfaceAttributeAccess):
         definition.name_of_indexing_attribute = name_of_indexing_attribute
         definition.state_guard = state_guard
         self.mapping_from_name_to_set_definition[name] = definition
+        _invalidate_method_cache(self.interface)
 
     def define_super_set(
         self, name, particle_subsets, index_to_default_set=None, state_guard=None
@@ -1545,6 +1607,7 @@ class HandleParticles(HandleCodeInterfaceAttributeAccess):
         )
         definition.state_guard = state_guard
         self.mapping_from_name_to_set_definition[name] = definition
+        _invalidate_method_cache(self.interface)
 
     def define_inmemory_set(
         self, name, particles_factory=CodeInMemoryParticles, state_guard=None
@@ -1554,6 +1617,7 @@ class HandleParticles(HandleCodeInterfaceAttributeAccess):
         definition.particles_factory = particles_factory
         definition.state_guard = state_guard
         self.mapping_from_name_to_set_definition[name] = definition
+        _invalidate_method_cache(self.interface)
 
     def define_grid(
         self,
@@ -1568,6 +1632,7 @@ class HandleParticles(HandleCodeInterfaceAttributeAccess):
         definition.axes_names = axes_names
         definition.state_guard = state_guard
         self.mapping_from_name_to_set_definition[name] = definition
+        _invalidate_method_cache(self.interface)
 
     def set_new(self, name_of_the_set, name_of_new_particle_method, names=None):
         self.mapping_from_name_to_set_definition[name_of_the_set].set_new(
@@ -1667,6 +1732,11 @@ class HandleParticles(HandleCodeInterfaceAttributeAccess):
         self.mapping_from_name_to_set_instance = {}
 
 
+def _invalidate_method_cache(interface):
+    if isinstance(interface, InCodeComponentImplementation):
+        interface.invalidate_method_cache()
+
+
 class OverriddenCodeInterface(object):
     def __init__(self, code_interface):
         self.code_interface = code_interface
@@ -1680,6 +1750,8 @@ class InCodeComponentImplementation(OldObjectsBindingMixin, OptionalAttributes):
         OptionalAttributes.__init__(self, **options)
         self.legacy_interface = legacy_interface
         self._options = options
+        self._state_version = 0
+        self._method_cache = {}
         self._handlers = []
         self.__init_handlers__(legacy_interface, options)
 
@@ -1691,6 +1763,7 @@ class InCodeComponentImplementation(OldObjectsBindingMixin, OptionalAttributes):
         self._handlers.append(HandleParticles(self))
         if self.must_handle_state:
             self._handlers.append(HandleState(self, **options))
+        self._handlers.append(HandleAttributeCache(self))
         self._handlers.append(HandleConvertUnits(self))
         self._handlers.append(HandleErrorCodes(self))
 
@@ -1706,6 +1779,26 @@ class InCodeComponentImplementation(OldObjectsBindingMixin, OptionalAttributes):
     def must_handle_state(self):
         return True
 
+    @option(type="boolean", sections=("code",))
+    def cache_particle_attributes(self):
+        """
+        If True, the attribute values of all particles in the particle
+        sets of the code are cached until the code is changed (by a
+        state transition or a call to any method that is not a getter
+        or declared read-only in define_read_only_methods).
+        """
+        return False
+
+    def invalidate_cached_attributes(self):
+        self._state_version += 1
+
+    def invalidate_method_cache(self):
+        """
+        Forget the method wrappers composed by the handlers, called
+        when methods, states, converters or sets are (re)defined.
+        """
+        self._method_cache = {}
+
     def setup(self):
         for x in self._handlers:
             x.setup(self)
@@ -1737,6 +1830,9 @@ class InCodeComponentImplementation(OldObjectsBindingMixin, OptionalAttributes):
     def define_errorcodes(self, handler):
         pass
 
+    def define_read_only_methods(self, handler):
+        pass
+
     def get_handler(self, name):
         for x in self._handlers:
             if x.has_name(name):
@@ -1744,6 +1840,10 @@ class InCodeComponentImplementation(OldObjectsBindingMixin, OptionalAttributes):
         return None
 
     def __getattr__(self, name):
+        method_cache = self.__dict__.get("_method_cache")
+        if method_cache is not None and name in method_cache:
+            return method_cache[name]
+
         result = None
         found = False
         for handler in self._handlers:
@@ -1752,6 +1852,13 @@ class InCodeComponentImplementation(OldObjectsBindingMixin, OptionalAttributes):
                 found = True
         if not found:
             raise AttributeError(name)
+
+        # the wrappers of a method only depend on the definitions in the
+        # handlers, properties, parameters and sets are retrieved every time
+        if method_cache is not None and isinstance(
+            result, (CodeMethodWrapper, ProxyingMethodWrapper)
+        ):
+            method_cache[name] = result
         return result
 
     def __dir__(self):
@@ -1775,6 +1882,11 @@ class InCodeComponentImplementation(OldObjectsBindingMixin, OptionalAttributes):
         builder_function(definition, **extra_arguments)
         return definition.new_set_instance(handler)
 
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_method_cache"] = {}
+        return state
+
     def __setstate__(self, state):
         self.__dict__ = state
 
@@ -97,6 +97,13 @@ class AbstractCodeMethodWrapper(object):
             return None
 
 
+def _contains_request(arguments):
+    for x in arguments:
+        if isinstance(x, AbstractASyncRequest):
+            return True
+    return False
+
+
 class CodeMethodWrapper(AbstractCodeMethodWrapper):
 
     def __init__(self, method, definition):
@@ -105,11 +112,17 @@ class CodeMethodWrapper(AbstractCodeMethodWrapper):
         self.definition.check_wrapped_method(self)
 
     def __call__(self, *list_arguments, **keyword_arguments):
-        async_dependency = keyword_arguments.pop("async_dependency", None)
-        return_request = keyword_arguments.pop("return_request", False)
+        if keyword_arguments:
+            async_dependency = keyword_arguments.pop("async_dependency", None)
+            return_request = keyword_arguments.pop("return_request", False)
+            has_requests = _contains_request(list_arguments) or \
+                _contains_request(keyword_arguments.values())
+        else:
+            async_dependency = None
+            return_request = False
+            has_requests = _contains_request(list_arguments)
 
-        if any(isinstance(x, AbstractASyncRequest) for x in list_arguments) or \
-           any(isinstance(x, AbstractASyncRequest) for x in keyword_arguments):
+        if has_requests:
             list_arguments_= []
             keyword_arguments_= dict()
             for arg in list_arguments:
@@ -175,7 +188,7 @@ class CodeMethodWrapper(AbstractCodeMethodWrapper):
 
     def asynchronous(self, *list_arguments, **keyword_arguments):
         if not self.is_async_supported:
-            raise exceptions.AmuseException("asynchronous call is not supported for this method")
+            raise exceptions.AsyncNotSupportedException("asynchronous call is not supported for this method")
 
 
         object = self.precall()
@@ -141,9 +141,16 @@ class StateMachine(OptionalAttributes):
 
     def enable(self):
         self.is_enabled = True
+        self._invalidate_method_cache_of_interface()
 
     def disable(self):
         self.is_enabled = False
+        self._invalidate_method_cache_of_interface()
+
+    def _invalidate_method_cache_of_interface(self):
+        # the methods of the interface are wrapped only if the state machine is enabled
+        if hasattr(self.interface, 'invalidate_method_cache'):
+            self.interface.invalidate_method_cache()
 
 
     def new_transition(self, from_name, to_name, is_auto = True):
@@ -6,6 +6,7 @@ from amuse.support import options
 
 import os
 import time
+import numpy
 from amuse.units import nbody_system
 from amuse.units import units
 from amuse import datamodel
@@ -35,6 +36,20 @@ class TestCSocketsImplementationInterface(test_c_implementation.TestCImplementat
     def test29(self):
         self.skip("this test uses mpi internals, skip here")
 
+    def test_batch(self):
+        instance = test_c_implementation.ForTestingInterface(self.exefile)
+        with instance.batch() as batch:
+            self.assertTrue(batch.is_active)
+            requests = [instance.echo_int.asynchronous(i) for i in range(10)]
+            strings = instance.echo_string.asynchronous(["abc", "def"])
+            doubles = instance.echo_double.asynchronous(numpy.arange(1000.0))
+        results = instance.call_many([(instance.echo_int, (i,)) for i in range(5)])
+        instance.stop()
+        self.assertEqual([x.result()["int_out"] for x in requests], list(range(10)))
+        self.assertEqual(list(strings.result()["string_out"]), ["abc", "def"])
+        self.assertEqual(list(doubles.result()["double_out"]), list(numpy.arange(1000.0)))
+        self.assertEqual([x["int_out"] for x in results], list(range(5)))
+
     @classmethod
     def check_not_in_mpiexec(cls):
         """
@@ -48,3 +63,30 @@ class TestCSocketsImplementationInterface(test_c_implementation.TestCImplementat
             return  # for now assume HYDI_CONTROL_FD is newer, and sockets will work!
         if 'HYDRA_CONTROL_FD' in os.environ or 'PMI_FD' in os.environ:
             cls.skip('cannot run the socket tests under mpi process manager')
+
+
+class TestCSharedMemoryImplementationInterface(TestCSocketsImplementationInterface):
+
+    @classmethod
+    def setup_class(cls):
+        super(TestCSharedMemoryImplementationInterface, cls).setup_class()
+        options.GlobalOptions.instance().override_value_for_option("channel_type", "shm")
+
+    def test_uses_shared_memory(self):
+        instance = test_c_implementation.ForTestingInterface(self.exefile)
+        self.assertTrue(instance.channel.is_using_shared_memory())
+        out, error = instance.echo_double([4.0, 5.0])
+        instance.stop()
+        self.assertEqual(list(out), [4.0, 5.0])
+        self.assertEqual(list(error), [0, 0])
+
+    def test_message_larger_than_shared_memory(self):
+        instance = test_c_implementation.ForTestingInterface(self.exefile, shared_memory_size=1000)
+        self.assertTrue(instance.channel.is_using_shared_memory())
+        out, error = instance.echo_double(numpy.arange(10.0))
+        self.assertEqual(list(out), list(numpy.arange(10.0)))
+        out, error = instance.echo_double(numpy.arange(1000.0))
+        self.assertEqual(list(out), list(numpy.arange(1000.0)))
+        out, error = instance.echo_string(["abc", "def"])
+        self.assertEqual(list(out), ["abc", "def"])
+        instance.stop()
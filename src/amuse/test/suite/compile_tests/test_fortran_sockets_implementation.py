@@ -270,3 +270,23 @@ class TestInterface(TestWithMPI):
 
         self.assertEqual(error, 0)
         self.assertEqual(out, "a"*N)
+
+    def test37(self):
+        instance = ForTestingInterface(self.exefile, channel_type="shm")
+        self.assertTrue(instance.channel.is_using_shared_memory())
+        out, error = instance.echo_double([4.0, 5.0])
+        self.assertEqual(list(out), [4.0, 5.0])
+        out, error = instance.echo_string(["abc", "def"])
+        self.assertEqual(list(out), ["abc", "def"])
+        del instance
+
+    def test38(self):
+        instance = ForTestingInterface(self.exefile, channel_type="shm", shared_memory_size=1000)
+        self.assertTrue(instance.channel.is_using_shared_memory())
+        out, error = instance.echo_double(list(range(10)))
+        self.assertEqual(list(out), list(range(10)))
+        out, error = instance.echo_double(list(range(1000)))
+        self.assertEqual(list(out), list(range(1000)))
+        out, error = instance.echo_string(["abc", "def"] * 100)
+        self.assertEqual(list(out), ["abc", "def"] * 100)
+        del instance
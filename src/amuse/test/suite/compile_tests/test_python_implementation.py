@@ -391,6 +391,26 @@ class ForTestingImplementation(object):
         return 0
 
 
+class ForTestingVectorizedImplementation(ForTestingImplementation):
+
+    def __init__(self):
+        ForTestingImplementation.__init__(self)
+        self.masses = numpy.zeros(100)
+        self.number_of_calls = 0
+
+    @python_code.vectorized
+    def get_mass(self, index_of_the_particle, mass):
+        self.number_of_calls += 1
+        mass.value = self.masses[index_of_the_particle]
+        return 0
+
+    @python_code.vectorized
+    def set_mass(self, index_of_the_particle, mass):
+        self.number_of_calls += 1
+        self.masses[index_of_the_particle] = mass
+        return 0
+
+
 class ForTesting(InCodeComponentImplementation):
 
     def __init__(self, **options):
@@ -1121,3 +1141,65 @@ class TestInterface(TestWithMPI):
         out = x.echo_bool([True, False, True])
         self.assertEqual(out, [True, False, True])
         x.stop()
+
+    def test41(self):
+        from amuse import rfi
+        x = self.ForTestingInterface()
+        with rfi.profile() as profiler:
+            x.echo_int(1)
+            x.echo_double([1.0, 2.0, 3.0])
+            request = x.echo_int.asynchronous(2)
+            request.result()
+        x.echo_int(3)
+        x.stop()
+
+        table = profiler.as_table()
+        self.assertEqual(len(table), 2)
+        rows = dict((row["function"], row) for row in table)
+        self.assertEqual(rows["echo_int"]["count"], 2)
+        self.assertEqual(rows["echo_double"]["count"], 1)
+        self.assertEqual(rows["echo_int"]["worker"], "ForTestingInterface-0")
+        self.assertEqual(rows["echo_double"]["bytes_sent"], 3 * 8)
+        self.assertTrue(rows["echo_double"]["bytes_received"] >= 3 * 8)
+        for row in table:
+            self.assertAlmostRelativeEqual(
+                row["total_time"],
+                row["send_time"] + row["compute_time"] + row["receive_time"],
+            )
+            self.assertEqual(row["split_messages"], 0)
+        self.assertEqual(profiler.as_dict()["count"], [x["count"] for x in table])
+        self.assertTrue("echo_double" in profiler.report())
+
+    def test42(self):
+        x = self.ForTestingInterface(channel_type="sockets", use_worker_pool=True, worker_pool_size=0)
+        self.assertEqual(x.echo_int(10)["int_out"], 10)
+        channel = x.channel
+        x.stop()
+
+        y = self.ForTestingInterface(channel_type="sockets", use_worker_pool=True, worker_pool_size=0)
+        self.assertTrue(y.channel is channel)
+        self.assertEqual(y.echo_int(20)["int_out"], 20)
+        y.stop()
+
+    def test43(self):
+        implementation = ForTestingVectorizedImplementation()
+        x = python_code.PythonImplementation(implementation, ForTestingInterface)
+
+        input_message = python_code.ClientSideMPIMessage(0, 11, 4)
+        input_message.ints = numpy.array([1, 2, 3, 4])
+        input_message.doubles = numpy.array([12.0, 13.0, 14.0, 15.0])
+        output_message = python_code.ClientSideMPIMessage(0, 11, 4)
+        x.handle_message(input_message, output_message)
+
+        self.assertEqual(implementation.number_of_calls, 1)
+        self.assertEqual(list(output_message.ints), [0, 0, 0, 0])
+        self.assertEqual(list(implementation.masses[1:5]), [12.0, 13.0, 14.0, 15.0])
+
+        input_message = python_code.ClientSideMPIMessage(0, 10, 3)
+        input_message.ints = numpy.array([4, 2, 0])
+        output_message = python_code.ClientSideMPIMessage(0, 10, 3)
+        x.handle_message(input_message, output_message)
+
+        self.assertEqual(implementation.number_of_calls, 2)
+        self.assertEqual(list(output_message.ints), [0, 0, 0])
+        self.assertEqual(list(output_message.doubles), [15.0, 13.0, 0.0])
@@ -17,6 +17,17 @@ from . import test_python_implementation
 from . import test_python_implementation_mpi
 
 
+class ForTestingWithPositions(test_python_implementation.ForTesting):
+
+    def __init__(self, interface):
+        InCodeComponentImplementation.__init__(self, interface)
+
+    def define_particle_sets(self, object):
+        test_python_implementation.ForTesting.define_particle_sets(self, object)
+        object.add_setter('particles', 'set_position', names=('x', 'y', 'z'))
+        object.add_getter('particles', 'get_position', names=('x', 'y', 'z'))
+
+
 class TestInterfaceSockets(test_python_implementation.TestInterface):
     def setUp(self):
         self.check_not_in_mpiexec()
@@ -115,6 +126,192 @@ class TestInterfaceSockets(test_python_implementation.TestInterface):
     def test27(self):
         pass  # skip because only supported for mpi channel
 
+    def test_socket_message_round_trip(self):
+        from amuse.rfi.channel import ReceiveBufferPool
+        import socket
+        import threading
+        sender, receiver = socket.socketpair()
+        try:
+            output_message = python_code.SocketMessage(3, 11, 4)
+            output_message.ints = numpy.arange(4, dtype='int32')
+            output_message.longs = [1, 2**40, 3, 4]
+            output_message.floats = [0.5] * 4
+            output_message.doubles = numpy.linspace(0, 1, 100000)
+            output_message.booleans = [True, False, True, False]
+            output_message.strings = ["a", "bc", "", "def"]
+            output_message.encoded_units = [1.0, 2.0]
+            # the message does not fit in the socket buffers, so send from a thread
+            thread = threading.Thread(target=output_message.send, args=(sender,))
+            thread.start()
+
+            pool = ReceiveBufferPool()
+            input_message = python_code.SocketMessage(buffer_pool=pool)
+            input_message.receive(receiver)
+            thread.join()
+        finally:
+            sender.close()
+            receiver.close()
+
+        self.assertEqual(input_message.call_id, 3)
+        self.assertEqual(input_message.function_id, 11)
+        self.assertEqual(input_message.call_count, 4)
+        self.assertFalse(input_message.error)
+        self.assertEqual(list(input_message.ints), [0, 1, 2, 3])
+        self.assertEqual(list(input_message.longs), [1, 2**40, 3, 4])
+        self.assertEqual(list(input_message.floats), [0.5] * 4)
+        self.assertEqual(input_message.doubles.dtype, numpy.float64)
+        self.assertTrue(numpy.all(input_message.doubles == numpy.linspace(0, 1, 100000)))
+        self.assertEqual(list(input_message.booleans), [1, 0, 1, 0])
+        self.assertEqual(list(input_message.strings), ["a", "bc", "", "def"])
+        self.assertEqual(list(input_message.encoded_units), [1.0, 2.0])
+
+    def test_receive_buffer_pool(self):
+        from amuse.rfi.channel import ReceiveBufferPool
+        pool = ReceiveBufferPool(maximum_number_of_buffers=2)
+        x = pool.acquire(80)
+        self.assertTrue(len(x) >= 80)
+        # x is not released, so a new buffer is needed
+        y = pool.acquire(80)
+        self.assertFalse(numpy.shares_memory(x, y))
+        self.assertEqual(len(pool.free_buffers), 0)
+        pool.release(x)
+        self.assertEqual(len(pool.free_buffers), 1)
+        # the released buffer is handed out again
+        z = pool.acquire(400)
+        self.assertTrue(z is x)
+        self.assertEqual(len(pool.free_buffers), 0)
+        # no free buffer is large enough
+        w = pool.acquire(pool.MINIMUM_BUFFER_SIZE + 1)
+        self.assertFalse(w is x or w is y)
+        for buffer in (x, y, w):
+            pool.release(buffer)
+        self.assertEqual(len(pool.free_buffers), 2)
+
+    def test_socket_message_release_buffers(self):
+        from amuse.rfi.channel import ReceiveBufferPool
+        pool = ReceiveBufferPool()
+        message = python_code.SocketMessage(buffer_pool=pool)
+        doubles = message._new_array(10, 'f8')
+        self.assertEqual(doubles.dtype, numpy.float64)
+        self.assertEqual(len(doubles), 10)
+        self.assertEqual(len(pool.free_buffers), 0)
+        message.release_buffers()
+        self.assertEqual(len(pool.free_buffers), 1)
+        self.assertTrue(numpy.shares_memory(doubles, pool.free_buffers[0]))
+
+    def test_batch(self):
+        x = self.ForTestingInterface()
+        error = x.set_mass([1, 2, 3], [4.0, 5.0, 6.0])
+        with x.batch() as batch:
+            self.assertTrue(batch.is_active)
+            requests = [x.get_mass.asynchronous(i) for i in [1, 2, 3]]
+            self.assertEqual(len(batch.pending_requests), 3)
+            request = x.echo_int.asynchronous(10)
+            # not asynchronous, so waits for the pending replies first
+            answer, error = x.get_mass(2)
+            self.assertEqual(answer, 5.0)
+            self.assertTrue(all(r.is_finished for r in requests))
+        self.assertFalse(batch.is_active)
+        self.assertEqual([r.result()["mass"] for r in requests], [4.0, 5.0, 6.0])
+        self.assertEqual(request.result()["int_out"], 10)
+        x.stop()
+
+    def test_batch_replies_in_order(self):
+        x = self.ForTestingInterface()
+        with x.batch():
+            requests = [x.echo_int.asynchronous(i) for i in range(10)]
+            self.assertEqual(requests[5].result()["int_out"], 5)
+            self.assertTrue(all(r.is_finished for r in requests[:6]))
+            self.assertFalse(any(r.is_finished for r in requests[6:]))
+        self.assertEqual([r.result()["int_out"] for r in requests], list(range(10)))
+        x.stop()
+
+    def test_call_many(self):
+        x = self.ForTestingInterface()
+        results = x.call_many([
+            (x.set_mass, ([1, 2], [4.0, 5.0])),
+            (x.get_mass, ([1, 2],)),
+            ("echo_int", (3,)),
+            (x.echo_string, (), dict(string_in="abc")),
+        ])
+        self.assertEqual(list(results[0]), [0, 0])
+        self.assertEqual(list(results[1]["mass"]), [4.0, 5.0])
+        self.assertEqual(results[2]["int_out"], 3)
+        self.assertEqual(results[3]["string_out"], "abc")
+        x.stop()
+
+    def test_batch_limits_pending_replies(self):
+        x = self.ForTestingInterface(maximum_size_of_pending_replies=200)
+        n = 100
+        x.set_mass(numpy.arange(n), numpy.arange(n) * 2.0)
+        with x.batch() as batch:
+            requests = []
+            for i in range(n):
+                requests.append(x.get_mass.asynchronous(i))
+                self.assertTrue(batch.size_of_pending_replies <= 200)
+            # the size of a string reply is not known, so it is send
+            # when no other replies are pending
+            request = x.echo_string.asynchronous("abc")
+            self.assertEqual(len(batch.pending_requests), 1)
+            # as is a reply larger than the limit
+            large = x.get_mass.asynchronous(numpy.arange(n))
+            self.assertEqual(len(batch.pending_requests), 1)
+        self.assertEqual([r.result()["mass"] for r in requests], list(numpy.arange(n) * 2.0))
+        self.assertEqual(request.result()["string_out"], "abc")
+        self.assertEqual(list(large.result()["mass"]), list(numpy.arange(n) * 2.0))
+        x.stop()
+
+    def test_batch_of_particle_getters(self):
+        x = ForTestingWithPositions(self.ForTestingInterface(batch_calls_of_getters=True))
+        particles = datamodel.Particles(3)
+        particles.mass = [1, 2, 3] | units.kg
+        particles.other = None
+        particles.x = [4.0, 5.0, 6.0]
+        particles.y = [7.0, 8.0, 9.0]
+        particles.z = 0.0
+        x.particles.add_particles(particles)
+        particles.new_channel_to(x.particles).copy_attributes(["x", "y", "z"])
+        copy = x.particles.copy()
+        self.assertEqual(copy.mass, [1.0, 2.0, 3.0])
+        self.assertEqual(copy.x, [4.0, 5.0, 6.0])
+        self.assertEqual(copy.y, [7.0, 8.0, 9.0])
+        self.assertEqual(x.legacy_interface.call_batch, None)
+        x.stop()
+
+
+class TestInterfaceSharedMemory(TestInterfaceSockets):
+
+    def ForTesting(self, **options):
+        options["worker_dir"] = self.get_path_to_results()
+        options["channel_type"] = "shm"
+        return test_python_implementation.ForTesting(**options)
+
+    def ForTestingInterface(self, **options):
+        options["worker_dir"] = self.get_path_to_results()
+        options["channel_type"] = "shm"
+        return test_python_implementation.ForTestingInterface(**options)
+
+    def test_uses_shared_memory(self):
+        x = self.ForTestingInterface()
+        self.assertTrue(x.channel.is_using_shared_memory())
+        error = x.set_mass([1, 2, 3], [4.0, 5.0, 6.0])
+        self.assertEqual(list(error), [0, 0, 0])
+        answer, error = x.get_mass([1, 2, 3])
+        x.stop()
+        self.assertEqual(list(answer), [4.0, 5.0, 6.0])
+
+    def test_message_larger_than_shared_memory(self):
+        x = self.ForTestingInterface(shared_memory_size=100)
+        self.assertTrue(x.channel.is_using_shared_memory())
+        n = 100
+        error = x.set_mass(numpy.arange(n), numpy.arange(n) * 2.0)
+        self.assertEqual(list(error), [0] * n)
+        answer, error = x.get_mass(numpy.arange(n))
+        self.assertEqual(list(answer), list(numpy.arange(n) * 2.0))
+        answer, error = x.get_mass([1, 2])
+        self.assertEqual(list(answer), [2.0, 4.0])
+        x.stop()
+
 
 class TestInterfaceSocketsMPI(test_python_implementation_mpi.TestInterface):
     def setUp(self):
@@ -4,6 +4,7 @@ import time
 from amuse.test import amusetest
 from amuse.datamodel.memory_storage import InMemoryAttributeStorageUseDictionaryForKeySet
 from amuse.datamodel.memory_storage import InMemoryAttributeStorageUseSortedKeys
+from amuse.datamodel.memory_storage import InMemoryAttributeStorageUseIncrementalIndex
 from amuse.datamodel.memory_storage import get_in_memory_attribute_storage_factory
 from amuse.datamodel.memory_storage import InMemoryVectorQuantityAttribute
 from amuse.datamodel.incode_storage import *
@@ -329,6 +330,54 @@ class TestDictionaryKeysInMemoryAttributeStorage(amusetest.TestCase, _AbstractTe
         return InMemoryAttributeStorageUseDictionaryForKeySet()
 
 
+class TestIncrementalIndexInMemoryAttributeStorage(amusetest.TestCase, _AbstractTestInMemoryAttributeStorage):
+
+    def new_inmemory_storage(self, is_with_units=True):
+        return InMemoryAttributeStorageUseIncrementalIndex()
+
+    def test12(self):
+        instance = self.new_inmemory_storage()
+        instance.add_particles_to_store(numpy.arange(1, 101), ["a"], [numpy.arange(1.0, 101.0) | units.m])
+        capacity = instance._capacity
+        for key in range(101, 111):
+            instance.add_particles_to_store([key], ["a", "b"], [[float(key)] | units.m, [1.0] | units.kg])
+        self.assertEqual(len(instance), 110)
+        self.assertEqual(instance._capacity, 2 * capacity)
+        self.assertEqual(instance.get_values_in_store(instance.get_indices_of([5, 110]), ["a"])[0], [5.0, 110.0] | units.m)
+        self.assertEqual(instance.get_values_in_store(None, ["b"])[0][98:101], [0.0, 0.0, 1.0] | units.kg)
+
+        indices = instance.get_indices_of([5, 7, 110])
+        instance.remove_particles_from_store(indices)
+        self.assertEqual(len(instance), 107)
+        self.assertEqual(instance._number_of_tombstones, 3)
+        self.assertFalse(instance.has_key_in_store(7))
+        self.assertTrue(instance.has_key_in_store(8))
+        self.assertRaises(Exception, instance.get_indices_of, [7], expected_message="Key not found in storage: 7")
+        self.assertEqual(instance.get_all_keys_in_store()[3:6], [4, 6, 8])
+        self.assertEqual(instance.get_indices_of([4, 6, 8]), [3, 5, 7])
+        values = instance.get_values_in_store(None, ["a"])[0]
+        self.assertEqual(len(values), 107)
+        self.assertEqual(values[3:6], [4.0, 6.0, 8.0] | units.m)
+
+        instance.set_values_in_store(None, ["c"], [numpy.arange(107)])
+        self.assertEqual(instance.get_values_in_store(instance.get_indices_of([4, 6, 8]), ["c"])[0], [3, 4, 5])
+
+        instance.remove_particles_from_store(instance.get_indices_of(numpy.arange(10, 101)))
+        self.assertEqual(len(instance), 16)
+        self.assertEqual(instance._number_of_tombstones, 0)
+        self.assertEqual(instance.get_all_keys_in_store(), [1, 2, 3, 4, 6, 8, 9] + list(range(101, 110)))
+        self.assertEqual(instance.get_indices_of([4, 6, 109]), [3, 4, 15])
+        a, c = instance.get_values_in_store(instance.get_indices_of([4, 6, 109]), ["a", "c"])
+        self.assertEqual(a, [4.0, 6.0, 109.0] | units.m)
+        self.assertEqual(c, [3, 4, 106])
+
+        copy = instance.copy()
+        copy.add_particles_to_store([200], ["a"], [[2.0] | units.m])
+        self.assertEqual(len(copy), 17)
+        self.assertEqual(len(instance), 16)
+        self.assertFalse(instance.has_key_in_store(200))
+
+
 class _Code(object):
     def __init__(self, is_with_units):
         self.data = {}
@@ -291,6 +291,68 @@ class GadgetFileFormatProcessorTests(amusetest.TestCase):
         self.assertEqual(data.gas.position, data_converted.gas.position)
         self.assertAlmostRelativeEquals(data.gas.velocity, math.sqrt(data_converted.Time) * data_converted.gas.velocity, 7)
 
+    def test14(self):
+        print("Test use_memory_map for Gadget read_set_from_file")
+        directory_name = os.path.dirname(__file__)
+        filename = os.path.join(directory_name, 'gassphere_littleendian.dat')
+        data = io.read_set_from_file(filename, format='gadget')
+        mapped = io.read_set_from_file(filename, format='gadget', use_memory_map=True)
+        self.assertEqual(len(mapped.gas), 1472)
+        self.assertEqual(len(mapped.halo), 0)
+        self.assertEqual(mapped.gas.key, data.gas.key)
+        self.assertEqual(mapped.gas.position, data.gas.position)
+        self.assertEqual(mapped.gas.velocity, data.gas.velocity)
+        self.assertEqual(mapped.gas.mass, data.gas.mass)
+        self.assertEqual(mapped.gas.u, data.gas.u)
+
+        mapped.gas[0].x = 1.0 | nbody_system.length
+        self.assertEqual(mapped.gas[0].x, 1.0 | nbody_system.length)
+        mapped_again = io.read_set_from_file(filename, format='gadget', use_memory_map=True)
+        self.assertEqual(mapped_again.gas[0].x, data.gas[0].x)
+
+    def test15(self):
+        print("Test loading a Gadget snapshot stored in multiple files")
+        halo = Particles(10)
+        halo.position = [[i, 2 * i, 3 * i] for i in range(10)] | nbody_system.length
+        halo.velocity = [[i, -i, 0] for i in range(10)] | nbody_system.speed
+        halo.mass = range(1, 11) | nbody_system.mass
+        header = namedtuple("Header", ["NumFiles"])(2)
+
+        filename = os.path.join(self.get_path_to_results(), "gadget_multiple_files_snapshot")
+        try:
+            io.write_set_to_file([(), halo[:6].copy()], filename + ".0", format='gadget', write_header_from=header)
+            io.write_set_to_file([(), halo[6:].copy()], filename + ".1", format='gadget', write_header_from=header)
+
+            for use_memory_map in [False, True]:
+                data = io.read_set_from_file(filename + ".0", format='gadget', return_header=True,
+                    use_memory_map=use_memory_map, load_all_files_of_snapshot=True)
+                self.assertEqual(len(data.gas), 0)
+                self.assertEqual(len(data.halo), 10)
+                self.assertEqual(data.Npart, (0, 10, 0, 0, 0, 0))
+                self.assertEqual(data.halo.key, halo.key)
+                self.assertEqual(data.halo.position, halo.position)
+                self.assertEqual(data.halo.velocity, halo.velocity)
+                self.assertEqual(data.halo.mass, halo.mass)
+
+            data = io.read_set_from_file(filename + ".0", format='gadget')
+            self.assertEqual(len(data.halo), 6)
+        finally:
+            for extension in [".0", ".1"]:
+                if os.path.exists(filename + extension):
+                    os.remove(filename + extension)
+
+    def test16(self):
+        print("Test iter_set_from_file for Gadget files")
+        filename = os.path.join(os.path.dirname(__file__), 'gassphere_littleendian.dat')
+        data = io.read_set_from_file(filename, format='gadget')
+        chunks = list(io.iter_set_from_file(filename, format='gadget', chunk_size=1000, attributes=["position", "u"]))
+        self.assertEqual([len(x) for x in chunks], [1000, 472])
+        self.assertEqual([x.collection_attributes.particle_type for x in chunks], ["gas", "gas"])
+        self.assertEqual(sorted(chunks[0].get_attribute_names_defined_in_store()), ["u", "x", "y", "z"])
+        self.assertEqual(chunks[1].key, data.gas[1000:].key)
+        self.assertEqual(chunks[1].position, data.gas[1000:].position)
+        self.assertEqual(chunks[1].u, data.gas[1000:].u)
+
 
 class NemoBinaryFileFormatProcessorTests(amusetest.TestCase):
 
@@ -430,3 +492,12 @@ class NemoBinaryFileFormatProcessorTests(amusetest.TestCase):
         self.assertAlmostEqual(particles.center_of_mass(), 0.0 | nbody_system.length)
         self.assertAlmostEqual(particles.center_of_mass_velocity(), 0.0 | nbody_system.speed)
         self.assertAlmostEqual(particles.kinetic_energy(), 0.230214395174 | nbody_system.energy)
+
+    def test10(self):
+        filename = os.path.join(os.path.dirname(__file__), 'plummer128.nemo')
+        particles = io.read_set_from_file(filename, format="nemobin")
+        mapped = io.read_set_from_file(filename, format="nemobin", use_memory_map=True)
+        self.assertEqual(len(mapped), 128)
+        self.assertEqual(mapped.position, particles.position)
+        self.assertEqual(mapped.velocity, particles.velocity)
+        self.assertEqual(mapped.mass, particles.mass)
@@ -139,6 +139,63 @@ class TestCalculateFieldForParticles(amusetest.TestCase):
         instance2.particles.add_particles(q)
         self.assertEqual(len(instance2.particles), 5)
 
+    def test7(self):
+        print("CalculateFieldForParticles, blocked direct summation")
+        convert = nbody_system.nbody_to_si(1.e5 | units.MSun, 1.0 | units.parsec)
+        numpy.random.seed(12345)
+        stars = new_plummer_model(100, convert_nbody=convert)
+        stars.radius = (0.01 | units.parsec) * numpy.random.uniform(low=0.4, high=3.0, size=len(stars))
+
+        cluster = ExampleGravityCodeInterface(softening_mode="individual")
+        cluster.particles.add_particles(stars)
+
+        instance = bridge.CalculateFieldForParticles(particles=stars, softening_mode="individual", block_size=2)
+
+        zeros = numpy.zeros(9) | units.parsec
+        pos_range = numpy.linspace(-1.0, 1.0, 9) | units.parsec
+        self.assertAlmostRelativeEqual(
+            instance.get_potential_at_point(zeros, pos_range, zeros, zeros),
+            cluster.get_potential_at_point(zeros, pos_range, zeros, zeros), 12)
+        for a_calculate_field, a_code in zip(
+                instance.get_gravity_at_point(zeros, pos_range, zeros, zeros),
+                cluster.get_gravity_at_point(zeros, pos_range, zeros, zeros)):
+            self.assertAlmostRelativeEqual(a_calculate_field, a_code, 12)
+
+    def test8(self):
+        print("CalculateFieldForParticles, Barnes-Hut tree")
+        epsilon = 0.01 | units.parsec
+        convert = nbody_system.nbody_to_si(1.e5 | units.MSun, 1.0 | units.parsec)
+        numpy.random.seed(12345)
+        stars = new_plummer_model(1000, convert_nbody=convert)
+
+        direct = bridge.CalculateFieldForParticles(particles=stars)
+        direct.smoothing_length_squared = epsilon**2
+        exact_tree = bridge.CalculateFieldForParticles(particles=stars, method="tree", opening_angle=0)
+        exact_tree.smoothing_length_squared = epsilon**2
+        tree = bridge.CalculateFieldForParticles(particles=stars, method="tree", opening_angle=0.5)
+        tree.smoothing_length_squared = epsilon**2
+
+        points = new_plummer_model(50, convert_nbody=convert)
+        zeros = numpy.zeros(50) | units.parsec
+        expected_potential = direct.get_potential_at_point(zeros, points.x, points.y, points.z)
+        expected_gravity = direct.get_gravity_at_point(zeros, points.x, points.y, points.z)
+
+        self.assertAlmostRelativeEqual(
+            exact_tree.get_potential_at_point(zeros, points.x, points.y, points.z), expected_potential, 12)
+        for a_tree, a_direct in zip(exact_tree.get_gravity_at_point(zeros, points.x, points.y, points.z),
+                expected_gravity):
+            self.assertAlmostRelativeEqual(a_tree, a_direct, 10)
+
+        self.assertAlmostRelativeEqual(
+            tree.get_potential_at_point(zeros, points.x, points.y, points.z), expected_potential, 2)
+        ax, ay, az = tree.get_gravity_at_point(zeros, points.x, points.y, points.z)
+        error = ((ax - expected_gravity[0])**2 + (ay - expected_gravity[1])**2 + (az - expected_gravity[2])**2).sqrt()
+        size = (expected_gravity[0]**2 + expected_gravity[1]**2 + expected_gravity[2]**2).sqrt()
+        self.assertTrue(numpy.median(error / size) < 0.01)
+
+        self.assertRaises(AmuseException, bridge.CalculateFieldForParticles, stars, method="fmm",
+            expected_message="Unknown method 'fmm' to calculate the field, use 'direct' or 'tree'")
+
 
 class ExampleGravityCodeInterface(object):
 
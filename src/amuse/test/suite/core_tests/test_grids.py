@@ -12,6 +12,7 @@ import collections
 from amuse.units import units
 from amuse.units import constants
 from amuse.units import nbody_system
+from amuse.units.quantities import as_vector_quantity
 from amuse import datamodel
 
 
@@ -1043,3 +1044,39 @@ class TestGridSamplingMultiplePoints(amusetest.TestCase):
         samples = SamplePointsOnMultipleGrids((grid1, grid2), [[3.0, 3.0, 3.0], [4.0, 3.0, 3.0], [13, 3, 3]] | units.m)
         self.assertEqual(len(samples), 3)
         self.assertEqual(samples.mass, [3.0, 4.0, 13.0] | units.kg)
+
+    def test4(self):
+        grid = datamodel.new_regular_grid((5, 6, 7), [10.0, 12.0, 14.0] | units.m)
+        grid.rho = numpy.random.random(grid.shape) | units.kg / units.m**3
+        grid.momentum = numpy.random.random(grid.shape + (3,)) | units.kg / units.m**2 / units.s
+        grid.rhovx = grid.momentum[..., 0]
+        points = numpy.random.uniform(-1.0, 15.0, (100, 3)) | units.m
+        for method in ["nearest", "linear"]:
+            samples = grid.samplePoints(points, method=method)
+            expected = [grid.samplePoint(x, method=method) for x in points]
+            expected = [x for x in expected if x.isvalid]
+            self.assertEqual(len(samples), len(expected))
+            self.assertTrue(len(samples) > 0)
+            self.assertAlmostRelativeEquals(samples.rho, as_vector_quantity([x.rho for x in expected]), 12)
+            self.assertAlmostRelativeEquals(samples.position, as_vector_quantity([x.position for x in expected]), 12)
+            self.assertEqual(numpy.array(list(samples.indices)), numpy.array([x.index for x in expected]))
+            momentum = samples.momentum
+            self.assertEqual(momentum.shape, (len(samples), 3))
+            self.assertAlmostRelativeEquals(momentum[:, 0], as_vector_quantity([x.rhovx for x in expected]), 12)
+
+    def test5(self):
+        grid1 = datamodel.new_regular_grid((5, 5, 5), [10.0, 10.0, 10.0] | units.m)
+        grid1.mass = grid1.x.value_in(units.m) | units.kg
+        grid2 = datamodel.new_regular_grid((5, 5, 5), [10.0, 10.0, 10.0] | units.m)
+        grid2.position += (10.0, 0, 0) | units.m
+        grid2.mass = grid2.x.value_in(units.m) | units.kg
+        points = [[13, 3, 3], [3.0, 3.0, 3.0], [3.1, 3.0, 3.0], [30, 3, 3], [13.5, 3, 3], [3.9, 3.0, 3.0]] | units.m
+        samples = SamplePointsOnMultipleGrids((grid1, grid2), points, SamplePointOnCellCenter)
+        self.assertEqual(len(samples), 5)
+        self.assertEqual(samples.mass, [13.0, 3.0, 3.0, 13.0, 3.0] | units.kg)
+        self.assertTrue(samples[0].grid is grid2)
+        samples.filterout_duplicate_indices()
+        self.assertEqual(len(samples), 4)
+        self.assertEqual(samples.mass, [13.0, 3.0, 13.0, 3.0] | units.kg)
+        self.assertEqual(samples.position, [[13, 3, 3], [3, 3, 3], [13, 3, 3], [3, 3, 3]] | units.m)
+        self.assertEqual(samples[1].index, [1, 1, 1])
@@ -447,6 +447,151 @@ class TestParticles(amusetest.TestCase):
         self.assertEqual(mass[1], 50)
         self.assertEqual(mass[0], 40)
 
+    def test8(self):
+        class Code(object):
+            def __init__(self):
+                self.mass = {}
+                self.next_index = 100
+                self.deleted = []
+
+            def get_number_of_particles(self):
+                return len(self.mass)
+
+            def get_mass(self, index):
+                return units.kg([self.mass[i] for i in index])
+
+            def new_particle(self, mass):
+                result = []
+                for x in mass.value_in(units.kg):
+                    self.mass[self.next_index] = x
+                    result.append(self.next_index)
+                    self.next_index -= 3
+                return result
+
+            def delete_particle(self, index):
+                for i in index:
+                    del self.mass[i]
+                    self.deleted.append(i)
+
+        code = Code()
+        storage = InCodeAttributeStorage(
+            code,
+            NewParticleMethod(code.new_particle, ("mass",)),
+            code.delete_particle,
+            code.get_number_of_particles,
+            [],
+            [ParticleGetAttributesMethod(code.get_mass, ("mass",)),],
+            name_of_the_index="index"
+        )
+
+        keys = numpy.array([50, 10, 40, 20, 30], dtype="uint64")
+        indices = storage.add_particles_to_store(keys, ["mass"], [units.kg([5.0, 1.0, 4.0, 2.0, 3.0])])
+        self.assertEqual(indices, [100, 97, 94, 91, 88])
+        self.assertEqual(storage.get_indices_of([20, 50, 20]), [91, 100, 91])
+        self.assertEqual(storage.get_all_keys_in_store(), keys)
+        self.assertTrue(storage.has_key_in_store(40))
+        self.assertFalse(storage.has_key_in_store(41))
+        self.assertEqual(storage.get_key_indices_of([30, 10]), [1, 4])
+        self.assertEqual(storage.get_positions_of_indices([88, 100]), [0, 4])
+        self.assertEqual(storage._get_keys_for_indices_in_the_code([94, 95, 88]), [40, 0, 30])
+        self.assertRaises(exceptions.KeysNotInStorageException, storage.get_indices_of, [20, 21])
+        self.assertRaises(Exception, storage.add_particles_to_store, [60, 10], ["mass"], [units.kg([6.0, 1.0])],
+            expected_message="particle with same key added twice: 10")
+
+        storage.remove_particles_from_store([97, 88])
+        self.assertEqual(code.deleted, [97, 88])
+        self.assertEqual(len(storage), 3)
+        self.assertEqual(storage.get_all_keys_in_store(), [50, 40, 20])
+        self.assertEqual(storage.get_all_indices_in_store(), [100, 94, 91])
+        mass, = storage.get_values_in_store(storage.get_indices_of([20, 50]), ["mass"])
+        self.assertEqual(mass, [2.0, 5.0] | units.kg)
+
+        storage._remove_indices([94, 1000])
+        self.assertEqual(storage.get_all_keys_in_store(), [50, 20])
+        storage._add_indices([94])
+        self.assertEqual(len(storage), 3)
+        self.assertEqual(storage.get_indices_of(storage.get_all_keys_in_store()[2:]), [94])
+        self.assertRaises(exceptions.AmuseException, storage._add_indices, [91],
+            expected_message="adding an index '91' that is already managed, bookkeeping is broken")
+
+    def test9(self):
+        class Code(object):
+            def __init__(self):
+                self.mass = {}
+                self.number_of_get_calls = 0
+                self._state_version = 0
+
+            def get_mass(self, index):
+                self.number_of_get_calls += 1
+                return units.kg([self.mass[i] for i in index])
+
+            def set_mass(self, index, mass):
+                for i, x in zip(index, mass.value_in(units.kg)):
+                    self.mass[i] = x
+
+            def new_particle(self, mass):
+                result = []
+                for x in mass.value_in(units.kg):
+                    index = len(self.mass)
+                    self.mass[index] = x
+                    result.append(index)
+                return result
+
+            def delete_particle(self, index):
+                for i in index:
+                    del self.mass[i]
+
+            def evolve_model(self):
+                for i in self.mass:
+                    self.mass[i] *= 2
+                self._state_version += 1
+
+        code = Code()
+        storage = InCodeAttributeStorage(
+            code,
+            NewParticleMethod(code.new_particle, ("mass",)),
+            code.delete_particle,
+            None,
+            [ParticleSetAttributesMethod(code.set_mass, ("mass",)),],
+            [ParticleGetAttributesMethod(code.get_mass, ("mass",)),],
+            name_of_the_index="index"
+        )
+        storage.enable_cache()
+        storage.add_particles_to_store([10, 11, 12], ["mass"], [units.kg([1.0, 2.0, 3.0])])
+
+        mass, = storage.get_values_in_store(None, ["mass"])
+        self.assertEqual(mass, [1.0, 2.0, 3.0] | units.kg)
+        self.assertEqual(code.number_of_get_calls, 1)
+        mass *= 10
+        mass, = storage.get_values_in_store(None, ["mass"])
+        self.assertEqual(mass, [1.0, 2.0, 3.0] | units.kg)
+        mass, = storage.get_values_in_store(numpy.array([2, 0]), ["mass"])
+        self.assertEqual(mass, [3.0, 1.0] | units.kg)
+        self.assertEqual(code.number_of_get_calls, 1)
+        self.assertEqual(storage.cache.hits, 2)
+        self.assertEqual(storage.cache.misses, 1)
+
+        code.evolve_model()
+        mass, = storage.get_values_in_store(None, ["mass"])
+        self.assertEqual(mass, [2.0, 4.0, 6.0] | units.kg)
+        self.assertEqual(code.number_of_get_calls, 2)
+
+        storage.set_values_in_store(numpy.array([1]), ["mass"], [units.kg([5.0])])
+        mass, = storage.get_values_in_store(None, ["mass"])
+        self.assertEqual(mass, [2.0, 5.0, 6.0] | units.kg)
+        self.assertEqual(code.number_of_get_calls, 3)
+
+        storage.remove_particles_from_store([0])
+        mass, = storage.get_values_in_store(None, ["mass"])
+        self.assertEqual(mass, [5.0, 6.0] | units.kg)
+        self.assertEqual(code.number_of_get_calls, 4)
+        self.assertEqual(storage.cache.hits, 2)
+        self.assertEqual(storage.cache.misses, 4)
+
+        storage.disable_cache()
+        storage.get_values_in_store(None, ["mass"])
+        self.assertEqual(code.number_of_get_calls, 5)
+
 
 class TestGrids(amusetest.TestCase):
 
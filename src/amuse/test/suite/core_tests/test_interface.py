@@ -86,6 +86,21 @@ class CodeInterfaceWithConvertedUnitsTests(amusetest.TestCase):
             expected_message="Error when calling 'return_an_errorcode' of a '<class 'amuse.support.interface.InCodeComponentImplementation'>', errorcode is -1"
         )
 
+    def test5(self):
+        class TestInterface(interface.InCodeComponentImplementation):
+            def define_read_only_methods(self, handler):
+                handler.add_read_only_method('return_an_errorcode')
+
+        original = self.TestClass()
+        instance = TestInterface(original, cache_particle_attributes=True)
+
+        version = instance._state_version
+        instance.get_mass()
+        instance.return_an_errorcode(0)
+        self.assertEqual(instance._state_version, version)
+        self.assertEqual(instance.add_to_length(5.0), 15.0)
+        self.assertTrue(instance._state_version > version)
+
 
 class CodeInterfaceWithUnitsOnLegacyFunctionTests(amusetest.TestCase):
 
@@ -670,6 +685,43 @@ class CodeInterfaceTests(amusetest.TestCase):
         self.assertEqual(instance.get_name_of_current_state(), 'ZERO')
         self.assertRaises(Exception, instance.returns_2, expected_message="While calling returns_2 of <class 'amuse.support.interface.InCodeComponentImplementation'>: No transition from current state state 'ZERO' to state 'TWO' possible")
 
+    def test16(self):
+        original = ClassWithState()
+        instance = interface.InCodeComponentImplementation(original)
+
+        handler = instance.get_handler('STATE')
+        handler.add_transition('ZERO', 'ONE', 'move_to_state_1')
+        handler.add_transition('ONE', 'TWO', 'move_to_state_2')
+        handler.add_transition('TWO', 'ONE', 'move_to_state_1')
+        handler.add_method('ONE', 'returns_1')
+        handler.set_initial_state('ZERO')
+
+        returns_1 = instance.returns_1
+        self.assertTrue(instance.returns_1 is returns_1)
+        self.assertTrue(instance.always_works is instance.always_works)
+        self.assertEqual(returns_1(), 1)
+        self.assertEqual(instance.get_name_of_current_state(), 'ONE')
+        instance.move_to_state_2()
+        self.assertEqual(instance.returns_1(), 1)
+        self.assertEqual(original.number_of_times_move_to_state_1_called, 2)
+
+        handler.add_method('TWO', 'returns_1')
+        self.assertFalse(instance.returns_1 is returns_1)
+        instance.move_to_state_2()
+        self.assertEqual(instance.returns_1(), 2)
+        self.assertEqual(original.number_of_times_move_to_state_1_called, 2)
+
+        returns_1 = instance.returns_1
+        instance.state_machine.disable()
+        self.assertFalse(instance.returns_1 is returns_1)
+        instance.move_to_state_3()
+        self.assertEqual(instance.returns_1(), 3)
+        self.assertEqual(instance.get_name_of_current_state(), 'TWO')
+
+        self.assertEqual(instance.returns_3(), 3)
+        instance.get_handler('METHOD').add_method('returns_3', (), units.m)
+        self.assertEqual(instance.returns_3(), 3 | units.m)
+
 
 class CodeInterfaceWithUnitsAndStateTests(amusetest.TestCase):
     class TestClass(object):
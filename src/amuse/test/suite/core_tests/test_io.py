@@ -90,6 +90,16 @@ class FrameworkTests(amusetest.TestCase):
             expected_message="You tried to load a file with fileformat 'test', but"
                 " this format is not supported for reading files")
 
+    def test6(self):
+        processor = base.FileFormatProcessor
+        writer = io.AsyncSnapshotWriter("test.txt", format=processor)
+        writer.write(datamodel.Particles(2))
+        self.assertRaises(base.CannotSaveException, writer.flush)
+        writer.write(datamodel.Particles(2))
+        self.assertRaises(base.CannotSaveException, writer.close)
+        self.assertRaises(base.IoException, writer.write, datamodel.Particles(2),
+            expected_message="IO exception: cannot write a snapshot, the writer is closed")
+
 
 class FormatTests(amusetest.TestCase):
 
@@ -425,3 +435,47 @@ class FormatTests(amusetest.TestCase):
             y = io.read_set_from_file(filename, "hdf5")
             self.assertAlmostEqual(x.mass, y.mass, 8)
             self.assertEqual(y.previous_state().previous_state(), None)
+
+    def test_async_snapshot_writer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "snapshots.h5")
+            x = datamodel.Particles(2)
+            with io.AsyncSnapshotWriter(filename, "hdf5", append_to_file=True, maximum_number_of_pending_writes=1) as writer:
+                for i in range(3):
+                    x.mass = [1.0 * 10 ** i, 2.0 * 10 ** i] | units.kg
+                    writer.write(x, timestamp=i | units.s)
+                writer.flush()
+                x.mass = [0.0, 0.0] | units.kg
+            y = io.read_set_from_file(filename, "hdf5", copy_history=False, close_file=False)
+            self.assertAlmostEqual([100.0, 200.0] | units.kg, y.mass, 8)
+            self.assertAlmostEqual(2 | units.s, y.collection_attributes.timestamp, 8)
+            self.assertAlmostEqual([10.0, 20.0] | units.kg, y.previous_state().mass, 8)
+            self.assertAlmostEqual([1.0, 2.0] | units.kg, y.previous_state().previous_state().mass, 8)
+            self.assertEqual(y.previous_state().previous_state().previous_state(), None)
+
+    def test_iter_set_from_file(self):
+        x = datamodel.Particles(25)
+        x.mass = range(1, 26) | units.kg
+        x.radius = range(25) | units.m
+        with tempfile.TemporaryDirectory() as directory:
+            for format in ["amuse", "txt", "csv"]:
+                filename = os.path.join(directory, "particles." + format)
+                if format == "txt":
+                    options = dict(attribute_names=["mass", "radius"], attribute_types=[units.kg, units.m])
+                else:
+                    options = {}
+                io.write_set_to_file(x, filename, format, **options)
+                for read_ahead in [True, False]:
+                    chunks = list(io.iter_set_from_file(filename, format, chunk_size=10, attributes=["mass"], read_ahead=read_ahead, **options))
+                    self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+                    for i, chunk in enumerate(chunks):
+                        self.assertEqual(chunk.get_attribute_names_defined_in_store(), ["mass"])
+                        self.assertAlmostRelativeEquals(chunk.mass, x[i * 10:(i + 1) * 10].mass, 8)
+                    if format == "amuse":
+                        self.assertEqual(datamodel.ParticlesSuperset(chunks).key, x.key)
+
+            chunks = io.iter_set_from_file(os.path.join(directory, "particles.amuse"), "amuse", chunk_size=1)
+            self.assertEqual(len(next(chunks)), 1)
+            chunks.close()
+            self.assertRaises(StopIteration, next, chunks)
+            self.assertRaises(base.IoException, io.iter_set_from_file, os.path.join(directory, "particles.amuse"), "amuse", chunk_size=0)
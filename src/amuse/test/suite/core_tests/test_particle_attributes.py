@@ -13,6 +13,7 @@ from amuse.ic.plummer import new_plummer_sphere
 from amuse.ic.salpeter import new_salpeter_mass_distribution_nbody
 from amuse.datamodel import Particle, Particles, ParticlesWithUnitsConverted
 from amuse.datamodel import particle_attributes
+from amuse.ext.basicgraph import Graph, MinimumSpanningTree
 
 
 class TestParticlesAttributes(amusetest.TestCase):
@@ -354,6 +355,84 @@ class TestParticlesAttributes(amusetest.TestCase):
             for i, x in enumerate(stars):
                 self.assertAlmostRelativeEqual(potential[i], x.potential())
 
+    def test17(self):
+        stars = new_plummer_sphere(200)
+        stars.mass = numpy.arange(1, 201) / 20100.0 | nbody_system.mass
+        eps2 = 0.01 | nbody_system.length**2
+        potential = stars.potential(smoothing_length_squared=eps2)
+        expected = 0.5 * (stars.mass * potential).sum()
+        self.assertAlmostRelativeEqual(stars.potential_energy(smoothing_length_squared=eps2), expected, 12)
+        for block_size in [1, 7, 199, 200, 500]:
+            self.assertAlmostRelativeEqual(
+                stars.potential_energy(smoothing_length_squared=eps2, block_size=block_size), expected, 12)
+
+        self.assertAlmostRelativeEqual(
+            stars.potential_energy(smoothing_length_squared=eps2, opening_angle=1e-6), expected, 12)
+        approximation = stars.potential_energy(smoothing_length_squared=eps2, opening_angle=0.5)
+        self.assertAlmostRelativeEqual(approximation, expected, 3)
+        self.assertNotEqual(approximation, expected)
+
+    def test18(self):
+        print("Test spatial_index and the searches that use it")
+        numpy.random.seed(1234)
+        particles = Particles(300)
+        particles.position = numpy.random.uniform(-1, 1, (300, 3)) | units.parsec
+        index = particles.spatial_index()
+        self.assertTrue(index is particles.spatial_index())
+        particles.x += 0.1 | units.parsec
+        self.assertFalse(index is particles.spatial_index())
+        index = particles.spatial_index()
+        particles.add_particle(Particle(position=[0, 0, 0] | units.parsec))
+        self.assertFalse(index is particles.spatial_index())
+
+        distances_squared = particles.distances_squared(particles).value_in(units.parsec**2)
+        distances_squared[numpy.diag_indices(len(particles))] = numpy.inf
+        self.assertEqual(particles.nearest_neighbour().key, particles.key[distances_squared.argmin(axis=1)])
+        neighbours = particles[::7]
+        expected = particles.distances_squared(neighbours).value_in(units.parsec**2).argmin(axis=1)
+        self.assertEqual(particles.nearest_neighbour(neighbours).key, neighbours.key[expected])
+
+        size = 0.2 | units.parsec
+        components = particles.connected_components(threshold=size)
+        brute_force = particles.connected_components(
+            threshold=size, distfunc=lambda p, q: (q.position - p.position).lengths())
+        self.assertEqual(len(components), len(brute_force))
+        self.assertEqual(sum([len(x) for x in components]), len(particles))
+        self.assertEqual(sorted([sorted(x.key) for x in components]), sorted([sorted(x.key) for x in brute_force]))
+
+        index = particles.spatial_index()
+        for radius in [0.0, 0.05, 0.3, 1.0, 10.0]:
+            self.assertEqual(index.count_pairs(radius), (distances_squared < radius**2).sum())
+            pairs = index.query_pairs(radius)
+            self.assertEqual(len(pairs), (distances_squared < radius**2).sum() // 2)
+            self.assertTrue((pairs[:, 0] < pairs[:, 1]).all())
+
+        binaries = Particles(4)
+        binaries.mass = 1 | units.MSun
+        binaries.position = [[-1, 0, 0], [1, 0, 0], [0, 1000, 0], [0, 1002, 0]] | units.AU
+        binaries.velocity = [[0, 1, 0], [0, -1, 0], [0, 0, 0], [0, 0, 300]] | units.kms
+        found = binaries.get_binaries(hardness=0.01)
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].key, binaries[:2].key)
+
+    def test19(self):
+        print("Test minimum spanning tree of the spatial index against Kruskal on the complete graph")
+        numpy.random.seed(4321)
+        particles = Particles(200)
+        particles.position = numpy.random.normal(size=(200, 3)) | units.parsec
+        particles[:20].position = [0, 0, 1] | units.parsec  # equal distances
+        graph = Graph()
+        for i in range(len(particles)):
+            distances = (particles.position - particles[i].position).lengths().value_in(units.parsec)
+            for j in range(i):
+                graph.add_edge(i, j, distances[j])
+        expected = sum([edge[0] for edge in MinimumSpanningTree(graph)])
+        self.assertAlmostRelativeEqual(particles.minimum_spanning_tree_length(), expected | units.parsec, 12)
+
+        def distfunc(p, q):
+            return (((p.x - q.x) ** 2 + (p.y - q.y) ** 2) ** 0.5).value_in(p.x.unit)
+        self.assertAlmostRelativeEqual(particles[::4].Qparameter(), particles[::4].Qparameter(distfunc), 12)
+
 
 class TestParticlesDomainAttributes(amusetest.TestCase):
 
@@ -1105,6 +1105,59 @@ class TestParticlesSuperset(amusetest.TestCase):
         self.assertEqual(superset[4].name, '1234')
         self.assertEqual(superset.name[4], '1234')
 
+    def test15(self):
+        class Code(object):
+            def __init__(self):
+                self.mass = {}
+
+            def get_mass(self, index):
+                return units.kg([self.mass[i] for i in index])
+
+            def set_mass(self, index, mass):
+                for i, x in zip(index, mass.value_in(units.kg)):
+                    self.mass[i] = x
+
+            def new_particle(self, mass):
+                result = []
+                for x in mass.value_in(units.kg):
+                    index = len(self.mass)
+                    self.mass[index] = x
+                    result.append(index)
+                return result
+
+            def delete_particle(self, index):
+                for i in index:
+                    del self.mass[i]
+
+        code = Code()
+        storage = incode_storage.InCodeAttributeStorage(
+            code,
+            incode_storage.NewParticleMethod(code.new_particle, ("mass",)),
+            code.delete_particle,
+            None,
+            [incode_storage.ParticleSetAttributesMethod(code.set_mass, ("mass",)),],
+            [incode_storage.ParticleGetAttributesMethod(code.get_mass, ("mass",)),],
+            name_of_the_index="index"
+        )
+        particles1 = datamodel.Particles(storage=storage)
+        particles1.add_particles_to_store(
+            numpy.array([9, 10, 11], dtype="uint64"), ["mass"], [[1, 2, 3] | units.kg]
+        )
+        particles2 = datamodel.Particles(keys=[12, 13])
+        particles2.mass = [4, 5] | units.kg
+        particles3 = datamodel.Particles(keys=[14])
+        particles3.mass = 6 | units.kg
+        superset = datamodel.ParticlesSuperset([particles1, particles2, particles3])
+
+        self.assertEqual(superset.mass, [1, 2, 3, 4, 5, 6] | units.kg)
+        self.assertEqual(superset[2:5].mass, [3, 4, 5] | units.kg)
+        superset.mass = [6, 5, 4, 3, 2, 1] | units.kg
+        self.assertEqual(code.mass, {0: 6, 1: 5, 2: 4})
+        self.assertEqual(particles2.mass, [3, 2] | units.kg)
+        self.assertEqual(particles3.mass, [1] | units.kg)
+        superset[1:4].mass = 7 | units.kg
+        self.assertEqual(superset.mass, [6, 7, 7, 7, 2, 1] | units.kg)
+
 
 class TestParticlesWithFilteredAttributes(amusetest.TestCase):
 
@@ -421,6 +421,28 @@ class TestQuantities(amusetest.TestCase):
         self.assertEqual(x.mean(), 2.0 | si.kg)
         self.assertEqual(x.mean(where=mask), 1.5 | si.kg)
 
+    def test_unit_algebra_cache(self):
+        quantities.set_unit_algebra_cache_size(2)
+        try:
+            self.assertEqual(quantities.unit_algebra.cache_info().maxsize, 2)
+            for x in range(3):
+                self.assertEqual((2.0 | units.m) * (3.0 | units.kg), 6.0 | units.m * units.kg)
+                self.assertEqual((2.0 | units.km) / (4.0 | units.s), 500.0 | units.m / units.s)
+                self.assertEqual((1.0 | units.km) + (1.0 | units.m), 1.001 | units.km)
+                self.assertEqual((1.0 | units.km) - (1.0 | units.m), 0.999 | units.km)
+                self.assertEqual(2.0 / (4.0 | units.s), 0.5 | units.s**-1)
+            info = quantities.unit_algebra.cache_info()
+            self.assertEqual(info.currsize, 2)
+            self.assertTrue(info.hits > 0)
+            self.assertRaises(core.IncompatibleUnitsException, lambda: (1.0 | units.km) + (1.0 | units.s))
+
+            quantities.set_unit_algebra_cache_size(0)
+            self.assertFalse(hasattr(quantities.unit_algebra, "cache_info"))
+            self.assertEqual((1.0 | units.km) + (1.0 | units.m), 1.001 | units.km)
+            self.assertEqual(((2.0 | units.m) * (3.0 | units.kg)).unit, (units.m * units.kg).to_simple_form())
+        finally:
+            quantities.set_unit_algebra_cache_size()
+
 
 class TestAdaptingVectorQuantities(amusetest.TestCase):
 
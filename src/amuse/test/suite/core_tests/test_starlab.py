@@ -302,3 +302,12 @@ class Test(amusetest.TestCase):
         unconverted_set = io.read_set_from_file(os.path.join(directory, 'evolved.dyn'), 'starlab', must_scale=False)
         self.assertEqual(len(unconverted_set), 20)
         self.assertAlmostRelativeEquals(converter.to_nbody(set.x), unconverted_set.x)
+
+    def test8(self):
+        filename = os.path.join(os.path.dirname(__file__), 'evolved.dyn')
+        set = io.read_set_from_file(filename, 'starlab')
+        chunks = list(io.iter_set_from_file(filename, 'starlab', chunk_size=7, attributes=["mass", "position"]))
+        self.assertEqual([len(x) for x in chunks], [7, 7, 6])
+        self.assertEqual(sorted(chunks[0].get_attribute_names_defined_in_store()), ["mass", "x", "y", "z"])
+        self.assertAlmostRelativeEquals(datamodel.ParticlesSuperset(chunks).mass, set.mass, 10)
+        self.assertAlmostRelativeEquals(datamodel.ParticlesSuperset(chunks).position, set.position, 10)
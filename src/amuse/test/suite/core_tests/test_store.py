@@ -8,8 +8,10 @@ from amuse import io
 from amuse.io import store
 from amuse.io import store_v1
 from amuse.io import store_v2
+from amuse.io import store_v3
 from amuse.units import units
 from amuse.units import nbody_system
+from amuse.support import exceptions
 from amuse.datamodel import Particles
 from amuse.datamodel import ParticlesOverlay
 from amuse.datamodel import Grid
@@ -1045,3 +1047,158 @@ class TestStoreHDFV2(amusetest.TestCase, _AbstractTestStoreHDF):
         self.assertEqual(z[0].y[0].id, 5)
 
         os.remove(output_file)
+
+    def test62(self):
+        test_results_path = self.get_path_to_results()
+        output_file = os.path.join(test_results_path, "test62"+self.store_version()+".h5")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+        x = Particles(1000)
+        x.mass = numpy.arange(1000) | units.kg
+        x.position = numpy.arange(3000).reshape(1000, 3) | units.m
+        x.id = numpy.arange(1000)
+        io.write_set_to_file(x, output_file, "amuse", version=self.store_version())
+
+        processor = store_v2.StoreHDF(output_file, open_for_writing=False, append_to_file=False, copy_history=False)
+        processor.chunk_cache = store_v2.HDF5ChunkCache(4096, block_size=256)
+        z = processor.load()
+        storage = z._private.attribute_storage
+        self.assertAlmostRelativeEquals(z[10:20].mass, x[10:20].mass)
+        self.assertAlmostRelativeEquals(z[990:].position, x[990:].position)
+        self.assertAlmostRelativeEquals(z[::-7].mass, x[::-7].mass)
+        indices = [5, 999, 5, 0, 513, 514, 2]
+        self.assertAlmostRelativeEquals(z[indices].mass, x[indices].mass)
+        self.assertAlmostRelativeEquals(z[indices].position, x[indices].position)
+        self.assertEqual(z[indices].id, x[indices].id)
+        self.assertAlmostRelativeEquals(z[-1].mass, 999 | units.kg)
+        self.assertTrue(0 < processor.chunk_cache.size <= 4096)
+        self.assertTrue(storage.get_attribute("mass") is storage.get_attribute("mass"))
+
+        dataset = storage.attributesgroup["mass"]
+        for indices in (slice(3, 900, 4), numpy.array([[1, 2], [600, 1]]), numpy.arange(1000) % 3 == 0, [], -3):
+            self.assertEqual(store_v2.read_selection(dataset, indices, processor.chunk_cache), dataset[:][indices])
+        self.assertEqual(store_v2.read_rows(dataset, numpy.array([0, 64, 65, 998])), [0, 64, 65, 998])
+        processor.close()
+
+        processor = store_v2.StoreHDF(output_file, open_for_writing=False, append_to_file=True, copy_history=False)
+        z = processor.load()
+        self.assertAlmostRelativeEquals(z[1:3].mass, [1, 2] | units.kg)
+        z[1].mass = 10 | units.kg
+        self.assertAlmostRelativeEquals(z[1:3].mass, [10, 2] | units.kg)
+        processor.close()
+
+        os.remove(output_file)
+
+    def test63(self):
+        test_results_path = self.get_path_to_results()
+        output_file = os.path.join(test_results_path, "test63"+self.store_version()+".h5")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+        grid = Grid(10, 12, 3)
+        grid.rho = numpy.arange(360).reshape(10, 12, 3) | units.kg / units.m**3
+        io.write_set_to_file(grid, output_file, "amuse", version=self.store_version())
+
+        z = io.read_set_from_file(output_file, "amuse", close_file=False, return_context=True)
+        with z as loaded:
+            self.assertAlmostRelativeEquals(loaded[2:5, ::-3, 1].rho, grid[2:5, ::-3, 1].rho)
+            self.assertAlmostRelativeEquals(loaded[4][7][2].rho, grid[4][7][2].rho)
+            indices = (numpy.array([1, 9, 1]), numpy.array([0, 11, 3]), numpy.array([2, 0, 1]))
+            self.assertAlmostRelativeEquals(
+                loaded.get_values_in_store(indices, ["rho"])[0],
+                grid.get_values_in_store(indices, ["rho"])[0]
+            )
+
+        os.remove(output_file)
+
+
+class TestStoreHDFV3(amusetest.TestCase):
+
+    def new_output_file(self, name):
+        output_file = os.path.join(self.get_path_to_results(), name + "3.0.h5")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return output_file
+
+    def test1(self):
+        output_file = self.new_output_file("test1")
+        particles = Particles(4)
+        particles.mass = [1, 2, 3, 4] | units.kg
+        particles.id = [1, 2, 3, 4]
+        for i in range(5):
+            particles.x = (i + numpy.arange(4)) | units.m
+            io.write_set_to_file(particles, output_file, "amuse", version="3.0", append_to_file=True, timestamp=i | units.s)
+
+        loaded = io.read_set_from_file(output_file, "amuse")
+        self.assertEqual(loaded.key, particles.key)
+        self.assertAlmostRelativeEquals(loaded.x, [4, 5, 6, 7] | units.m)
+        self.assertEqual(loaded.id, [1, 2, 3, 4])
+        self.assertAlmostRelativeEquals(loaded.collection_attributes.timestamp, 4 | units.s)
+        history = list(loaded.history)
+        self.assertEqual(len(history), 5)
+        self.assertAlmostRelativeEquals(history[0].x, [0, 1, 2, 3] | units.m)
+
+        timestamp, x = io.read_history(output_file, ["timestamp", "x"])
+        self.assertAlmostRelativeEquals(timestamp, numpy.arange(5) | units.s)
+        self.assertEqual(x.shape, (5, 4))
+        self.assertAlmostRelativeEquals(x, (numpy.arange(5).reshape(5, 1) + numpy.arange(4)) | units.m)
+        mass, = io.read_history(output_file, ["mass"], keys=particles.key[::-2])
+        self.assertAlmostRelativeEquals(mass, [[4, 2]] * 5 | units.kg)
+
+        processor = store_v3.StoreHDF(output_file, open_for_writing=False, append_to_file=False)
+        group = processor.data_group()
+        self.assertEqual(len(group["keys"]), 4)
+        self.assertEqual(len(group["member_ranges"]), 1)
+        self.assertEqual(list(group["membership"][:]), [0] * 5)
+        self.assertEqual(sorted(group.keys()), ["attributes", "collection_attributes", "keys", "member_ranges", "members", "membership"])
+        processor.close()
+        os.remove(output_file)
+
+    def test2(self):
+        output_file = self.new_output_file("test2")
+        particles = Particles(3)
+        particles.x = [1, 2, 3] | units.m
+        io.write_set_to_file(particles, output_file, "amuse", version="3.0", append_to_file=True)
+        removed = particles[1]
+        particles.remove_particle(removed)
+        new_particle = particles.add_particle(Particles(1, x=[4] | units.m))
+        particles.y = 1 | units.m
+        io.write_set_to_file(particles, output_file, "amuse", version="3.0", append_to_file=True)
+
+        loaded = io.read_set_from_file(output_file, "amuse")
+        self.assertEqual(loaded.key, particles.key)
+        self.assertAlmostRelativeEquals(loaded.x, [1, 3, 4] | units.m)
+        self.assertAlmostRelativeEquals(loaded.y, [1, 1, 1] | units.m)
+        previous = list(loaded.history)[0]
+        self.assertEqual(len(previous), 3)
+        self.assertFalse("y" in previous.get_attribute_names_defined_in_store())
+
+        keys, x = io.read_history(output_file, ["key", "x"])
+        self.assertEqual(x.shape, (2, 4))
+        self.assertEqual(keys[0, :3], [particles[0].key, removed.key, particles[1].key])
+        self.assertEqual(keys[1], [particles[0].key, 0, particles[1].key, new_particle.key])
+        self.assertAlmostRelativeEquals(x[0, :3], [1, 2, 3] | units.m)
+        self.assertTrue(numpy.isnan(x[1, 1].value_in(units.m)))
+        self.assertTrue(numpy.isnan(x[0, 3].value_in(units.m)))
+        os.remove(output_file)
+
+    def test3(self):
+        output_file = self.new_output_file("test3")
+        grid = Grid(2, 3)
+        for i in range(3):
+            grid.rho = (i + numpy.arange(6).reshape(2, 3)) | units.kg / units.m**3
+            io.write_set_to_file([grid], output_file, "amuse", version="3.0", append_to_file=True, names=["gas"])
+
+        loaded, = io.read_set_from_file(output_file, "amuse", names=["gas"])
+        self.assertEqual(loaded.shape, (2, 3))
+        self.assertAlmostRelativeEquals(loaded.rho, grid.rho)
+        rho, = io.read_history(output_file, ["rho"], name="gas")
+        self.assertEqual(rho.shape, (3, 2, 3))
+        self.assertAlmostRelativeEquals(rho[1], grid.rho - (1 | units.kg / units.m**3))
+
+        self.assertRaises(Exception, io.write_set_to_file, grid, output_file, "amuse", version="2.0", append_to_file=True)
+        self.assertRaises(exceptions.AmuseException, io.write_set_to_file, grid, output_file, "amuse",
+            version="3.0", append_to_file=True, names=["gas"],
+            expected_message="the sets to store with names must be given as a list, not as a Grid")
+        os.remove(output_file)
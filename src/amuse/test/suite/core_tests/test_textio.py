@@ -351,6 +351,37 @@ class TableFormattedTextTests(amusetest.TestCase):
         self.assertAlmostRelativeEquals(p2.a, p.a)
         self.assertAlmostRelativeEquals(p2.b, p.b)
 
+    def test15(self):
+        p = datamodel.Particles(keys=[2**60 + i for i in range(25)])
+        p.a = numpy.linspace(0, 1, 25) | units.m
+        p.n = numpy.arange(25) - 12
+
+        stream = StringIO()
+        instance = text.TableFormattedText(stream=stream, set=p)
+        instance.attribute_names = ['a', 'n']
+        instance.attribute_types = [units.m, None]
+        instance.key_in_column = 1
+        instance.maximum_number_of_lines_buffered = 7
+        instance.store()
+        contents = stream.getvalue()
+
+        lines = contents.splitlines()
+        self.assertEqual(len(lines), 27)
+        self.assertEqual(lines[2], "0.0 {0} -12".format(p[0].key))
+        self.assertEqual(lines[3], "{0!r} {1} -11".format(float(p[1].a.value_in(units.m)), p[1].key))
+
+        for contents_to_read in [contents, contents.replace("\n", "\n\n", 5)]:
+            instance = text.TableFormattedText(stream=StringIO(contents_to_read))
+            instance.attribute_names = ['a', 'n']
+            instance.attribute_types = [units.m, None]
+            instance.attribute_dtypes = ['float64', 'int64']
+            instance.key_in_column = 1
+            instance.maximum_number_of_lines_buffered = 7
+            read = instance.load()
+            self.assertEqual(read.key, p.key)
+            self.assertEqual(read.a, p.a)
+            self.assertEqual(read.n, p.n)
+
 
 class CsvFileTextTests(amusetest.TestCase):
 
@@ -0,0 +1,68 @@
+import time
+
+from amuse.test import amusetest
+from amuse.rfi import worker_pool
+
+
+class FakeChannel(object):
+    number_of_channels = 0
+
+    def __init__(self):
+        FakeChannel.number_of_channels += 1
+        self.is_stopped = False
+
+    def send_message(self, call_id, function_id, dtype_to_arguments={}):
+        pass
+
+    def recv_message(self, call_id, function_id, handle_as_array):
+        return {}
+
+    def stop(self):
+        self.is_stopped = True
+
+
+class WorkerPoolTests(amusetest.TestCase):
+
+    def wait_for(self, condition, timeout=10.0):
+        end = time.time() + timeout
+        while not condition() and time.time() < end:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test1(self):
+        pool = worker_pool.WorkerPool()
+        self.assertEqual(pool.acquire("a"), None)
+        pool.start_workers("a", FakeChannel, size=2, can_start_in_background=False)
+        self.assertEqual(pool.number_of_idle_workers("a"), 0)
+
+        channel = FakeChannel()
+        self.assertTrue(pool.release("a", channel))
+        self.assertEqual(pool.number_of_idle_workers("a"), 1)
+        self.assertTrue(pool.acquire("a") is channel)
+        self.assertEqual(pool.acquire("a"), None)
+        self.assertFalse(pool.release("b", channel))
+
+    def test2(self):
+        pool = worker_pool.WorkerPool()
+        pool.start_workers("a", FakeChannel, size=3, maximum_size=4)
+        self.wait_for(lambda: pool.number_of_idle_workers("a") == 3)
+        channels = [pool.acquire("a") for i in range(2)]
+        self.assertTrue(all(isinstance(x, FakeChannel) for x in channels))
+        self.wait_for(lambda: pool.number_of_idle_workers("a") == 3)
+
+        self.assertTrue(pool.release("a", channels[0]))
+        self.assertFalse(pool.release("a", channels[1]))
+        self.assertEqual(pool.number_of_idle_workers("a"), 4)
+        pool.stop()
+        self.assertEqual(pool.number_of_idle_workers("a"), 0)
+        self.assertTrue(channels[0].is_stopped)
+        self.assertFalse(channels[1].is_stopped)
+        self.assertEqual(pool.acquire("a"), None)
+
+    def test3(self):
+        pool = worker_pool.WorkerPool(polling_interval=0.01)
+        pool.start_workers("a", FakeChannel, size=0, maximum_idle_time=0.05)
+        channel = FakeChannel()
+        self.assertTrue(pool.release("a", channel))
+        self.wait_for(lambda: channel.is_stopped)
+        self.assertEqual(pool.number_of_idle_workers("a"), 0)
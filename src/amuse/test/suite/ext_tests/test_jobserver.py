@@ -4,6 +4,7 @@ from amuse.ext.job_server import RemoteCodeInterface, JobServer
 
 from socket import gethostname
 import os
+import numpy
 
 from amuse.ic.plummer import new_plummer_model
 
@@ -92,6 +93,19 @@ class TestRemoteCode(amusetest.TestCase):
         var_ = remote.evaluate("var")
         self.assertEqual(var_, var*2)
 
+    def test5(self):
+        self.check_not_in_mpiexec()
+        remote = RemoteCodeInterface(channel_type="sockets")
+
+        var = numpy.arange(100000.0).reshape(1000, 100)
+        remote.assign("var", var)
+        var_ = remote.evaluate("var[::-1] * 2")
+        self.assertEqual(var_, var[::-1] * 2)
+        self.assertTrue(var_.flags.writeable)
+        result = remote.func(numpy.sum, var, axis=1)
+        self.assertEqual(result, var.sum(axis=1))
+        remote.stop()
+
 
 class TestJobServer(amusetest.TestCase):
 
@@ -112,3 +126,15 @@ class TestJobServer(amusetest.TestCase):
         result = example_parallel_jobs2(10, 4)
         for arg, res in result.items():
             self.assertEqual(arg, len(res))
+
+    def test4(self):
+        jobserver = JobServer(hosts=[gethostname()]*2, verbose=False)
+        futures = dict((i, jobserver.submit(new_plummer_model, i)) for i in range(1, 6))
+        for arg, future in futures.items():
+            self.assertEqual(arg, len(future.result()))
+            self.assertTrue(future.done())
+        self.assertEqual(len(list(jobserver.finished_jobs)), 0)
+
+        future = jobserver.submit(numpy.sqrt, "a")
+        self.assertTrue(future.exception() is not None)
+        self.assertRaises(Exception, future.result)
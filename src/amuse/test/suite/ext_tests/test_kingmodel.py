@@ -4,7 +4,7 @@ from amuse.test import amusetest
 from amuse.support.exceptions import AmuseException
 from amuse.units import nbody_system
 from amuse.units import units
-from amuse.ic.kingmodel import new_king_model
+from amuse.ic.kingmodel import new_king_model, MakeKingModel
 
 
 class TestKingModel(amusetest.TestCase):
@@ -54,3 +54,25 @@ class TestKingModel(amusetest.TestCase):
         self.assertAlmostEqual(particles.center_of_mass_velocity(), [0, 0, 0] | units.km / units.s)
         self.assertAlmostEqual(particles[:3].position, [[-0.23147381, -0.19421449, -0.01165137],
             [-0.09283025, -0.06444658, -0.07922396], [-0.44189946, 0.23786357, 0.39115629]] | units.AU)
+
+    def test6(self):
+        print("Testing the vectorized sampling against the per-particle sampling.")
+        for W0, beta in [(6.0, 0.0), (3.0, 0.5)]:
+            generator = MakeKingModel(200, W0, beta=beta, random=numpy.random.default_rng(12))
+            masses, positions, velocities = generator.makeking()
+            self.assertEqual(positions.shape, (200, 3))
+            self.assertEqual(velocities.shape, (200, 3))
+            generator.random = numpy.random.default_rng(12)
+            positions, velocities = generator.sample_phase_space()
+
+            generator.random = numpy.random.default_rng(12)
+            for i in range(200):
+                position, potential = generator.setpos()
+                velocity = generator.setvel(potential)
+                self.assertAlmostRelativeEqual(positions[i], position, 12)
+                self.assertAlmostRelativeEqual(velocities[i], velocity, 12)
+
+        particles1 = new_king_model(100, 6.0, random=numpy.random.default_rng(7))
+        particles2 = new_king_model(100, 6.0, random=numpy.random.default_rng(7))
+        self.assertEqual(particles1.position, particles2.position)
+        self.assertEqual(particles1.velocity, particles2.velocity)
@@ -16,6 +16,7 @@ from amuse.lab import *
 #from amuse.datamodel import *
 #from amuse.units import nbody_system
 from amuse.support.thirdparty import texttable
+from amuse.units import quantities
 
 import traceback
 
@@ -546,6 +547,56 @@ class RunSpeedTests(object):
             lengths[x]
         self.end_measurement()
         
+    def _scalar_quantity_arithmetic(self):
+        mass = 1.0 | units.MSun
+        distance = 1.0 | units.parsec
+        speed = 1.0 | units.kms
+        total = 0.0 | units.J
+        for x in range(self.total_number_of_points):
+            energy = 0.5 * mass * speed * speed - constants.G * mass * mass / distance
+            total = total + energy
+            distance = distance + (1.0 | units.AU)
+        return total
+
+    def _small_vector_quantity_arithmetic(self):
+        mass = [1.0, 2.0, 3.0] | units.MSun
+        position = [1.0, 2.0, 3.0] | units.parsec
+        velocity = [1.0, 2.0, 3.0] | units.kms
+        total = 0.0 | units.J
+        for x in range(self.total_number_of_points):
+            energy = 0.5 * mass * velocity * velocity - constants.G * mass / position * mass
+            total = total + energy.sum()
+            position = position + (1.0 | units.AU)
+        return total
+
+    def speed_scalar_quantity_arithmetic(self):
+        self.start_measurement()
+        self._scalar_quantity_arithmetic()
+        self.end_measurement()
+
+    def speed_scalar_quantity_arithmetic_without_unit_algebra_cache(self):
+        quantities.set_unit_algebra_cache_size(0)
+        try:
+            self.start_measurement()
+            self._scalar_quantity_arithmetic()
+            self.end_measurement()
+        finally:
+            quantities.set_unit_algebra_cache_size()
+
+    def speed_small_vector_quantity_arithmetic(self):
+        self.start_measurement()
+        self._small_vector_quantity_arithmetic()
+        self.end_measurement()
+
+    def speed_small_vector_quantity_arithmetic_without_unit_algebra_cache(self):
+        quantities.set_unit_algebra_cache_size(0)
+        try:
+            self.start_measurement()
+            self._small_vector_quantity_arithmetic()
+            self.end_measurement()
+        finally:
+            quantities.set_unit_algebra_cache_size()
+
     def speed_add_particles(self):
         particles_to_add = new_plummer_model(self.total_number_of_points)
         step = self.total_number_of_points / 10
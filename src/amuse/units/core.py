@@ -1180,7 +1180,7 @@ def get_base_unit_with_name(system, name):
 class UnitWithSpecificDtype(named_unit):
 
     def __init__(self, unit, dtype):
-        self.specific_dtype = dtype
+        self.specific_dtype = numpy.dtype(dtype)
         symbol = str(unit) + "_" + str(dtype)
         named_unit.__init__(self, symbol, symbol, unit)
 
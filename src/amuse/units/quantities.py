@@ -1,5 +1,6 @@
 import numpy
 import operator
+import functools
 
 from math import sqrt
 
@@ -21,6 +22,43 @@ except ImportError:
     HAS_ASTROPY = False
 
 
+UNIT_ALGEBRA_CACHE_SIZE = 1024
+
+
+def _calculate_unit_algebra(operation, unit1, unit2):
+    """
+    Returns the unit of the result of an arithmetic operation on
+    quantities in unit1 and unit2 and the factor to multiply the
+    values in unit2 with. For addition (and subtraction) the result is
+    in unit1, for multiplication and division the result is in the
+    simple form of the combined unit. If unit1 is None, the result is
+    the inverse of unit2.
+    """
+    if operation is operator.add:
+        return unit1, unit2.conversion_factor_from(unit1)
+    elif unit1 is None:
+        return (1.0 / unit2).to_simple_form(), 1
+    else:
+        return operation(unit1, unit2).to_simple_form(), 1
+
+
+def set_unit_algebra_cache_size(maxsize=UNIT_ALGEBRA_CACHE_SIZE):
+    """
+    Sets the maximum number of (operator, unit, unit) combinations to
+    remember the result unit and conversion factor for, the least
+    recently used combinations are evicted first. A maxsize of 0
+    disables the cache.
+    """
+    global unit_algebra
+    if maxsize > 0:
+        unit_algebra = functools.lru_cache(maxsize=maxsize)(_calculate_unit_algebra)
+    else:
+        unit_algebra = _calculate_unit_algebra
+
+
+set_unit_algebra_cache_size()
+
+
 class Quantity:
     """
     A Quantity objects represents a scalar or vector with a
@@ -111,8 +149,8 @@ class Quantity:
             return new_quantity(other.number, other.unit)
         else:
             other = to_quantity(other)
-            factor = other.unit.conversion_factor_from(self.unit)
-            return new_quantity(self.number + factor * other.number, self.unit)
+            unit, factor = unit_algebra(operator.add, self.unit, other.unit)
+            return new_quantity(self.number + factor * other.number, unit)
 
     __radd__ = __add__
 
@@ -120,20 +158,21 @@ class Quantity:
         if self.unit.is_zero():
             return -other
         else:
-            other_in_my_units = to_quantity(other).as_quantity_in(self.unit)
-            return new_quantity(self.number - other_in_my_units.number, self.unit)
+            other = to_quantity(other)
+            unit, factor = unit_algebra(operator.add, self.unit, other.unit)
+            return new_quantity(self.number - other.number * factor, unit)
 
     def __rsub__(self, other):
         if self.unit.is_zero():
             return new_quantity(other.number, other.unit)
-        other_in_my_units = to_quantity(other).as_quantity_in(self.unit)
-        return new_quantity(other_in_my_units.number - self.number, self.unit)
+        other = to_quantity(other)
+        unit, factor = unit_algebra(operator.add, self.unit, other.unit)
+        return new_quantity(other.number * factor - self.number, unit)
 
     def __mul__(self, other):
         other = to_quantity(other)
-        return new_quantity_nonone(
-            self.number * other.number, (self.unit * other.unit).to_simple_form()
-        )
+        unit, _ = unit_algebra(operator.mul, self.unit, other.unit)
+        return new_quantity_nonone(self.number * other.number, unit)
 
     __rmul__ = __mul__
 
@@ -142,39 +181,34 @@ class Quantity:
 
     def __truediv__(self, other):
         other = to_quantity(other)
+        unit, _ = unit_algebra(operator.truediv, self.unit, other.unit)
         return new_quantity_nonone(
-            operator.__truediv__(self.number, other.number),
-            (self.unit / other.unit).to_simple_form(),
+            operator.__truediv__(self.number, other.number), unit
         )
 
     def __rtruediv__(self, other):
-        return new_quantity_nonone(
-            operator.__truediv__(other, self.number), (1.0 / self.unit).to_simple_form()
-        )
+        unit, _ = unit_algebra(operator.truediv, None, self.unit)
+        return new_quantity_nonone(operator.__truediv__(other, self.number), unit)
 
     def __floordiv__(self, other):
         other = to_quantity(other)
+        unit, _ = unit_algebra(operator.truediv, self.unit, other.unit)
         return new_quantity_nonone(
-            operator.__floordiv__(self.number, other.number),
-            (self.unit / other.unit).to_simple_form(),
+            operator.__floordiv__(self.number, other.number), unit
         )
 
     def __rfloordiv__(self, other):
-        return new_quantity_nonone(
-            operator.__floordiv__(other, self.number),
-            (1.0 / self.unit).to_simple_form(),
-        )
+        unit, _ = unit_algebra(operator.truediv, None, self.unit)
+        return new_quantity_nonone(operator.__floordiv__(other, self.number), unit)
 
     def __div__(self, other):
         other = to_quantity(other)
-        return new_quantity_nonone(
-            self.number / other.number, (self.unit / other.unit).to_simple_form()
-        )
+        unit, _ = unit_algebra(operator.truediv, self.unit, other.unit)
+        return new_quantity_nonone(self.number / other.number, unit)
 
     def __rdiv__(self, other):
-        return new_quantity_nonone(
-            other / self.number, (1.0 / self.unit).to_simple_form()
-        )
+        unit, _ = unit_algebra(operator.truediv, None, self.unit)
+        return new_quantity_nonone(other / self.number, unit)
 
     def __mod__(self, other):
         other_in_my_units = to_quantity(other).as_quantity_in(self.unit)